@@ -0,0 +1,228 @@
+import argparse
+import mmap
+import pickle
+import struct
+import sys
+import time
+
+
+MAGIC = b'MCAR'
+# 3 stores each section pickled; the fixed-width records of versions 1 and 2 are no longer read
+FORMAT_VERSION = 3
+
+HEADER = struct.Struct('<4sHHI')  # magic, version, flags, section count
+SECTION_ENTRY = struct.Struct('<4sQQ')  # section tag, offset, length
+
+TOKENS = b'TOKS'
+IR = b'IRCD'
+SYMBOLS = b'SYMS'
+AST = b'ASTN'
+FUNCTIONS = b'FUNS'
+
+
+class ArtifactError(Exception):
+    """Raised for data that is not a readable artifact"""
+    pass
+
+
+def encode_artifact(tokens=None, ir_code=None, symbols=None, ast=None, functions=None):
+    """
+    Serialize compile results
+
+    Args:
+        tokens: Token dicts from TokenScanner.scan / CompileSession.token_stream
+        ir_code: IR instructions
+        symbols: Symbol entries (VariableRegistry.all_entries())
+        ast: AST (nested tuples)
+        functions: Function dicts (CompileSession.functions values)
+
+    Returns:
+        bytes: Artifact data
+    """
+    sections = []
+    if tokens is not None:
+        sections.append((TOKENS, list(tokens)))
+    if ir_code is not None:
+        sections.append((IR, ir_code))
+    if symbols is not None:
+        sections.append((SYMBOLS, symbols))
+    if ast is not None:
+        sections.append((AST, ast))
+    if functions is not None:
+        sections.append((FUNCTIONS, [(function['name'], function['dtype'],
+                                      [tuple(param) for param in function['params']], function['ir'])
+                                     for function in functions]))
+    data = [(tag, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for tag, value in sections]
+    offset = HEADER.size + SECTION_ENTRY.size * len(data)
+    table = []
+    for tag, blob in data:
+        table.append(SECTION_ENTRY.pack(tag, offset, len(blob)))
+        offset += len(blob)
+    return (HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(data)) + b''.join(table)
+            + b''.join(blob for _, blob in data))
+
+
+def session_artifact(session):
+    """Serialize the tokens, IR, symbols, AST and functions of a CompileSession"""
+    return encode_artifact(session.token_stream, session.ir_instructions,
+                           session.registry.all_entries(), session.ast, session.functions.values())
+
+
+class ArtifactReader:
+    """
+    Reader over artifact bytes, a memoryview or an mmap
+
+    Sections are located from the header and each is unpickled the first
+    time it is used, so reading the IR does not decode the tokens. Only
+    read artifacts you wrote: unpickling untrusted data can run code.
+    """
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        if len(self.view) < HEADER.size:
+            raise ArtifactError("not an artifact (too short)")
+        magic, version, _, count = HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC:
+            raise ArtifactError("not an artifact (bad magic)")
+        if version != FORMAT_VERSION:
+            raise ArtifactError(f"unsupported artifact version {version} (expected {FORMAT_VERSION}); "
+                                f"compile the source again")
+
+        self.sections = {}
+        for pos in range(count):
+            tag, offset, length = SECTION_ENTRY.unpack_from(self.view, HEADER.size + pos * SECTION_ENTRY.size)
+            if offset + length > len(self.view):
+                raise ArtifactError(f"section {tag.decode('ascii', 'replace')} runs past the end")
+            self.sections[tag] = self.view[offset:offset + length]
+        self.decoded = {}
+
+    def section(self, tag):
+        """The unpickled section, or None if the artifact has none"""
+        if tag not in self.sections:
+            return None
+        if tag not in self.decoded:
+            try:
+                self.decoded[tag] = pickle.loads(self.sections[tag])
+            except Exception as e:
+                raise ArtifactError(f"section {tag.decode('ascii', 'replace')} is corrupt: {e}") from e
+        return self.decoded[tag]
+
+    @property
+    def tokens(self):
+        return self.section(TOKENS)
+
+    @property
+    def ir(self):
+        return self.section(IR)
+
+    @property
+    def symbols(self):
+        return self.section(SYMBOLS)
+
+    def functions(self):
+        """
+        Decode the functions section
+
+        Returns:
+            dict: Name -> {'name', 'dtype', 'params', 'ir'} with params as
+                  (name, dtype) tuples, or None if the artifact has none
+        """
+        functions = self.section(FUNCTIONS)
+        if functions is None:
+            return None
+        return {name: {'name': name, 'dtype': dtype, 'params': params, 'ir': ir}
+                for name, dtype, params, ir in functions}
+
+    def ast(self):
+        """
+        Decode the AST section
+
+        Returns:
+            tuple: The AST as stored, or None if the artifact has none
+        """
+        return self.section(AST)
+
+    def release(self):
+        """Drop every view into the buffer (required before closing an mmap)"""
+        for view in self.sections.values():
+            view.release()
+        self.view.release()
+
+
+class ArtifactFile(ArtifactReader):
+    """Memory-mapped artifact file; use as a context manager"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            super().__init__(self.mapped)
+        except Exception:
+            self.mapped.close()
+            raise
+
+    def close(self):
+        self.release()
+        self.mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_artifact(path, data):
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def main(argv=None):
+    """Compare artifact size, encode and load time with pickle and JSON on a generated program"""
+    import json
+    from compiler import Compiler
+    from workloads import generate_program
+
+    arg_parser = argparse.ArgumentParser(description="Artifact format size and speed comparison")
+    arg_parser.add_argument('--statements', type=int, default=5000)
+    args = arg_parser.parse_args(argv)
+
+    session = Compiler().compile(generate_program(args.statements))
+    payload = {'tokens': session.token_stream, 'ir': session.ir_instructions,
+               'symbols': session.registry.all_entries(), 'ast': session.ast}
+
+    def best(func, runs=5):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    blob_pickle = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    blob_json = json.dumps(payload).encode('utf-8')
+    blob_artifact = encode_artifact(payload['tokens'], payload['ir'], payload['symbols'], payload['ast'])
+
+    def load_artifact_full():
+        reader = ArtifactReader(blob_artifact)
+        return reader.tokens, reader.ir, reader.symbols, reader.ast()
+
+    print(f"{len(session.token_stream)} tokens, {len(session.ir_instructions)} IR instructions")
+    print(f"{'FORMAT':<18} {'SIZE':<12} {'ENCODE':<12} {'LOAD':<12}")
+    rows = [
+        ('pickle', blob_pickle, lambda: pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL),
+         lambda: pickle.loads(blob_pickle)),
+        ('json', blob_json, lambda: json.dumps(payload), lambda: json.loads(blob_json)),
+        ('artifact (full)', blob_artifact,
+         lambda: encode_artifact(payload['tokens'], payload['ir'], payload['symbols'], payload['ast']),
+         load_artifact_full),
+        ('artifact (IR only)', blob_artifact, None, lambda: ArtifactReader(blob_artifact).ir),
+    ]
+    for name, blob, encode, load in rows:
+        encode_ms = f"{best(encode):.2f} ms" if encode else '-'
+        print(f"{name:<18} {len(blob):<12} {encode_ms:<12} {best(load):.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+import argparse
+import random
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:  # Optional: only batch execution needs it
+    numpy = None
+
+from cfg import build_cfg
+from ir import (ARITHMETIC_OPS, BRANCH_OPS, CONVERSION_OPS, DIVISION_OPS, RELATIONAL_OPS, defined,
+                float_variables, is_var, uses)
+
+
+DEFAULT_MAX_STEPS = 50_000_000
+
+# Benchmark kernel: data-dependent loop counts and branches, so lanes diverge
+DEFAULT_KERNEL = """
+input int seed;
+input int rounds;
+int x = seed;
+int acc = 0;
+for (int i = 0; i < rounds % 100; i = i + 1) {
+    x = (x * 1103515245 + 12345) % 2147483648;
+    if (x % 3 == 0) {
+        acc = acc + x / 7;
+    } else {
+        acc = acc - x % 11;
+    }
+}
+int steps = 0;
+int n = seed % 50 + 1;
+while (n != 1) {
+    if (n % 2 == 0) { n = n / 2; } else { n = 3 * n + 1; }
+    steps = steps + 1;
+}
+print(acc);
+print(steps);
+"""
+
+
+class BatchError(Exception):
+    """Raised when a batch cannot be run (missing NumPy, bad inputs, unsupported IR)"""
+    pass
+
+
+class BatchResult:
+    """Outputs and final state of every lane of one batch run"""
+
+    def __init__(self, size, records, values, failed, errors, steps, block_runs):
+        self.size = size
+        self.records = records  # (lane indices or None for all, printed values), in order
+        self.values = values  # Variable -> array of its final value per lane
+        self.failed = failed  # Lanes stopped by a run-time error
+        self.errors = errors  # Lane -> error message
+        self.steps = steps  # Executed instructions per lane
+        self.block_runs = block_runs  # Masked block executions for the whole batch
+        self._outputs = None
+
+    @property
+    def outputs(self):
+        """Values each lane printed, as a list per lane"""
+        if self._outputs is None:
+            outputs = [[] for _ in range(self.size)]
+            for lanes, values in self.records:
+                for lane, value in zip(range(self.size) if lanes is None else lanes.tolist(),
+                                       values.tolist()):
+                    outputs[lane].append(value)
+            self._outputs = outputs
+        return self._outputs
+
+
+def check_inputs(declared, inputs):
+    """
+    Check batch inputs against a program's input declarations
+
+    Args:
+        declared: (name, dtype) pairs from CompileSession.inputs
+        inputs: dict from input name to a sequence of values
+
+    Returns:
+        int: Batch size (length of every input)
+
+    Raises:
+        BatchError: If an input is missing, undeclared or of another length
+    """
+    names = [name for name, _ in declared]
+    missing = [name for name in names if name not in inputs]
+    if missing:
+        raise BatchError(f"no values for input(s) {', '.join(missing)}")
+    unknown = [name for name in inputs if name not in names]
+    if unknown:
+        raise BatchError(f"{', '.join(unknown)} not declared as input(s)")
+    sizes = {len(values) for values in inputs.values()}
+    if len(sizes) > 1:
+        raise BatchError("inputs have different lengths")
+    return sizes.pop() if sizes else 1
+
+
+def _truncating_div(a, b):
+    """C division of int arrays (b must have no zeros)"""
+    quotient = numpy.floor_divide(a, b)
+    inexact = numpy.remainder(a, b) != 0
+    return quotient + (inexact & ((a < 0) != (b < 0)))
+
+
+def _truncating_mod(a, b):
+    """C remainder of int arrays (b must have no zeros)"""
+    return a - b * _truncating_div(a, b)
+
+
+def _operations():
+    """Binary op -> array function; a typed op never looks at its lanes' dtypes"""
+    return {
+        'iadd': numpy.add, 'isub': numpy.subtract, 'imul': numpy.multiply,
+        'idiv': _truncating_div, 'imod': _truncating_mod,
+        'fadd': numpy.add, 'fsub': numpy.subtract, 'fmul': numpy.multiply,
+        'fdiv': numpy.true_divide, 'fmod': numpy.fmod,
+        '<': numpy.less, '<=': numpy.less_equal, '>': numpy.greater,
+        '>=': numpy.greater_equal, '==': numpy.equal, '!=': numpy.not_equal,
+    }
+
+
+class BatchExecutor:
+    """
+    Runs one IR program over a batch of inputs with NumPy arrays
+
+    Every variable and temp is an array with one element per input (lane).
+    Lanes keep their own position in the CFG; each step runs the first
+    block (in layout order) that some lane is at, for the lanes at that
+    block (all of them when the batch has not diverged), and a branch only
+    updates the positions of the lanes that took it. Ints are 64-bit and
+    wrap like `IRInterpreter(int_bits=64)` and native code; a variable that
+    may hold a float is a float64 array in every lane.
+    """
+
+    def __init__(self, max_steps=DEFAULT_MAX_STEPS):
+        if numpy is None:
+            raise BatchError("batch execution requires NumPy (pip install numpy)")
+        self.max_steps = max_steps
+
+    def run(self, ir_code, inputs=None, size=None, declared=None):
+        """
+        Execute an IR program once for every lane
+
+        Args:
+            ir_code: List of IR instructions
+            inputs: dict from input name to a sequence of per-lane values
+            size: Number of lanes (defaults to the length of the inputs)
+            declared: Variable name -> declared type (CompileSession.declared_types())
+
+        Returns:
+            BatchResult
+
+        Raises:
+            BatchError: If the IR has an operation batches cannot run
+        """
+        inputs = inputs or {}
+        if size is None:
+            size = len(next(iter(inputs.values()))) if inputs else 1
+        cfg = build_cfg(ir_code)
+        instrs = [instr for block in cfg.blocks for instr in block.instrs]
+        floats = float_variables(instrs, declared)
+        operations = _operations()
+        exit_pos = len(cfg.blocks) - 1
+        position = {block: pos for pos, block in enumerate(cfg.blocks)}
+
+        env = {}
+        for instr in instrs:
+            for name in uses(instr) + [defined(instr)]:
+                if name is not None and name not in env:
+                    env[name] = numpy.zeros(size, numpy.float64 if name in floats else numpy.int64)
+        for name, values in inputs.items():
+            env[name] = numpy.asarray(values, numpy.float64 if name in floats else numpy.int64).copy()
+
+        pc = numpy.zeros(size, numpy.int64)
+        steps = numpy.zeros(size, numpy.int64)
+        failed = numpy.zeros(size, bool)
+        errors = {}
+        records = []
+        block_runs = 0
+
+        def value(operand):
+            return env[operand] if is_var(operand) else operand
+
+        def fail(bad, message):
+            for lane in numpy.flatnonzero(bad).tolist():
+                errors[lane] = message
+            failed[bad] = True
+            pc[bad] = exit_pos
+
+        with numpy.errstate(all='ignore'):
+            while True:
+                pos = int(pc.min())
+                if pos == exit_pos:
+                    break
+                block = cfg.blocks[pos]
+                mask = pc == pos
+                if mask.all():
+                    mask = None
+                block_runs += 1
+
+                for instr in block.instrs:
+                    op = instr['op']
+                    if op == 'count':
+                        continue
+                    if op in ARITHMETIC_OPS or op in RELATIONAL_OPS:
+                        a, b = value(instr['src1']), value(instr['src2'])
+                        if op in DIVISION_OPS:
+                            zero = numpy.broadcast_to(numpy.asarray(b) == 0, (size,))
+                            if zero.any():
+                                bad = zero if mask is None else zero & mask
+                                if bad.any():
+                                    fail(bad, "division by zero")
+                                    mask = ~bad if mask is None else mask & ~bad
+                                b = numpy.where(zero, 1, b)
+                        result = operations[op](a, b)
+                        numpy.copyto(env[instr['dst']], result, casting='unsafe',
+                                     where=True if mask is None else mask)
+                    elif op == 'assign' or op in CONVERSION_OPS:
+                        # dst's array has the converted type already
+                        numpy.copyto(env[instr['dst']], value(instr['src1']), casting='unsafe',
+                                     where=True if mask is None else mask)
+                    elif op == 'output':
+                        printed = numpy.broadcast_to(value(instr['src1']), (size,))
+                        if mask is None:
+                            records.append((None, printed.copy()))
+                        else:
+                            records.append((numpy.flatnonzero(mask), printed[mask]))
+                    elif op in BRANCH_OPS:
+                        continue
+                    else:
+                        raise BatchError(f"cannot run '{op}' in a batch")
+
+                active = slice(None) if mask is None else mask
+                steps[active] += sum(1 for instr in block.instrs if instr['op'] != 'count')
+                term = block.terminator
+                if term is None:
+                    pc[active] = position[block.fallthrough]
+                elif term['op'] == 'jump':
+                    pc[active] = position[block.target]
+                else:
+                    jumps = numpy.broadcast_to(value(term['src1']), (size,)) == 0
+                    pc[active] = numpy.where(jumps[active], position[block.target],
+                                             position[block.fallthrough])
+                over = steps > self.max_steps
+                if over.any():
+                    fail(over & ~failed, f"step limit of {self.max_steps} exceeded (infinite loop?)")
+
+        return BatchResult(size, records, env, failed, errors, steps, block_runs)
+
+
+def random_inputs(declared, size, seed=0):
+    """Random input values: ints in [0, 1000), floats in [0, 1)"""
+    rng = random.Random(seed)
+    return {name: [rng.random() if dtype == 'float' else rng.randrange(1000) for _ in range(size)]
+            for name, dtype in declared}
+
+
+def measure_throughput(code, size, opt_level=2, seed=0):
+    """
+    Run a program over random inputs as a batch and once per input
+
+    Returns:
+        dict: 'batch_s', 'scalar_s', 'speedup', 'block_runs' and 'mismatches'
+              (lanes whose output differs from the interpreter's)
+
+    Raises:
+        BatchError: If the program does not compile cleanly
+    """
+    from compiler import Compiler
+    from interpreter import IRInterpreter, IRRuntimeError
+
+    session = Compiler(opt_level).compile(code)
+    if session.all_issues():
+        raise BatchError(session.all_issues()[0])
+    inputs = random_inputs(session.inputs, size, seed)
+
+    start = time.perf_counter()
+    result = BatchExecutor().run(session.ir_instructions, inputs, size, session.declared_types())
+    batch_s = time.perf_counter() - start
+
+    interpreter = IRInterpreter(int_bits=64)
+    expected = []
+    start = time.perf_counter()
+    for lane in range(size):
+        try:
+            expected.append(interpreter.run(session.ir_instructions,
+                                            {name: values[lane] for name, values in inputs.items()}).output)
+        except IRRuntimeError:
+            expected.append(None)
+    scalar_s = time.perf_counter() - start
+
+    mismatches = 0
+    for lane, output in enumerate(expected):
+        if (output is None) != bool(result.failed[lane]) or (output is not None and output != result.outputs[lane]):
+            mismatches += 1
+    return {'batch_s': batch_s, 'scalar_s': scalar_s, 'speedup': scalar_s / batch_s,
+            'block_runs': result.block_runs, 'mismatches': mismatches}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Throughput of batch execution against one interpreter run per input")
+    arg_parser.add_argument('program', nargs='?', help="source with input declarations (default: built-in kernel)")
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    arg_parser.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=2)
+    args = arg_parser.parse_args(argv)
+
+    code = DEFAULT_KERNEL
+    if args.program:
+        with open(args.program, 'r', encoding='utf-8') as file:
+            code = file.read()
+
+    failed = False
+    print(f"{'INPUTS':<10} {'BATCH':<12} {'PER INPUT':<12} {'SPEEDUP':<10} {'BLOCK RUNS':<12}")
+    for size in args.sizes:
+        res = measure_throughput(code, size, args.opt_level)
+        print(f"{size:<10} {res['batch_s'] * 1000:<9.1f} ms {res['scalar_s'] * 1000:<9.1f} ms "
+              f"{res['speedup']:<9.1f}x {res['block_runs']:<12}")
+        if res['mismatches']:
+            print(f"FAIL: {res['mismatches']} lane(s) differ from the interpreter")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
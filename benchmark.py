@@ -0,0 +1,152 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from compiler import Compiler
+from interpreter import IRInterpreter
+from pgo import collect_profile
+from unroll import DEFAULT_UNROLL_FACTOR
+
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+
+def default_programs():
+    return sorted(glob.glob(os.path.join(BENCHMARK_DIR, '*.c')))
+
+
+def measure_program(source, levels, interpreter=None, unroll_factor=DEFAULT_UNROLL_FACTOR, profile=None):
+    """
+    Compile one program at each optimization level and interpret the IR
+
+    Args:
+        source: Source code string
+        levels: Optimization levels to compare
+        interpreter: IRInterpreter to run with (a default one if omitted)
+        unroll_factor: Loop unrolling factor at -O2 (0 keeps loops rolled)
+        profile: pgo.Profile of the source to optimize with (optional)
+
+    Returns:
+        dict: Level -> {'steps', 'branches', 'taken', 'ir_size', 'output', 'compile_ms'}
+
+    Raises:
+        ValueError: If the program does not compile cleanly
+    """
+    interpreter = interpreter or IRInterpreter()
+    compiler = Compiler(unroll_factor=unroll_factor)
+    results = {}
+    for level in levels:
+        start = time.perf_counter()
+        session = compiler.compile(source, opt_level=level, profile=profile)
+        compile_ms = (time.perf_counter() - start) * 1000
+        if session.all_issues():
+            raise ValueError(session.all_issues()[0])
+        run = interpreter.run(session.ir_instructions, functions=session.functions)
+        results[level] = {
+            'steps': run.steps,
+            'branches': run.branches,
+            'taken': run.taken,
+            'ir_size': len(session.ir_instructions),
+            'output': run.output,
+            'compile_ms': compile_ms,
+        }
+    return results
+
+
+def compare_unrolling(programs, factors):
+    """
+    Print executed instructions and branches at -O2 for each unroll factor
+
+    Returns:
+        int: 1 if any factor changed a program's output, else 0
+    """
+    failed = False
+    header = ' '.join(f"{'x' + str(factor) + ' steps/branches':<22}" for factor in factors)
+    print(f"{'PROGRAM':<24} {header} {'IR SIZE':<12}")
+    for path in programs:
+        with open(path, 'r', encoding='utf-8') as file:
+            source = file.read()
+        results = [measure_program(source, [2], unroll_factor=factor)[2] for factor in factors]
+        if any(res['output'] != results[0]['output'] for res in results):
+            print(f"FAIL {path}: output depends on the unroll factor")
+            failed = True
+        columns = ' '.join(f"{str(res['steps']) + '/' + str(res['branches']):<22}" for res in results)
+        sizes = '/'.join(str(res['ir_size']) for res in results)
+        print(f"{os.path.basename(path):<24} {columns} {sizes:<12}")
+    return 1 if failed else 0
+
+
+def compare_profiled(programs, level):
+    """
+    Print executed instructions and taken jumps with and without a profile
+
+    The profile of each program is recorded from its own unoptimized run.
+
+    Returns:
+        int: 1 if the profile changed a program's output, else 0
+    """
+    failed = False
+    print(f"{'PROGRAM':<24} {'STEPS':<18} {'TAKEN JUMPS':<18} {'CHANGE':<10}")
+    for path in programs:
+        with open(path, 'r', encoding='utf-8') as file:
+            source = file.read()
+        session = Compiler().compile(source)
+        if session.all_issues():
+            raise ValueError(session.all_issues()[0])
+        profile, _ = collect_profile(source, session.ir_instructions)
+        plain = measure_program(source, [level])[level]
+        guided = measure_program(source, [level], profile=profile)[level]
+        if plain['output'] != guided['output']:
+            print(f"FAIL {path}: output differs with the profile")
+            failed = True
+        change = guided['taken'] / plain['taken'] - 1 if plain['taken'] else 0.0
+        steps = f"{plain['steps']} -> {guided['steps']}"
+        taken = f"{plain['taken']} -> {guided['taken']}"
+        print(f"{os.path.basename(path):<24} {steps:<18} {taken:<18} {change:<+10.1%}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Executed-instruction benchmark for the optimizer")
+    arg_parser.add_argument('programs', nargs='*', help="source files (default: benchmarks/*.c)")
+    arg_parser.add_argument('--levels', type=int, nargs='+', default=[0, 1, 2],
+                            help="optimization levels to compare; the first is the reference")
+    arg_parser.add_argument('--unroll', type=int, nargs='+', metavar='FACTOR',
+                            help="instead compare -O2 with these unroll factors (0: rolled)")
+    arg_parser.add_argument('--pgo', action='store_true',
+                            help="instead compare the last level with and without a recorded profile")
+    args = arg_parser.parse_args(argv)
+
+    programs = args.programs or default_programs()
+    if args.unroll:
+        return compare_unrolling(programs, args.unroll)
+    if args.pgo:
+        return compare_profiled(programs, args.levels[-1])
+    reference = args.levels[0]
+    failed = False
+
+    header = f"{'PROGRAM':<24} " + ' '.join(f"{'O' + str(level) + ' steps':<14}" for level in args.levels)
+    print(header + f" {'REDUCTION':<10} {'IR SIZE':<12}")
+    for path in programs:
+        with open(path, 'r', encoding='utf-8') as file:
+            results = measure_program(file.read(), args.levels)
+
+        base = results[reference]
+        for level, res in results.items():
+            if res['output'] != base['output']:
+                print(f"FAIL {path}: output at O{level} differs from O{reference}")
+                failed = True
+
+        best = results[args.levels[-1]]
+        reduction = 1 - best['steps'] / base['steps'] if base['steps'] else 0.0
+        steps = ' '.join(f"{results[level]['steps']:<14}" for level in args.levels)
+        sizes = '/'.join(str(results[level]['ir_size']) for level in args.levels)
+        print(f"{os.path.basename(path):<24} {steps} {reduction:<10.1%} {sizes:<12}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+int start;
+int steps;
+int longest;
+int value;
+int limit;
+limit = 300;
+longest = 0;
+start = 1;
+while (start < limit) {
+    value = start;
+    steps = 0;
+    while (value != 1) {
+        if (value % 2 == 0) {
+            value = value / 2;
+        } else {
+            value = value * 3 + 1;
+        }
+        steps = steps + 1;
+    }
+    if (steps > longest) {
+        longest = steps;
+    }
+    start = start + 1;
+}
+print(longest);
@@ -0,0 +1,21 @@
+int debug;
+int scale;
+int n;
+int acc;
+debug = 0;
+scale = 4;
+n = 0;
+acc = 0;
+while (n < 2000) {
+    if (debug == 1) {
+        print(n);
+    } else {
+        acc = acc + n * scale;
+    }
+    if (scale > 2) {
+        acc = acc - n * scale;
+        acc = acc + n;
+    }
+    n = n + 1;
+}
+print(acc);
@@ -0,0 +1,19 @@
+int n;
+int total;
+int sum;
+n = 250;
+total = 0;
+sum = 0;
+for (int i = 0; i < n; i = i + 1) {
+    total = total + i * 3 % 11;
+}
+for (int k = 0; k < 200; k = k + 1) {
+    for (int j = 0; j < 8; j = j + 1) {
+        sum = sum + j * k;
+    }
+}
+for (int d = 1000; d > 0; d = d - 7) {
+    total = total + d % 5;
+}
+print(total);
+print(sum);
@@ -0,0 +1,20 @@
+int i;
+int j;
+int total;
+int width;
+int height;
+width = 40;
+height = 30;
+total = 0;
+i = 0;
+while (i < height) {
+    j = 0;
+    while (j < width) {
+        int cell;
+        cell = i * width + j;
+        total = total + cell % 7;
+        j = j + 1;
+    }
+    i = i + 1;
+}
+print(total);
@@ -0,0 +1,21 @@
+int k;
+int a;
+int b;
+int r;
+float f;
+a = 12;
+b = 5;
+r = 0;
+f = 0.0;
+k = 0;
+while (k < 1500) {
+    int x;
+    int y;
+    x = (k + a) * (k + a) - b;
+    y = (a + k) * (a + k) + b;
+    r = r + (x + y) / 2;
+    f = f + 0.5;
+    k = k + 1;
+}
+print(r);
+print(f);
@@ -0,0 +1,377 @@
+import argparse
+import sys
+import time
+
+from ir import ARITHMETIC_OPS, RELATIONAL_OPS, defined, is_var, truncating_div
+from loops import int_variables
+
+
+INF = float('inf')
+UNBOUNDED = (-INF, INF)
+FACT_DEPTH = 3  # Definitions and facts a range query looks through before using the global range
+WIDEN_AFTER = 3  # Times a range may grow before its growing bounds are widened to infinity
+
+_NEGATED = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '==': '!=', '!=': '=='}
+_SWAPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+
+
+def _is_int(operand):
+    return type(operand) is int
+
+
+def _intersect(a, b):
+    return (max(a[0], b[0]), min(a[1], b[1]))
+
+
+def _empty(r):
+    return r[0] > r[1]
+
+
+def _times(a, b):
+    # 0 * inf is 0 for interval bounds
+    return 0 if a == 0 or b == 0 else a * b
+
+
+def _div_bound(x, c):
+    return x if x in (INF, -INF) else truncating_div(x, c)
+
+
+def transfer(op, a, b, divisor=None):
+    """
+    Range of a binary operation's result from the ranges of its operands
+
+    Args:
+        op: IR operation
+        a, b: (low, high) of the operands
+        divisor: The second operand when it is an int constant (for idiv and imod)
+
+    Returns:
+        tuple: (low, high), UNBOUNDED when nothing is known
+    """
+    if _empty(a) or _empty(b):
+        return UNBOUNDED
+    if op == 'iadd':
+        return (a[0] + b[0], a[1] + b[1])
+    if op == 'isub':
+        return (a[0] - b[1], a[1] - b[0])
+    if op == 'imul':
+        products = [_times(x, y) for x in a for y in b]
+        return (min(products), max(products))
+    if op == 'idiv' and divisor is not None and divisor > 0:
+        # Truncating division by a positive constant is monotonic
+        return (_div_bound(a[0], divisor), _div_bound(a[1], divisor))
+    if op == 'imod' and divisor:
+        largest = abs(divisor) - 1
+        if a[0] >= 0:
+            return (0, min(a[1], largest))
+        if a[1] <= 0:
+            return (max(a[0], -largest), 0)
+        return (-largest, largest)
+    if op in RELATIONAL_OPS:
+        return (0, 1)
+    return UNBOUNDED
+
+
+def _constrain(rel, bound):
+    """Values x can have when x rel y holds for some y in bound"""
+    low, high = bound
+    if rel == '<':
+        return (-INF, high - 1)
+    if rel == '<=':
+        return (-INF, high)
+    if rel == '>':
+        return (low + 1, INF)
+    if rel == '>=':
+        return (low, INF)
+    if rel == '==':
+        return bound
+    return UNBOUNDED
+
+
+def value_ranges(cfg, defs, int_vars):
+    """
+    Flow-insensitive range of every int SSA value
+
+    Ranges start empty and grow until stable; a range that keeps growing
+    (a value carried around a loop) has its growing bound widened to
+    infinity. Entry values, loads and call results are unbounded.
+
+    Returns:
+        dict: SSA name -> (low, high)
+    """
+    ranges = {}
+    grown = {}
+
+    def operand_range(operand):
+        if _is_int(operand):
+            return (operand, operand)
+        if not is_var(operand) or operand not in defs or operand not in int_vars:
+            return UNBOUNDED
+        return ranges.get(operand)  # None until its definition has been evaluated
+
+    order = cfg.reverse_postorder()
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            for instr in block.instrs:
+                dst = defined(instr)
+                if dst is None:
+                    continue
+                op = instr['op']
+                if dst not in int_vars:
+                    new = UNBOUNDED
+                elif op == 'phi':
+                    known = [r for r in map(operand_range, instr['src1'].values()) if r is not None]
+                    if not known:
+                        continue
+                    new = (min(r[0] for r in known), max(r[1] for r in known))
+                elif op == 'assign':
+                    new = operand_range(instr['src1'])
+                elif op in ARITHMETIC_OPS or op in RELATIONAL_OPS:
+                    a, b = operand_range(instr['src1']), operand_range(instr['src2'])
+                    if a is None or b is None:
+                        continue
+                    new = transfer(op, a, b, instr['src2'] if _is_int(instr['src2']) else None)
+                else:
+                    new = UNBOUNDED
+                if new is None:
+                    continue
+                old = ranges.get(dst)
+                if old is not None:
+                    new = (min(old[0], new[0]), max(old[1], new[1]))
+                    if new == old:
+                        continue
+                    grown[dst] = grown.get(dst, 0) + 1
+                    if grown[dst] > WIDEN_AFTER:
+                        new = (new[0] if new[0] == old[0] else -INF, new[1] if new[1] == old[1] else INF)
+                ranges[dst] = new
+                changed = True
+    return ranges
+
+
+def eliminate_bounds_checks(cfg, idom):
+    """
+    Remove bounds checks that range analysis proves can never fail
+
+    The range of an index where it is checked is the intersection of its
+    global range (value_ranges), the range computed from its definition's
+    operands, and facts that hold in the checking block: the comparison
+    of a conditional jump on the only edge into the block or a dominator
+    (e.g. i < 10 inside while (i < 10)), and the checks already passed in
+    dominating code. A fact about t = i + c also bounds i, which covers the
+    guards of partially unrolled loops. Only int values are bounded.
+
+    Args:
+        cfg: ControlFlowGraph in SSA form (modified in place)
+        idom: Immediate dominators of cfg
+
+    Returns:
+        int: Number of checks removed
+    """
+    if not any(instr['op'] == 'check' for block in cfg.blocks for instr in block.instrs):
+        return 0
+
+    defs = {}
+    for block in cfg.blocks:
+        for instr in block.instrs:
+            dst = defined(instr)
+            if dst is not None:
+                if dst in defs:
+                    return 0  # Not in SSA form: one name may hold different values
+                defs[dst] = instr
+    int_vars = int_variables(cfg)
+    ranges = value_ranges(cfg, defs, int_vars)
+
+    def offset(name):
+        """(base, c) when name is defined as base + c for an int constant c"""
+        instr = defs.get(name)
+        if instr is None:
+            return None
+        op, a, b = instr['op'], instr['src1'], instr['src2']
+        if op == 'iadd' and is_var(a) and _is_int(b):
+            return a, b
+        if op == 'iadd' and _is_int(a) and is_var(b):
+            return b, a
+        if op == 'isub' and is_var(a) and _is_int(b):
+            return a, -b
+        return None
+
+    def add_fact(facts, x, rel, y):
+        """Record x rel y under x and, when x = base + c, under base"""
+        if not is_var(x) or x not in int_vars or not (_is_int(y) or (is_var(y) and y in int_vars)):
+            return
+        facts.setdefault(x, []).append((rel, y, 0))
+        shifted = offset(x)
+        if shifted is not None and shifted[0] in int_vars:
+            facts.setdefault(shifted[0], []).append((rel, y, shifted[1]))
+
+    def edge_facts(block):
+        """Facts from the branch on the only edge into block"""
+        facts = {}
+        if len(block.preds) != 1:
+            return facts
+        pred = block.preds[0]
+        term = pred.terminator
+        if (pred is block or term is None or term['op'] != 'jump_if_false'
+                or pred.target is pred.fallthrough):
+            return facts
+        cmp = defs.get(term['src1']) if is_var(term['src1']) else None
+        if cmp is None or cmp['op'] not in RELATIONAL_OPS:
+            return facts
+        rel = cmp['op'] if block is pred.fallthrough else _NEGATED[cmp['op']]
+        add_fact(facts, cmp['src1'], rel, cmp['src2'])
+        add_fact(facts, cmp['src2'], _SWAPPED[rel], cmp['src1'])
+        return facts
+
+    def check_facts(facts, instr):
+        add_fact(facts, instr['src1'], '>=', 0)
+        add_fact(facts, instr['src1'], '<', instr['src2'])
+
+    own = {}
+
+    def block_facts(block):
+        """Everything known after block runs: its edge facts and all its checks"""
+        if block not in own:
+            facts = edge_facts(block)
+            for instr in block.instrs:
+                if instr['op'] == 'check':
+                    check_facts(facts, instr)
+            own[block] = facts
+        return own[block]
+
+    def range_at(name, chain, depth):
+        if _is_int(name):
+            return (name, name)
+        if not is_var(name) or name not in int_vars or name not in defs:
+            return UNBOUNDED
+        result = ranges.get(name, UNBOUNDED)
+        if depth >= FACT_DEPTH:
+            return result
+        instr = defs[name]
+        if instr['op'] in ARITHMETIC_OPS:
+            # The operands' facts here bound the result as well
+            a = range_at(instr['src1'], chain, depth + 1)
+            b = range_at(instr['src2'], chain, depth + 1)
+            divisor = instr['src2'] if _is_int(instr['src2']) else None
+            result = _intersect(result, transfer(instr['op'], a, b, divisor))
+        for facts in chain:
+            for rel, other, shift in facts.get(name, ()):
+                low, high = _constrain(rel, range_at(other, chain, depth + 1))
+                result = _intersect(result, (low - shift, high - shift))
+        return result
+
+    removed = 0
+    for block in cfg.blocks:
+        if block not in idom or not any(instr['op'] == 'check' for instr in block.instrs):
+            continue
+        dominators = []
+        walk = block
+        while idom[walk] is not walk:
+            walk = idom[walk]
+            dominators.append(block_facts(walk))
+        local = edge_facts(block)
+        chain = [local] + [facts for facts in dominators if facts]
+        kept = []
+        for instr in block.instrs:
+            if instr['op'] == 'check':
+                low, high = range_at(instr['src1'], chain, 0)
+                if 0 <= low <= high < instr['src2']:
+                    removed += 1
+                    continue
+                check_facts(local, instr)
+            kept.append(instr)
+        block.instrs = kept
+    return removed
+
+
+def count_checks(ir_code):
+    """Bounds checks in an IR list"""
+    return sum(1 for instr in ir_code if instr['op'] == 'check')
+
+
+KERNELS = {
+    'fill': """
+        int a[1000];
+        int i = 0;
+        while (i < 1000) { a[i] = i * 3; i = i + 1; }
+        print(a[999]);
+    """,
+    'prefix-sum': """
+        int a[1000];
+        int i;
+        for (i = 0; i < 1000; i = i + 1) { a[i] = i % 7; }
+        for (i = 1; i < 1000; i = i + 1) { a[i] = a[i] + a[i - 1]; }
+        print(a[999]);
+    """,
+    'reverse': """
+        int a[500];
+        int b[500];
+        int i;
+        for (i = 0; i < 500; i = i + 1) { a[i] = i; }
+        i = 499;
+        while (i >= 0) { b[499 - i] = a[i]; i = i - 1; }
+        print(b[0]);
+        print(b[499]);
+    """,
+    'matrix': """
+        int m[900];
+        int row;
+        int col;
+        int total = 0;
+        for (row = 0; row < 30; row = row + 1) {
+            for (col = 0; col < 30; col = col + 1) { m[row * 30 + col] = row + col; }
+        }
+        for (row = 0; row < 30; row = row + 1) { total = total + m[row * 30 + row]; }
+        print(total);
+    """,
+    'histogram': """
+        input int n;
+        int counts[10];
+        int i = 0;
+        while (i < n) { counts[i % 10] = counts[i % 10] + 1; i = i + 1; }
+        print(counts[3]);
+    """,
+}
+
+
+def main(argv=None):
+    from compiler import Compiler
+    from interpreter import IRInterpreter
+    from passes import PassManager, pipeline_for
+    arg_parser = argparse.ArgumentParser(description="Loop kernels with and without bounds-check elimination")
+    arg_parser.add_argument('-O', dest='opt_level', type=int, choices=[1, 2], default=2,
+                            help="optimization level")
+    arg_parser.add_argument('--n', type=int, default=1000, help="value of the histogram kernel's input")
+    args = arg_parser.parse_args(argv)
+
+    compiler = Compiler()
+    interpreter = IRInterpreter()
+    pipelines = {'checked': [name for name in pipeline_for(args.opt_level) if name != 'bce'],
+                 'eliminated': pipeline_for(args.opt_level)}
+    print(f"{'KERNEL':<12} {'CHECKS':>7} {'ELIMINATED':>11} {'RUN CHECKS':>16} {'STEPS':>18} "
+          f"{'SPEEDUP':>8}  OUTPUT")
+    failed = False
+    for name, code in KERNELS.items():
+        session = compiler.compile(code, opt_level=0, asm=False)
+        if session.all_issues():
+            raise ValueError(session.all_issues()[0])
+        runs, seconds, eliminated = {}, {}, 0
+        for label, pipeline in pipelines.items():
+            manager = PassManager(pipeline)
+            ir_code = manager.run(session.ir_instructions)
+            eliminated = manager.reports.get('checks_eliminated', 0)
+            start = time.perf_counter()
+            runs[label] = interpreter.run(ir_code, {'n': args.n})
+            seconds[label] = time.perf_counter() - start
+        checked, fast = runs['checked'], runs['eliminated']
+        same = checked.output == fast.output
+        failed = failed or not same
+        print(f"{name:<12} {count_checks(session.ir_instructions):>7} {eliminated:>11} "
+              f"{f'{checked.checks} -> {fast.checks}':>16} {f'{checked.steps} -> {fast.steps}':>18} "
+              f"{seconds['checked'] / seconds['eliminated']:>7.2f}x  {'identical' if same else 'DIFFERENT'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
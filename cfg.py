@@ -0,0 +1,392 @@
+import time
+
+from ir import BRANCH_OPS, NameAllocator, defined, make_instr, uses
+
+
+class BasicBlock:
+    """Straight-line run of IR instructions with a single entry and exit"""
+
+    def __init__(self, index, label=None):
+        self.index = index
+        self.label = label
+        self.instrs = []  # Body without the leading 'mark'
+        self.fallthrough = None  # Block reached when the end is not a taken jump
+        self.target = None  # Block a trailing jump/jump_if_false goes to
+        self.preds = []
+        self.count = None  # Executions, when a profile is applied
+        self.taken = None  # Times a trailing jump_if_false jumped, when profiled
+
+    @property
+    def terminator(self):
+        """The trailing jump/jump_if_false instruction, or None"""
+        if self.instrs and self.instrs[-1]['op'] in BRANCH_OPS:
+            return self.instrs[-1]
+        return None
+
+    @property
+    def succs(self):
+        """Successor blocks (fallthrough first)"""
+        result = []
+        for block in (self.fallthrough, self.target):
+            if block is not None and block not in result:
+                result.append(block)
+        return result
+
+    def __repr__(self):
+        return f"<BasicBlock {self.index} {self.label or ''}>"
+
+
+class ControlFlowGraph:
+    """Basic blocks of an IR list in their original layout order"""
+
+    def __init__(self, blocks, names):
+        self.blocks = blocks
+        self.exit = blocks[-1]  # Empty block reached at the end of the program; stays last
+        self.names = names  # NameAllocator for fresh temps and labels
+        # Types the IR does not carry, for ir.float_variables (see PassManager)
+        self.declared = {}
+        self.return_types = {}
+        self.next_index = len(blocks)
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+
+    def new_block(self, label=None):
+        """Create a block that is not yet placed in the layout"""
+        block = BasicBlock(self.next_index, label)
+        self.next_index += 1
+        return block
+
+    def ensure_label(self, block):
+        """Give a block a label so jumps can refer to it"""
+        if block.label is None:
+            block.label = self.names.label()
+        return block.label
+
+    def compute_preds(self):
+        """Recompute predecessor lists from successor edges"""
+        for block in self.blocks:
+            block.preds = []
+        for block in self.blocks:
+            for succ in block.succs:
+                succ.preds.append(block)
+
+    def reverse_postorder(self):
+        """Blocks reachable from the entry in reverse postorder"""
+        seen = set()
+        order = []
+        stack = [(self.entry, iter(self.entry.succs))]
+        seen.add(self.entry)
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+    def remove_unreachable(self):
+        """
+        Drop blocks that cannot be reached from the entry
+
+        Returns:
+            bool: True if any block was removed
+        """
+        reachable = set(self.reverse_postorder())
+        reachable.add(self.exit)
+        before = len(self.blocks)
+        self.blocks = [block for block in self.blocks if block in reachable]
+        self.compute_preds()
+        return len(self.blocks) != before
+
+    def split_edge(self, pred, succ):
+        """
+        Insert an empty block on the edge pred -> succ
+
+        Returns:
+            BasicBlock: The new block, placed right after pred in the layout
+        """
+        middle = self.new_block()
+        # When both edges of a conditional jump reach succ, only the taken one is split
+        both_edges = pred.target is succ and pred.fallthrough is succ
+        if pred.target is succ:
+            pred.target = middle
+            middle.target = succ
+            middle.instrs.append(make_instr('jump', None))
+        else:
+            pred.fallthrough = middle
+            middle.fallthrough = succ
+        self.blocks.insert(self.blocks.index(pred) + 1, middle)
+
+        for instr in succ.instrs:
+            if instr['op'] == 'phi' and pred.index in instr['src1']:
+                if both_edges:
+                    instr['src1'][middle.index] = instr['src1'][pred.index]
+                else:
+                    instr['src1'][middle.index] = instr['src1'].pop(pred.index)
+        self.compute_preds()
+        return middle
+
+    def to_ir(self, branch_positions=None):
+        """
+        Linearize the blocks back into an IR list
+
+        Branch operands are rewritten from the block edges, and explicit jumps
+        are added where a fallthrough successor is not the next block.
+
+        Args:
+            branch_positions: Optional dict that receives block -> IR position
+                              of the block's jump_if_false
+        """
+        # Label every jump destination first; a backward jump may reach a block already emitted
+        for pos, block in enumerate(self.blocks):
+            next_block = self.blocks[pos + 1] if pos + 1 < len(self.blocks) else None
+            if block.terminator is not None:
+                self.ensure_label(block.target)
+            if block.fallthrough is not None and block.fallthrough is not next_block:
+                self.ensure_label(block.fallthrough)
+
+        ir_code = []
+        for pos, block in enumerate(self.blocks):
+            if block.label is not None:
+                ir_code.append(make_instr('mark', block.label))
+
+            body = block.instrs
+            term = block.terminator
+            if term is not None:
+                body = body[:-1]
+            ir_code.extend(body)
+
+            if term is not None:
+                if term['op'] == 'jump':
+                    ir_code.append(make_instr('jump', self.ensure_label(block.target)))
+                else:
+                    if branch_positions is not None:
+                        branch_positions[block] = len(ir_code)
+                    ir_code.append(make_instr('jump_if_false', term['src1'], self.ensure_label(block.target)))
+
+            next_block = self.blocks[pos + 1] if pos + 1 < len(self.blocks) else None
+            if block.fallthrough is not None and block.fallthrough is not next_block:
+                ir_code.append(make_instr('jump', self.ensure_label(block.fallthrough)))
+        return ir_code
+
+
+def build_cfg(ir_code):
+    """
+    Split an IR list into basic blocks and connect them
+
+    Args:
+        ir_code: List of IR instructions
+
+    Returns:
+        ControlFlowGraph: Blocks in layout order; the first block is the entry
+                          and the last one is an empty exit block
+    """
+    # The entry block is never labeled, so it can have no predecessors
+    blocks = [BasicBlock(0)]
+    for instr in ir_code:
+        op = instr['op']
+        if op == 'mark':
+            blocks.append(BasicBlock(len(blocks), instr['src1']))
+            continue
+        if blocks[-1].terminator is not None:
+            blocks.append(BasicBlock(len(blocks)))
+        blocks[-1].instrs.append(dict(instr))
+    # Empty exit block, kept last, so every path off the end has an explicit edge
+    blocks.append(BasicBlock(len(blocks)))
+
+    by_label = {block.label: block for block in blocks if block.label is not None}
+    for pos, block in enumerate(blocks):
+        next_block = blocks[pos + 1] if pos + 1 < len(blocks) else None
+        term = block.terminator
+        if term is None:
+            block.fallthrough = next_block
+        elif term['op'] == 'jump':
+            block.target = by_label[term['src1']]
+        else:
+            block.target = by_label[term['src2']]
+            block.fallthrough = next_block
+
+    cfg = ControlFlowGraph(blocks, NameAllocator(ir_code))
+    cfg.compute_preds()
+    return cfg
+
+
+def compute_dominators(cfg):
+    """
+    Immediate dominators (Cooper, Harvey and Kennedy's iterative algorithm)
+
+    Returns:
+        dict: Block -> immediate dominator (the entry maps to itself)
+    """
+    order = cfg.reverse_postorder()
+    position = {block: pos for pos, block in enumerate(order)}
+    idom = {cfg.entry: cfg.entry}
+
+    def intersect(a, b):
+        while a is not b:
+            while position[a] > position[b]:
+                a = idom[a]
+            while position[b] > position[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order[1:]:
+            new_idom = None
+            for pred in block.preds:
+                if pred in idom:
+                    new_idom = pred if new_idom is None else intersect(pred, new_idom)
+            if idom.get(block) is not new_idom:
+                idom[block] = new_idom
+                changed = True
+    return idom
+
+
+def dominator_tree(idom):
+    """
+    Children of each block in the dominator tree
+
+    Returns:
+        dict: Block -> list of blocks it immediately dominates
+    """
+    children = {block: [] for block in idom}
+    for block, parent in idom.items():
+        if block is not parent:
+            children[parent].append(block)
+    for kids in children.values():
+        kids.sort(key=lambda block: block.index)
+    return children
+
+
+def dominates(idom, a, b):
+    """True if block a dominates block b"""
+    while True:
+        if a is b:
+            return True
+        parent = idom.get(b)
+        if parent is None or parent is b:
+            return False
+        b = parent
+
+
+def dominance_frontiers(cfg, idom):
+    """
+    Dominance frontier of every reachable block
+
+    Returns:
+        dict: Block -> set of blocks in its dominance frontier
+    """
+    frontier = {block: set() for block in idom}
+    for block in idom:
+        preds = [pred for pred in block.preds if pred in idom]
+        if len(preds) < 2:
+            continue
+        for pred in preds:
+            runner = pred
+            while runner is not idom[block]:
+                frontier[runner].add(block)
+                runner = idom[runner]
+    return frontier
+
+
+def liveness(cfg):
+    """
+    Variables live into and out of each block (non-SSA IR)
+
+    Returns:
+        tuple: (live_in, live_out) dicts from block to set of names
+    """
+    gen = {}
+    kill = {}
+    for block in cfg.blocks:
+        block_gen = set()
+        block_kill = set()
+        for instr in block.instrs:
+            for name in uses(instr):
+                if name not in block_kill:
+                    block_gen.add(name)
+            dst = defined(instr)
+            if dst is not None:
+                block_kill.add(dst)
+        gen[block] = block_gen
+        kill[block] = block_kill
+
+    live_in = {block: set() for block in cfg.blocks}
+    live_out = {block: set() for block in cfg.blocks}
+    order = list(reversed(cfg.reverse_postorder()))
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            out = set()
+            for succ in block.succs:
+                out |= live_in[succ]
+            new_in = gen[block] | (out - kill[block])
+            if out != live_out[block] or new_in != live_in[block]:
+                live_out[block] = out
+                live_in[block] = new_in
+                changed = True
+    return live_in, live_out
+
+
+# Analyses that depend only on the block structure, not on the instructions
+CFG_ANALYSES = ('dominators', 'dominator-tree', 'frontiers', 'loops')
+
+
+class AnalysisCache:
+    """
+    Computes analyses of one CFG on demand and keeps them until invalidated
+
+    Providers are functions of the cache (so they can ask for other
+    analyses); callers add their own, e.g. loop detection.
+    """
+
+    providers = {
+        'dominators': lambda cache: compute_dominators(cache.cfg),
+        'dominator-tree': lambda cache: dominator_tree(cache.get('dominators')),
+        'frontiers': lambda cache: dominance_frontiers(cache.cfg, cache.get('dominators')),
+        'liveness': lambda cache: liveness(cache.cfg),
+    }
+
+    def __init__(self, cfg, providers=None):
+        self.cfg = cfg
+        self.providers = dict(AnalysisCache.providers)
+        self.providers.update(providers or {})
+        self.results = {}
+        self.computed = {}  # Name -> number of times computed
+        self.hits = {}  # Name -> number of cached answers
+        self.seconds = 0.0  # Total time spent computing
+
+    def get(self, name):
+        """
+        Get an analysis result, computing it if it is not cached
+
+        Raises:
+            KeyError: If no provider is registered for name
+        """
+        if name in self.results:
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return self.results[name]
+        provider = self.providers[name]
+        start = time.perf_counter()
+        result = provider(self)
+        self.seconds += time.perf_counter() - start
+        self.results[name] = result
+        self.computed[name] = self.computed.get(name, 0) + 1
+        return result
+
+    def invalidate(self, preserved=()):
+        """Drop every cached result except the preserved analyses"""
+        for name in list(self.results):
+            if name not in preserved:
+                del self.results[name]
@@ -0,0 +1,492 @@
+import argparse
+import os
+import sys
+import time
+
+from ir_format import format_ir, function_title
+from passes import PASSES
+
+
+EMIT_CHOICES = ['tokens', 'symbols', 'ir', 'asm']
+
+
+def format_tokens(tokens):
+    """Render tokens in the layout of the GUI's Tokens tab"""
+    lines = [f"{'TYPE':<18} {'VALUE':<18} {'LINE':<8}", "─" * 50]
+    for tok in tokens:
+        lines.append(f"{tok['kind']:<18} {str(tok['val']):<18} {str(tok['ln']):<8}")
+    return '\n'.join(lines) + '\n'
+
+
+def format_symbols(symbols):
+    """Render symbol entries in the layout of the GUI's Symbols tab"""
+    lines = [f"{'IDENTIFIER':<18} {'TYPE':<10} {'VALUE':<10} {'SCOPE':<18} {'LEVEL':<8}", "─" * 70]
+    for entry in symbols:
+        val_str = str(entry['val']) if entry['val'] is not None else 'None'
+        lines.append(f"{entry['id']:<18} {entry['dtype']:<10} {val_str:<10} "
+                     f"{entry['scope']:<18} {entry['scope_level']:<8}")
+    return '\n'.join(lines) + '\n'
+
+
+def print_result(path, result, emit, show_header):
+    """
+    Print the requested sections of one compile result
+
+    Returns:
+        int: Number of problems reported
+    """
+    if show_header and emit:
+        print(f"==> {path} <==")
+    for section in emit:
+        if section == 'tokens':
+            sys.stdout.write(format_tokens(result['tokens']))
+        elif section == 'symbols':
+            sys.stdout.write(format_symbols(result['symbols']))
+        elif section == 'ir':
+            sys.stdout.write(format_ir(result['ir'], result.get('loop_stats')))
+            for function in result.get('functions', []):
+                print(f"\n{function_title(function)}:")
+                sys.stdout.write(format_ir(function['ir'], function.get('loop_stats')))
+        elif section == 'asm':
+            sys.stdout.write('\n'.join(result['asm']) + '\n')
+    for issue in result['issues']:
+        print(f"{path}: {issue}", file=sys.stderr)
+    return len(result['issues'])
+
+
+def read_sources(paths):
+    sources = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            sources.append((path, file.read()))
+    return sources
+
+
+def save_artifact(directory, path, result):
+    """Write a compile result as <directory>/<source name>.mca"""
+    from artifacts import encode_artifact, write_artifact
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0] + '.mca'
+    write_artifact(os.path.join(directory, name),
+                   encode_artifact(result['tokens'], result['ir'], result['symbols'],
+                                   functions=result['functions']))
+
+
+def assembly_path(output, path, many):
+    """Where -o puts a source's assembly: OUT itself, or OUT/<name>.asm for several sources"""
+    if not many:
+        return output
+    os.makedirs(output, exist_ok=True)
+    return os.path.join(output, os.path.splitext(os.path.basename(path))[0] + '.asm')
+
+
+def unroll_option(args):
+    """Extra Compiler arguments for --unroll (none when it was not given)"""
+    return () if args.unroll is None else (args.unroll,)
+
+
+def load_profiles(paths, sources):
+    """
+    Read --profile files and pick the one recorded from each source
+
+    Returns:
+        list: pgo.Profile or None per source, or None if a file is unreadable
+    """
+    from pgo import Profile, ProfileError
+    profiles = []
+    for path in paths:
+        try:
+            profiles.append(Profile.load(path))
+        except ProfileError as e:
+            print(e, file=sys.stderr)
+            return None
+    chosen = []
+    for _, source in sources:
+        chosen.append(next((profile for profile in profiles if profile.matches(source)), None))
+    for path, profile in zip(paths, profiles):
+        if profile not in chosen:
+            print(f"{path}: ignoring stale profile (recorded from another source)", file=sys.stderr)
+    return chosen
+
+
+def cmd_compile(args):
+    sources = read_sources(args.files)
+    emit = args.emit or ([] if args.output else ['asm'])
+    many = len(sources) > 1
+    start = time.perf_counter()
+
+    if args.daemon is not None:
+        if (args.print_after or args.unroll is not None or args.profile or args.parser != 'ply' or args.jobs
+                or args.lex_jobs):
+            print("--print-after, --unroll, --profile, --parser, --jobs and --lex-jobs are not available "
+                  "with --daemon", file=sys.stderr)
+            return 2
+        from daemon_client import DaemonClient
+        with DaemonClient(args.daemon or None) as client:
+            results = client.compile_many(sources, args.opt_level)
+        for result in results:
+            if not result['ok']:
+                print(f"{result.get('path')}: daemon error: {result['error']}", file=sys.stderr)
+                return 2
+        if args.output:
+            for (path, _), result in zip(sources, results):
+                with open(assembly_path(args.output, path, many), 'w', encoding='utf-8') as file:
+                    file.write('\n'.join(result['asm']) + '\n')
+        problems = sum(report_result(args, path, result, emit, many)
+                       for (path, _), result in zip(sources, results))
+    else:
+        from code_generator import AssemblyTranslator
+        from compiler import Compiler
+        profiles = load_profiles(args.profile, sources)
+        if profiles is None:
+            return 2
+        compiler = Compiler(args.opt_level, *unroll_option(args), parser_engine=args.parser,
+                            function_workers=args.jobs, lex_workers=args.lex_jobs)
+        problems = 0
+        for (path, source), profile in zip(sources, profiles):
+            session = compiler.compile(source, print_after=args.print_after, profile=profile,
+                                       asm='asm' in emit)
+            for pass_name, listing in session.ir_dumps:
+                print(f";; IR after {pass_name} ({path})")
+                sys.stdout.write(listing)
+            if args.output:
+                # Streamed, so the whole listing is never held in memory
+                with open(assembly_path(args.output, path, many), 'w', encoding='utf-8') as file:
+                    AssemblyTranslator().translate_to(session.ir_instructions, file, session.profile_hints,
+                                                      functions=session.functions.values())
+            # Reported before the next file is compiled, so the tokens and IR
+            # of every file are never held at once
+            problems += report_result(args, path, session.as_dict(), emit, many)
+        compiler.close()
+
+    if args.time:
+        print(f"compiled {len(sources)} file(s) in {(time.perf_counter() - start) * 1000:.1f} ms",
+              file=sys.stderr)
+    return 1 if problems else 0
+
+
+def report_result(args, path, result, emit, many):
+    """
+    Print one compile result with its requested statistics and save its artifact
+
+    Returns:
+        int: Number of problems reported
+    """
+    problems = print_result(path, result, emit, many)
+    if args.time_passes and result['pass_stats']:
+        from passes import format_pass_stats
+        print(f"passes for {path}:", file=sys.stderr)
+        sys.stderr.write(format_pass_stats(result['pass_stats']))
+    if args.time_passes and result.get('bounds_checks', {}).get('emitted'):
+        checks = result['bounds_checks']
+        print(f"bounds checks for {path}: {checks['emitted']} emitted, {checks['eliminated']} eliminated, "
+              f"{checks['remaining']} left", file=sys.stderr)
+    if args.time_passes and result.get('function_stats'):
+        from functions import format_function_stats
+        print(f"functions for {path}:", file=sys.stderr)
+        sys.stderr.write(format_function_stats(result['function_stats']))
+    if args.artifacts:
+        save_artifact(args.artifacts, path, result)
+    return problems
+
+
+def verify_executable(path, ir_code):
+    """
+    Run a built executable and compare its output with the IR interpreter
+
+    Returns:
+        str: Description of the first difference, or None if they agree
+    """
+    import subprocess
+    from interpreter import IRInterpreter, IRRuntimeError
+    from native import printed_as
+
+    start = time.perf_counter()
+    try:
+        expected = IRInterpreter(int_bits=64).run(ir_code).output
+        expected_error = False
+    except IRRuntimeError:
+        expected_error = True
+    interpreted_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    run = subprocess.run([os.path.abspath(path)], capture_output=True, text=True)
+    native_ms = (time.perf_counter() - start) * 1000
+
+    if expected_error:
+        if run.returncode == 0:
+            return "interpreter failed at run time but the executable exited normally"
+    else:
+        if run.returncode != 0:
+            return f"executable exited with status {run.returncode}: {run.stderr.strip()}"
+        actual = run.stdout.split('\n')[:-1]
+        for pos, value in enumerate(expected):
+            if pos >= len(actual):
+                return f"executable stopped after {pos} values, expected {len(expected)}"
+            if not printed_as(actual[pos], value):
+                return f"value {pos}: expected {value}, got {actual[pos]}"
+        if len(actual) > len(expected):
+            return f"executable printed {len(actual)} values, expected {len(expected)}"
+    print(f"verified {path}: interpreter {interpreted_ms:.1f} ms, native {native_ms:.1f} ms",
+          file=sys.stderr)
+    return None
+
+
+def cmd_build(args):
+    from compiler import Compiler
+    from native import NativeCodegenError, NativeTranslator, write_executable
+
+    ((path, source),) = read_sources([args.file])
+    profiles = load_profiles([args.profile] if args.profile else [], [(path, source)])
+    if profiles is None:
+        return 2
+    session = Compiler(args.opt_level, *unroll_option(args)).compile(source, profile=profiles[0])
+    for issue in session.all_issues():
+        print(f"{path}: {issue}", file=sys.stderr)
+    if session.all_issues():
+        return 1
+    if session.inputs:
+        print(f"{path}: programs with input declarations cannot be built natively", file=sys.stderr)
+        return 1
+
+    var_weights = session.profile_hints.var_weights if session.profile_hints else None
+    try:
+        image = NativeTranslator().translate(session.ir_instructions, var_weights,
+                                             session.declared_types())
+    except NativeCodegenError as e:
+        print(f"{path}: {e}", file=sys.stderr)
+        return 1
+    output = args.output or os.path.splitext(os.path.basename(path))[0]
+    write_executable(output, image)
+
+    if args.verify:
+        difference = verify_executable(output, session.ir_instructions)
+        if difference:
+            print(f"{path}: verification failed: {difference}", file=sys.stderr)
+            return 1
+    return 0
+
+
+def cmd_profile(args):
+    from compiler import Compiler
+    from interpreter import IRRuntimeError
+    from pgo import collect_profile
+
+    ((path, source),) = read_sources([args.file])
+    session = Compiler(0).compile(source)
+    for issue in session.all_issues():
+        print(f"{path}: {issue}", file=sys.stderr)
+    if session.all_issues():
+        return 1
+
+    try:
+        profile, result = collect_profile(source, session.ir_instructions, functions=session.functions)
+    except IRRuntimeError as e:
+        print(f"{path}: {e}", file=sys.stderr)
+        return 1
+    for value in result.output:
+        print(value)
+    output = args.output or os.path.splitext(os.path.basename(path))[0] + '.prof'
+    profile.save(output)
+    print(f"profiled {path}: {result.steps} steps, {result.branches} branches, "
+          f"{len(profile.blocks)} blocks -> {output}", file=sys.stderr)
+    return 0
+
+
+def read_batch_inputs(path, declared):
+    """
+    Read one batch input per CSV row; the header names the inputs
+
+    Returns:
+        dict: Input name -> list of values (converted to the declared type)
+
+    Raises:
+        ValueError: If a value is not a number of the declared type
+    """
+    import csv
+    types = dict(declared)
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        inputs = {name.strip(): [] for name in reader.fieldnames or []}
+        for row in reader:
+            for name, text in row.items():
+                convert = float if types.get(name.strip()) == 'float' else int
+                inputs[name.strip()].append(convert(text.strip()))
+    return inputs
+
+
+def cmd_batch(args):
+    from batch import BatchError, BatchExecutor, check_inputs
+    from compiler import Compiler
+
+    ((path, source),) = read_sources([args.file])
+    session = Compiler(args.opt_level, *unroll_option(args)).compile(source)
+    for issue in session.all_issues():
+        print(f"{path}: {issue}", file=sys.stderr)
+    if session.all_issues():
+        return 1
+
+    try:
+        executor = BatchExecutor()
+    except BatchError as e:
+        # NumPy is missing: nothing to do with either file
+        print(e, file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    try:
+        inputs = read_batch_inputs(args.inputs, session.inputs)
+        size = check_inputs(session.inputs, inputs)
+    except (BatchError, ValueError) as e:
+        print(f"{args.inputs}: {e}", file=sys.stderr)
+        return 2
+    try:
+        result = executor.run(session.ir_instructions, inputs, size, session.declared_types())
+    except BatchError as e:
+        print(f"{path}: {e}", file=sys.stderr)
+        return 2
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for lane, output in enumerate(result.outputs):
+        if result.failed[lane]:
+            print(f"{path}: row {lane + 1}: {result.errors[lane]}", file=sys.stderr)
+        print(' '.join(str(value) for value in output))
+    if args.time:
+        print(f"ran {size} input(s) in {elapsed_ms:.1f} ms ({result.block_runs} block runs)",
+              file=sys.stderr)
+    return 1 if result.failed.any() else 0
+
+
+def cmd_serve(args):
+    from daemon import CompileDaemon
+    CompileDaemon(args.socket, args.workers).run()
+    return 0
+
+
+def cmd_stop(args):
+    from daemon_client import DaemonClient
+    with DaemonClient(args.socket) as client:
+        client.shutdown()
+    return 0
+
+
+def cmd_watch(args):
+    from watch import SourceWatcher
+    if not os.path.isdir(args.directory):
+        print(f"{args.directory}: not a directory", file=sys.stderr)
+        return 2
+    SourceWatcher(args.directory, args.ext or ['.c'], args.opt_level, args.output, args.debounce / 1000,
+                  args.poll, args.interval / 1000).run()
+    return 0
+
+
+def cmd_lsp(args):
+    from lsp import LanguageServer
+    return LanguageServer(sys.stdin.buffer, sys.stdout.buffer, delay=args.delay / 1000).serve()
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='minicompiler',
+                                         description="Mini Compiler command line")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    compile_cmd = commands.add_parser('compile', help="compile source files")
+    compile_cmd.add_argument('files', nargs='+')
+    compile_cmd.add_argument('--emit', action='append', choices=EMIT_CHOICES,
+                             help="output section to print (repeatable, default: asm unless -o is given)")
+    compile_cmd.add_argument('-o', dest='output', metavar='OUT',
+                             help="write assembly to OUT (a directory of <name>.asm files for several sources)")
+    compile_cmd.add_argument('--daemon', nargs='?', const='', metavar='SOCKET',
+                             help="compile on a running daemon (default socket if no path)")
+    compile_cmd.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=0,
+                             help="optimization level (1: SSA constant propagation and value "
+                                  "numbering, 2: plus loop optimizations)")
+    compile_cmd.add_argument('--unroll', type=int, metavar='FACTOR',
+                             help="loop unrolling factor at -O2 (default 4, 1: complete unrolling only, 0: none)")
+    compile_cmd.add_argument('--time', action='store_true', help="report total compile latency")
+    compile_cmd.add_argument('--print-after', action='append', default=[], metavar='PASS',
+                             choices=list(PASSES) + ['all'],
+                             help="dump the IR after an optimization pass (repeatable, 'all' for every pass)")
+    compile_cmd.add_argument('--time-passes', action='store_true',
+                             help="report time and IR size change of each optimization pass")
+    compile_cmd.add_argument('--artifacts', metavar='DIR',
+                             help="also store tokens, IR and symbols of each file as DIR/<name>.mca")
+    compile_cmd.add_argument('--profile', action='append', default=[], metavar='FILE',
+                             help="optimize with a profile from the 'profile' command at -O1 and above "
+                                  "(repeatable; each source uses the profile recorded from it)")
+    compile_cmd.add_argument('--parser', choices=['ply', 'lr'], default='ply',
+                             help="parse loop: PLY's generic driver or the table-driven one (default ply)")
+    compile_cmd.add_argument('-j', '--jobs', type=int, default=0, metavar='N',
+                             help="optimize and translate functions on N worker processes (default 0: in process)")
+    compile_cmd.add_argument('--lex-jobs', type=int, default=0, metavar='N',
+                             help="lex sources of 1 MB or more in chunks on N worker processes (default 0: in process)")
+    compile_cmd.set_defaults(handler=cmd_compile)
+
+    build_cmd = commands.add_parser('build', help="build a native x86-64 Linux executable")
+    build_cmd.add_argument('file')
+    build_cmd.add_argument('-o', dest='output', help="executable path (default: source name without extension)")
+    build_cmd.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=0,
+                           help="optimization level")
+    build_cmd.add_argument('--unroll', type=int, metavar='FACTOR', help="loop unrolling factor at -O2")
+    build_cmd.add_argument('--verify', action='store_true',
+                           help="run the executable and compare its output with the IR interpreter")
+    build_cmd.add_argument('--profile', metavar='FILE',
+                           help="optimize with a profile from the 'profile' command at -O1 and above")
+    build_cmd.set_defaults(handler=cmd_build)
+
+    profile_cmd = commands.add_parser('profile', help="run a program and record its execution counts")
+    profile_cmd.add_argument('file')
+    profile_cmd.add_argument('-o', dest='output', help="profile path (default: source name with .prof)")
+    profile_cmd.set_defaults(handler=cmd_profile)
+
+    batch_cmd = commands.add_parser('batch', help="run a program once per CSV row of inputs, vectorized")
+    batch_cmd.add_argument('file')
+    batch_cmd.add_argument('inputs', help="CSV file with a header row naming the program's inputs")
+    batch_cmd.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=0,
+                           help="optimization level")
+    batch_cmd.add_argument('--unroll', type=int, metavar='FACTOR', help="loop unrolling factor at -O2")
+    batch_cmd.add_argument('--time', action='store_true', help="report batch run time")
+    batch_cmd.set_defaults(handler=cmd_batch)
+
+    serve_cmd = commands.add_parser('serve', help="run the compile daemon")
+    serve_cmd.add_argument('--socket', help="Unix socket path")
+    serve_cmd.add_argument('--workers', type=int,
+                           help="worker processes (default: CPU count, 0 = threads)")
+    serve_cmd.set_defaults(handler=cmd_serve)
+
+    stop_cmd = commands.add_parser('stop', help="stop a running compile daemon")
+    stop_cmd.add_argument('--socket', help="Unix socket path")
+    stop_cmd.set_defaults(handler=cmd_stop)
+
+    watch_cmd = commands.add_parser('watch', help="recompile sources in a directory whenever they change")
+    watch_cmd.add_argument('directory')
+    watch_cmd.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=0,
+                           help="optimization level")
+    watch_cmd.add_argument('-o', dest='output', metavar='DIR',
+                           help="write each source's assembly to DIR/<relative path>.asm")
+    watch_cmd.add_argument('--ext', action='append', metavar='SUFFIX',
+                           help="suffix of the files to compile (repeatable, default .c)")
+    watch_cmd.add_argument('--debounce', type=float, default=50, metavar='MS',
+                           help="quiet time that ends a burst of saves (default 50 ms)")
+    watch_cmd.add_argument('--poll', action='store_true',
+                           help="poll modification times even where inotify is available")
+    watch_cmd.add_argument('--interval', type=float, default=500, metavar='MS',
+                           help="time between polls (default 500 ms)")
+    watch_cmd.set_defaults(handler=cmd_watch)
+
+    lsp_cmd = commands.add_parser('lsp', help="run a language server on stdin and stdout")
+    lsp_cmd.add_argument('--delay', type=float, default=10, metavar='MS',
+                         help="quiet time after an edit before diagnostics are computed (default 10 ms)")
+    lsp_cmd.set_defaults(handler=cmd_lsp)
+
+    return arg_parser
+
+
+def main(argv=None):
+    """Run a command line subcommand"""
+    args = build_arg_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,103 +1,264 @@
-class AssemblyTranslator:
-    """Converts IR to assembly language"""
-    
-    def __init__(self):
-        self.asm_output = []
-        self.regs = ['AX', 'BX', 'CX', 'DX']
-        self.reg_alloc = {}
-        self.reg_idx = 0
-        
-    def allocate_reg(self, var):
-        """
-        Allocate a register for a variable
-        
-        Args:
-            var: Variable name
-            
-        Returns:
-            str: Register name
-        """
-        if var in self.reg_alloc:
-            return self.reg_alloc[var]
-        
-        reg = self.regs[self.reg_idx % len(self.regs)]
-        self.reg_idx += 1
-        self.reg_alloc[var] = reg
-        return reg
-    
-    def translate(self, ir_code):
-        """
-        Translate intermediate representation to assembly code
-        
-        Args:
-            ir_code: List of IR instructions
-            
-        Returns:
-            list: Assembly code lines
-        """
-        self.asm_output = []
-        self.asm_output.append("; Generated Assembly Code")
-        self.asm_output.append("section .data")
-        self.asm_output.append("section .text")
-        self.asm_output.append("global main")
-        self.asm_output.append("main:")
-        
-        for instr in ir_code:
-            op = instr['op']
-            s1 = instr['src1']
-            s2 = instr['src2']
-            d = instr['dst']
-            
-            if op == 'assign':
-                r_src = self.allocate_reg(s1) if isinstance(s1, str) and s1.startswith('temp') else None
-                r_dst = self.allocate_reg(d)
-                
-                if r_src:
-                    self.asm_output.append(f"    MOV {r_dst}, {r_src}")
-                else:
-                    self.asm_output.append(f"    MOV {r_dst}, {s1}")
-                    
-            elif op in ['+', '-', '*', '/', '%']:
-                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
-                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
-                r_res = self.allocate_reg(d)
-                
-                ops = {'+': 'ADD', '-': 'SUB', '*': 'IMUL', '/': 'IDIV', '%': 'MOD'}
-                
-                v1 = r1 if r1 else s1
-                v2 = r2 if r2 else s2
-                
-                self.asm_output.append(f"    {ops[op]} {r_res}, {v1}, {v2}")
-                    
-            elif op in ['<', '<=', '>', '>=', '==', '!=']:
-                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
-                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
-                r_res = self.allocate_reg(d)
-                
-                v1 = r1 if r1 else s1
-                v2 = r2 if r2 else s2
-                
-                self.asm_output.append(f"    CMP {v1}, {v2}")
-                self.asm_output.append(f"    SETCC {r_res}")
-                
-            elif op == 'mark':
-                self.asm_output.append(f"{s1}:")
-                
-            elif op == 'jump':
-                self.asm_output.append(f"    JMP {s1}")
-                
-            elif op == 'jump_if_false':
-                r = self.allocate_reg(s1) if isinstance(s1, str) else None
-                v = r if r else s1
-                self.asm_output.append(f"    CMP {v}, 0")
-                self.asm_output.append(f"    JZ {s2}")
-                
-            elif op == 'output':
-                r = self.allocate_reg(s1) if isinstance(s1, str) else None
-                v = r if r else s1
-                self.asm_output.append(f"    CALL print_{v}")
-        
-        self.asm_output.append("    MOV EAX, 0")
-        self.asm_output.append("    RET")
-        
-        return self.asm_output
\ No newline at end of file
+from ir import ARITHMETIC_OPS
+
+
+STREAM_BUFFER_LINES = 4096  # Lines collected per write by translate_to
+
+REGISTERS = ('AX', 'BX', 'CX', 'DX')
+
+# Lines around main's body
+PROLOGUE = ("; Generated Assembly Code", "section .data", "section .text", "global main", "main:")
+EPILOGUE = ("    MOV EAX, 0", "    RET")
+
+# Typed op -> instruction: int ops use the general registers' integer
+# instructions, float ops the scalar double-precision ones
+INSTRUCTIONS = {
+    'iadd': 'ADD', 'isub': 'SUB', 'imul': 'IMUL', 'idiv': 'IDIV', 'imod': 'MOD',
+    'fadd': 'ADDSD', 'fsub': 'SUBSD', 'fmul': 'MULSD', 'fdiv': 'DIVSD', 'fmod': 'FMOD',
+}
+
+
+class AssemblyTranslator:
+    """Converts IR to assembly language"""
+    
+    def __init__(self):
+        self.asm_output = []
+        self.regs = list(REGISTERS)
+        self.shared_regs = self.regs  # Registers handed out round-robin
+        self.reg_alloc = {}
+        self.reg_idx = 0
+        
+    def allocate_reg(self, var):
+        """
+        Allocate a register for a variable
+        
+        Args:
+            var: Variable name
+            
+        Returns:
+            str: Register name
+        """
+        if var in self.reg_alloc:
+            return self.reg_alloc[var]
+        
+        reg = self.shared_regs[self.reg_idx % len(self.shared_regs)]
+        self.reg_idx += 1
+        self.reg_alloc[var] = reg
+        return reg
+    
+    def reserve_registers(self, hot_vars):
+        """
+        Give the hottest variables registers of their own
+        
+        Args:
+            hot_vars: Variables by decreasing run-time use; one register is
+                      left to be shared by all other variables
+        """
+        pinned = hot_vars[:len(self.regs) - 1]
+        self.reg_alloc = dict(zip(pinned, self.regs[1:]))
+        self.shared_regs = self.regs[:len(self.regs) - len(pinned)]
+    
+    def translate(self, ir_code, hints=None, functions=()):
+        """
+        Translate intermediate representation to assembly code
+        
+        Args:
+            ir_code: List of IR instructions
+            hints: pgo.ProfileHints for this IR (optional); hot variables get
+                   dedicated registers and conditional jumps are annotated
+                   with how often they are taken
+            functions: Function records whose 'asm' (from translate_function)
+                       follows main
+            
+        Returns:
+            list: Assembly code lines
+        """
+        self.asm_output = list(self.translate_iter(ir_code, hints, functions))
+        return self.asm_output
+    
+    def translate_to(self, ir_code, file, hints=None, buffer_lines=STREAM_BUFFER_LINES, functions=()):
+        """
+        Write assembly for IR to a text file as it is generated
+        
+        Only buffer_lines lines are held at a time, so memory use does not
+        grow with the size of the output.
+        
+        Args:
+            ir_code: Iterable of IR instructions
+            file: Text file object to write to
+            hints: pgo.ProfileHints for this IR (optional)
+            buffer_lines: Lines collected per write
+            functions: Function records whose 'asm' follows main
+            
+        Returns:
+            int: Number of lines written
+        """
+        written = 0
+        chunk = []
+        for line in self.translate_iter(ir_code, hints, functions):
+            chunk.append(line)
+            if len(chunk) >= buffer_lines:
+                file.write('\n'.join(chunk) + '\n')
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            file.write('\n'.join(chunk) + '\n')
+            written += len(chunk)
+        return written
+    
+    def translate_iter(self, ir_code, hints=None, functions=()):
+        """
+        Generate assembly lines one at a time
+        
+        Args:
+            ir_code: Iterable of IR instructions (consumed once, in order)
+            hints: pgo.ProfileHints for this IR (optional)
+            functions: Function records whose 'asm' follows main
+            
+        Yields:
+            str: Assembly code lines
+        """
+        if hints is not None:
+            self.reserve_registers(hints.hot_variables())
+        yield from PROLOGUE
+        yield from self.translate_body(ir_code, hints)
+        yield from EPILOGUE
+        for function in functions:
+            yield ""
+            yield from function['asm']
+    
+    def translate_function(self, name, params, ir_code):
+        """
+        Translate one function on its own
+        
+        Arguments are pushed by the caller and read as ARG0, ARG1, ...; the
+        result is returned in EAX. Labels are prefixed with the function's
+        name, since every function numbers its labels from 1.
+        
+        Args:
+            name: Function name
+            params: (name, dtype) per parameter
+            ir_code: The function's IR
+            
+        Returns:
+            list: Assembly code lines
+        """
+        lines = [f"{name}:"]
+        for idx, (param, _) in enumerate(params):
+            lines.append(f"    MOV {self.allocate_reg(param)}, ARG{idx}")
+        lines.extend(self.translate_body(ir_code, label_prefix=f"{name}."))
+        self.asm_output = lines
+        return lines
+    
+    def translate_body(self, ir_code, hints=None, label_prefix=''):
+        """
+        Generate the assembly of IR instructions without any entry or exit code
+        
+        Args:
+            ir_code: Iterable of IR instructions
+            hints: pgo.ProfileHints for this IR (optional)
+            label_prefix: Put before every label
+            
+        Yields:
+            str: Assembly code lines
+        """
+        for idx, instr in enumerate(ir_code):
+            op = instr['op']
+            s1 = instr['src1']
+            s2 = instr['src2']
+            d = instr['dst']
+            
+            if op == 'assign':
+                r_src = self.allocate_reg(s1) if isinstance(s1, str) and s1.startswith('temp') else None
+                r_dst = self.allocate_reg(d)
+                
+                if r_src:
+                    yield f"    MOV {r_dst}, {r_src}"
+                else:
+                    yield f"    MOV {r_dst}, {s1}"
+                    
+            elif op in ARITHMETIC_OPS:
+                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
+                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
+                r_res = self.allocate_reg(d)
+                
+                v1 = r1 if r1 else s1
+                v2 = r2 if r2 else s2
+                
+                yield f"    {INSTRUCTIONS[op]} {r_res}, {v1}, {v2}"
+                
+            elif op == 'itof':
+                r = self.allocate_reg(s1) if isinstance(s1, str) else None
+                v = r if r else s1
+                yield f"    CVTSI2SD {self.allocate_reg(d)}, {v}"
+                    
+            elif op in ['<', '<=', '>', '>=', '==', '!=']:
+                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
+                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
+                r_res = self.allocate_reg(d)
+                
+                v1 = r1 if r1 else s1
+                v2 = r2 if r2 else s2
+                
+                yield f"    CMP {v1}, {v2}"
+                yield f"    SETCC {r_res}"
+                
+            elif op == 'mark':
+                yield f"{label_prefix}{s1}:"
+                
+            elif op == 'jump':
+                yield f"    JMP {label_prefix}{s1}"
+                
+            elif op == 'jump_if_false':
+                r = self.allocate_reg(s1) if isinstance(s1, str) else None
+                v = r if r else s1
+                yield f"    CMP {v}, 0"
+                if hints is not None and idx in hints.branch_bias:
+                    bias = hints.branch_bias[idx]
+                    hint = 'likely' if bias >= 0.5 else 'unlikely'
+                    yield f"    JZ {label_prefix}{s2}    ; {hint} ({bias:.0%} taken)"
+                else:
+                    yield f"    JZ {label_prefix}{s2}"
+                
+            elif op == 'output':
+                r = self.allocate_reg(s1) if isinstance(s1, str) else None
+                v = r if r else s1
+                yield f"    CALL print_{v}"
+                
+            elif op == 'param':
+                r = self.allocate_reg(s1) if isinstance(s1, str) else None
+                v = r if r else s1
+                yield f"    PUSH {v}"
+                
+            elif op == 'call':
+                yield f"    CALL {s1}"
+                if s2:
+                    yield f"    ADD SP, {s2}"
+                yield f"    MOV {self.allocate_reg(d)}, EAX"
+                
+            elif op == 'return':
+                r = self.allocate_reg(s1) if isinstance(s1, str) else None
+                v = r if r else s1
+                yield f"    MOV EAX, {v}"
+                yield "    RET"
+                
+            elif op == 'array':
+                yield f"    ALLOC {d}, {s1}"
+                
+            elif op == 'check':
+                r = self.allocate_reg(s1) if isinstance(s1, str) else None
+                v = r if r else s1
+                # Unsigned comparison: negative indexes fail too
+                yield f"    CMP {v}, {s2}"
+                yield "    JAE bounds_error"
+                
+            elif op == 'load':
+                r = self.allocate_reg(s2) if isinstance(s2, str) else None
+                v = r if r else s2
+                yield f"    MOV {self.allocate_reg(d)}, [{s1} + {v}]"
+                
+            elif op == 'store':
+                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
+                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
+                v1 = r1 if r1 else s1
+                v2 = r2 if r2 else s2
+                yield f"    MOV [{d} + {v2}], {v1}"
@@ -0,0 +1,111 @@
+from bounds import count_checks
+from lexer import TokenScanner
+from parallel_lex import ParallelTokenScanner
+from parser import SyntaxProcessor
+from code_generator import AssemblyTranslator
+from functions import FunctionBackend, callee_types
+from session import CompileSession
+from passes import PassManager, pipeline_for
+from unroll import DEFAULT_UNROLL_FACTOR
+
+
+class Compiler:
+    """
+    Shareable compiler front to back
+
+    The lexer rules and LALR tables are built once in the constructor and are
+    only read afterwards, so a single Compiler can be used from many threads.
+    Every compile() call gets its own CompileSession. Functions are compiled
+    by a FunctionBackend whose cache is shared by all of them. With lex
+    workers, sources of at least parallel_lex.MIN_PARALLEL_SIZE characters
+    are lexed in chunks on a process pool before they are parsed.
+    """
+
+    def __init__(self, opt_level=0, unroll_factor=DEFAULT_UNROLL_FACTOR, parser_engine='ply',
+                 function_workers=0, lex_workers=0):
+        self.opt_level = opt_level  # 0: IR as parsed, 1: SSA optimizations, 2: plus loop optimizations
+        self.unroll_factor = unroll_factor  # Body copies per unrolled loop at -O2 (0: no unrolling)
+        self.scanner = TokenScanner()
+        self.scanner.initialize()
+        self.processor = SyntaxProcessor()
+        self.processor.initialize(self.scanner, parser_engine)  # 'ply' or 'lr' (lr_parser.TableParser)
+        # Worker processes that compile a program's functions in parallel (0: none)
+        self.function_backend = FunctionBackend(unroll_factor, function_workers)
+        # Worker processes that lex large sources in chunks (0 or 1: lexed while parsing)
+        self.parallel_scanner = ParallelTokenScanner(lex_workers) if lex_workers > 1 else None
+
+    def close(self):
+        """Stop the function and lex workers, if any were started"""
+        self.function_backend.close()
+        if self.parallel_scanner is not None:
+            self.parallel_scanner.close()
+
+    def compile(self, code, session=None, opt_level=None, print_after=(), profile=None, asm=True):
+        """
+        Run every stage on one source
+
+        Args:
+            code: Source code string
+            session: CompileSession to fill (a fresh one is used if omitted)
+            opt_level: Overrides the compiler's optimization level for this call
+            print_after: Pass names (or 'all') whose output IR is kept in session.ir_dumps
+            profile: pgo.Profile to optimize with (ignored unless recorded from this code)
+            asm: Fill session.asm; callers that stream assembly with
+                 AssemblyTranslator.translate_to pass False
+
+        Returns:
+            CompileSession: Tokens, AST, symbols, IR, assembly and issues
+        """
+        if session is None:
+            session = CompileSession(code)
+        tokens = None
+        if self.parallel_scanner is not None and len(code) >= self.parallel_scanner.min_size:
+            tokens, issues = self.parallel_scanner.scan_rows(code)
+            session.lex_issues.extend(issues)
+        self.processor.process(code, session, tokens)
+        return self.finish(session, opt_level, print_after, profile, asm)
+
+    def finish(self, session, opt_level=None, print_after=(), profile=None, asm=True):
+        """
+        Optimize and translate a session whose source has already been parsed
+
+        Takes the same options as compile(); used by callers that fill the
+        front-end results themselves (incremental.IncrementalCompiler).
+
+        Returns:
+            CompileSession: The same session, with optimized IR and assembly
+        """
+        code = session.code
+        if opt_level is None:
+            opt_level = self.opt_level
+        # IR of a program with errors may be incomplete, so it is left as parsed
+        if profile is not None and not profile.matches(code):
+            profile = None
+        emitted = count_checks(session.ir_instructions) + sum(
+            count_checks(function['ir']) for function in session.functions.values())
+        eliminated = 0
+        if opt_level > 0 and not session.all_issues():
+            manager = PassManager(pipeline_for(opt_level, profile is not None), print_after,
+                                  self.unroll_factor, profile, session.declared_types(),
+                                  callee_types(session.ir_instructions, session.functions))
+            session.ir_instructions = manager.run(session.ir_instructions)
+            session.pass_stats = manager.stats
+            session.ir_dumps = manager.dumps
+            session.loop_stats = manager.reports.get('loops', [])
+            session.profile_hints = manager.reports.get('profile_hints')
+            eliminated = manager.reports.get('checks_eliminated', 0)
+        if session.functions:
+            # Always translated, so callers that stream main's assembly can append them
+            self.function_backend.run(session, opt_level if not session.all_issues() else 0, print_after)
+            eliminated += sum(row['checks_eliminated'] for row in session.function_stats)
+        session.bounds_checks = {
+            'emitted': emitted,
+            'eliminated': eliminated,
+            'remaining': count_checks(session.ir_instructions) + sum(
+                count_checks(function['ir']) for function in session.functions.values()),
+        }
+        # The translator keeps register state per call, so each session gets its own
+        if asm:
+            session.asm = AssemblyTranslator().translate(session.ir_instructions, session.profile_hints,
+                                                         session.functions.values())
+        return session
@@ -0,0 +1,220 @@
+import argparse
+import gc
+import json
+import math
+import os
+import sys
+import time
+
+from code_generator import AssemblyTranslator
+from compiler import Compiler
+from session import CompileSession
+from workloads import generate_program
+
+
+DEFAULT_SIZES = [1000, 2000, 4000, 8000]
+DEFAULT_BOUNDS = {'lex': 1.2, 'parse': 1.2, 'codegen': 1.2}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'complexity_baseline.json')
+
+
+class StageTimer:
+    """Runs each compiler stage on generated programs and records timings"""
+
+    def __init__(self, repeats=3):
+        self.repeats = repeats
+        self.compiler = Compiler()
+        self.translator = AssemblyTranslator()
+
+    def best_of(self, func, min_total=0.25, max_runs=50):
+        """
+        Return the fastest run of func (seconds), with GC paused like timeit
+
+        Runs at least `repeats` times, and keeps going for cheap stages until
+        `min_total` seconds have been spent so that short timings are not noise.
+        """
+        best = None
+        total = 0.0
+        runs = 0
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while runs < self.repeats or (total < min_total and runs < max_runs):
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+                total += elapsed
+                runs += 1
+                if best is None or elapsed < best:
+                    best = elapsed
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return best
+
+    def measure(self, size):
+        """
+        Time lexing, parsing and code generation for one program size
+
+        Args:
+            size: Number of top-level statements in the generated program
+
+        Returns:
+            tuple: (timings, work) - stage name -> seconds, and stage name -> input size
+                   (characters for lexing, tokens for parsing, IR instructions for codegen)
+        """
+        src = generate_program(size)
+        timings = {}
+        timings['lex'] = self.best_of(lambda: self.compiler.scanner.scan(src))
+        timings['parse'] = self.best_of(lambda: self.compiler.processor.process(src))
+        session = CompileSession(src)
+        self.compiler.processor.process(src, session)
+        ir = session.ir_instructions
+        timings['codegen'] = self.best_of(lambda: self.translator.translate(ir))
+
+        tokens = session.token_stream
+        work = {'lex': len(src), 'parse': len(tokens), 'codegen': len(ir)}
+        return timings, work
+
+
+def fit_exponent(sizes, times):
+    """
+    Fit t = c * n^k by least squares in log-log space
+
+    Returns:
+        float: The growth exponent k
+    """
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return num / den if den else 0.0
+
+
+def run_guard(sizes=None, bounds=None, repeats=3):
+    """
+    Measure every stage at several sizes and fit growth exponents
+
+    The exponent is fitted against each stage's real input size rather than the
+    requested statement count, since generated statement lengths vary.
+
+    Returns:
+        dict: Stage name -> {'exponent': k, 'times': {size: seconds}, 'work': {size: n}}
+    """
+    sizes = sizes or DEFAULT_SIZES
+    bounds = bounds or DEFAULT_BOUNDS
+    timer = StageTimer(repeats)
+
+    per_stage = {stage: ([], []) for stage in bounds}
+    for size in sizes:
+        timings, work = timer.measure(size)
+        for stage in bounds:
+            per_stage[stage][0].append(timings[stage])
+            per_stage[stage][1].append(work[stage])
+
+    results = {}
+    for stage, (times, work) in per_stage.items():
+        results[stage] = {
+            'exponent': fit_exponent(work, times),
+            'times': {str(size): t for size, t in zip(sizes, times)},
+            'work': {str(size): n for size, n in zip(sizes, work)},
+        }
+    return results
+
+
+def check_results(results, bounds, baseline=None, exponent_slack=0.15, time_ratio=2.0):
+    """
+    Compare measured results against exponent bounds and a stored baseline
+
+    Args:
+        results: Output of run_guard
+        bounds: Stage name -> maximum allowed growth exponent
+        baseline: Previously stored results (optional)
+        exponent_slack: Allowed exponent increase over the baseline
+        time_ratio: Allowed slowdown factor at the largest size over the baseline
+
+    Returns:
+        list: Failure messages (empty if everything is within bounds)
+    """
+    failures = []
+    for stage, res in results.items():
+        k = res['exponent']
+        if k > bounds[stage]:
+            failures.append(f"{stage}: growth exponent {k:.2f} exceeds bound {bounds[stage]:.2f}")
+
+        if not baseline or stage not in baseline:
+            continue
+        base = baseline[stage]
+        # Sub-linear baseline fits are measurement noise; never demand better than linear
+        if k > max(base['exponent'], 1.0) + exponent_slack:
+            failures.append(f"{stage}: growth exponent {k:.2f} regressed from baseline {base['exponent']:.2f}")
+
+        largest = max(res['times'], key=int)
+        if largest in base['times'] and res['times'][largest] > base['times'][largest] * time_ratio:
+            failures.append(f"{stage}: {res['times'][largest] * 1000:.1f} ms at n={largest} is more than "
+                            f"{time_ratio:g}x the baseline {base['times'][largest] * 1000:.1f} ms")
+    return failures
+
+
+def load_baseline(path):
+    """Load stored baseline results, or None if there is no baseline yet"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(path, results):
+    """Store results as the new baseline"""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Algorithmic-complexity regression guard")
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                            help="program sizes (top-level statements) to measure")
+    arg_parser.add_argument('--bound', action='append', default=[], metavar='STAGE=K',
+                            help="override the maximum growth exponent for a stage")
+    arg_parser.add_argument('--repeats', type=int, default=3)
+    arg_parser.add_argument('--baseline', default=BASELINE_PATH)
+    arg_parser.add_argument('--time-ratio', type=float, default=2.0,
+                            help="allowed slowdown over the baseline at the largest size")
+    arg_parser.add_argument('--update-baseline', action='store_true',
+                            help="store this run as the new baseline instead of comparing")
+    args = arg_parser.parse_args(argv)
+
+    bounds = dict(DEFAULT_BOUNDS)
+    for item in args.bound:
+        stage, _, value = item.partition('=')
+        if stage not in bounds:
+            arg_parser.error(f"unknown stage '{stage}'")
+        try:
+            bounds[stage] = float(value)
+        except ValueError:
+            arg_parser.error(f"invalid bound '{item}' (expected STAGE=K with a number K)")
+
+    results = run_guard(args.sizes, bounds, args.repeats)
+
+    print(f"{'STAGE':<10} {'EXPONENT':<10} {'BOUND':<8} " + ' '.join(f"{'n=' + str(n):<12}" for n in args.sizes))
+    for stage, res in results.items():
+        times = ' '.join(f"{res['times'][str(n)] * 1000:<9.2f} ms" for n in args.sizes)
+        print(f"{stage:<10} {res['exponent']:<10.2f} {bounds[stage]:<8.2f} {times}")
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failures = check_results(results, bounds, load_baseline(args.baseline), time_ratio=args.time_ratio)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("OK: all stages within bounds")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from compiler import Compiler
+from daemon_client import HEADER, MAX_MESSAGE_SIZE, default_socket_path, encode_message
+
+
+_worker_compiler = None
+
+
+async def read_message(reader):
+    """
+    Read one framed message from an asyncio stream
+
+    Returns:
+        dict: The decoded message, or None if the peer closed the connection
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"message of {size} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit")
+    return json.loads(await reader.readexactly(size))
+
+
+def _init_worker():
+    """Build the compiler once per worker (already warm when the worker was forked)"""
+    global _worker_compiler
+    if _worker_compiler is None:
+        _worker_compiler = Compiler()
+
+
+def _init_worker_ready(_):
+    return _worker_compiler is not None
+
+
+def compile_source(source, opt_level=0):
+    """
+    Compile one source in a worker
+
+    Returns:
+        dict: Session results plus the compile time in milliseconds
+    """
+    _init_worker()
+    start = time.perf_counter()
+    result = _worker_compiler.compile(source, opt_level=opt_level).as_dict()
+    result['elapsed_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+class CompileDaemon:
+    """Long-running compile server on a Unix domain socket"""
+
+    def __init__(self, socket_path=None, workers=None):
+        """
+        Args:
+            socket_path: Path of the Unix socket to listen on
+            workers: Number of worker processes (0 compiles on threads in the daemon)
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.pool = None
+        self.stopping = None
+        self.connections = {}
+
+    def start_pool(self):
+        # Warm the compiler before forking so workers inherit the built tables
+        _init_worker()
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+            # Start every worker now instead of on the first request
+            list(self.pool.map(_init_worker_ready, range(self.workers)))
+        else:
+            self.pool = ThreadPoolExecutor(os.cpu_count() or 1)
+
+    def remove_stale_socket(self):
+        """Delete a leftover socket file, refusing if a daemon still answers on it"""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"a compile daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    async def handle_client(self, reader, writer):
+        """Serve one connection; requests may be pipelined and answer out of order"""
+        write_lock = asyncio.Lock()
+        tasks = set()
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except (ValueError, json.JSONDecodeError) as e:
+                    await self.send(writer, write_lock, {'id': None, 'ok': False, 'error': str(e)})
+                    break
+                if message is None:
+                    break
+                task = asyncio.ensure_future(self.dispatch(message, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def dispatch(self, message, writer, write_lock):
+        """Run one request and send its response"""
+        request_id = message.get('id')
+        op = message.get('op', 'compile')
+
+        if op == 'compile':
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self.pool, compile_source, message.get('source', ''),
+                                                    message.get('opt_level', 0))
+                response = {'id': request_id, 'ok': True, 'path': message.get('path')}
+                response.update(result)
+            except Exception as e:
+                response = {'id': request_id, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        elif op == 'ping':
+            response = {'id': request_id, 'ok': True, 'pid': os.getpid(), 'workers': self.workers}
+        elif op == 'shutdown':
+            response = {'id': request_id, 'ok': True}
+            self.stopping.set()
+        else:
+            response = {'id': request_id, 'ok': False, 'error': f"unknown op '{op}'"}
+
+        await self.send(writer, write_lock, response)
+
+    async def send(self, writer, write_lock, response):
+        async with write_lock:
+            writer.write(encode_message(response))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def serve(self):
+        """Listen until a shutdown request or SIGINT/SIGTERM arrives"""
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path,
+                                                 limit=MAX_MESSAGE_SIZE)
+        os.chmod(self.socket_path, 0o600)
+        pool = f"{self.workers} worker processes" if self.workers else "thread pool"
+        print(f"minicompiler daemon listening on {self.socket_path} ({pool})", flush=True)
+        try:
+            async with server:
+                await self.stopping.wait()
+                # Closing the transports ends each handler's read loop cleanly
+                handlers = list(self.connections)
+                for writer in self.connections.values():
+                    writer.close()
+                await asyncio.gather(*handlers, return_exceptions=True)
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def run(self):
+        """Start the worker pool and serve (blocking)"""
+        self.remove_stale_socket()
+        self.start_pool()
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,102 @@
+import json
+import os
+import socket
+import struct
+import tempfile
+
+
+# Every message is a 4-byte big-endian length followed by that many bytes of UTF-8 JSON
+HEADER = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 256 * 1024 * 1024
+
+
+def default_socket_path():
+    """Per-user socket path used when none is given"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"minicompiler-{os.getuid()}.sock")
+
+
+def encode_message(message):
+    """Frame a message for the wire"""
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(len(payload)) + payload
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("compile daemon closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class DaemonClient:
+    """Thin blocking client for CompileDaemon"""
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.socket_path)
+        self.next_id = 0
+
+    def send(self, message):
+        """Send a request and return its id"""
+        self.next_id += 1
+        message = dict(message, id=self.next_id)
+        self.sock.sendall(encode_message(message))
+        return self.next_id
+
+    def receive(self):
+        """Read one response"""
+        (size,) = HEADER.unpack(_recv_exactly(self.sock, HEADER.size))
+        return json.loads(_recv_exactly(self.sock, size))
+
+    def request(self, message):
+        """Send one request and wait for its response"""
+        self.send(message)
+        return self.receive()
+
+    def compile(self, source, path=None, opt_level=0):
+        """
+        Compile one source on the daemon
+
+        Returns:
+            dict: tokens, symbols, ir, asm, issues and elapsed_ms
+        """
+        return self.request({'op': 'compile', 'source': source, 'path': path, 'opt_level': opt_level})
+
+    def compile_many(self, sources, opt_level=0):
+        """
+        Pipeline several compiles over one connection
+
+        Args:
+            sources: List of (path, source) pairs
+            opt_level: Optimization level for every source
+
+        Returns:
+            list: Responses in the same order as sources
+        """
+        ids = [self.send({'op': 'compile', 'source': source, 'path': path, 'opt_level': opt_level})
+               for path, source in sources]
+        responses = {}
+        while len(responses) < len(ids):
+            response = self.receive()
+            responses[response['id']] = response
+        return [responses[request_id] for request_id in ids]
+
+    def shutdown(self):
+        """Ask the daemon to exit"""
+        return self.request({'op': 'shutdown'})
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,247 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from code_generator import AssemblyTranslator
+from passes import PassManager, pipeline_for
+from unroll import DEFAULT_UNROLL_FACTOR
+
+
+FUNCTION_CACHE_SIZE = 1024  # Compiled functions kept per FunctionBackend
+PARALLEL_MIN_INSTRUCTIONS = 500  # Below this much uncached IR, a pool costs more than it saves
+
+
+def compile_function(name, params, ir_code, opt_level, unroll_factor, print_after=(), dtype='int',
+                     return_types=None):
+    """
+    Optimize and translate one function (run in pool workers, so module level)
+
+    Args:
+        name: Function name
+        params: (name, dtype) per parameter
+        ir_code: The function's IR as parsed
+        opt_level: Optimization level
+        unroll_factor: Body copies per unrolled loop at -O2
+        print_after: Pass names (or 'all') whose output IR is dumped
+        dtype: Return type
+        return_types: Function name -> return type of the functions it calls
+
+    Returns:
+        dict: ir, asm, pass_stats, loop_stats, checks_eliminated, ir_dumps and ms
+    """
+    start = time.perf_counter()
+    result = {'ir': ir_code, 'pass_stats': [], 'loop_stats': [], 'checks_eliminated': 0, 'ir_dumps': []}
+    if opt_level > 0:
+        # The parameters and the return value are the only names the IR does not type
+        declared = dict(params, **{'return': dtype})
+        manager = PassManager(pipeline_for(opt_level), print_after, unroll_factor,
+                              declared=declared, return_types=return_types)
+        result['ir'] = manager.run(ir_code)
+        result['pass_stats'] = manager.stats
+        result['loop_stats'] = manager.reports.get('loops', [])
+        result['checks_eliminated'] = manager.reports.get('checks_eliminated', 0)
+        result['ir_dumps'] = manager.dumps
+    result['asm'] = AssemblyTranslator().translate_function(name, params, result['ir'])
+    result['ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def callee_types(ir_code, functions):
+    """
+    Return type of every function an IR list calls
+
+    Args:
+        ir_code: IR instructions
+        functions: Function name -> function dict (CompileSession.functions)
+
+    Returns:
+        dict: Function name -> return type
+    """
+    return {instr['src1']: functions[instr['src1']]['dtype'] for instr in ir_code
+            if instr['op'] == 'call' and instr['src1'] in functions}
+
+
+def typed(operand):
+    """An operand with its type, for cache keys"""
+    return (type(operand).__name__, operand)
+
+
+def cache_key(function, opt_level, print_after, return_types):
+    """Everything the compiled form of a function depends on (besides the unroll factor)"""
+    # Operands are keyed with their types: 2 == 2.0 with the same hash, but they compile differently
+    ir_key = tuple((instr['op'], typed(instr['src1']), typed(instr['src2']), typed(instr['dst']))
+                   for instr in function['ir'])
+    return (function['name'], function['dtype'], tuple(map(tuple, function['params'])), ir_key,
+            tuple(sorted(return_types.items())), opt_level, tuple(print_after))
+
+
+class FunctionBackend:
+    """
+    Optimizes and translates the functions of a program, each on its own
+
+    Functions cannot see each other's variables, so each one's optimized IR
+    and assembly depend only on its own IR. Results are kept in an LRU
+    cache: after an edit, only the functions whose IR changed are compiled
+    again. With workers, the cache misses of one program are compiled in
+    parallel on a process pool (the passes are pure Python, so threads
+    would not overlap). Safe to share between threads.
+    """
+
+    def __init__(self, unroll_factor=DEFAULT_UNROLL_FACTOR, workers=0, cache_size=FUNCTION_CACHE_SIZE):
+        """
+        Args:
+            unroll_factor: Body copies per unrolled loop at -O2
+            workers: Worker processes (0 compiles in the calling thread)
+            cache_size: Compiled functions to keep
+        """
+        self.unroll_factor = unroll_factor
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers)
+            return self.pool
+
+    def close(self):
+        """Stop the worker processes (the backend can still be used afterwards)"""
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def lookup(self, key):
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+            return result
+
+    def store(self, key, result):
+        with self.lock:
+            self.cache[key] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def run(self, session, opt_level, print_after=()):
+        """
+        Compile every function of a session in place
+
+        Sets each function's 'ir' to the optimized IR and its 'asm', adds
+        per-pass dumps to session.ir_dumps and one row per function to
+        session.function_stats.
+
+        Args:
+            session: CompileSession with parsed functions
+            opt_level: Optimization level
+            print_after: Pass names (or 'all') whose output IR is dumped
+        """
+        functions = list(session.functions.values())
+        callees = [callee_types(function['ir'], session.functions) for function in functions]
+        keys = [cache_key(function, opt_level, print_after, types)
+                for function, types in zip(functions, callees)]
+        results = {}
+        misses = []
+        for function, key, types in zip(functions, keys, callees):
+            start = time.perf_counter()
+            cached = self.lookup(key)
+            if cached is not None:
+                results[function['name']] = (cached, True, (time.perf_counter() - start) * 1000)
+            else:
+                misses.append((function, key, types))
+
+        args = [(function['name'], function['params'], function['ir'], opt_level, self.unroll_factor,
+                 tuple(print_after), function['dtype'], types) for function, _, types in misses]
+        parallel = (self.workers > 0 and len(misses) > 1 and
+                    sum(len(function['ir']) for function, _, _ in misses) >= PARALLEL_MIN_INSTRUCTIONS)
+        if parallel:
+            compiled = list(self.get_pool().map(compile_function, *zip(*args)))
+        else:
+            compiled = [compile_function(*call) for call in args]
+        for (function, key, _), result in zip(misses, compiled):
+            self.store(key, result)
+            results[function['name']] = (result, False, result['ms'])
+
+        for function in functions:
+            result, cached, ms = results[function['name']]
+            session.function_stats.append({
+                'function': function['name'],
+                'ms': ms,
+                'cached': cached,
+                'parallel': parallel and not cached,
+                'ir_before': len(function['ir']),
+                'ir_after': len(result['ir']),
+                'checks_eliminated': result['checks_eliminated'],
+            })
+            # Copies, so sessions never share (and mutate) the cached IR
+            function['ir'] = [dict(instr) for instr in result['ir']]
+            function['asm'] = list(result['asm'])
+            function['loop_stats'] = result['loop_stats']
+            session.ir_dumps.extend((f"{pass_name} in {function['name']}", listing)
+                                    for pass_name, listing in result['ir_dumps'])
+
+
+def format_function_stats(stats):
+    """Render per-function back-end statistics as a table"""
+    lines = [f"{'FUNCTION':<18} {'TIME':>10} {'IR':>14}  SOURCE", "─" * 54]
+    for row in stats:
+        delta = row['ir_after'] - row['ir_before']
+        source = 'cached' if row['cached'] else 'worker' if row['parallel'] else 'compiled'
+        lines.append(f"{row['function']:<18} {row['ms']:>7.2f} ms {row['ir_after']:>7} ({delta:+d})  {source}")
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    from compiler import Compiler
+    from incremental import edit_number
+    from workloads import generate_function_program
+    arg_parser = argparse.ArgumentParser(description="Per-function back end: serial, parallel and cached")
+    arg_parser.add_argument('--functions', type=int, nargs='+', default=[8, 32],
+                            help="functions per generated program")
+    arg_parser.add_argument('--statements', type=int, default=20, help="statements per function")
+    arg_parser.add_argument('--workers', type=int, default=4, help="worker processes for the parallel run")
+    arg_parser.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=2,
+                            help="optimization level")
+    args = arg_parser.parse_args(argv)
+
+    serial = Compiler()
+    parallel = Compiler(function_workers=args.workers)
+    print(f"{'FUNCTIONS':<10} {'SERIAL MS':>10} {'PARALLEL MS':>12} {'EDIT ONE MS':>12} {'CACHED':>7}  OUTPUT")
+    failed = False
+    try:
+        for n in args.functions:
+            code = generate_function_program(n, args.statements)
+            # Warm the pool so worker start-up is not counted
+            parallel.compile(generate_function_program(args.workers, 1, seed=1), opt_level=args.opt_level)
+            times, sessions = {}, {}
+            for name, compiler in (('serial', serial), ('parallel', parallel)):
+                compiler.function_backend.cache.clear()
+                start = time.perf_counter()
+                sessions[name] = compiler.compile(code, opt_level=args.opt_level)
+                times[name] = time.perf_counter() - start
+            # Change one constant: only the function that contains it is compiled again
+            edited = edit_number(code, random.Random(n))
+            start = time.perf_counter()
+            session = serial.compile(edited, opt_level=args.opt_level)
+            edit_ms = (time.perf_counter() - start) * 1000
+            cached = sum(row['cached'] for row in session.function_stats)
+            expected = Compiler().compile(edited, opt_level=args.opt_level)
+            same = (sessions['serial'].asm == sessions['parallel'].asm and session.asm == expected.asm)
+            failed = failed or not same
+            print(f"{n:<10} {times['serial'] * 1000:>10.1f} {times['parallel'] * 1000:>12.1f} "
+                  f"{edit_ms:>12.1f} {cached:>3}/{n:<3}  {'identical' if same else 'DIFFERENT'}")
+    finally:
+        parallel.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-from lexer import TokenScanner
-from parser import SyntaxProcessor
-from code_generator import AssemblyTranslator
+import tkinter.font as tkfont
+from concurrent.futures import Future, ThreadPoolExecutor
+from ir_format import function_title, ir_segments, loop_comments
+import codecs
+import mmap
 import os
 import re
 
@@ -30,53 +32,67 @@ class SyntaxHighlighter:
     def highlight(self, event=None):
         """Apply syntax highlighting"""
         self.text.mark_set("range_start", "1.0")
-        content = self.text.get("1.0", "end-1c")
+        self.highlight_range("1.0", "end-1c")
+    
+    def highlight_viewport(self, event=None, margin=20):
+        """
+        Apply syntax highlighting to the visible lines only (large-file mode)
+        
+        Args:
+            margin: Extra lines above and below the viewport to highlight
+        """
+        first = int(self.text.index('@0,0').split('.')[0])
+        last = int(self.text.index(f"@0,{self.text.winfo_height()}").split('.')[0])
+        self.highlight_range(f"{max(first - margin, 1)}.0", f"{last + margin}.0 lineend")
+    
+    def highlight_range(self, start, end):
+        """
+        Apply syntax highlighting between two text indices
+        
+        Args:
+            start: Text index where highlighting starts
+            end: Text index where highlighting ends
+        """
+        start = self.text.index(start)
+        content = self.text.get(start, end)
         
         # Remove all tags
         for tag in self.tags.keys():
-            self.text.tag_remove(tag, "1.0", "end")
+            self.text.tag_remove(tag, start, end)
         
         # Keywords
-        keywords = r'\b(int|if|else|while|print|return|void|char|float|double)\b'
+        keywords = r'\b(int|if|else|while|for|print|input|return|void|char|float|double)\b'
         for match in re.finditer(keywords, content):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text.tag_add('keyword', start, end)
+            self.tag_match('keyword', start, match.start(), match.end())
         
         # Numbers
         numbers = r'\b\d+\b'
         for match in re.finditer(numbers, content):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text.tag_add('number', start, end)
+            self.tag_match('number', start, match.start(), match.end())
         
         # Single line comments
         comments = r'//.*?$'
         for match in re.finditer(comments, content, re.MULTILINE):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text.tag_add('comment', start, end)
+            self.tag_match('comment', start, match.start(), match.end())
         
         # Multi-line comments
         ml_comments = r'/\*.*?\*/'
         for match in re.finditer(ml_comments, content, re.DOTALL):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text.tag_add('comment', start, end)
+            self.tag_match('comment', start, match.start(), match.end())
         
         # Operators
         operators = r'[+\-*/%=<>!&|]+'
         for match in re.finditer(operators, content):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text.tag_add('operator', start, end)
+            self.tag_match('operator', start, match.start(), match.end())
         
-        # Function calls
-        functions = r'\b(\w+)\s*\('
+        # Function calls (not keywords followed by a parenthesis, such as for and while)
+        functions = r'\b(?!(?:if|while|for|print|return)\b)(\w+)\s*\('
         for match in re.finditer(functions, content):
-            start = f"1.0+{match.start(1)}c"
-            end = f"1.0+{match.end(1)}c"
-            self.text.tag_add('function', start, end)
+            self.tag_match('function', start, match.start(1), match.end(1))
+    
+    def tag_match(self, tag, base, match_start, match_end):
+        """Tag a regex match found in text that starts at index `base`"""
+        self.text.tag_add(tag, f"{base}+{match_start}c", f"{base}+{match_end}c")
 
 
 class OutputHighlighter:
@@ -108,6 +124,7 @@ class OutputHighlighter:
         self.text.tag_config('ir_var', foreground='#9CDCFE')
         self.text.tag_config('ir_num', foreground='#B5CEA8')
         self.text.tag_config('ir_index', foreground='#858585')
+        self.text.tag_config('ir_comment', foreground='#6A9955')
         
         # Assembly colors
         self.text.tag_config('asm_instruction', foreground='#569CD6', font=('Consolas', 9, 'bold'))
@@ -121,6 +138,54 @@ class OutputHighlighter:
         self.text.tag_config('error_text', foreground='#F48771')
 
 
+class LineNumberGutter(tk.Canvas):
+    """Line number gutter that only draws the numbers of visible lines"""
+    def __init__(self, parent, text_widget, font, bg, fg, **kwargs):
+        super().__init__(parent, bg=bg, highlightthickness=0, bd=0, **kwargs)
+        self.text = text_widget
+        self.fg = fg
+        self.font = tkfont.Font(font=font)
+        self.digit_width = self.font.measure('0')
+        self.digits = 0
+        self.redraw_pending = None
+        self.set_digits(1)
+        
+    def set_digits(self, digits):
+        """Resize the gutter only when the widest line number changes"""
+        digits = max(digits, 3)
+        if digits != self.digits:
+            self.digits = digits
+            self.config(width=digits * self.digit_width + 20)
+    
+    def schedule_redraw(self, event=None):
+        """Coalesce bursts of scroll and edit events into a single redraw"""
+        if self.redraw_pending is None:
+            self.redraw_pending = self.after_idle(self.redraw)
+    
+    def redraw(self):
+        """Draw numbers for the lines currently in the viewport"""
+        self.redraw_pending = None
+        self.delete('all')
+        
+        # Tk keeps the line count in its text B-tree, so this is not a buffer scan
+        line_count = int(self.text.index('end-1c').split('.')[0])
+        self.set_digits(len(str(line_count)))
+        
+        right = self.digits * self.digit_width + 10
+        index = self.text.index('@0,0')
+        while True:
+            info = self.text.dlineinfo(index)
+            if info is None:
+                break
+            line = index.split('.')[0]
+            self.create_text(right, info[1], anchor='ne', text=line,
+                             fill=self.fg, font=self.font)
+            next_index = self.text.index(f"{index}+1line")
+            if next_index == index:
+                break
+            index = next_index
+
+
 class VSCodeButton(tk.Canvas):
     """VS Code style button with smooth hover animation"""
     def __init__(self, parent, text, command, icon="", bg_color="#0E639C", **kwargs):
@@ -175,13 +240,31 @@ class VSCodeButton(tk.Canvas):
 class CompilerInterface:
     """VS Code styled compiler interface"""
     
-    def __init__(self, window):
+    # Files above this size are opened in large-file mode
+    LARGE_FILE_THRESHOLD = 2 * 1024 * 1024
+    LOAD_CHUNK_SIZE = 256 * 1024
+    # How often a compile requested before the compiler is built checks for it
+    COMPILER_POLL_MS = 20
+    
+    def __init__(self, window, defer=True):
+        """
+        Args:
+            window: Root Tk window
+            defer: Build the compiler on a background thread and each output
+                   pane when its tab is first shown, so the first frame only
+                   waits for the editor (False builds everything here)
+        """
         self.window = window
         self.window.title("Mini Compiler by Yeakin Iqra")
         self.window.geometry("1400x800")
         
         self.current_file = None
         self.file_modified = False
+        self.large_file = False
+        self.load_job = None
+        self.load_file = None  # File being read by a chunked load
+        self.highlight_job = None
+        self.compile_job = None
         
         self.colors = {
             'bg': '#1E1E1E',
@@ -200,13 +283,66 @@ class CompilerInterface:
         
         self.window.configure(bg=self.colors['bg'])
         
-        self.scanner = TokenScanner()
-        self.scanner.initialize()
-        self.processor = SyntaxProcessor()
-        self.processor.initialize()
-        self.translator = AssemblyTranslator()
+        # Set from compiler_build once it is done (see compiler_ready)
+        self.incremental = None
+        if defer:
+            executor = ThreadPoolExecutor(1)
+            self.compiler_build = executor.submit(self.build_compiler)
+            executor.shutdown(wait=False)
+        else:
+            self.compiler_build = Future()
+            self.compiler_build.set_result(self.build_compiler())
+        self.session = None
         
         self.build_interface()
+        if not defer:
+            for view in self.tab_views:
+                self.ensure_view(view)
+    
+    @staticmethod
+    def build_compiler():
+        """Import the compiler and build its lexer and LALR tables (thread-safe)"""
+        from compiler import Compiler
+        from incremental import IncrementalCompiler
+        # Keeps the last compiled source split by statement, so a recompile
+        # after an edit only parses the statements that changed
+        return IncrementalCompiler(Compiler())
+    
+    def compiler_ready(self):
+        """
+        Take the compiler from the background build once it is done
+        
+        A failed build is shown in the Problems pane and the compiler is
+        built again here, in the event loop; if that fails too, the next
+        Run tries once more.
+        
+        Returns:
+            bool: True if self.incremental can be used
+        """
+        if self.incremental is None and self.compiler_build.done():
+            error = self.compiler_build.exception()
+            if error is None:
+                self.incremental = self.compiler_build.result()
+                return True
+            self.show_build_error(error)
+            self.compiler_build = Future()
+            try:
+                self.incremental = self.build_compiler()
+                self.compiler_build.set_result(self.incremental)
+            except Exception as e:
+                self.compiler_build.set_exception(e)
+                self.show_build_error(e)
+        return self.incremental is not None
+    
+    def show_build_error(self, error):
+        """Show a failed compiler build in the Problems pane"""
+        pane = self.ensure_view('err_view')
+        pane.delete('1.0', tk.END)
+        pane.insert('end', "❌ ", 'error_icon')
+        pane.insert('end', f"Failed to build the compiler: {error}\n\n", 'error_text')
+        self.session = None
+        self.rendered_views = set()
+        self.output_tabs.select(self.tab_frames['err_view'])
         
     def build_interface(self):
         self.create_activity_bar()
@@ -279,6 +415,14 @@ class CompilerInterface:
         VSCodeButton(right_frame, "Save", self.save_file,
                     icon="💾", bg_color="#3C3C3C", width=80).pack(side=tk.LEFT, padx=5)
         
+        self.opt_level = tk.StringVar(value="-O0")
+        opt_menu = tk.OptionMenu(right_frame, self.opt_level, "-O0", "-O1", "-O2")
+        opt_menu.config(font=('Segoe UI', 9), bg="#3C3C3C", fg=self.colors['text'], bd=0,
+                        highlightthickness=0, activebackground="#505050",
+                        activeforeground=self.colors['text'])
+        opt_menu['menu'].config(bg="#3C3C3C", fg=self.colors['text'])
+        opt_menu.pack(side=tk.LEFT, padx=5)
+        
         VSCodeButton(right_frame, "Run", self.run_compilation, 
                     icon="▶", bg_color="#0E639C", width=80).pack(side=tk.LEFT, padx=5)
         
@@ -303,11 +447,8 @@ class CompilerInterface:
         editor_container = tk.Frame(parent, bg=self.colors['editor'])
         editor_container.pack(fill=tk.BOTH, expand=True)
         
-        self.line_numbers = tk.Text(editor_container, width=4, 
-                                    bg=self.colors['editor'], fg=self.colors['text_dim'],
-                                    font=('Consolas', 10), state='disabled',
-                                    relief='flat', bd=0, padx=10, pady=10)
-        self.line_numbers.pack(side=tk.LEFT, fill=tk.Y)
+        gutter_slot = tk.Frame(editor_container, bg=self.colors['editor'])
+        gutter_slot.pack(side=tk.LEFT, fill=tk.Y)
         
         sep = tk.Frame(editor_container, bg=self.colors['border'], width=1)
         sep.pack(side=tk.LEFT, fill=tk.Y)
@@ -323,6 +464,22 @@ class CompilerInterface:
                                                     undo=True)
         self.code_input.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
+        self.line_numbers = LineNumberGutter(gutter_slot, self.code_input,
+                                             font=('Consolas', 10),
+                                             bg=self.colors['editor'],
+                                             fg=self.colors['text_dim'])
+        self.line_numbers.pack(fill=tk.Y, expand=True)
+        
+        # Redraw the gutter whenever the viewport moves, not on a full rebuild
+        scrollbar = self.code_input.vbar
+        def on_text_scroll(first, last):
+            scrollbar.set(first, last)
+            self.line_numbers.schedule_redraw()
+            if self.large_file:
+                self.schedule_viewport_highlight()
+        self.code_input.config(yscrollcommand=on_text_scroll)
+        self.code_input.bind('<Configure>', self.line_numbers.schedule_redraw, add='+')
+        
         # Initialize syntax highlighter
         self.highlighter = SyntaxHighlighter(self.code_input)
         
@@ -365,7 +522,19 @@ while (counter < 5) {
     def on_key_release(self, event=None):
         """Handle key release for highlighting and line numbers"""
         self.update_line_numbers()
-        self.highlighter.highlight()
+        if self.large_file:
+            self.schedule_viewport_highlight()
+        else:
+            self.highlighter.highlight()
+    
+    def schedule_viewport_highlight(self):
+        """Coalesce scroll and key events into one viewport highlight pass"""
+        if self.highlight_job is None:
+            self.highlight_job = self.window.after_idle(self.run_viewport_highlight)
+    
+    def run_viewport_highlight(self):
+        self.highlight_job = None
+        self.highlighter.highlight_viewport()
         
     def create_output_tabs(self, parent):
         tab_bar = tk.Frame(parent, bg=self.colors['sidebar'], height=35)
@@ -400,11 +569,36 @@ while (counter < 5) {
             ("Problems", "err_view")
         ]
         
+        # Panes are built and filled from self.session when their tab is shown
+        # (render_visible_tab); until then each tab holds an empty frame
+        self.tab_views = [attr for _, attr in tabs]
+        self.tab_frames = {}
+        self.renderers = {
+            'tok_view': self.render_tokens,
+            'var_view': self.render_symbols,
+            'ir_view': self.render_ir,
+            'asm_view': self.render_asm,
+            'err_view': self.render_problems,
+        }
+        self.rendered_views = set()
+        self.output_tabs.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
         for label, attr in tabs:
             frame = tk.Frame(self.output_tabs, bg=self.colors['editor'])
+            self.tab_frames[attr] = frame
+            setattr(self, attr, None)
             self.output_tabs.add(frame, text=label)
-            
-            view = scrolledtext.ScrolledText(frame,
+    
+    def ensure_view(self, attr):
+        """
+        Build an output pane and its highlighter tags the first time it is needed
+        
+        Returns:
+            ScrolledText: The pane
+        """
+        view = getattr(self, attr)
+        if view is None:
+            view = scrolledtext.ScrolledText(self.tab_frames[attr],
                                             font=('Consolas', 9),
                                             bg=self.colors['editor'],
                                             fg=self.colors['text'],
@@ -417,6 +611,7 @@ while (counter < 5) {
             
             # Setup highlighter for each view
             setattr(self, f"{attr}_highlighter", OutputHighlighter(view))
+        return view
             
     def create_status_bar(self):
         status = tk.Frame(self.window, bg=self.colors['statusbar'], height=22)
@@ -435,6 +630,10 @@ while (counter < 5) {
                                      fg='white')
         self.status_label.pack(side=tk.LEFT, padx=5)
         
+        # Shown only while a large file is loading
+        self.load_progress = ttk.Progressbar(left_frame, length=160, maximum=100,
+                                             mode='determinate')
+        
         right_frame = tk.Frame(status, bg=self.colors['statusbar'])
         right_frame.pack(side=tk.RIGHT)
         
@@ -442,13 +641,7 @@ while (counter < 5) {
                 bg=self.colors['statusbar'], fg='white').pack(side=tk.LEFT, padx=10)
         
     def update_line_numbers(self, event=None):
-        line_count = self.code_input.get('1.0', 'end-1c').count('\n') + 1
-        line_numbers_string = '\n'.join(str(i) for i in range(1, line_count + 1))
-        
-        self.line_numbers.config(state='normal')
-        self.line_numbers.delete('1.0', 'end')
-        self.line_numbers.insert('1.0', line_numbers_string)
-        self.line_numbers.config(state='disabled')
+        self.line_numbers.schedule_redraw()
         
     def on_text_modified(self, event=None):
         if self.code_input.edit_modified():
@@ -473,9 +666,15 @@ while (counter < 5) {
         
         if file_path:
             try:
+                self.cancel_load()
+                if os.path.getsize(file_path) > self.LARGE_FILE_THRESHOLD:
+                    self.open_large_file(file_path)
+                    return
+                
                 with open(file_path, 'r', encoding='utf-8') as file:
                     content = file.read()
                 
+                self.large_file = False
                 self.code_input.delete('1.0', tk.END)
                 self.code_input.insert('1.0', content)
                 self.highlighter.highlight()
@@ -487,6 +686,96 @@ while (counter < 5) {
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to open file:\n{str(e)}")
     
+    def open_large_file(self, file_path):
+        """
+        Open a file in large-file mode: insert it in chunks from the event loop,
+        highlight only the viewport and compile straight from the file on disk
+        
+        Args:
+            file_path: Path of the file to load
+        """
+        total = os.path.getsize(file_path)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        
+        self.large_file = True
+        self.current_file = file_path
+        self.code_input.config(undo=False)
+        self.code_input.delete('1.0', tk.END)
+        for tag in self.highlighter.tags:
+            self.code_input.tag_remove(tag, '1.0', tk.END)
+        self.load_progress['value'] = 0
+        self.load_progress.pack(side=tk.LEFT, padx=5)
+        name = os.path.basename(file_path)
+        file = self.load_file = open(file_path, 'rb')
+        
+        def load_chunk():
+            try:
+                data = file.read(self.LOAD_CHUNK_SIZE)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    self.code_input.insert('end-1c', text)
+                
+                if data:
+                    percent = 100 * file.tell() / max(total, 1)
+                    self.load_progress['value'] = percent
+                    self.status_label.config(text=f"Loading {name}... {percent:.0f}%")
+                    self.load_job = self.window.after(1, load_chunk)
+                    return
+            except Exception as e:
+                self.finish_load()
+                messagebox.showerror("Error", f"Failed to open file:\n{str(e)}")
+                return
+            
+            self.finish_load()
+            self.code_input.mark_set('insert', '1.0')
+            self.code_input.see('1.0')
+            self.file_modified = False
+            self.update_title()
+            self.update_line_numbers()
+            self.schedule_viewport_highlight()
+            self.status_label.config(text=f"Opened: {name} (large-file mode)")
+        
+        self.load_job = self.window.after(1, load_chunk)
+    
+    def finish_load(self):
+        """Close the file and restore editor state after a chunked load ends"""
+        if self.load_file is not None:
+            self.load_file.close()
+            self.load_file = None
+        self.load_job = None
+        self.load_progress.pack_forget()
+        self.code_input.edit_modified(False)
+        self.code_input.edit_reset()
+        self.code_input.config(undo=True)
+    
+    def cancel_load(self):
+        """Stop an in-progress chunked load"""
+        if self.load_job is not None:
+            self.window.after_cancel(self.load_job)
+        if self.load_job is not None or self.load_file is not None:
+            self.finish_load()
+    
+    def read_source(self):
+        """
+        Get the source to compile
+        
+        In large-file mode an unmodified buffer is decoded straight from a
+        read-only map of the file on disk rather than copied out of the Text
+        widget, so the only copy made is the str itself.
+        
+        Returns:
+            str: Source code
+        """
+        if self.large_file and not self.file_modified and self.current_file:
+            with open(self.current_file, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return ''
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    code = str(mapped, 'utf-8')
+            # Newlines as text mode reads them (replace returns code itself when there are none)
+            return code.replace('\r\n', '\n').replace('\r', '\n')
+        return self.code_input.get('1.0', tk.END)
+    
     def save_file(self):
         if not self.current_file:
             self.save_file_as()
@@ -524,29 +813,73 @@ while (counter < 5) {
                 messagebox.showerror("Error", f"Failed to save file:\n{str(e)}")
         
     def run_compilation(self):
+        if self.load_job is not None:
+            self.status_label.config(text="⏳ Still loading file...")
+            return
+        
+        if not self.compiler_ready():
+            if self.compiler_build.done():
+                # The build failed again; the error is in the Problems pane
+                self.status_label.config(text="❌ Compiler failed to build")
+                return
+            # The tables are still being built: compile as soon as they are
+            self.status_label.config(text="⏳ Preparing compiler...")
+            if self.compile_job is None:
+                self.compile_job = self.window.after(self.COMPILER_POLL_MS, self.run_pending_compilation)
+            return
+        
         self.status_label.config(text="⏳ Compiling...")
         self.window.update()
         
-        src = self.code_input.get('1.0', tk.END)
+        src = self.read_source()
         
-        for view in ['tok_view', 'var_view', 'ir_view', 'asm_view', 'err_view']:
-            getattr(self, view).delete('1.0', tk.END)
+        session = self.incremental.compile(src, opt_level=int(self.opt_level.get()[-1]))
+        self.session = session
         
-        self.processor.registry.clear()
-        
-        # Tokens with colors
-        tokens, lex_errs = self.scanner.scan(src)
+        # Every pane now shows an older compile; only the visible one is redrawn here
+        self.rendered_views = set()
+        self.render_visible_tab()
         
+        all_errs = session.all_issues()
+        if all_errs:
+            self.status_label.config(text=f"❌ {len(all_errs)} problem(s)")
+        else:
+            stats = self.incremental.stats
+            detail = "" if stats['full'] else f" (reparsed {stats['reparsed']} of {stats['statements']} statements)"
+            checks = session.bounds_checks
+            if checks['emitted']:
+                detail += f", {checks['eliminated']} of {checks['emitted']} bounds checks eliminated"
+            self.status_label.config(text=f"✓ Build successful{detail}")
+    
+    def run_pending_compilation(self):
+        self.compile_job = None
+        self.run_compilation()
+    
+    def on_tab_changed(self, event=None):
+        self.render_visible_tab()
+    
+    def render_visible_tab(self):
+        """Fill the selected output pane from the last compile, unless it already shows it"""
+        view = self.tab_views[self.output_tabs.index('current')]
+        pane = self.ensure_view(view)
+        if self.session is None or view in self.rendered_views:
+            return
+        pane.delete('1.0', tk.END)
+        self.renderers[view](self.session)
+        self.rendered_views.add(view)
+    
+    def render_tokens(self, session):
+        """Tokens with colors"""
         self.tok_view.insert('1.0', f"{'TYPE':<18} {'VALUE':<18} {'LINE':<8}\n", 'header')
         self.tok_view.insert('end', "─" * 50 + "\n", 'separator')
         
-        for tok in tokens:
+        for tok in session.token_stream:
             kind = tok['kind']
             val = str(tok['val'])
             ln = str(tok['ln'])
             
             # Apply colors based on token type
-            if kind in ['KEYWORD', 'IF', 'ELSE', 'WHILE', 'INT']:
+            if kind in ['KEYWORD', 'IF', 'ELSE', 'WHILE', 'FOR', 'INT', 'INPUT']:
                 self.tok_view.insert('end', f"{kind:<18} ", 'keyword_token')
             elif kind in ['NUMBER', 'NUM']:
                 self.tok_view.insert('end', f"{kind:<18} ", 'number_token')
@@ -559,14 +892,13 @@ while (counter < 5) {
             
             self.tok_view.insert('end', f"{val:<18} ")
             self.tok_view.insert('end', f"{ln:<8}\n", 'line_num')
-        
-        # Symbols with colors
-        self.processor.process(src)
-        
+    
+    def render_symbols(self, session):
+        """Symbols with colors"""
         self.var_view.insert('1.0', f"{'IDENTIFIER':<18} {'TYPE':<10} {'VALUE':<10} {'SCOPE':<18} {'LEVEL':<8}\n", 'header')
         self.var_view.insert('end', "─" * 70 + "\n", 'separator')
         
-        for entry in self.processor.registry.all_entries():
+        for entry in session.registry.all_entries():
             val_str = str(entry['val']) if entry['val'] is not None else 'None'
             
             self.var_view.insert('end', f"{entry['id']:<18} ", 'identifier_token')
@@ -574,52 +906,23 @@ while (counter < 5) {
             self.var_view.insert('end', f"{val_str:<10} ", 'value')
             self.var_view.insert('end', f"{entry['scope']:<18} ", 'scope')
             self.var_view.insert('end', f"{entry['scope_level']:<8}\n", 'line_num')
-        
-        # IR Code with colors
-        for idx, instr in enumerate(self.processor.ir_instructions):
-            op = instr['op']
-            s1 = instr['src1']
-            s2 = instr['src2']
-            d = instr['dst']
-            
-            self.ir_view.insert('end', f"{idx:3}: ", 'ir_index')
-            
-            if op == 'assign':
-                self.ir_view.insert('end', f" {d} ", 'ir_var')
-                self.ir_view.insert('end', "= ", 'ir_op')
-                if str(s1).isdigit():
-                    self.ir_view.insert('end', f"{s1}\n", 'ir_num')
-                else:
-                    self.ir_view.insert('end', f"{s1}\n", 'ir_var')
-            elif op in ['+', '-', '*', '/', '%']:
-                self.ir_view.insert('end', f" {d} ", 'ir_var')
-                self.ir_view.insert('end', "= ", 'ir_op')
-                self.ir_view.insert('end', f"{s1} ", 'ir_var')
-                self.ir_view.insert('end', f"{op} ", 'ir_op')
-                self.ir_view.insert('end', f"{s2}\n", 'ir_var')
-            elif op in ['<', '<=', '>', '>=', '==', '!=']:
-                self.ir_view.insert('end', f" {d} ", 'ir_var')
-                self.ir_view.insert('end', "= ", 'ir_op')
-                self.ir_view.insert('end', f"{s1} ", 'ir_var')
-                self.ir_view.insert('end', f"{op} ", 'ir_op')
-                self.ir_view.insert('end', f"{s2}\n", 'ir_var')
-            elif op == 'mark':
-                self.ir_view.insert('end', f"\n{s1}:\n", 'ir_label')
-            elif op == 'jump':
-                self.ir_view.insert('end', " goto ", 'ir_op')
-                self.ir_view.insert('end', f"{s1}\n", 'ir_label')
-            elif op == 'jump_if_false':
-                self.ir_view.insert('end', " if !", 'ir_op')
-                self.ir_view.insert('end', f"{s1} ", 'ir_var')
-                self.ir_view.insert('end', "goto ", 'ir_op')
-                self.ir_view.insert('end', f"{s2}\n", 'ir_label')
-            elif op == 'output':
-                self.ir_view.insert('end', " print ", 'ir_op')
-                self.ir_view.insert('end', f"{s1}\n", 'ir_var')
-        
-        # Assembly with colors
-        asm = self.translator.translate(self.processor.ir_instructions)
-        for line in asm:
+    
+    def render_ir(self, session):
+        """IR Code with colors (optimized loops are annotated above their header label)"""
+        comments = loop_comments(session.loop_stats)
+        for idx, instr in enumerate(session.ir_instructions):
+            for text, tag in ir_segments(idx, instr, comments):
+                self.ir_view.insert('end', text, tag)
+        for function in session.functions.values():
+            self.ir_view.insert('end', f"\n{function_title(function)}:\n", 'ir_label')
+            comments = loop_comments(function['loop_stats'])
+            for idx, instr in enumerate(function['ir']):
+                for text, tag in ir_segments(idx, instr, comments):
+                    self.ir_view.insert('end', text, tag)
+    
+    def render_asm(self, session):
+        """Assembly with colors"""
+        for line in session.asm:
             line = line.strip()
             if not line:
                 self.asm_view.insert('end', "\n")
@@ -645,18 +948,17 @@ while (counter < 5) {
                             else:
                                 self.asm_view.insert('end', token)
                     self.asm_view.insert('end', "\n")
-        
-        # Errors with colors
-        all_errs = lex_errs + self.processor.issues
+    
+    def render_problems(self, session):
+        """Errors with colors"""
+        all_errs = session.all_issues()
         if all_errs:
-            for idx, err in enumerate(all_errs, 1):
+            for err in all_errs:
                 self.err_view.insert('end', "❌ ", 'error_icon')
                 self.err_view.insert('end', f"{err}\n\n", 'error_text')
-            self.status_label.config(text=f"❌ {len(all_errs)} problem(s)")
         else:
             self.err_view.insert('end', "✓ ", 'success_icon')
             self.err_view.insert('end', "No problems detected")
-            self.status_label.config(text="✓ Build successful")
         
     def reset_all(self):
         if self.file_modified:
@@ -669,11 +971,20 @@ while (counter < 5) {
             elif response is None:
                 return
         
+        self.cancel_load()
+        if self.compile_job is not None:
+            self.window.after_cancel(self.compile_job)
+            self.compile_job = None
+        self.large_file = False
         self.code_input.delete('1.0', tk.END)
-        for view in ['tok_view', 'var_view', 'ir_view', 'asm_view', 'err_view']:
-            getattr(self, view).delete('1.0', tk.END)
-        
-        self.processor.registry.clear()
+        for view in self.tab_views:
+            if getattr(self, view) is not None:
+                getattr(self, view).delete('1.0', tk.END)
+        
+        self.session = None
+        self.rendered_views = set()
+        if self.incremental is not None:
+            self.incremental.reset()
         self.current_file = None
         self.file_modified = False
         self.update_title()
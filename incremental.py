@@ -0,0 +1,752 @@
+import argparse
+import random
+import re
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from collections import ChainMap
+from collections.abc import Sequence
+from itertools import accumulate
+
+from bounds import count_checks
+from code_generator import EPILOGUE, PROLOGUE, REGISTERS, AssemblyTranslator
+from compiler import Compiler
+from session import CompileSession
+from workloads import generate_program
+
+
+# A statement whose text hashes to 0 under this mask ends a StatementBlock
+BLOCK_MASK = 31
+# Statements after which a block ends whatever their hashes
+MAX_BLOCK = 4 * (BLOCK_MASK + 1)
+
+
+class StatementFragment:
+    """
+    Front-end results of one top-level statement, parsed on its own
+
+    The text runs from just after the previous statement to just after this
+    one, so it starts with the whitespace and comments in between. Tokens,
+    lines, temps and labels are numbered from the start of the fragment;
+    place_names() and place_issues() shift them to where the fragment sits
+    in the program and translate() gives its assembly there.
+    """
+
+    def __init__(self, text, env):
+        self.text = text
+        self.env = env  # (name, dtype) of the globals it mentions that were declared before it
+        # A function's dtype is (return type, parameters), so callers are checked again when it changes
+        self.nlines = text.count('\n')
+        self.ends_block = hash(text) & BLOCK_MASK == 0
+        self.tokens = []
+        self.ids = frozenset()  # Identifiers it mentions
+        self.stmts = []
+        self.ir = []
+        self.entries = []  # Symbol entries it adds
+        self.declares = []  # (name, dtype) of the globals it adds
+        self.inputs = []
+        self.functions = {}  # Functions it defines (their temps and labels are their own)
+        self.lex_issues = []
+        self.issues = []
+        self.syntax_errors = 0
+        self.n_temps = 0
+        self.n_labels = 0
+        self.checks = 0  # Bounds checks in its IR
+        self.operands = ()  # Names its IR mentions besides its temps
+        self.names_key = self.names_placed = None
+        self.issues_key = self.issues_placed = None
+        self.asm_key = self.asm = None
+        self.asm_regs = []  # (variable, register) for the variables its assembly gives a register first
+        self.asm_allocs = 0  # Registers its assembly hands out
+
+    def place_names(self, tmp_base, lbl_base):
+        """
+        Get the fragment's AST, IR and symbol entries with its temps and
+        labels numbered after those of the statements before it
+
+        Args:
+            tmp_base: Temps used by the statements before it
+            lbl_base: Labels used by the statements before it
+
+        Returns:
+            tuple: (stmts, ir, entries)
+        """
+        if self.names_key != (tmp_base, lbl_base):
+            self.names_key = (tmp_base, lbl_base)
+            if tmp_base or lbl_base:
+                names = {f"temp{n}": f"temp{n + tmp_base}" for n in range(1, self.n_temps + 1)}
+                names.update((f"Label{n}", f"Label{n + lbl_base}") for n in range(1, self.n_labels + 1))
+                rename = lambda x: names.get(x, x) if isinstance(x, str) else x
+                self.names_placed = (
+                    [rename_tree(stmt, rename) for stmt in self.stmts],
+                    [{'op': instr['op'], 'src1': rename(instr['src1']), 'src2': rename(instr['src2']),
+                      'dst': rename(instr['dst'])} for instr in self.ir],
+                    [dict(entry, val=rename(entry['val'])) for entry in self.entries])
+            else:
+                self.names_placed = (self.stmts, self.ir, self.entries)
+        return self.names_placed
+
+    def place_issues(self, line):
+        """
+        Get the fragment's diagnostics with line numbers in the program
+
+        Returns:
+            tuple: (lex_issues, issues)
+        """
+        if self.issues_key != line:
+            self.issues_key = line
+            self.issues_placed = ([shift_lines(issue, line - 1) for issue in self.lex_issues],
+                                  [shift_lines(issue, line - 1) for issue in self.issues])
+        return self.issues_placed
+
+    def translate(self, regs, allocs):
+        """
+        Get the assembly of the IR from the last place_names()
+
+        A full translation hands out registers round-robin in order of
+        first use over the whole program, so the assembly depends only on
+        the labels before the fragment, on how many registers were handed
+        out before it (modulo their number) and on those its variables
+        already have; temps never appear in it. It is translated again
+        only when one of these changes.
+
+        Args:
+            regs: Variable -> register for the statements before it (the
+                  fragment's new variables are added)
+            allocs: Registers handed out before it
+
+        Returns:
+            tuple: (assembly lines, registers handed out by the fragment)
+        """
+        key = (self.names_key[1], allocs % len(REGISTERS), tuple(map(regs.get, self.operands)))
+        if key != self.asm_key:
+            translator = AssemblyTranslator()
+            # Registers it hands out go to the first map, the earlier ones are only read
+            translator.reg_alloc = ChainMap({}, regs)
+            translator.reg_idx = allocs
+            self.asm = list(translator.translate_body(self.names_placed[1]))
+            added = translator.reg_alloc.maps[0]
+            self.asm_regs = [(name, added[name]) for name in self.operands if name in added]
+            self.asm_allocs = len(added)
+            self.asm_key = key
+        regs.update(self.asm_regs)
+        return self.asm, self.asm_allocs
+
+
+class StatementBlock:
+    """
+    A run of consecutive fragments with their results joined
+
+    A block ends after a statement whose text hashes to 0 under BLOCK_MASK
+    (or after MAX_BLOCK statements), so an edit only changes the blocks it
+    touches and the others keep their joined lists: joining a program
+    costs time per block rather than per statement. Blocks are placed and
+    translated like fragments, each part again only when what it depends
+    on moves.
+    """
+
+    def __init__(self, fragments, starts):
+        """
+        Args:
+            fragments: Its StatementFragments, in order
+            starts: Offset of each one in the source
+        """
+        self.fragments = fragments
+        self.nlines = sum(frag.nlines for frag in fragments)
+        self.n_temps = sum(frag.n_temps for frag in fragments)
+        self.n_labels = sum(frag.n_labels for frag in fragments)
+        self.checks = sum(frag.checks for frag in fragments)
+        self.syntax_errors = sum(frag.syntax_errors for frag in fragments)
+        self.inputs = [entry for frag in fragments for entry in frag.inputs]
+        self.functions = {name: function for frag in fragments for name, function in frag.functions.items()}
+        self.operands = tuple(dict.fromkeys(name for frag in fragments for name in frag.operands))
+        # Tokens numbered from the start of the block
+        self.tokens = []
+        line = 1
+        for frag, start in zip(fragments, starts):
+            self.tokens += [ProgramTokens.shift(tok, start - starts[0], line) for tok in frag.tokens]
+            line += frag.nlines
+        self.names_key = self.names_placed = None
+        self.issues_key = self.issues_placed = None
+        self.asm_key = self.asm = None
+        self.asm_regs = []
+        self.asm_allocs = 0
+
+    def place_names(self, tmp_base, lbl_base):
+        """
+        Get the joined AST, IR and symbol entries (see StatementFragment.place_names)
+
+        Returns:
+            tuple: (stmts, ir, entries, global entries)
+        """
+        if self.names_key != (tmp_base, lbl_base):
+            self.names_key = (tmp_base, lbl_base)
+            stmts, ir, entries = [], [], []
+            for frag in self.fragments:
+                frag_stmts, frag_ir, frag_entries = frag.place_names(tmp_base, lbl_base)
+                stmts += frag_stmts
+                ir += frag_ir
+                entries += frag_entries
+                tmp_base += frag.n_temps
+                lbl_base += frag.n_labels
+            self.names_placed = (stmts, ir, entries, [entry for entry in entries if entry['scope_level'] == 0])
+        return self.names_placed
+
+    def place_issues(self, line):
+        """
+        Get the joined diagnostics with line numbers in the program
+
+        Returns:
+            tuple: (lex_issues, issues)
+        """
+        if self.issues_key != line:
+            self.issues_key = line
+            lex_issues, issues = [], []
+            for frag in self.fragments:
+                frag_lex_issues, frag_issues = frag.place_issues(line)
+                lex_issues += frag_lex_issues
+                issues += frag_issues
+                line += frag.nlines
+            self.issues_placed = (lex_issues, issues)
+        return self.issues_placed
+
+    def translate(self, regs, allocs):
+        """
+        Get the joined assembly of the IR from the last place_names()
+        (see StatementFragment.translate)
+
+        Returns:
+            tuple: (assembly lines, registers handed out by the block)
+        """
+        key = (self.names_key[1], allocs % len(REGISTERS), tuple(map(regs.get, self.operands)))
+        if key != self.asm_key:
+            block_regs = ChainMap({}, regs)
+            asm, added = [], 0
+            for frag in self.fragments:
+                lines, frag_added = frag.translate(block_regs, allocs + added)
+                asm += lines
+                added += frag_added
+            self.asm = asm
+            self.asm_regs = list(block_regs.maps[0].items())
+            self.asm_allocs = added
+            self.asm_key = key
+        regs.update(self.asm_regs)
+        return self.asm, self.asm_allocs
+
+
+class ProgramTokens(Sequence):
+    """
+    Token stream of a program, read from its blocks' own tokens
+
+    A token's offset and line are shifted to the program when it is read,
+    so an edit that moves every statement below it costs nothing here.
+    Compares equal to a list of the same token dicts.
+    """
+
+    def __init__(self, blocks, starts, lines):
+        """
+        Args:
+            blocks: StatementBlocks in program order
+            starts: Offset of each block in the source
+            lines: Line each block starts on
+        """
+        self.parts = [(block.tokens, start, line) for block, start, line in zip(blocks, starts, lines)
+                      if block.tokens]
+        self.ends = list(accumulate(len(tokens) for tokens, _, _ in self.parts))
+
+    @staticmethod
+    def shift(tok, start, line):
+        return {'kind': tok['kind'], 'val': tok['val'], 'ln': tok['ln'] + line - 1, 'pos': tok['pos'] + start}
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[idx] for idx in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        part = bisect_right(self.ends, index)
+        tokens, start, line = self.parts[part]
+        return self.shift(tokens[index - (self.ends[part - 1] if part else 0)], start, line)
+
+    def __iter__(self):
+        for tokens, start, line in self.parts:
+            for tok in tokens:
+                yield self.shift(tok, start, line)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+
+def rename_tree(node, rename):
+    """Apply rename to every leaf of an AST node"""
+    if isinstance(node, (tuple, list)):
+        return type(node)(rename_tree(child, rename) for child in node)
+    return rename(node)
+
+
+LINE_PATTERN = re.compile(r'\bline (\d+)')
+
+
+def shift_lines(message, offset):
+    """Move the line numbers in a diagnostic by offset"""
+    if not offset:
+        return message
+    return LINE_PATTERN.sub(lambda m: f"line {int(m.group(1)) + offset}", message)
+
+
+def common_prefix(a, b):
+    """Length of the longest common prefix of two strings (C-speed comparisons)"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a.startswith(b[lo:mid], lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix(a, b, limit):
+    """Length of the longest common suffix of two strings, at most limit"""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a.endswith(b[len(b) - mid:len(b) - lo], 0, len(a) - lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class IncrementalCompiler:
+    """
+    Recompiles a changing source, reparsing only the statements that changed
+
+    The previous source is kept split into top-level statements. After an
+    edit, lexing restarts at the statement before the first changed
+    character and stops at the first statement boundary past the edit that
+    was also a boundary before it. Each new statement is parsed on its own
+    with the globals declared above it, so its temps and labels are local;
+    unchanged statements keep their parse and are only renumbered. A
+    statement is parsed again when a global it mentions is declared or
+    removed above it, which re-runs its undefined-variable and
+    redeclaration checks.
+
+    Programs with syntax errors are compiled in full, so error recovery
+    reports what Compiler.compile reports. Statements are joined in
+    blocks (see StatementBlock). Without optimization, main's assembly is
+    joined from each statement's cached translation, so only the
+    statements whose IR or register context changed are translated
+    again; optimized programs go through Compiler.finish, since the passes
+    work on the whole program. One instance follows one document and is
+    not thread-safe; it shares the compiler's tables.
+    """
+
+    def __init__(self, compiler=None):
+        self.compiler = compiler if compiler is not None else Compiler()
+        self.reset()
+
+    def reset(self):
+        """Forget the previous source"""
+        self.code = ''
+        self.fragments = []
+        self.starts = []
+        self.blocks = []
+        self.block_starts = []
+        self.stats = {}
+
+    def compile(self, code, opt_level=None, print_after=(), profile=None, asm=True):
+        """
+        Compile code, reusing what is unchanged since the previous call
+
+        Takes the same options as Compiler.compile.
+
+        Returns:
+            CompileSession: The same results a full compile produces
+        """
+        started = time.perf_counter()
+        reparsed = self.update(code)
+        full = not self.fragments or any(block.syntax_errors for block in self.blocks)
+        if full:
+            session = CompileSession(code)
+            self.compiler.processor.process(code, session)
+        else:
+            session = self.assemble(code)
+        self.stats = {'statements': len(self.fragments), 'reparsed': reparsed, 'full': full,
+                      'front_end_ms': (time.perf_counter() - started) * 1000}
+        if full or (self.compiler.opt_level if opt_level is None else opt_level) > 0:
+            return self.compiler.finish(session, opt_level, print_after, profile, asm)
+        return self.finish_unoptimized(session, asm)
+
+    def finish_unoptimized(self, session, asm=True):
+        """
+        Do what Compiler.finish does at -O0 for an assembled session
+
+        Returns:
+            CompileSession: The same session, with assembly
+        """
+        checks = sum(block.checks for block in self.blocks) + sum(
+            count_checks(function['ir']) for function in session.functions.values())
+        if session.functions:
+            self.compiler.function_backend.run(session, 0)
+        session.bounds_checks = {'emitted': checks, 'eliminated': 0, 'remaining': checks}
+        if asm:
+            session.asm = list(PROLOGUE)
+            regs, allocs = {}, 0
+            for block in self.blocks:
+                lines, added = block.translate(regs, allocs)
+                session.asm += lines
+                allocs += added
+            session.asm += EPILOGUE
+            for function in session.functions.values():
+                session.asm.append("")
+                session.asm += function['asm']
+        return session
+
+    def front_end(self, code):
+        """
+        Parse code like compile() does, without optimizing or translating it
+
+        A statement with a syntax error keeps the errors it reports when
+        parsed on its own instead of forcing a full reparse, so a half-typed
+        statement costs no more than any other edit. Error recovery can
+        then differ from Compiler.compile after the first error.
+
+        Returns:
+            CompileSession: Tokens, symbols, IR and issues of code
+        """
+        started = time.perf_counter()
+        reparsed = self.update(code)
+        if self.fragments:
+            session = self.assemble(code)
+        else:
+            session = CompileSession(code)
+            self.compiler.processor.process(code, session)
+        self.stats = {'statements': len(self.fragments), 'reparsed': reparsed, 'full': not self.fragments,
+                      'front_end_ms': (time.perf_counter() - started) * 1000}
+        return session
+
+    def issues(self, code):
+        """
+        Get what front_end(code).all_issues() returns, without assembling
+        the rest of the session (which is linear in the program's size)
+
+        Returns:
+            list: Lexical issues, then syntax and semantic issues
+        """
+        started = time.perf_counter()
+        reparsed = self.update(code)
+        if not self.fragments:
+            return self.front_end(code).all_issues()
+        lex_issues, issues = [], []
+        line = 1
+        for block in self.blocks:
+            block_lex_issues, block_issues = block.place_issues(line)
+            lex_issues += block_lex_issues
+            issues += block_issues
+            line += block.nlines
+        self.stats = {'statements': len(self.fragments), 'reparsed': reparsed, 'full': False,
+                      'front_end_ms': (time.perf_counter() - started) * 1000}
+        return lex_issues + issues
+
+    def update(self, code):
+        """
+        Split code into statements, reusing the unchanged ones
+
+        Returns:
+            int: Number of statements parsed by this call
+        """
+        old, fragments, starts = self.code, self.fragments, self.starts
+        if code == old:
+            return 0
+        prefix = common_prefix(old, code)
+        suffix = common_suffix(old, code, min(len(old), len(code)) - prefix)
+        delta = len(code) - len(old)
+        first = max(bisect_left(starts, prefix) - 1, 0)
+
+        while True:
+            # Boundaries of the new statements from the start of fragment `first`
+            region_start = starts[first] if fragments else 0
+            ends, resume = [], len(fragments)
+            trailing = False
+            for end, has_tokens in self.boundaries(code, region_start):
+                if not has_tokens:
+                    trailing = True
+                    break
+                ends.append(end)
+                if end >= len(code) - suffix:
+                    j = bisect_left(starts, end - delta)
+                    if j < len(starts) and starts[j] == end - delta:
+                        resume = j
+                        break
+            if trailing and ends:
+                # Comments and blanks after the last statement belong to it
+                ends[-1] = len(code)
+            elif trailing and first > 0:
+                first -= 1
+                continue
+            break
+
+        texts, pos = [], region_start
+        for end in ends:
+            texts.append(code[pos:end])
+            pos = end
+        new_starts = starts[:first]
+        pos = region_start
+        for text in texts:
+            new_starts.append(pos)
+            pos += len(text)
+        new_starts += [start + delta for start in starts[resume:]]
+
+        self.code = code
+        self.starts = new_starts
+        self.fragments = fragments[:first] + [StatementFragment(text, None) for text in texts] + fragments[resume:]
+        removed = fragments[first:resume]
+        parsed = self.refresh_envs({frag.text: frag for frag in removed},
+                                   {name for frag in removed for name, _ in frag.declares})
+        self.regroup()
+        return parsed
+
+    def refresh_envs(self, reuse, dirty):
+        """
+        Parse the new fragments and those whose visible globals changed
+
+        Args:
+            reuse: Parsed fragments by text, for statements that moved
+            dirty: Globals whose declarations may have changed
+
+        Returns:
+            int: Number of statements parsed
+        """
+        declared = {}
+        parsed = 0
+        for idx, frag in enumerate(self.fragments):
+            if frag.env is None:
+                old = reuse.pop(frag.text, None)
+                if old is not None and old.env == frozenset(
+                        (name, declared[name]) for name in old.ids if name in declared):
+                    frag = self.fragments[idx] = old
+                else:
+                    frag = self.fragments[idx] = self.parse(frag.text, declared)
+                    parsed += 1
+                dirty.update(name for name, _ in frag.declares)
+            elif not frag.ids.isdisjoint(dirty):
+                env = frozenset((name, declared[name]) for name in frag.ids if name in declared)
+                if env != frag.env:
+                    dirty.update(name for name, _ in frag.declares)
+                    frag = self.fragments[idx] = self.parse(frag.text, declared)
+                    dirty.update(name for name, _ in frag.declares)
+                    parsed += 1
+            for name, dtype in frag.declares:
+                declared.setdefault(name, dtype)
+        return parsed
+
+    def regroup(self):
+        """Group the fragments into blocks, keeping the blocks whose fragments are unchanged"""
+        old = {tuple(block.fragments): block for block in self.blocks}
+        self.blocks, self.block_starts = [], []
+        first = 0
+        for idx, frag in enumerate(self.fragments, 1):
+            if frag.ends_block or idx - first == MAX_BLOCK or idx == len(self.fragments):
+                fragments = tuple(self.fragments[first:idx])
+                block = old.get(fragments)
+                if block is None:
+                    block = StatementBlock(fragments, self.starts[first:idx])
+                self.blocks.append(block)
+                self.block_starts.append(self.starts[first])
+                first = idx
+
+    def parse(self, text, declared):
+        """
+        Parse one statement with the globals declared before it
+
+        Args:
+            text: Statement source
+            declared: Global name -> dtype for the statements above it
+
+        Returns:
+            StatementFragment: Results numbered from the start of the statement
+        """
+        session = CompileSession(text)
+        registry = session.registry
+        for name, dtype in declared.items():
+            if not isinstance(dtype, tuple):
+                registry.add(name, dtype, None, context='declaration')
+            elif dtype[0] == 'function':
+                session.declare_function(name, *dtype[1:])
+            else:
+                registry.add(name, dtype[1], dtype[2], context='array')
+        self.compiler.processor.process(text, session)
+
+        frag = StatementFragment(text, None)
+        frag.tokens = session.token_stream
+        frag.ids = frozenset(tok['val'] for tok in frag.tokens if tok['kind'] == 'IDENTIFIER')
+        frag.env = frozenset((name, declared[name]) for name in frag.ids if name in declared)
+        frag.stmts = session.ast[0][1] if session.ast else []
+        frag.ir = session.ir_instructions
+        frag.entries = registry.all_entries()[len(declared):]
+        frag.declares = [(entry['id'], self.declared_type(entry, session))
+                         for entry in frag.entries if entry['scope_level'] == 0]
+        frag.inputs = session.inputs
+        frag.functions = {name: function for name, function in session.functions.items() if name not in declared}
+        frag.lex_issues = session.lex_issues
+        frag.issues = session.issues
+        frag.syntax_errors = session.syntax_errors
+        frag.n_temps = session.tmp_counter
+        frag.n_labels = session.lbl_counter
+        frag.checks = count_checks(frag.ir)
+        temps = {f"temp{n}" for n in range(1, frag.n_temps + 1)}
+        frag.operands = tuple(dict.fromkeys(
+            x for instr in frag.ir for x in (instr['src1'], instr['src2'], instr['dst'])
+            if isinstance(x, str) and x not in temps))
+        return frag
+
+    @staticmethod
+    def declared_type(entry, session):
+        """
+        What statements below see of a global: its dtype, ('function', dtype,
+        params) for a function or ('array', dtype, size) for an array
+        """
+        if entry['ctx'] == 'function':
+            params = tuple(tuple(param) for param in session.functions[entry['id']]['params'])
+            return ('function', entry['dtype'], params)
+        if entry['ctx'] == 'array':
+            return ('array', entry['dtype'], entry['val'])
+        return entry['dtype']
+
+    def assemble(self, code):
+        """Join the placed blocks into one session"""
+        session = CompileSession(code)
+        stmts = []
+        scope = session.registry.scope_stack[0]
+        lines = []
+        line = 1
+        for block in self.blocks:
+            lines.append(line)
+            block_stmts, ir, entries, global_entries = block.place_names(session.tmp_counter,
+                                                                         session.lbl_counter)
+            lex_issues, issues = block.place_issues(line)
+            stmts += block_stmts
+            session.ir_instructions += ir
+            session.registry.all_variables += entries
+            for entry in global_entries:
+                scope.setdefault(entry['id'], entry)
+            session.inputs += block.inputs
+            # Copies: the back end replaces each function's IR with the optimized one
+            session.functions.update((name, dict(function)) for name, function in block.functions.items())
+            session.lex_issues += lex_issues
+            session.issues += issues
+            session.tmp_counter += block.n_temps
+            session.lbl_counter += block.n_labels
+            line += block.nlines
+        session.token_stream = ProgramTokens(self.blocks, self.block_starts, lines)
+        session.ast.append(('program', stmts))
+        return session
+
+    @staticmethod
+    def statement_ends(tokens):
+        """
+        Offsets just after each top-level statement
+
+        A statement ends with ';' outside braces and parentheses, or with the
+        '}' that closes its last block unless 'else' follows.
+        """
+        depth = 0
+        tok = next(tokens, None)
+        while tok is not None:
+            kind = tok.type
+            following = None
+            if kind in ('LBRACE', 'LPAREN'):
+                depth += 1
+            elif kind in ('RBRACE', 'RPAREN'):
+                depth = max(depth - 1, 0)
+            if depth == 0 and kind == 'SEMICOLON':
+                yield tok.lexpos + 1
+            elif depth == 0 and kind == 'RBRACE':
+                following = next(tokens, None)
+                if following is None or following.type != 'ELSE':
+                    yield tok.lexpos + 1
+            tok = following if following is not None else next(tokens, None)
+
+    def boundaries(self, code, start):
+        """
+        Statement ends in code from offset start
+
+        Yields:
+            tuple: (end, True) per statement, then (len(code), False) if only
+                   comments and blanks follow the last one
+        """
+        lexer = self.compiler.scanner.new_lexer(code)
+        lexer.lexpos = start
+        last_end = start
+        for end in self.statement_ends(iter(lexer.token, None)):
+            last_end = end
+            yield end, True
+        if last_end < len(code):
+            # Unterminated statements still get a fragment; they report a syntax error
+            lexer = self.compiler.scanner.new_lexer(code)
+            lexer.lexpos = last_end
+            yield len(code), lexer.token() is not None
+
+
+def edit_number(code, rng):
+    """Replace one integer literal in code with another"""
+    matches = list(re.finditer(r'(?<![\w.])\d+(?![\w.])', code))
+    match = rng.choice(matches)
+    return code[:match.start()] + str(rng.randint(1, 999)) + code[match.end():]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Full vs incremental recompilation after small edits")
+    arg_parser.add_argument('source', nargs='?', help="file to edit (default: a generated program)")
+    arg_parser.add_argument('--statements', type=int, nargs='+', default=[1000, 5000, 20000],
+                            help="sizes of the generated programs")
+    arg_parser.add_argument('--edits', type=int, default=10, help="edits per program")
+    args = arg_parser.parse_args(argv)
+
+    compiler = Compiler()
+    if args.source:
+        with open(args.source, 'r', encoding='utf-8') as file:
+            programs = [(args.source, file.read())]
+    else:
+        programs = [(f"{n} statements", generate_program(n)) for n in args.statements]
+
+    print(f"{'PROGRAM':<18} {'LINES':>7} {'FULL MS':>9} {'INCR MS':>9} {'REPARSED':>9}  OUTPUT")
+    failed = False
+    for name, code in programs:
+        rng = random.Random(0)
+        incremental = IncrementalCompiler(compiler)
+        incremental.compile(code)
+        full_total = incr_total = 0.0
+        reparsed = 0
+        same = True
+        for _ in range(args.edits):
+            code = edit_number(code, rng)
+            start = time.perf_counter()
+            expected = compiler.compile(code)
+            full_total += time.perf_counter() - start
+            start = time.perf_counter()
+            result = incremental.compile(code)
+            incr_total += time.perf_counter() - start
+            reparsed += incremental.stats['reparsed']
+            same = same and all(getattr(result, attr) == getattr(expected, attr) for attr in (
+                'token_stream', 'ir_instructions', 'functions', 'ast', 'inputs', 'lex_issues', 'issues',
+                'asm', 'bounds_checks'))
+            same = same and result.registry.all_entries() == expected.registry.all_entries()
+        failed = failed or not same
+        print(f"{name:<18} {code.count(chr(10)):>7} {full_total * 1000 / args.edits:>9.1f} "
+              f"{incr_total * 1000 / args.edits:>9.1f} {reparsed / args.edits:>9.1f}  "
+              f"{'identical' if same else 'DIFFERENT'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
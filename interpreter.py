@@ -0,0 +1,196 @@
+from ir import DIVISION_OPS, INT_OPS, OPERATIONS
+
+
+class IRRuntimeError(Exception):
+    """Raised when a program fails while being interpreted"""
+    pass
+
+
+class ExecutionResult:
+    """Output and instruction counts of one interpreted run"""
+
+    def __init__(self, output, steps, branches, counts=None, taken=0, checks=0):
+        self.output = output  # Values printed, in order
+        self.steps = steps  # Executed instructions (labels and counters not counted)
+        self.branches = branches  # Executed jump/jump_if_false instructions
+        self.taken = taken  # Of those, the ones that transferred control
+        self.counts = counts or {}  # Counter name -> times its 'count' instruction ran
+        self.checks = checks  # Executed bounds checks
+
+
+class CallState:
+    """What the frames of one run share: callees, output, counters and the step count"""
+
+    def __init__(self, functions):
+        self.functions = functions
+        self.labels = {}  # id(IR list) -> label positions, built on first entry
+        self.output = []
+        self.counts = {}
+        self.steps = 0
+        self.branches = 0
+        self.taken = 0
+        self.checks = 0
+
+
+class IRInterpreter:
+    """
+    Executes IR directly
+
+    This is the reference semantics that optimizations and backends are
+    checked against. Variables that are read before being assigned are 0.
+    'count' instructions (added by pgo.instrument) increment named counters.
+    With int_bits set, the results of int ops wrap like machine integers of
+    that width. Typed ops run their OPERATIONS function directly: the front
+    end has already converted their operands. A call runs the callee's IR
+    with its parameters bound to the arguments (converted to float for float
+    parameters) in a fresh set of variables. Arrays are lists of zeros of
+    their element type; loads and stores
+    outside an array fail even where no 'check' precedes them, so a check
+    removed by mistake shows up as an error instead of a wrong result.
+    """
+
+    def __init__(self, max_steps=50_000_000, int_bits=None, max_depth=500):
+        self.max_steps = max_steps
+        self.int_bits = int_bits
+        self.max_depth = max_depth  # Nested calls allowed (each is a Python frame)
+
+    def run(self, ir_code, inputs=None, functions=None):
+        """
+        Execute an IR program
+
+        Args:
+            ir_code: List of IR instructions
+            inputs: Optional dict of initial values for the program's inputs
+            functions: CompileSession.functions of the program, if it calls any
+
+        Returns:
+            ExecutionResult: Printed values and executed-instruction counts
+                             (of every function run)
+
+        Raises:
+            IRRuntimeError: On division by zero, an index out of bounds, when
+                            max_steps is exceeded or when calls nest deeper
+                            than max_depth
+        """
+        state = CallState(functions or {})
+        self.execute(ir_code, dict(inputs or {}), state, 0)
+        return ExecutionResult(state.output, state.steps, state.branches, state.counts, state.taken,
+                               state.checks)
+
+    def execute(self, ir_code, env, state, depth):
+        """
+        Run one function (or the main program) to its end
+
+        Returns:
+            The value of the 'return' instruction reached, None for the main program
+        """
+        labels = state.labels.get(id(ir_code))
+        if labels is None:
+            labels = state.labels[id(ir_code)] = {
+                instr['src1']: pos for pos, instr in enumerate(ir_code) if instr['op'] == 'mark'}
+        output = state.output
+        counts = state.counts
+        steps = state.steps
+        branches = state.branches
+        taken = state.taken
+        args = []  # Values pushed by 'param' for the calls of this frame
+        result = None
+        pc = 0
+        end = len(ir_code)
+
+        def value(operand):
+            return env.get(operand, 0) if isinstance(operand, str) else operand
+
+        if self.int_bits:
+            modulus = 1 << self.int_bits
+            half = modulus >> 1
+
+            def wrap(result):
+                if not -half <= result < half:
+                    return (result + half) % modulus - half
+                return result
+        else:
+            wrap = None
+        divisions = frozenset(DIVISION_OPS)
+        int_ops = frozenset(INT_OPS)
+
+        while pc < end:
+            instr = ir_code[pc]
+            op = instr['op']
+            pc += 1
+            if op == 'mark':
+                continue
+            if op == 'count':
+                counts[instr['src1']] = counts.get(instr['src1'], 0) + 1
+                continue
+
+            steps += 1
+            if steps > self.max_steps:
+                raise IRRuntimeError(f"step limit of {self.max_steps} exceeded (infinite loop?)")
+
+            operation = OPERATIONS.get(op)
+            if operation is not None:
+                b = value(instr['src2'])
+                if op in divisions and b == 0:
+                    raise IRRuntimeError(f"division by zero at instruction {pc - 1}")
+                result = operation(value(instr['src1']), b)
+                env[instr['dst']] = wrap(result) if wrap is not None and op in int_ops else result
+            elif op == 'assign':
+                result = value(instr['src1'])
+                env[instr['dst']] = wrap(result) if wrap is not None and type(result) is int else result
+            elif op == 'jump':
+                branches += 1
+                taken += 1
+                pc = labels[instr['src1']]
+            elif op == 'jump_if_false':
+                branches += 1
+                if not value(instr['src1']):
+                    taken += 1
+                    pc = labels[instr['src2']]
+            elif op == 'output':
+                output.append(value(instr['src1']))
+            elif op == 'param':
+                args.append(value(instr['src1']))
+            elif op == 'call':
+                function = state.functions.get(instr['src1'])
+                if function is None:
+                    raise IRRuntimeError(f"call to undefined function '{instr['src1']}' at instruction {pc - 1}")
+                if depth >= self.max_depth:
+                    raise IRRuntimeError(f"call depth of {self.max_depth} exceeded (infinite recursion?)")
+                split = len(args) - instr['src2']
+                callee_env = {name: float(arg) if dtype == 'float' else arg
+                              for (name, dtype), arg in zip(function['params'], args[split:])}
+                del args[split:]
+                state.steps, state.branches, state.taken = steps, branches, taken
+                env[instr['dst']] = self.execute(function['ir'], callee_env, state, depth + 1)
+                steps, branches, taken = state.steps, state.branches, state.taken
+            elif op == 'return':
+                result = value(instr['src1'])
+                break
+            elif op == 'array':
+                env[instr['dst']] = [0.0 if instr['src2'] == 'float' else 0] * instr['src1']
+            elif op == 'check':
+                state.checks += 1
+                index = value(instr['src1'])
+                if type(index) is not int or not 0 <= index < instr['src2']:
+                    raise IRRuntimeError(f"index {index} out of bounds for '{instr['dst']}' "
+                                         f"(size {instr['src2']}) at instruction {pc - 1}")
+            elif op == 'load':
+                elements = env[instr['src1']]
+                index = value(instr['src2'])
+                if type(index) is not int or not 0 <= index < len(elements):
+                    raise IRRuntimeError(f"unchecked index {index} out of bounds for '{instr['src1']}' "
+                                         f"at instruction {pc - 1}")
+                env[instr['dst']] = elements[index]
+            elif op == 'store':
+                elements = env[instr['dst']]
+                index = value(instr['src2'])
+                if type(index) is not int or not 0 <= index < len(elements):
+                    raise IRRuntimeError(f"unchecked index {index} out of bounds for '{instr['dst']}' "
+                                         f"at instruction {pc - 1}")
+                elements[index] = value(instr['src1'])
+            else:
+                raise IRRuntimeError(f"cannot interpret '{op}' at instruction {pc - 1}")
+
+        state.steps, state.branches, state.taken = steps, branches, taken
+        return result
@@ -0,0 +1,281 @@
+import math
+import operator
+
+
+# Arithmetic is typed: the front end converts both operands to one type, so
+# an op never has to look at its operands to pick int or float semantics
+INT_OPS = ('iadd', 'isub', 'imul', 'idiv', 'imod')
+FLOAT_OPS = ('fadd', 'fsub', 'fmul', 'fdiv', 'fmod')
+ARITHMETIC_OPS = INT_OPS + FLOAT_OPS
+# (source operator, operand type) -> typed op
+TYPED_OPS = {(symbol, dtype): op for dtype, ops in (('int', INT_OPS), ('float', FLOAT_OPS))
+             for symbol, op in zip(('+', '-', '*', '/', '%'), ops)}
+RELATIONAL_OPS = ('<', '<=', '>', '>=', '==', '!=')
+BINARY_OPS = ARITHMETIC_OPS + RELATIONAL_OPS
+COMMUTATIVE_OPS = ('iadd', 'imul', 'fadd', 'fmul', '==', '!=')
+DIVISION_OPS = ('idiv', 'imod', 'fdiv', 'fmod')
+
+# 'itof' converts its int operand (src1) to a float in dst
+CONVERSION_OPS = ('itof',)
+
+# Ops that end a basic block
+BRANCH_OPS = ('jump', 'jump_if_false')
+
+# Ops whose only operand (src1) is read: 'param' pushes a call argument,
+# 'return' ends a function with its value
+UNARY_USE_OPS = ('assign', 'output', 'jump_if_false', 'param', 'return') + CONVERSION_OPS
+
+# A call takes the last src2 values pushed by 'param', runs function src1
+# and leaves the result in dst
+CALL_OPS = ('param', 'call', 'return')
+
+# 'array' allocates dst with src1 elements of type src2; 'check' stops the
+# program unless 0 <= src1 < src2 (dst names the array); 'load' reads
+# element src2 of array src1 into dst; 'store' writes src1 to element src2
+# of array dst. Array names are not variables: uses() and defined() never
+# return them, so SSA renaming and the scalar optimizations leave them alone.
+ARRAY_OPS = ('array', 'check', 'load', 'store')
+
+
+class IREvaluationError(Exception):
+    """Raised when an IR operation cannot be evaluated (e.g. division by zero)"""
+    pass
+
+
+def make_instr(operation, operand1=None, operand2=None, dest=None):
+    """Build an IR instruction dict in the layout CompileSession.add_instruction uses"""
+    return {'op': operation, 'src1': operand1, 'src2': operand2, 'dst': dest}
+
+
+def is_var(operand):
+    """Variables and temps are strings; constants are int/float"""
+    return isinstance(operand, str)
+
+
+def is_const(operand):
+    return isinstance(operand, (int, float)) and not isinstance(operand, bool)
+
+
+def uses(instr):
+    """
+    Get the variables an instruction reads
+
+    Args:
+        instr: IR instruction dict
+
+    Returns:
+        list: Variable names read by the instruction
+    """
+    op = instr['op']
+    if op in BINARY_OPS:
+        return [x for x in (instr['src1'], instr['src2']) if is_var(x)]
+    if op in UNARY_USE_OPS:
+        return [instr['src1']] if is_var(instr['src1']) else []
+    if op == 'phi':
+        return [x for x in instr['src1'].values() if is_var(x)]
+    if op == 'load':
+        return [instr['src2']] if is_var(instr['src2']) else []
+    if op == 'store':
+        return [x for x in (instr['src1'], instr['src2']) if is_var(x)]
+    if op == 'check':
+        return [instr['src1']] if is_var(instr['src1']) else []
+    return []
+
+
+def defined(instr):
+    """
+    Get the variable an instruction writes
+
+    Returns:
+        str: Destination name, or None if the instruction defines nothing
+    """
+    if instr['op'] in BINARY_OPS or instr['op'] in ('assign', 'phi', 'call', 'load') + CONVERSION_OPS:
+        return instr['dst']
+    return None
+
+
+def replace_uses(instr, mapping):
+    """
+    Rewrite the operands an instruction reads
+
+    Args:
+        instr: IR instruction dict (modified in place)
+        mapping: dict or callable from variable name to its replacement
+    """
+    lookup = mapping if callable(mapping) else (lambda name: mapping.get(name, name))
+    op = instr['op']
+    if op == 'phi':
+        instr['src1'] = {pred: lookup(x) if is_var(x) else x for pred, x in instr['src1'].items()}
+        return
+    if op in BINARY_OPS or op in UNARY_USE_OPS or op in ('store', 'check'):
+        if is_var(instr['src1']):
+            instr['src1'] = lookup(instr['src1'])
+    if (op in BINARY_OPS or op in ('load', 'store')) and is_var(instr['src2']):
+        instr['src2'] = lookup(instr['src2'])
+
+
+def has_side_effects(instr):
+    """Instructions that must be kept even if their result is unused"""
+    return (instr['op'] in ('output', 'mark', 'jump', 'jump_if_false', 'count') + CALL_OPS
+            or instr['op'] in ('array', 'check', 'store'))
+
+
+def can_trap(instr):
+    """Instructions that may fail at run time and so cannot be speculated"""
+    if instr['op'] == 'call':
+        return True  # The callee may divide by zero, print or never return
+    if instr['op'] == 'load':
+        return True  # Stores are not tracked, so a load is never moved or dropped
+    return instr['op'] in DIVISION_OPS and not (is_const(instr['src2']) and instr['src2'] != 0)
+
+
+def truncating_div(a, b):
+    """Integer division rounding toward zero, as in C"""
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def truncating_mod(a, b):
+    """Integer remainder with the sign of the dividend, as in C"""
+    return a - b * truncating_div(a, b)
+
+
+# Op -> function of its operand values (src1, src2). Typed ops never check
+# their operands' types; the division functions fail on a zero divisor.
+OPERATIONS = {
+    'iadd': operator.add, 'isub': operator.sub, 'imul': operator.mul,
+    'idiv': truncating_div, 'imod': truncating_mod,
+    'fadd': operator.add, 'fsub': operator.sub, 'fmul': operator.mul,
+    'fdiv': operator.truediv, 'fmod': math.fmod,
+    '<': lambda a, b: int(a < b), '<=': lambda a, b: int(a <= b),
+    '>': lambda a, b: int(a > b), '>=': lambda a, b: int(a >= b),
+    '==': lambda a, b: int(a == b), '!=': lambda a, b: int(a != b),
+    'itof': lambda a, b: float(a),
+}
+
+
+def evaluate(op, a, b=None):
+    """
+    Evaluate a binary IR operation (or a conversion) with C-like semantics
+
+    Integer division and remainder truncate toward zero. Comparisons
+    produce 1 or 0.
+
+    Raises:
+        IREvaluationError: On division or remainder by zero
+    """
+    operation = OPERATIONS.get(op)
+    if operation is None:
+        raise IREvaluationError(f"unknown operation '{op}'")
+    if op in DIVISION_OPS and b == 0:
+        raise IREvaluationError("division by zero")
+    return operation(a, b)
+
+
+def label_targets(ir_code):
+    """Labels referenced by jumps"""
+    targets = set()
+    for instr in ir_code:
+        if instr['op'] == 'jump':
+            targets.add(instr['src1'])
+        elif instr['op'] == 'jump_if_false':
+            targets.add(instr['src2'])
+    return targets
+
+
+def max_counter(ir_code, prefix):
+    """
+    Highest N used in names like temp<N> or Label<N>
+
+    Used to create fresh temps and labels that do not clash with the parser's.
+    """
+    highest = 0
+    for instr in ir_code:
+        for operand in (instr['src1'], instr['src2'], instr['dst']):
+            if isinstance(operand, str) and operand.startswith(prefix):
+                digits = operand[len(prefix):].split('.')[0]
+                if digits.isdigit():
+                    highest = max(highest, int(digits))
+    return highest
+
+
+class NameAllocator:
+    """Hands out temps and labels that are unused in a given IR list"""
+
+    def __init__(self, ir_code):
+        self.tmp_counter = max_counter(ir_code, 'temp')
+        self.lbl_counter = max_counter(ir_code, 'Label')
+
+    def temp(self):
+        self.tmp_counter += 1
+        return f"temp{self.tmp_counter}"
+
+    def label(self):
+        self.lbl_counter += 1
+        return f"Label{self.lbl_counter}"
+
+
+def float_variables(ir_code, declared=None, return_types=None):
+    """
+    Variables that hold floats
+
+    The IR is typed: arithmetic ops, comparisons and conversions fix the
+    type of what they define, a load has its array's element type and a
+    call its function's return type. Only copies ('assign', 'phi') are
+    untyped, and a copy has the type of its source, so the names joined by
+    copies share one type: that of any typed definition or constant among
+    them, or of their declarations (SSA versions name.N are declared as
+    name). Names with neither, such as an int parameter or a variable that
+    is never assigned, hold ints.
+
+    Args:
+        ir_code: IR instructions
+        declared: Variable name -> 'int' or 'float' from the declarations
+                  (CompileSession.declared_types())
+        return_types: Function name -> return type; a call to a function
+                      missing here is taken to return a float
+
+    Returns:
+        set: Variable names; every other variable only ever holds ints
+    """
+    declared = declared or {}
+    return_types = return_types or {}
+    float_arrays = {instr['dst'] for instr in ir_code if instr['op'] == 'array' and instr['src2'] == 'float'}
+    parent = {}
+
+    def find(name):
+        root = parent.setdefault(name, name)
+        while parent[root] != root:
+            root = parent[root]
+        while parent[name] != root:
+            parent[name], name = root, parent[name]
+        return root
+
+    typed = []  # (name, dtype) known from a definition or a copied constant
+    for instr in ir_code:
+        for name in uses(instr):
+            find(name)
+        dst = defined(instr)
+        if dst is None:
+            continue
+        find(dst)
+        op = instr['op']
+        if op in FLOAT_OPS or op in CONVERSION_OPS:
+            typed.append((dst, 'float'))
+        elif op in INT_OPS or op in RELATIONAL_OPS:
+            typed.append((dst, 'int'))
+        elif op == 'load':
+            typed.append((dst, 'float' if instr['src1'] in float_arrays else 'int'))
+        elif op == 'call':
+            typed.append((dst, return_types.get(instr['src1'], 'float')))
+        else:
+            sources = instr['src1'].values() if op == 'phi' else [instr['src1']]
+            for source in sources:
+                if is_var(source):
+                    parent[find(source)] = find(dst)
+                else:
+                    typed.append((dst, 'float' if isinstance(source, float) else 'int'))
+
+    typed.extend((name, declared.get(name.split('.')[0])) for name in parent)
+    float_roots = {find(name) for name, dtype in typed if dtype == 'float'}
+    return {name for name in parent if find(name) in float_roots}
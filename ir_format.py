@@ -0,0 +1,135 @@
+from ir import ARITHMETIC_OPS, CONVERSION_OPS, RELATIONAL_OPS
+
+
+def loop_comments(loop_stats):
+    """
+    Describe each optimized loop
+
+    Args:
+        loop_stats: Per-loop dicts from CompileSession.loop_stats
+
+    Returns:
+        dict: Header label -> comment line shown above the label
+    """
+    comments = {}
+    for loop in loop_stats or []:
+        text = (f"; loop depth {loop['depth']}, {loop['blocks']} blocks: "
+                f"{loop['hoisted']} hoisted, {loop['reduced']} strength-reduced")
+        if loop['induction_vars']:
+            text += f" (induction: {', '.join(loop['induction_vars'])})"
+        if loop.get('unrolled'):
+            text += f", {loop['unrolled']}"
+        comments[loop['header']] = text
+    return comments
+
+
+def ir_segments(idx, instr, comments=None):
+    """
+    Split one IR instruction into display segments
+
+    Args:
+        idx: Position of the instruction in the IR list
+        instr: IR instruction dict
+        comments: Optional dict from label to a comment shown above it
+
+    Returns:
+        list: (text, tag) pairs; tag names match OutputHighlighter
+    """
+    op = instr['op']
+    s1 = instr['src1']
+    s2 = instr['src2']
+    d = instr['dst']
+
+    segments = [(f"{idx:3}: ", 'ir_index')]
+
+    if op == 'assign':
+        segments.append((f" {d} ", 'ir_var'))
+        segments.append(("= ", 'ir_op'))
+        if str(s1).isdigit():
+            segments.append((f"{s1}\n", 'ir_num'))
+        else:
+            segments.append((f"{s1}\n", 'ir_var'))
+    elif op in ARITHMETIC_OPS or op in RELATIONAL_OPS:
+        segments.append((f" {d} ", 'ir_var'))
+        segments.append(("= ", 'ir_op'))
+        segments.append((f"{s1} ", 'ir_var'))
+        segments.append((f"{op} ", 'ir_op'))
+        segments.append((f"{s2}\n", 'ir_var'))
+    elif op in CONVERSION_OPS:
+        segments.append((f" {d} ", 'ir_var'))
+        segments.append((f"= {op} ", 'ir_op'))
+        segments.append((f"{s1}\n", 'ir_var'))
+    elif op == 'mark':
+        if comments and s1 in comments:
+            segments.append((f"\n{comments[s1]}", 'ir_comment'))
+        segments.append((f"\n{s1}:\n", 'ir_label'))
+    elif op == 'jump':
+        segments.append((" goto ", 'ir_op'))
+        segments.append((f"{s1}\n", 'ir_label'))
+    elif op == 'jump_if_false':
+        segments.append((" if !", 'ir_op'))
+        segments.append((f"{s1} ", 'ir_var'))
+        segments.append(("goto ", 'ir_op'))
+        segments.append((f"{s2}\n", 'ir_label'))
+    elif op == 'output':
+        segments.append((" print ", 'ir_op'))
+        segments.append((f"{s1}\n", 'ir_var'))
+    elif op == 'param':
+        segments.append((" param ", 'ir_op'))
+        segments.append((f"{s1}\n", 'ir_var'))
+    elif op == 'call':
+        segments.append((f" {d} ", 'ir_var'))
+        segments.append(("= call ", 'ir_op'))
+        segments.append((f"{s1}", 'ir_label'))
+        segments.append((f", {s2}\n", 'ir_num'))
+    elif op == 'return':
+        segments.append((" return ", 'ir_op'))
+        segments.append((f"{s1}\n", 'ir_var'))
+    elif op == 'array':
+        segments.append((" array ", 'ir_op'))
+        segments.append((f"{d}", 'ir_var'))
+        segments.append((f"[{s1}] ", 'ir_num'))
+        segments.append((f"{s2}\n", 'ir_op'))
+    elif op == 'check':
+        segments.append((" check ", 'ir_op'))
+        segments.append((f"{s1} ", 'ir_var'))
+        segments.append(("< ", 'ir_op'))
+        segments.append((f"{s2} ", 'ir_num'))
+        segments.append((f"({d})\n", 'ir_var'))
+    elif op == 'load':
+        segments.append((f" {d} ", 'ir_var'))
+        segments.append(("= ", 'ir_op'))
+        segments.append((f"{s1}[{s2}]\n", 'ir_var'))
+    elif op == 'store':
+        segments.append((f" {d}[{s2}] ", 'ir_var'))
+        segments.append(("= ", 'ir_op'))
+        segments.append((f"{s1}\n", 'ir_var'))
+    elif op == 'phi':
+        # Only seen in IR dumped while a pass pipeline is in SSA form
+        segments.append((f" {d} ", 'ir_var'))
+        segments.append(("= phi ", 'ir_op'))
+        segments.append((f"{', '.join(str(value) for value in s1.values())}\n", 'ir_var'))
+
+    return segments
+
+
+def function_title(function):
+    """Signature of a function record, e.g. 'int add(int a, int b)'"""
+    params = ', '.join(f"{dtype} {name}" for name, dtype in function['params'])
+    return f"{function['dtype']} {function['name']}({params})"
+
+
+def format_ir(ir_code, loop_stats=None):
+    """
+    Render IR as plain text, in the same layout as the GUI's IR view
+
+    Args:
+        ir_code: List of IR instructions
+        loop_stats: Optional per-loop statistics to show as comments
+
+    Returns:
+        str: IR listing
+    """
+    comments = loop_comments(loop_stats)
+    return ''.join(text for idx, instr in enumerate(ir_code)
+                   for text, _ in ir_segments(idx, instr, comments))
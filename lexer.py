@@ -6,14 +6,15 @@ class TokenScanner:
     
     keywords = {
         'if': 'IF', 'else': 'ELSE', 'while': 'WHILE', 'for': 'FOR',
-        'int': 'INT', 'float': 'FLOAT', 'return': 'RETURN', 'print': 'PRINT'
+        'int': 'INT', 'float': 'FLOAT', 'return': 'RETURN', 'print': 'PRINT',
+        'input': 'INPUT'
     }
 
     tokens = [
         'IDENTIFIER', 'INTEGER', 'DECIMAL',
         'PLUS', 'MINUS', 'MULTIPLY', 'DIVIDE', 'MOD',
         'EQUALS', 'EQUAL_TO', 'NOT_EQUAL', 'LESS', 'LESS_EQ', 'GREATER', 'GREATER_EQ',
-        'LPAREN', 'RPAREN', 'LBRACE', 'RBRACE', 'SEMICOLON', 'COMMA',
+        'LPAREN', 'RPAREN', 'LBRACE', 'RBRACE', 'LBRACKET', 'RBRACKET', 'SEMICOLON', 'COMMA',
     ] + list(keywords.values())
 
     # Token rules (order matters for PLY)
@@ -45,6 +46,8 @@ class TokenScanner:
     t_RPAREN = r'\)'
     t_LBRACE = r'\{'
     t_RBRACE = r'\}'
+    t_LBRACKET = r'\['
+    t_RBRACKET = r'\]'
     t_SEMICOLON = r';'
     t_COMMA = r','
     t_ignore = ' \t'
@@ -69,18 +72,78 @@ class TokenScanner:
         tok.lexer.lineno += len(tok.value)
 
     def t_error(self, tok):
-        self.issues.append(f"Invalid character '{tok.value[0]}' at line {tok.lineno}")
+        # Issues live on the per-call lexer so one scanner can serve many threads
+        tok.lexer.issues.append(f"Invalid character '{tok.value[0]}' at line {tok.lineno}")
         tok.lexer.skip(1)
 
     def __init__(self):
         self.scanner = None
-        self.token_stream = []
-        self.issues = []
 
     def initialize(self):
         """Initialize the lexer"""
         self.scanner = lex.lex(module=self)
 
+    def new_lexer(self, code, issues=None, session=None):
+        """
+        Create a lexer for one source that shares the compiled rules
+
+        Args:
+            code: Source code string to tokenize
+            issues: List that lexical errors are appended to
+            session: CompileSession the lexer belongs to (optional)
+
+        Returns:
+            Lexer: An independent PLY lexer positioned at the start of code
+        """
+        lexer = self.scanner.clone()
+        lexer.issues = issues if issues is not None else []
+        lexer.session = session
+        lexer.lineno = 1
+        lexer.input(code)
+        return lexer
+
+    @staticmethod
+    def next_token(lexer, token_stream):
+        """
+        Read the next token and record it in token_stream
+
+        Returns:
+            LexToken: The token, or None at end of input
+        """
+        tok = lexer.token()
+        if tok:
+            token_stream.append({
+                'kind': tok.type,
+                'val': tok.value,
+                'ln': tok.lineno,
+                'pos': tok.lexpos
+            })
+        return tok
+
+    @staticmethod
+    def token_reader(rows, token_stream):
+        """
+        Read tokens scanned beforehand (parallel_lex) the way next_token reads a lexer
+
+        Args:
+            rows: (kind, value, line, position) tuples of the whole source, in order
+            token_stream: List each token is recorded in as it is read
+
+        Returns:
+            callable: Returns the next LexToken, or None at end of input
+        """
+        remaining = iter(rows)
+
+        def read():
+            row = next(remaining, None)
+            if row is None:
+                return None
+            tok = lex.LexToken()
+            tok.type, tok.value, tok.lineno, tok.lexpos = row
+            token_stream.append({'kind': tok.type, 'val': tok.value, 'ln': tok.lineno, 'pos': tok.lexpos})
+            return tok
+        return read
+
     def scan(self, code):
         """
         Scan source code and generate token stream
@@ -91,19 +154,10 @@ class TokenScanner:
         Returns:
             tuple: (token_stream, issues) - list of tokens and list of errors
         """
-        self.token_stream = []
-        self.issues = []
-        self.scanner.input(code)
+        token_stream = []
+        lexer = self.new_lexer(code)
         
-        while True:
-            tok = self.scanner.token()
-            if not tok:
-                break
-            self.token_stream.append({
-                'kind': tok.type,
-                'val': tok.value,
-                'ln': tok.lineno,
-                'pos': tok.lexpos
-            })
+        while self.next_token(lexer, token_stream):
+            pass
         
-        return self.token_stream, self.issues
+        return token_stream, lexer.issues
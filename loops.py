@@ -0,0 +1,311 @@
+from cfg import AnalysisCache, dominates
+from ir import can_trap, defined, float_variables, is_var, make_instr, replace_uses, uses
+
+
+class Loop:
+    """Natural loop: a header plus every block that reaches a back edge to it"""
+
+    def __init__(self, header, blocks, latches):
+        self.header = header
+        self.blocks = blocks  # Set of blocks, header included
+        self.latches = latches  # Blocks with a back edge to the header
+        self.depth = 1
+
+    def exits(self):
+        """Edges (exiting block, outside block) that leave the loop"""
+        return [(block, succ) for block in self.blocks for succ in block.succs
+                if succ not in self.blocks]
+
+
+def find_loops(cfg, idom):
+    """
+    Detect natural loops from back edges (an edge to a block that dominates its source)
+
+    Loops sharing a header are merged.
+
+    Returns:
+        list: Loops, innermost first
+    """
+    by_header = {}
+    for block in idom:
+        for succ in block.succs:
+            if succ in idom and dominates(idom, succ, block):
+                by_header.setdefault(succ, []).append(block)
+
+    loops = []
+    for header, latches in by_header.items():
+        body = {header}
+        stack = [latch for latch in latches if latch is not header]
+        while stack:
+            block = stack.pop()
+            if block in body:
+                continue
+            body.add(block)
+            stack.extend(pred for pred in block.preds if pred in idom)
+        loops.append(Loop(header, body, latches))
+
+    for loop in loops:
+        loop.depth = sum(1 for other in loops if loop.header in other.blocks)
+    loops.sort(key=lambda loop: (len(loop.blocks), -loop.depth))
+    return loops
+
+
+def ensure_preheader(cfg, loop):
+    """
+    Insert an empty block that every entry into the loop goes through
+
+    Returns:
+        BasicBlock: The preheader, placed right before the header in the layout
+    """
+    header = loop.header
+    preheader = cfg.new_block()
+    preheader.fallthrough = header
+    for pred in header.preds:
+        if pred in loop.blocks:
+            continue
+        if pred.fallthrough is header:
+            pred.fallthrough = preheader
+        if pred.target is header:
+            pred.target = preheader
+    cfg.blocks.insert(cfg.blocks.index(header), preheader)
+    cfg.compute_preds()
+    return preheader
+
+
+def hoist_invariants(loop, preheader, idom, live_in):
+    """
+    Move loop-invariant computations into the preheader
+
+    An instruction is moved when its operands are constants or are not
+    assigned in the loop (or were themselves moved), it is the only
+    definition of its result in the loop, its result is not carried around
+    the loop, it cannot trap (the loop body may run zero times), and its
+    block dominates every exit where the result is still live.
+
+    Returns:
+        int: Number of instructions moved
+    """
+    def_count = {}
+    for block in loop.blocks:
+        for instr in block.instrs:
+            dst = defined(instr)
+            if dst is not None:
+                def_count[dst] = def_count.get(dst, 0) + 1
+
+    exits = loop.exits()
+    ordered = sorted(loop.blocks, key=lambda block: block.index)
+    hoisted = set()
+    moved = 0
+    changed = True
+    while changed:
+        changed = False
+        for block in ordered:
+            for instr in list(block.instrs):
+                dst = defined(instr)
+                if dst is None or def_count[dst] != 1 or can_trap(instr):
+                    continue
+                if dst in live_in[loop.header]:
+                    continue
+                if any(name in def_count and name not in hoisted for name in uses(instr)):
+                    continue
+                if any(dst in live_in[succ] and not dominates(idom, block, exiting)
+                       for exiting, succ in exits):
+                    continue
+                block.instrs.remove(instr)
+                preheader.instrs.append(instr)
+                hoisted.add(dst)
+                moved += 1
+                changed = True
+    return moved
+
+
+def _increment(instr, name):
+    """Constant int step if instr computes name + c, c + name or name - c"""
+    op, a, b = instr['op'], instr['src1'], instr['src2']
+    if op == 'iadd':
+        if a == name and type(b) is int:
+            return b
+        if b == name and type(a) is int:
+            return a
+    if op == 'isub' and a == name and type(b) is int:
+        return -b
+    return None
+
+
+def find_induction_variables(loop, int_vars):
+    """
+    Basic induction variables: int variables changed once per iteration by a constant
+
+    Recognizes i = i + c directly and the parser's form t = i + c; i = t
+    with t computed earlier in the same block.
+
+    Returns:
+        dict: Name -> (block, defining instruction, step)
+    """
+    sites = {}
+    for block in loop.blocks:
+        for pos, instr in enumerate(block.instrs):
+            dst = defined(instr)
+            if dst is not None:
+                sites.setdefault(dst, []).append((block, pos, instr))
+
+    ivs = {}
+    for name, defs in sites.items():
+        if len(defs) != 1 or name not in int_vars:
+            continue
+        block, pos, instr = defs[0]
+        step = _increment(instr, name)
+        if step is None and instr['op'] == 'assign' and is_var(instr['src1']):
+            source = sites.get(instr['src1'], [])
+            if len(source) == 1 and source[0][0] is block and source[0][1] < pos:
+                step = _increment(source[0][2], name)
+        if step:
+            ivs[name] = (block, instr, step)
+    return ivs
+
+
+def _live_after(block, instr, live_out):
+    """Variables live right after instr in block"""
+    live = set(live_out)
+    for later in reversed(block.instrs):
+        if later is instr:
+            return live
+        dst = defined(later)
+        if dst is not None:
+            live.discard(dst)
+        live.update(uses(later))
+    return live
+
+
+def reduce_strength(cfg, loop, preheader, int_vars, live_in, live_out):
+    """
+    Replace multiplications of an induction variable by a constant with a
+    running sum that is advanced next to the induction variable's update
+
+    The product's uses read the running sum directly when the product is
+    defined only there and is never live across the induction variable's
+    update; otherwise it becomes a copy of the running sum.
+
+    Returns:
+        tuple: (number of multiplications replaced, induction variables used)
+    """
+    ivs = find_induction_variables(loop, int_vars)
+    def_count = {}
+    for block in cfg.blocks:
+        for instr in block.instrs:
+            dst = defined(instr)
+            if dst is not None:
+                def_count[dst] = def_count.get(dst, 0) + 1
+
+    sums = {}
+    renamed = {}
+    reduced = 0
+    for block in sorted(loop.blocks, key=lambda block: block.index):
+        for instr in list(block.instrs):
+            if instr['op'] != 'imul':
+                continue
+            a, b = instr['src1'], instr['src2']
+            if a in ivs and type(b) is int:
+                iv, factor = a, b
+            elif b in ivs and type(a) is int:
+                iv, factor = b, a
+            else:
+                continue
+            product = instr['dst']
+            if product == iv or product in live_in[loop.header]:
+                continue
+            if sum(1 for other in loop.blocks for x in other.instrs if defined(x) == product) != 1:
+                continue
+
+            iv_block, iv_def, step = ivs[iv]
+            key = (iv, factor)
+            if key not in sums:
+                running = cfg.names.temp()
+                sums[key] = running
+                int_vars.add(running)
+                preheader.instrs.append(make_instr('imul', iv, factor, running))
+                pos = next(pos for pos, other in enumerate(iv_block.instrs) if other is iv_def)
+                iv_block.instrs.insert(pos + 1, make_instr('iadd', running, factor * step, running))
+
+            if def_count[product] == 1 and product not in _live_after(iv_block, iv_def, live_out[iv_block]):
+                block.instrs.remove(instr)
+                renamed[product] = sums[key]
+            else:
+                instr.update(make_instr('assign', sums[key], None, product))
+            reduced += 1
+
+    if renamed:
+        for block in cfg.blocks:
+            for instr in block.instrs:
+                replace_uses(instr, renamed)
+    return reduced, sorted({iv for iv, _ in sums})
+
+
+def int_variables(cfg):
+    """Variables of a CFG that only ever hold ints"""
+    instrs = [instr for block in cfg.blocks for instr in block.instrs]
+    names = {name for instr in instrs for name in uses(instr) + [defined(instr)] if is_var(name)}
+    return names - float_variables(instrs, cfg.declared, cfg.return_types)
+
+
+# Provider for AnalysisCache
+LOOP_ANALYSES = {'loops': lambda cache: find_loops(cache.cfg, cache.get('dominators'))}
+
+
+def optimize_loops(cfg, analyses=None, stats=None):
+    """
+    Loop-invariant code motion and induction-variable strength reduction
+
+    Args:
+        cfg: ControlFlowGraph without unreachable blocks (modified in place)
+        analyses: AnalysisCache for cfg with LOOP_ANALYSES (created if omitted)
+        stats: Optional list that receives one dict per loop: header label,
+               depth, blocks, hoisted, reduced and induction_vars
+
+    Returns:
+        int: Number of instructions hoisted or strength-reduced
+    """
+    if analyses is None:
+        analyses = AnalysisCache(cfg, LOOP_ANALYSES)
+    int_vars = int_variables(cfg)
+
+    done = set()
+    changes = 0
+    while True:
+        pending = [loop for loop in analyses.get('loops') if loop.header not in done]
+        if not pending:
+            break
+        loop = pending[0]
+        done.add(loop.header)
+
+        preheader = ensure_preheader(cfg, loop)
+        analyses.invalidate()
+        live_in, live_out = analyses.get('liveness')
+        hoisted = hoist_invariants(loop, preheader, analyses.get('dominators'), live_in)
+        reduced, ivs = reduce_strength(cfg, loop, preheader, int_vars, live_in, live_out)
+        if not preheader.instrs:
+            _remove_preheader(cfg, loop, preheader)
+        analyses.invalidate()
+        changes += hoisted + reduced
+
+        if stats is not None:
+            stats.append({
+                'header': cfg.ensure_label(loop.header),
+                'depth': loop.depth,
+                'blocks': len(loop.blocks),
+                'hoisted': hoisted,
+                'reduced': reduced,
+                'induction_vars': ivs,
+            })
+    return changes
+
+
+def _remove_preheader(cfg, loop, preheader):
+    """Undo ensure_preheader when nothing was placed in it"""
+    for pred in preheader.preds:
+        if pred.fallthrough is preheader:
+            pred.fallthrough = loop.header
+        if pred.target is preheader:
+            pred.target = loop.header
+    cfg.blocks.remove(preheader)
+    cfg.compute_preds()
@@ -0,0 +1,220 @@
+import argparse
+import sys
+import time
+
+from workloads import generate_program
+
+
+ERROR_COUNT = 3  # Tokens to shift before another syntax error is reported (as in PLY)
+NO_ACTION = 1 << 30  # Marks an empty table cell
+
+
+class Production(list):
+    """
+    The p argument of grammar actions: p[0] is the result, p[1:] the values of the right-hand side
+
+    A plain list, so indexing and len() run in C; one object is reused for
+    every reduction of a parse, as PLY does with its YaccProduction.
+    lineno(n) reads the parser's line stack in place instead of a copy.
+    """
+
+    __slots__ = ('lexer', 'lines', 'base')
+
+    def lineno(self, n):
+        """Line of the n-th symbol of the right-hand side (0 for nonterminals, as in PLY)"""
+        return self.lines[self.base + n]
+
+
+class Symbol:
+    """End of input, or the error token that stands for a bad lookahead during recovery"""
+
+    __slots__ = ('type', 'value', 'lineno')
+
+    def __init__(self, kind, value=None):
+        self.type = kind
+        self.value = value
+        self.lineno = getattr(value, 'lineno', 0)
+
+
+class TableParser:
+    """
+    LALR driver over PLY's tables, without PLY's generic machinery
+
+    The action, goto and default-reduction tables are flattened into lists
+    indexed by state * width + symbol number; shifts are positive, reduces
+    negative, accept 0 and empty cells NO_ACTION. Reductions call the
+    grammar's action methods directly with a reused Production list instead
+    of a YaccProduction over symbol objects.
+
+    Syntax errors are recovered from exactly as PLY does for a grammar
+    without error productions. The one difference: where PLY would reduce
+    the same empty rule forever (an error token in a state whose only
+    action is that reduction), the state is popped instead. The grammar has
+    no empty rules, so both engines stop on every input.
+    """
+
+    def __init__(self, ply_parser):
+        """
+        Args:
+            ply_parser: LRParser from ply.yacc.yacc(), with actions bound
+        """
+        productions = ply_parser.productions
+        terminals = {'$end', 'error'}
+        nonterminals = set()
+        for actions in ply_parser.action.values():
+            terminals.update(actions)
+        for gotos in ply_parser.goto.values():
+            nonterminals.update(gotos)
+        nonterminals.update(prod.name for prod in productions)
+        self.term_index = {name: idx for idx, name in enumerate(sorted(terminals))}
+        self.nonterm_index = {name: idx for idx, name in enumerate(sorted(nonterminals))}
+        self.end = self.term_index['$end']
+        self.error = self.term_index['error']
+
+        n_states = max(max(ply_parser.action, default=0), max(ply_parser.goto, default=0)) + 1
+        self.width = len(self.term_index)
+        self.goto_width = len(self.nonterm_index)
+        self.action = [NO_ACTION] * (n_states * self.width)
+        self.goto = [NO_ACTION] * (n_states * self.goto_width)
+        self.default = [NO_ACTION] * n_states
+        for state, actions in ply_parser.action.items():
+            for name, act in actions.items():
+                self.action[state * self.width + self.term_index[name]] = act
+        for state, gotos in ply_parser.goto.items():
+            for name, target in gotos.items():
+                self.goto[state * self.goto_width + self.nonterm_index[name]] = target
+        for state, act in ply_parser.defaulted_states.items():
+            self.default[state] = act
+
+        self.lengths = [prod.len for prod in productions]
+        self.lhs = [self.nonterm_index[prod.name] for prod in productions]
+        self.callables = [prod.callable for prod in productions]
+
+    def parse(self, lexer, tokenfunc, errorfunc):
+        """
+        Parse the tokens of one source
+
+        Args:
+            lexer: Lexer given to the grammar actions as p.lexer
+            tokenfunc: Returns the next token, or None at end of input
+            errorfunc: Called with the offending token (None at end of input)
+                       when a syntax error is reported
+
+        Returns:
+            The value of the start symbol, or None after an unrecovered error
+        """
+        action, goto, default = self.action, self.goto, self.default
+        width, goto_width = self.width, self.goto_width
+        lengths, lhs, callables = self.lengths, self.lhs, self.callables
+        term_index = self.term_index
+        end, error = self.end, self.error
+
+        p = Production()
+        p.lexer = lexer
+        states = [0]
+        values = [None]
+        lines = [0]  # Line of each symbol on the stack, for p.lineno()
+        p.lines = lines
+        state = 0
+        lookahead = None
+        kind = end
+        pending = []  # Lookaheads put back during error recovery
+        errorcount = 0
+
+        while True:
+            t = default[state]
+            if t == NO_ACTION:
+                if lookahead is None:
+                    lookahead = pending.pop() if pending else tokenfunc()
+                    if lookahead is None:
+                        lookahead = Symbol('$end')
+                    kind = term_index.get(lookahead.type, error)
+                t = action[state * width + kind]
+            elif lookahead is not None and kind == error and not lengths[-t] \
+                    and default[goto[state * goto_width + lhs[-t]]] == NO_ACTION:
+                # PLY would reduce the empty rule and pop its state here forever
+                t = NO_ACTION
+
+            if t == NO_ACTION:
+                # Syntax error
+                if errorcount == 0:
+                    errorfunc(None if kind == end else lookahead)
+                errorcount = ERROR_COUNT
+                if len(states) <= 1 and kind != end:
+                    # Nothing left to pop: drop the token and start over
+                    lookahead = None
+                    del pending[:]
+                elif kind == end:
+                    return None
+                elif kind != error:
+                    pending.append(lookahead)
+                    lookahead = Symbol('error', lookahead)
+                    kind = error
+                else:
+                    values.pop()
+                    lines.pop()
+                    states.pop()
+                    state = states[-1]
+            elif t > 0:
+                states.append(t)
+                values.append(lookahead.value)
+                lines.append(lookahead.lineno)
+                state = t
+                lookahead = None
+                if errorcount:
+                    errorcount -= 1
+            elif t < 0:
+                rule = -t
+                plen = lengths[rule]
+                p.base = len(lines) - plen - 1
+                if plen:
+                    p[:] = values[-plen - 1:]
+                    del values[-plen:]
+                    p[0] = None
+                    callables[rule](p)
+                    del states[-plen:]
+                    del lines[-plen:]
+                else:
+                    p[:] = (None,)
+                    callables[rule](p)
+                values.append(p[0])
+                lines.append(0)
+                state = goto[states[-1] * goto_width + lhs[rule]]
+                states.append(state)
+            else:
+                return values[-1]
+
+
+def main(argv=None):
+    from compiler import Compiler
+    arg_parser = argparse.ArgumentParser(description="PLY's parse loop vs the table-driven parser")
+    arg_parser.add_argument('--statements', type=int, nargs='+', default=[1000, 5000, 20000],
+                            help="sizes of the generated programs")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="best of this many runs")
+    args = arg_parser.parse_args(argv)
+
+    compilers = {engine: Compiler(parser_engine=engine) for engine in ('ply', 'lr')}
+    print(f"{'STATEMENTS':<11} {'TOKENS':>8} {'PLY MS':>9} {'LR MS':>9} {'SPEEDUP':>8}  OUTPUT")
+    failed = False
+    for n in args.statements:
+        code = generate_program(n)
+        sessions, best = {}, {}
+        for engine, compiler in compilers.items():
+            best[engine] = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                sessions[engine] = compiler.compile(code, opt_level=0, asm=False)
+                best[engine] = min(best[engine], time.perf_counter() - start)
+        ply_session, lr_session = sessions['ply'], sessions['lr']
+        same = all(getattr(ply_session, attr) == getattr(lr_session, attr) for attr in (
+            'token_stream', 'ir_instructions', 'ast', 'lex_issues', 'issues'))
+        same = same and ply_session.registry.all_entries() == lr_session.registry.all_entries()
+        failed = failed or not same
+        print(f"{n:<11} {len(ply_session.token_stream):>8} {best['ply'] * 1000:>9.1f} "
+              f"{best['lr'] * 1000:>9.1f} {best['ply'] / best['lr']:>7.2f}x  "
+              f"{'identical' if same else 'DIFFERENT'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,651 @@
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+
+from compiler import Compiler
+from incremental import LINE_PATTERN, IncrementalCompiler
+
+
+DIAGNOSTICS_DELAY = 0.01  # Seconds a document must be unchanged before it is analyzed
+SOURCE = 'minicompiler'
+
+# JSON-RPC and LSP error codes
+METHOD_NOT_FOUND = -32601
+REQUEST_CANCELLED = -32800
+CONTENT_MODIFIED = -32801
+
+# Semantic token legend: a token's type is its index in TOKEN_TYPES
+TOKEN_TYPES = ['keyword', 'type', 'function', 'parameter', 'variable', 'number', 'operator']
+TOKEN_MODIFIERS = ['declaration']
+KIND_TYPES = {
+    'IF': 'keyword', 'ELSE': 'keyword', 'WHILE': 'keyword', 'FOR': 'keyword',
+    'RETURN': 'keyword', 'PRINT': 'keyword', 'INPUT': 'keyword',
+    'INT': 'type', 'FLOAT': 'type',
+    'INTEGER': 'number', 'DECIMAL': 'number',
+    'PLUS': 'operator', 'MINUS': 'operator', 'MULTIPLY': 'operator', 'DIVIDE': 'operator',
+    'MOD': 'operator', 'EQUALS': 'operator', 'EQUAL_TO': 'operator', 'NOT_EQUAL': 'operator',
+    'LESS': 'operator', 'LESS_EQ': 'operator', 'GREATER': 'operator', 'GREATER_EQ': 'operator',
+}
+ENTRY_TYPES = {'function': 'function', 'parameter': 'parameter'}  # By symbol ctx; others are variables
+
+NEWLINE = re.compile(r'\n')
+NUMBER = re.compile(r'\d+(?:\.\d+)?')
+QUOTED = re.compile(r"'([^']+)'")
+NUMBER_LITERAL = re.compile(r'(?<![\w.])\d+(?![\w.])')
+BURST = "\nint burst = undefined_name;"  # Typed one character per change by the benchmark
+
+
+def read_message(stream):
+    """
+    Read one Content-Length framed JSON-RPC message
+
+    Returns:
+        dict: The decoded message, or None at end of input
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if length is not None:
+                break
+            continue
+        name, _, value = line.decode('ascii').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return json.loads(body)
+
+
+def write_message(stream, message):
+    """Write one JSON-RPC message with its Content-Length header"""
+    body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    stream.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    stream.flush()
+
+
+def line_starts(text):
+    """Offset of the first character of every line"""
+    return [0] + [match.end() for match in NEWLINE.finditer(text)]
+
+
+def offset_at(text, starts, position):
+    """
+    Offset in text of an LSP position
+
+    Columns count UTF-16 code units, as LSP defines them; positions past
+    the end of a line or of the text are clamped to it.
+    """
+    line = position['line']
+    if line >= len(starts):
+        return len(text)
+    start = starts[line]
+    end = starts[line + 1] - 1 if line + 1 < len(starts) else len(text)
+    column = position['character']
+    segment = text[start:end]
+    if segment.isascii():
+        return start + min(column, len(segment))
+    units = 0
+    for idx, char in enumerate(segment):
+        if units >= column:
+            return start + idx
+        units += 2 if ord(char) > 0xFFFF else 1
+    return end
+
+
+def position_at(text, starts, offset):
+    """LSP position (line and UTF-16 column) of an offset in text"""
+    line = bisect_right(starts, offset) - 1
+    segment = text[starts[line]:offset]
+    column = len(segment) if segment.isascii() else len(segment.encode('utf-16-le')) // 2
+    return {'line': line, 'character': column}
+
+
+class SymbolIndex:
+    """
+    Which declaration each identifier in a token stream refers to
+
+    Scopes are opened where the parser opens them: one per block, one
+    around a for loop's initializer and body, and one around a function's
+    parameters and body. A declaration is an identifier after a type
+    keyword; it is matched to the symbol entry the parser made for it, in
+    order, and declarations the parser rejected (redeclarations) have none
+    and are not put in scope. A variable is visible after the ';' that
+    ends its declaration, a function and its parameters from their header.
+    """
+
+    def __init__(self, tokens, entries):
+        """
+        Args:
+            tokens: Token stream of a session
+            entries: The session's symbol entries, in declaration order
+        """
+        self.declaration = {}  # Token index -> token index of its declaration (itself for declarations)
+        self.entry = {}  # Token index of a declaration -> its symbol entry
+        scopes = [{}]
+        closers = []  # Per open block: scopes opened before its '{' that close with it
+        opened = 0  # Scopes opened by a header not yet followed by its body
+        waiting = []  # (name, token index) of variables declared by the current statement
+        next_entry = 0
+        for idx, tok in enumerate(tokens):
+            kind = tok['kind']
+            if kind == 'IDENTIFIER':
+                name = tok['val']
+                if idx and tokens[idx - 1]['kind'] in ('INT', 'FLOAT'):
+                    self.declaration[idx] = idx
+                    header = idx + 1 < len(tokens) and tokens[idx + 1]['kind'] == 'LPAREN'
+                    if (next_entry < len(entries) and entries[next_entry]['id'] == name
+                            and entries[next_entry]['scope_level'] == len(scopes) - 1):
+                        self.entry[idx] = entries[next_entry]
+                        next_entry += 1
+                        if header or opened:
+                            # Functions and parameters are declared by the header
+                            scopes[-1][name] = idx
+                        else:
+                            waiting.append((name, idx))
+                    if header:
+                        scopes.append({})
+                        opened += 1
+                else:
+                    for scope in reversed(scopes):
+                        if name in scope:
+                            self.declaration[idx] = scope[name]
+                            break
+            elif kind == 'SEMICOLON':
+                for name, decl in waiting:
+                    scopes[-1][name] = decl
+                waiting = []
+            elif kind == 'FOR':
+                scopes.append({})
+                opened += 1
+            elif kind == 'LBRACE':
+                scopes.append({})
+                closers.append(opened)
+                opened = 0
+            elif kind == 'RBRACE' and closers:
+                del scopes[max(len(scopes) - 1 - closers.pop(), 1):]
+
+
+class Analysis:
+    """
+    What the front end found in one version of a document
+
+    Diagnostics are made up front, as every version publishes them. The
+    token stream and symbol index behind semantic tokens and go-to-definition
+    are built the first time one is requested: placing every statement's
+    tokens in the document costs time linear in its size.
+    """
+
+    def __init__(self, text, version, issues, front_end, starts=None):
+        """
+        Args:
+            text: The document's text
+            version: Its version
+            issues: Lexical, syntax and semantic issues in text
+            front_end: Returns the CompileSession of text when called
+            starts: line_starts(text), if already known
+        """
+        self.text = text
+        self.version = version
+        self.starts = line_starts(text) if starts is None else starts
+        self.diagnostics = [self.diagnostic(issue) for issue in issues]
+        self.front_end = front_end
+        self.tokens = self.index = None
+
+    def symbols(self):
+        if self.index is None:
+            session = self.front_end()
+            self.tokens = session.token_stream
+            self.index = SymbolIndex(self.tokens, session.registry.all_entries())
+        return self.index
+
+    def token_length(self, tok):
+        if tok['kind'] in ('INTEGER', 'DECIMAL'):
+            # The value lost the spelling (1.50 is 1.5)
+            return NUMBER.match(self.text, tok['pos']).end() - tok['pos']
+        return len(tok['val'])
+
+    def range(self, start, end):
+        return {'start': position_at(self.text, self.starts, start),
+                'end': position_at(self.text, self.starts, end)}
+
+    def span(self, message):
+        """
+        Offsets (start, end) of the text an issue is about: the first word
+        it quotes on the line it gives, else that whole line
+        """
+        match = LINE_PATTERN.search(message)
+        if match is None:
+            # 'Unexpected end of input'
+            end = len(self.text.rstrip())
+            return max(end - 1, 0), end
+        line = min(int(match.group(1)), len(self.starts))
+        start = self.starts[line - 1]
+        end = self.starts[line] - 1 if line < len(self.starts) else len(self.text)
+        quoted = QUOTED.search(message)
+        if quoted is not None:
+            found = re.compile(rf'(?<![\w.]){re.escape(quoted.group(1))}(?![\w.])').search(self.text, start, end)
+            if found is not None:
+                return found.span()
+        segment = self.text[start:end]
+        return start + len(segment) - len(segment.lstrip()), start + len(segment.rstrip())
+
+    def diagnostic(self, message):
+        return {'range': self.range(*self.span(message)), 'severity': 1, 'source': SOURCE, 'message': message}
+
+    def semantic_tokens(self):
+        """
+        Encode the tokens for textDocument/semanticTokens/full
+
+        Returns:
+            list: Five integers per token (line and start relative to the
+                  previous token, length, type and modifier bits)
+        """
+        index = self.symbols()
+        data = []
+        prev_line = prev_start = 0
+        for idx, tok in enumerate(self.tokens):
+            kind = tok['kind']
+            modifiers = 0
+            if kind == 'IDENTIFIER':
+                decl = index.declaration.get(idx)
+                entry = index.entry.get(decl)
+                token_type = ENTRY_TYPES.get(entry['ctx'], 'variable') if entry else 'variable'
+                modifiers = 1 if decl == idx else 0
+            else:
+                token_type = KIND_TYPES.get(kind)
+                if token_type is None:
+                    continue
+            line = tok['ln'] - 1
+            segment = self.text[self.starts[line]:tok['pos']]
+            start = len(segment) if segment.isascii() else len(segment.encode('utf-16-le')) // 2
+            data += (line - prev_line, start - prev_start if line == prev_line else start,
+                     self.token_length(tok), TOKEN_TYPES.index(token_type), modifiers)
+            prev_line, prev_start = line, start
+        return data
+
+    def definition(self, position):
+        """
+        Range of the declaration of the identifier at an LSP position
+
+        Returns:
+            dict: The declaration's range, or None if there is no identifier
+                  there or it is undeclared
+        """
+        index = self.symbols()
+        offset = offset_at(self.text, self.starts, position)
+        idx = bisect_right(self.tokens, offset, key=lambda tok: tok['pos']) - 1
+        if idx < 0:
+            return None
+        tok = self.tokens[idx]
+        if tok['kind'] != 'IDENTIFIER' or offset > tok['pos'] + len(tok['val']):
+            return None
+        decl = index.declaration.get(idx)
+        if decl is None:
+            return None
+        target = self.tokens[decl]
+        return self.range(target['pos'], target['pos'] + len(target['val']))
+
+
+class Document:
+    """An open document: its latest text and the analysis of the last version parsed"""
+
+    def __init__(self, uri, text, version, compiler):
+        self.uri = uri
+        self.text = text
+        self.starts = line_starts(text)  # Replaced, never mutated: analyses share it
+        self.version = version
+        self.incremental = IncrementalCompiler(compiler)
+        self.analysis = None
+
+    def apply(self, changes, version):
+        """
+        Apply textDocument/didChange content changes (ranged or whole text)
+
+        A ranged change rescans only the text it inserts for line breaks;
+        the line starts after it are shifted instead of searched for again.
+        """
+        for change in changes:
+            if 'range' in change:
+                text, starts, inserted = self.text, self.starts, change['text']
+                start = offset_at(text, starts, change['range']['start'])
+                end = offset_at(text, starts, change['range']['end'])
+                first = bisect_right(starts, start)
+                last = bisect_right(starts, end)
+                delta = len(inserted) - (end - start)
+                self.text = text[:start] + inserted + text[end:]
+                self.starts = (starts[:first] + [start + match.end() for match in NEWLINE.finditer(inserted)]
+                               + [offset + delta for offset in starts[last:]])
+            else:
+                self.text = change['text']
+                self.starts = line_starts(self.text)
+        self.version = version
+
+
+class LanguageServer:
+    """
+    Language server for Mini-C over stdio
+
+    Supports incremental document sync, diagnostics from the compiler's
+    issues, semantic tokens and go-to-definition. The reading thread only
+    applies edits and queues work, so it never waits for a parse. One
+    worker thread owns every document's IncrementalCompiler (which shares
+    the compiler's tables): a document is analyzed once it has been
+    unchanged for `delay`, so a burst of keystrokes is parsed once, and
+    only the statements an edit touched are parsed again. Diagnostics of a
+    version that was edited while it was being analyzed are dropped rather
+    than published. Requests are answered from the analysis of the latest
+    version, in order; one cancelled with $/cancelRequest while still
+    queued is answered with RequestCancelled without being run.
+    """
+
+    def __init__(self, reader, writer, compiler=None, delay=DIAGNOSTICS_DELAY):
+        """
+        Args:
+            reader: Binary stream the client writes to
+            writer: Binary stream the client reads from
+            compiler: Compiler whose tables every document shares (built if omitted)
+            delay: Seconds without changes before a document is analyzed
+        """
+        self.reader = reader
+        self.writer = writer
+        self.compiler = compiler if compiler is not None else Compiler(parser_engine='lr')
+        self.delay = delay
+        self.documents = {}  # URI -> Document
+        self.due = {}  # URI -> monotonic time its diagnostics are due
+        self.requests = deque()  # Requests waiting for the worker
+        self.changed = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.running = True
+        self.shutdown_requested = False
+
+    def send(self, message):
+        with self.write_lock:
+            write_message(self.writer, message)
+
+    def respond(self, msg_id, result=None, error=None):
+        message = {'jsonrpc': '2.0', 'id': msg_id}
+        if error is not None:
+            message['error'] = {'code': error[0], 'message': error[1]}
+        else:
+            message['result'] = result
+        self.send(message)
+
+    def notify(self, method, params):
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    def capabilities(self):
+        return {
+            'textDocumentSync': {'openClose': True, 'change': 2},  # 2: incremental
+            'definitionProvider': True,
+            'semanticTokensProvider': {
+                'legend': {'tokenTypes': TOKEN_TYPES, 'tokenModifiers': TOKEN_MODIFIERS},
+                'full': True,
+            },
+        }
+
+    def serve(self):
+        """
+        Handle messages until the client exits or closes the stream
+
+        Returns:
+            int: Exit code (0 if 'shutdown' came before the end)
+        """
+        worker = threading.Thread(target=self.work, name='lsp-worker', daemon=True)
+        worker.start()
+        try:
+            while True:
+                message = read_message(self.reader)
+                if message is None or message.get('method') == 'exit':
+                    break
+                self.dispatch(message)
+        finally:
+            with self.changed:
+                self.running = False
+                self.changed.notify()
+            worker.join()
+        return 0 if self.shutdown_requested else 1
+
+    def dispatch(self, message):
+        """Handle one message on the reading thread"""
+        method = message.get('method')
+        params = message.get('params') or {}
+        msg_id = message.get('id')
+        if method == 'initialize':
+            self.respond(msg_id, {'capabilities': self.capabilities(), 'serverInfo': {'name': SOURCE}})
+        elif method == 'shutdown':
+            self.shutdown_requested = True
+            self.respond(msg_id, None)
+        elif method == 'textDocument/didOpen':
+            item = params['textDocument']
+            with self.changed:
+                self.documents[item['uri']] = Document(item['uri'], item['text'], item.get('version', 0),
+                                                       self.compiler)
+                self.due[item['uri']] = time.monotonic()
+                self.changed.notify()
+        elif method == 'textDocument/didChange':
+            uri = params['textDocument']['uri']
+            with self.changed:
+                document = self.documents.get(uri)
+                if document is not None:
+                    document.apply(params['contentChanges'], params['textDocument'].get('version'))
+                    self.due[uri] = time.monotonic() + self.delay
+                    self.changed.notify()
+        elif method == 'textDocument/didClose':
+            uri = params['textDocument']['uri']
+            with self.changed:
+                self.documents.pop(uri, None)
+                self.due.pop(uri, None)
+            self.notify('textDocument/publishDiagnostics', {'uri': uri, 'diagnostics': []})
+        elif method in ('textDocument/semanticTokens/full', 'textDocument/definition'):
+            with self.changed:
+                self.requests.append(message)
+                self.changed.notify()
+        elif method == '$/cancelRequest':
+            with self.changed:
+                queued = [request for request in self.requests if request['id'] == params.get('id')]
+                for request in queued:
+                    self.requests.remove(request)
+            for request in queued:
+                self.respond(request['id'], error=(REQUEST_CANCELLED, "request cancelled"))
+        elif msg_id is not None:
+            self.respond(msg_id, error=(METHOD_NOT_FOUND, f"unsupported method '{method}'"))
+
+    def next_job(self):
+        """
+        Wait for the next request or due document
+
+        Returns:
+            tuple: ('request', message) or ('analyze', uri), or None when stopping
+        """
+        with self.changed:
+            while self.running:
+                if self.requests:
+                    return 'request', self.requests.popleft()
+                if self.due:
+                    when, uri = min((when, uri) for uri, when in self.due.items())
+                    wait = when - time.monotonic()
+                    if wait <= 0:
+                        return 'analyze', uri
+                    self.changed.wait(wait)
+                else:
+                    self.changed.wait()
+            return None
+
+    def work(self):
+        while True:
+            job = self.next_job()
+            if job is None:
+                return
+            kind, arg = job
+            if kind == 'analyze':
+                self.analyze(arg)
+            else:
+                self.answer(arg)
+
+    def analyze(self, uri):
+        """
+        Bring the analysis of a document up to date and publish its diagnostics
+
+        Returns:
+            Analysis: Of the document's latest version, or None if it was
+                      closed or edited while being analyzed
+        """
+        with self.changed:
+            document = self.documents.get(uri)
+            if document is None:
+                return None
+            self.due.pop(uri, None)
+            text, version, starts = document.text, document.version, document.starts
+        analysis = document.analysis
+        if analysis is not None and analysis.version == version and analysis.text == text:
+            return analysis
+        incremental = document.incremental
+        analysis = Analysis(text, version, incremental.issues(text), lambda: incremental.front_end(text), starts)
+        with self.changed:
+            if self.documents.get(uri) is not document or document.version != version:
+                # Stale: the newer version is already due
+                return None
+            document.analysis = analysis
+        self.notify('textDocument/publishDiagnostics',
+                    {'uri': uri, 'version': version, 'diagnostics': analysis.diagnostics})
+        return analysis
+
+    def answer(self, message):
+        params = message['params']
+        uri = params['textDocument']['uri']
+        analysis = self.analyze(uri)
+        if analysis is None:
+            if uri in self.documents:
+                self.respond(message['id'], error=(CONTENT_MODIFIED, "document changed"))
+            else:
+                self.respond(message['id'], None)
+        elif message['method'] == 'textDocument/definition':
+            target = analysis.definition(params['position'])
+            self.respond(message['id'], target and {'uri': uri, 'range': target})
+        else:
+            self.respond(message['id'], {'data': analysis.semantic_tokens()})
+
+
+class BenchmarkClient:
+    """Drives a LanguageServer over pipes and waits for what it publishes"""
+
+    def __init__(self, delay):
+        client_read, server_write = os.pipe()
+        server_read, client_write = os.pipe()
+        self.server = LanguageServer(os.fdopen(server_read, 'rb'), os.fdopen(server_write, 'wb'), delay=delay)
+        self.writer = os.fdopen(client_write, 'wb')
+        self.reader = os.fdopen(client_read, 'rb')
+        self.thread = threading.Thread(target=self.server.serve, daemon=True)
+        self.thread.start()
+        self.next_id = 0
+
+    def send(self, method, params, request=False):
+        message = {'jsonrpc': '2.0', 'method': method, 'params': params}
+        if request:
+            self.next_id += 1
+            message['id'] = self.next_id
+        write_message(self.writer, message)
+        return message.get('id')
+
+    def wait_for(self, matches):
+        """Read messages until one satisfies matches; returns it and how many were skipped"""
+        skipped = []
+        while True:
+            message = read_message(self.reader)
+            if matches(message):
+                return message, skipped
+            skipped.append(message)
+
+    def diagnostics(self, version):
+        message, skipped = self.wait_for(lambda m: m.get('method') == 'textDocument/publishDiagnostics'
+                                         and m['params'].get('version') == version)
+        return message['params']['diagnostics'], skipped
+
+    def close(self):
+        self.send('shutdown', None, request=True)
+        self.wait_for(lambda m: m.get('id') == self.next_id)
+        self.send('exit', None)
+        self.writer.close()
+        self.thread.join()
+
+
+def main(argv=None):
+    from workloads import generate_function_program, generate_program
+    arg_parser = argparse.ArgumentParser(description="Language server diagnostics latency after edits")
+    arg_parser.add_argument('--lines', type=int, default=10000, help="approximate size of the documents")
+    arg_parser.add_argument('--edits', type=int, default=40, help="edits per document")
+    arg_parser.add_argument('--delay', type=float, default=DIAGNOSTICS_DELAY * 1000, metavar='MS',
+                            help="quiet time before a document is analyzed")
+    args = arg_parser.parse_args(argv)
+
+    programs = [('statements', generate_program(max(args.lines // 9, 1))),
+                ('functions', generate_function_program(max(args.lines // 100, 1), 10))]
+    uri = 'file:///bench.c'
+    print(f"{'PROGRAM':<11} {'LINES':>6} {'OPEN MS':>8} {'P50 MS':>7} {'P95 MS':>7} {'MAX MS':>7} "
+          f"{'BURST':>6}  OUTPUT")
+    failed = False
+    for name, code in programs:
+        client = BenchmarkClient(args.delay / 1000)
+        client.send('initialize', {}, request=True)
+        client.wait_for(lambda m: m.get('id') == 1)
+        start = time.perf_counter()
+        client.send('textDocument/didOpen', {'textDocument': {'uri': uri, 'text': code, 'version': 0}})
+        client.diagnostics(0)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        rng = random.Random(0)
+        text, version, latencies = code, 0, []
+        for _ in range(args.edits):
+            # Replace a literal, usually with one of another length
+            lo, hi = rng.choice([match.span() for match in NUMBER_LITERAL.finditer(text)])
+            value = str(rng.randint(1, 999))
+            starts = line_starts(text)
+            change = {'range': {'start': position_at(text, starts, lo), 'end': position_at(text, starts, hi)},
+                      'text': value}
+            text = text[:lo] + value + text[hi:]
+            version += 1
+            start = time.perf_counter()
+            client.send('textDocument/didChange', {'textDocument': {'uri': uri, 'version': version},
+                                                   'contentChanges': [change]})
+            client.diagnostics(version)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # A burst of keystrokes: only the last version should be analyzed and published
+        starts = line_starts(text)
+        end = position_at(text, starts, len(text))
+        for char in BURST:
+            version += 1
+            client.send('textDocument/didChange', {'textDocument': {'uri': uri, 'version': version},
+                                                   'contentChanges': [{'range': {'start': end, 'end': end},
+                                                                       'text': char}]})
+            text += char
+            end = position_at(text, line_starts(text), len(text))
+        diagnostics, skipped = client.diagnostics(version)
+        published = 1 + sum(m.get('method') == 'textDocument/publishDiagnostics' for m in skipped)
+        client.close()
+
+        expected = Compiler().compile(text, opt_level=0, asm=False).all_issues()
+        same = [d['message'] for d in diagnostics] == expected and text == client.server.documents[uri].text
+        failed = failed or not same
+        latencies.sort()
+        print(f"{name:<11} {text.count(chr(10)) + 1:>6} {open_ms:>8.1f} {statistics.median(latencies):>7.1f} "
+              f"{latencies[int(len(latencies) * 0.95) - 1]:>7.1f} {latencies[-1]:>7.1f} "
+              f"{published:>3}/{len(BURST):<2}  {'identical' if same else 'DIFFERENT'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
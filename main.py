@@ -1,13 +1,19 @@
-import tkinter as tk
-from gui import CompilerInterface
+import sys
 
 
 def main():
     """Initialize and run the compiler GUI"""
+    import tkinter as tk
+    from gui import CompilerInterface
+
     app_window = tk.Tk()
     compiler_ui = CompilerInterface(app_window)
     app_window.mainloop()
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Subcommands (compile, serve, ...) run without loading the GUI
+        from cli import main as cli_main
+        sys.exit(cli_main())
     main()
@@ -0,0 +1,1034 @@
+import functools
+import os
+import struct
+
+from ir import ARRAY_OPS, BINARY_OPS, CONVERSION_OPS, FLOAT_OPS, RELATIONAL_OPS, defined, float_variables, is_var, uses
+
+
+TEXT_BASE = 0x400000
+DATA_BASE = 0x600000
+PAGE_SIZE = 0x1000
+OUTPUT_BUFFER_SIZE = 65536
+
+# Register numbers as used in ModRM/REX encoding
+RAX, RCX, RDX, RBX, RSP, RBP, RSI, RDI = range(8)
+R8, R9, R10, R11, R12, R13, R14, R15 = range(8, 16)
+
+# Registers the runtime never touches, so variables can live in them for the whole program
+VARIABLE_REGS = [RBX, RBP, R12, R13, R14, R15]
+
+XMM0, XMM1 = 0, 1
+
+# Condition codes for Jcc/SETcc
+CC_E, CC_NE, CC_L, CC_GE, CC_LE, CC_G, CC_NS, CC_BE = 0x4, 0x5, 0xC, 0xD, 0xE, 0xF, 0x9, 0x6
+CC_B, CC_AE, CC_A, CC_NP = 0x2, 0x3, 0x7, 0xB
+RELATIONAL_CC = {'<': CC_L, '<=': CC_LE, '>': CC_G, '>=': CC_GE, '==': CC_E, '!=': CC_NE}
+
+# SSE2 scalar double ops (F2 0F xx)
+FLOAT_OPCODES = {'fadd': 0x58, 'fmul': 0x59, 'fsub': 0x5C, 'fdiv': 0x5E}
+
+SYS_WRITE = 1
+SYS_EXIT = 60
+
+DIVISION_MESSAGE = b"runtime error: division by zero\n"
+
+# Schubfach shortest-digits conversion (Giulietti, "The Schubfach way to
+# render doubles"): decimal exponents of the 2**q bounds and the table of
+# 126-bit approximations of 10**-k it multiplies by
+K_MIN, K_MAX = -324, 292
+Q_MIN = -1074
+C_MIN = 1 << 52
+C_TINY = 3
+
+
+def float_bits(value):
+    return struct.unpack('<Q', struct.pack('<d', value))[0]
+
+
+def flog2_pow10(e):
+    """floor(e * log2(10))"""
+    return (e * 913124641741) >> 38
+
+
+@functools.lru_cache(maxsize=None)
+def power_table():
+    """
+    floor(10**-k * 2**r) + 1 for each k, normalized to 126 bits
+
+    Returns:
+        bytes: (high 63 bits, low 63 bits) qword pairs for K_MIN..K_MAX
+    """
+    table = bytearray()
+    for k in range(K_MIN, K_MAX + 1):
+        r = flog2_pow10(-k) - 125
+        num, den = (10 ** -k, 1) if k <= 0 else (1, 10 ** k)
+        g = (num // (den << r) if r >= 0 else (num << -r) // den) + 1
+        table += struct.pack('<QQ', g >> 63, g & ((1 << 63) - 1))
+    return bytes(table)
+
+
+class NativeCodegenError(Exception):
+    """Raised when IR uses something the native backend cannot compile"""
+    pass
+
+
+class X86Encoder:
+    """
+    Minimal x86-64 machine-code assembler
+
+    Only the instruction forms the backend and its runtime need are
+    provided. Jumps and calls refer to labels and are patched by finish().
+    """
+
+    def __init__(self, base_address):
+        self.base_address = base_address  # Where the first byte will be loaded
+        self.code = bytearray()
+        self.labels = {}
+        self.fixups = []  # (offset of rel32, label)
+        self.address_fixups = []  # (offset of imm32, label)
+
+    def emit(self, *values):
+        self.code.extend(values)
+
+    def rex(self, w, reg, rm, force=False):
+        value = 0x40 | (w << 3) | ((reg >> 3) << 2) | (rm >> 3)
+        if value != 0x40 or force:
+            self.code.append(value)
+
+    def label(self, name):
+        self.labels[name] = len(self.code)
+
+    def rel32(self, name):
+        self.fixups.append((len(self.code), name))
+        self.code.extend(b'\0\0\0\0')
+
+    def mov_imm(self, reg, value):
+        if 0 <= value < 1 << 32:
+            self.rex(0, 0, reg)
+            self.emit(0xB8 + (reg & 7))
+            self.code.extend(struct.pack('<I', value))
+        elif -(1 << 31) <= value < 0:
+            self.rex(1, 0, reg)
+            self.emit(0xC7, 0xC0 | (reg & 7))
+            self.code.extend(struct.pack('<i', value))
+        else:
+            self.rex(1, 0, reg)
+            self.emit(0xB8 + (reg & 7))
+            self.code.extend(struct.pack('<Q', value & 0xFFFFFFFFFFFFFFFF))
+
+    def mov_label_address(self, reg, name):
+        """mov reg, absolute address of a label"""
+        self.rex(0, 0, reg)
+        self.emit(0xB8 + (reg & 7))
+        self.address_fixups.append((len(self.code), name))
+        self.code.extend(b'\0\0\0\0')
+
+    def load(self, reg, address):
+        """mov reg, qword [address]"""
+        self.rex(1, reg, 0)
+        self.emit(0x8B, 0x04 | ((reg & 7) << 3), 0x25)
+        self.code.extend(struct.pack('<I', address))
+
+    def store(self, address, reg):
+        """mov qword [address], reg"""
+        self.rex(1, reg, 0)
+        self.emit(0x89, 0x04 | ((reg & 7) << 3), 0x25)
+        self.code.extend(struct.pack('<I', address))
+
+    def alu(self, opcode, dst, src):
+        """Two-register form of add (0x01), sub (0x29), cmp (0x39), test (0x85), xor (0x31), mov (0x89)"""
+        self.rex(1, src, dst)
+        self.emit(opcode, 0xC0 | ((src & 7) << 3) | (dst & 7))
+
+    def alu_imm(self, ext, reg, value):
+        """add (/0), sub (/5) or cmp (/7) with a 32-bit immediate"""
+        self.rex(1, 0, reg)
+        self.emit(0x81, 0xC0 | (ext << 3) | (reg & 7))
+        self.code.extend(struct.pack('<i', value))
+
+    def load_indexed(self, reg, base, disp):
+        """mov reg, qword [base + disp8] (base is not rsp/r12)"""
+        self.rex(1, reg, base)
+        self.emit(0x8B, 0x40 | ((reg & 7) << 3) | (base & 7), disp)
+
+    def imul(self, dst, src):
+        self.rex(1, dst, src)
+        self.emit(0x0F, 0xAF, 0xC0 | ((dst & 7) << 3) | (src & 7))
+
+    def unary(self, ext, reg):
+        """F7 group: neg (/3), div (/6), idiv (/7)"""
+        self.rex(1, 0, reg)
+        self.emit(0xF7, 0xC0 | (ext << 3) | (reg & 7))
+
+    def shift(self, ext, reg, count=None):
+        """Shift group: shl (/4), shr (/5) or sar (/7) by an immediate, or by cl if count is None"""
+        self.rex(1, 0, reg)
+        if count is None:
+            self.emit(0xD3, 0xC0 | (ext << 3) | (reg & 7))
+        else:
+            self.emit(0xC1, 0xC0 | (ext << 3) | (reg & 7), count)
+
+    def step(self, ext, reg):
+        """FF group: inc (/0), dec (/1)"""
+        self.rex(1, 0, reg)
+        self.emit(0xFF, 0xC0 | (ext << 3) | (reg & 7))
+
+    def cqo(self):
+        self.emit(0x48, 0x99)
+
+    def setcc_rax(self, cc):
+        """setcc al; movzx eax, al (leaves 0 or 1 in rax)"""
+        self.emit(0x0F, 0x90 + cc, 0xC0)
+        self.emit(0x0F, 0xB6, 0xC0)
+
+    def store_byte(self, base, src):
+        """mov byte [base], src8 (base is not rsp/rbp/r12/r13)"""
+        self.rex(0, src, base, force=src >= 4)
+        self.emit(0x88, ((src & 7) << 3) | (base & 7))
+
+    def store_byte_imm(self, base, value):
+        """mov byte [base], imm8"""
+        self.rex(0, 0, base)
+        self.emit(0xC6, base & 7, value)
+
+    def add_byte_imm(self, reg, value):
+        """add reg8, imm8 (reg is al, cl, dl or bl)"""
+        self.emit(0x80, 0xC0 | reg, value)
+
+    def movq_to_xmm(self, xmm, reg):
+        self.emit(0x66)
+        self.rex(1, xmm, reg)
+        self.emit(0x0F, 0x6E, 0xC0 | ((xmm & 7) << 3) | (reg & 7))
+
+    def movq_from_xmm(self, reg, xmm):
+        self.emit(0x66)
+        self.rex(1, xmm, reg)
+        self.emit(0x0F, 0x7E, 0xC0 | ((xmm & 7) << 3) | (reg & 7))
+
+    def sse(self, prefix, opcode, dst, src):
+        """Two-register SSE2 op: addsd/subsd/mulsd/divsd (F2 58/5C/59/5E) or ucomisd (66 2E)"""
+        self.emit(prefix)
+        self.rex(0, dst, src)
+        self.emit(0x0F, opcode, 0xC0 | ((dst & 7) << 3) | (src & 7))
+
+    def cvtsi2sd(self, xmm, reg):
+        self.emit(0xF2)
+        self.rex(1, xmm, reg)
+        self.emit(0x0F, 0x2A, 0xC0 | ((xmm & 7) << 3) | (reg & 7))
+
+    def x87(self, opcode, ext, address):
+        """x87 op on a qword at an absolute address: fld (DD /0), fstp (DD /3)"""
+        self.emit(opcode, 0x04 | (ext << 3), 0x25)
+        self.code.extend(struct.pack('<I', address))
+
+    def push(self, reg):
+        self.rex(0, 0, reg)
+        self.emit(0x50 + (reg & 7))
+
+    def pop(self, reg):
+        self.rex(0, 0, reg)
+        self.emit(0x58 + (reg & 7))
+
+    def jmp(self, name):
+        self.emit(0xE9)
+        self.rel32(name)
+
+    def jcc(self, cc, name):
+        self.emit(0x0F, 0x80 + cc)
+        self.rel32(name)
+
+    def call(self, name):
+        self.emit(0xE8)
+        self.rel32(name)
+
+    def ret(self):
+        self.emit(0xC3)
+
+    def syscall(self):
+        self.emit(0x0F, 0x05)
+
+    def rep_movsb(self):
+        self.emit(0xF3, 0xA4)
+
+    def rep_stosb(self):
+        self.emit(0xF3, 0xAA)
+
+    def finish(self):
+        """
+        Resolve label references
+
+        Returns:
+            bytes: Machine code
+        """
+        for offset, name in self.fixups + self.address_fixups:
+            if name not in self.labels:
+                raise NativeCodegenError(f"undefined label '{name}'")
+        for offset, name in self.fixups:
+            self.code[offset:offset + 4] = struct.pack('<i', self.labels[name] - (offset + 4))
+        for offset, name in self.address_fixups:
+            self.code[offset:offset + 4] = struct.pack('<I', self.base_address + self.labels[name])
+        return bytes(self.code)
+
+
+# Qwords the float runtime keeps between steps
+FLOAT_SCRATCH = ('k', 'dk', 'out', 'g1', 'g0', 'vb', 'x', 'y')
+
+
+class DataLayout:
+    """Addresses in the zero-initialized data segment"""
+
+    def __init__(self, variables):
+        self.slots = {name: DATA_BASE + 8 * pos for pos, name in enumerate(variables)}
+        end = DATA_BASE + 8 * len(variables)
+        self.out_len = end
+        self.digits = end + 8  # 24 bytes: sign, up to 20 digits, newline
+        self.float_text = end + 32  # 32 bytes: the longest float repr is 24 characters
+        self.scratch = {name: end + 64 + 8 * pos for pos, name in enumerate(FLOAT_SCRATCH)}
+        self.out_buf = end + 64 + 8 * len(FLOAT_SCRATCH)
+        self.size = self.out_buf - DATA_BASE + OUTPUT_BUFFER_SIZE
+
+
+class NativeTranslator:
+    """
+    Translates IR into a static x86-64 Linux ELF executable
+
+    Values are 64-bit integers (arithmetic wraps instead of growing like the
+    reference interpreter's) or doubles, computed with SSE2 and printed
+    like Python's repr. Function calls and arrays are not supported:
+    check_supported rejects them before any code is emitted. The most used
+    variables live in callee-saved registers, the rest in the data segment.
+    print output is buffered and written with the write syscall.
+    """
+
+    def __init__(self):
+        self.asm = None
+        self.layout = None
+        self.registers = {}
+        self.floats = set()
+        self.label_counter = 0
+
+    def check_supported(self, ir_code):
+        """
+        Raises:
+            NativeCodegenError: For calls, arrays or ops the backend lacks
+        """
+        for instr in ir_code:
+            op = instr['op']
+            if op in ('param', 'call'):
+                raise NativeCodegenError("function calls are not supported by the native backend")
+            if op in ARRAY_OPS:
+                raise NativeCodegenError("arrays are not supported by the native backend")
+            if op not in BINARY_OPS and op not in CONVERSION_OPS and \
+                    op not in ('assign', 'mark', 'jump', 'jump_if_false', 'output'):
+                raise NativeCodegenError(f"cannot compile IR operation '{op}'")
+            for operand in (instr['src1'], instr['src2']):
+                if isinstance(operand, int) and not -(1 << 63) <= operand < 1 << 63:
+                    raise NativeCodegenError(f"constant {operand} does not fit in 64 bits")
+
+    def assign_storage(self, ir_code, var_weights=None):
+        """Keep the most used variables in registers (by run-time weight when profiled)"""
+        counts = {}
+        for instr in ir_code:
+            names = uses(instr)
+            dst = defined(instr)
+            if dst is not None:
+                names.append(dst)
+            for name in names:
+                counts[name] = counts.get(name, 0) + 1
+        weights = var_weights or {}
+        ranked = sorted(counts, key=lambda name: (-weights.get(name, 0), -counts[name], name))
+        self.registers = dict(zip(ranked, VARIABLE_REGS))
+        self.layout = DataLayout([name for name in ranked if name not in self.registers])
+
+    def is_float(self, operand):
+        return isinstance(operand, float) or operand in self.floats
+
+    def load_operand(self, reg, operand):
+        if isinstance(operand, float):
+            self.asm.mov_imm(reg, float_bits(operand))
+        elif not is_var(operand):
+            self.asm.mov_imm(reg, operand)
+        elif operand in self.registers:
+            self.asm.alu(0x89, reg, self.registers[operand])
+        else:
+            self.asm.load(reg, self.layout.slots[operand])
+
+    def store_result(self, name, reg):
+        if name in self.registers:
+            self.asm.alu(0x89, self.registers[name], reg)
+        else:
+            self.asm.store(self.layout.slots[name], reg)
+
+    def translate(self, ir_code, var_weights=None, declared=None):
+        """
+        Compile IR into an ELF image
+
+        Args:
+            ir_code: List of IR instructions
+            var_weights: Optional variable -> run-time use count (from a
+                         profile) that decides which variables get registers
+            declared: Variable name -> 'int' or 'float' from the declarations
+                      (CompileSession.declared_types()), for float variables
+                      the IR alone does not type
+
+        Returns:
+            bytes: Executable file contents
+
+        Raises:
+            NativeCodegenError: If the IR cannot be compiled natively
+        """
+        self.check_supported(ir_code)
+        self.floats = float_variables(ir_code, declared)
+        self.assign_storage(ir_code, var_weights)
+        self.asm = X86Encoder(TEXT_BASE + ELF_HEADERS_SIZE)
+        self.label_counter = 0
+        asm = self.asm
+
+        for reg in self.registers.values():
+            asm.alu(0x31, reg, reg)
+
+        for instr in ir_code:
+            op = instr['op']
+            if op == 'mark':
+                asm.label('ir.' + instr['src1'])
+            elif op == 'assign':
+                if instr['dst'] in self.floats:
+                    self.load_float_operand(RAX, instr['src1'])
+                else:
+                    self.load_operand(RAX, instr['src1'])
+                self.store_result(instr['dst'], RAX)
+            elif op in FLOAT_OPS:
+                self.float_binary(op, instr)
+            elif op in RELATIONAL_OPS and (self.is_float(instr['src1']) or self.is_float(instr['src2'])):
+                self.float_compare(op, instr)
+            elif op in BINARY_OPS:
+                self.binary(op, instr)
+            elif op == 'itof':
+                self.load_operand(RAX, instr['src1'])
+                asm.cvtsi2sd(XMM0, RAX)
+                asm.movq_from_xmm(RAX, XMM0)
+                self.store_result(instr['dst'], RAX)
+            elif op == 'jump':
+                asm.jmp('ir.' + instr['src1'])
+            elif op == 'jump_if_false':
+                self.load_operand(RAX, instr['src1'])
+                if self.is_float(instr['src1']):
+                    asm.shift(4, RAX, 1)  # Drops the sign, so -0.0 is false too
+                else:
+                    asm.alu(0x85, RAX, RAX)
+                asm.jcc(CC_E, 'ir.' + instr['src2'])
+            elif op == 'output':
+                self.load_operand(RAX, instr['src1'])
+                asm.call('rt.print_float' if self.is_float(instr['src1']) else 'rt.print_int')
+
+        asm.call('rt.flush')
+        self.emit_exit(0)
+        self.emit_runtime()
+        return build_elf(asm.finish(), self.layout.size)
+
+    def binary(self, op, instr):
+        asm = self.asm
+        self.load_operand(RAX, instr['src1'])
+        self.load_operand(RCX, instr['src2'])
+        if op == 'iadd':
+            asm.alu(0x01, RAX, RCX)
+        elif op == 'isub':
+            asm.alu(0x29, RAX, RCX)
+        elif op == 'imul':
+            asm.imul(RAX, RCX)
+        elif op in ('idiv', 'imod'):
+            asm.alu(0x85, RCX, RCX)
+            asm.jcc(CC_E, 'rt.division_by_zero')
+            # idiv faults on the most negative value / -1, so -1 is handled apart
+            by_minus_one = self.local_label()
+            done = self.local_label()
+            asm.alu_imm(7, RCX, -1)
+            asm.jcc(CC_E, by_minus_one)
+            asm.cqo()
+            asm.unary(7, RCX)
+            if op == 'imod':
+                asm.alu(0x89, RAX, RDX)
+            asm.jmp(done)
+            asm.label(by_minus_one)
+            if op == 'idiv':
+                asm.unary(3, RAX)
+            else:
+                asm.alu(0x31, RAX, RAX)
+            asm.label(done)
+        else:
+            asm.alu(0x39, RAX, RCX)
+            asm.setcc_rax(RELATIONAL_CC[op])
+        self.store_result(instr['dst'], RAX)
+
+    def load_float_operand(self, reg, operand):
+        """Load a float operand's bits; an int constant (from folding) is converted first"""
+        if isinstance(operand, int) and not is_var(operand):
+            operand = float(operand)
+        self.load_operand(reg, operand)
+
+    def float_binary(self, op, instr):
+        """Float arithmetic on the operands' bits in rax and rcx, with SSE2 (fmod with x87 fprem)"""
+        asm = self.asm
+        self.load_float_operand(RAX, instr['src1'])
+        self.load_float_operand(RCX, instr['src2'])
+        if op in ('fdiv', 'fmod'):
+            # Zero and negative zero have no bits set but the sign
+            asm.alu(0x89, RDX, RCX)
+            asm.shift(4, RDX, 1)
+            asm.jcc(CC_E, 'rt.division_by_zero')
+        if op == 'fmod':
+            # fprem leaves the exact remainder with the dividend's sign, like math.fmod
+            scratch = self.layout.scratch
+            partial = self.local_label()
+            asm.store(scratch['x'], RAX)
+            asm.store(scratch['y'], RCX)
+            asm.x87(0xDD, 0, scratch['y'])
+            asm.x87(0xDD, 0, scratch['x'])
+            asm.label(partial)
+            asm.emit(0xD9, 0xF8)  # fprem
+            asm.emit(0xDF, 0xE0)  # fnstsw ax
+            asm.emit(0xF6, 0xC4, 0x04)  # test ah, 4 (C2: reduction incomplete)
+            asm.jcc(CC_NE, partial)
+            asm.emit(0xDD, 0xD9)  # fstp st(1)
+            asm.x87(0xDD, 3, scratch['x'])
+            asm.load(RAX, scratch['x'])
+        else:
+            asm.movq_to_xmm(XMM0, RAX)
+            asm.movq_to_xmm(XMM1, RCX)
+            asm.sse(0xF2, FLOAT_OPCODES[op], XMM0, XMM1)
+            asm.movq_from_xmm(RAX, XMM0)
+        self.store_result(instr['dst'], RAX)
+
+    def float_compare(self, op, instr):
+        """
+        Compare as floats with ucomisd
+
+        Only the unsigned conditions are false for NaN, so < and <= compare
+        the operands swapped; == and != also test the parity (unordered) flag.
+        """
+        asm = self.asm
+        self.load_float_operand(RAX, instr['src1'])
+        self.load_float_operand(RCX, instr['src2'])
+        asm.movq_to_xmm(XMM0, RAX)
+        asm.movq_to_xmm(XMM1, RCX)
+        if op in ('<', '<='):
+            asm.sse(0x66, 0x2E, XMM1, XMM0)
+        else:
+            asm.sse(0x66, 0x2E, XMM0, XMM1)
+        if op in ('<', '>'):
+            asm.setcc_rax(CC_A)
+        elif op in ('<=', '>='):
+            asm.setcc_rax(CC_AE)
+        else:
+            ordered = self.local_label()
+            asm.setcc_rax(CC_E if op == '==' else CC_NE)
+            asm.jcc(CC_NP, ordered)
+            asm.mov_imm(RAX, 0 if op == '==' else 1)
+            asm.label(ordered)
+        self.store_result(instr['dst'], RAX)
+
+    def local_label(self):
+        self.label_counter += 1
+        return f"local.{self.label_counter}"
+
+    def emit_exit(self, status):
+        self.asm.mov_imm(RAX, SYS_EXIT)
+        self.asm.mov_imm(RDI, status)
+        self.asm.syscall()
+
+    def emit_runtime(self):
+        """print_int (value in rax), print_float (bits in rax), flush and the division-by-zero handler"""
+        asm = self.asm
+        layout = self.layout
+        newline = layout.digits + 23
+
+        # Convert rax to decimal right to left, ending at the newline
+        asm.label('rt.print_int')
+        asm.mov_imm(RSI, newline)
+        asm.store_byte_imm(RSI, ord('\n'))
+        asm.alu(0x89, R8, RAX)
+        asm.alu(0x85, RAX, RAX)
+        asm.jcc(CC_NS, 'rt.print_digits')
+        asm.unary(3, RAX)
+        asm.label('rt.print_digits')
+        asm.mov_imm(RCX, 10)
+        asm.label('rt.print_loop')
+        asm.alu(0x31, RDX, RDX)
+        asm.unary(6, RCX)  # Unsigned, so the most negative value still converts
+        asm.add_byte_imm(RDX, ord('0'))
+        asm.step(1, RSI)
+        asm.store_byte(RSI, RDX)
+        asm.alu(0x85, RAX, RAX)
+        asm.jcc(CC_NE, 'rt.print_loop')
+        asm.alu(0x85, R8, R8)
+        asm.jcc(CC_NS, 'rt.print_copy')
+        asm.step(1, RSI)
+        asm.store_byte_imm(RSI, ord('-'))
+
+        # Append the text to the output buffer, flushing first if it would not fit
+        asm.label('rt.print_copy')
+        asm.mov_imm(RCX, newline + 1)
+        asm.alu(0x29, RCX, RSI)
+        asm.label('rt.print_text')  # rsi = text, rcx = length
+        asm.load(RDX, layout.out_len)
+        asm.alu(0x89, RAX, RDX)
+        asm.alu(0x01, RAX, RCX)
+        asm.alu_imm(7, RAX, OUTPUT_BUFFER_SIZE)
+        asm.jcc(CC_BE, 'rt.print_append')
+        asm.push(RSI)
+        asm.push(RCX)
+        asm.call('rt.flush')
+        asm.pop(RCX)
+        asm.pop(RSI)
+        asm.alu(0x31, RDX, RDX)
+        asm.label('rt.print_append')
+        asm.mov_imm(RDI, layout.out_buf)
+        asm.alu(0x01, RDI, RDX)
+        asm.alu(0x01, RDX, RCX)
+        asm.store(layout.out_len, RDX)
+        asm.rep_movsb()
+        asm.ret()
+
+        # write(1, out_buf, out_len), retrying on short writes
+        asm.label('rt.flush')
+        asm.load(RDX, layout.out_len)
+        asm.mov_imm(RSI, layout.out_buf)
+        asm.label('rt.flush_loop')
+        asm.alu(0x85, RDX, RDX)
+        asm.jcc(CC_E, 'rt.flush_done')
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.mov_imm(RDI, 1)
+        asm.push(RDX)
+        asm.push(RSI)
+        asm.syscall()
+        asm.pop(RSI)
+        asm.pop(RDX)
+        asm.alu(0x85, RAX, RAX)
+        asm.jcc(CC_LE, 'rt.write_failed')
+        asm.alu(0x01, RSI, RAX)
+        asm.alu(0x29, RDX, RAX)
+        asm.jmp('rt.flush_loop')
+        asm.label('rt.flush_done')
+        asm.alu(0x31, RDX, RDX)
+        asm.store(layout.out_len, RDX)
+        asm.ret()
+
+        asm.label('rt.write_failed')
+        self.emit_exit(1)
+
+        # Output printed so far is kept, like the interpreter's
+        asm.label('rt.division_by_zero')
+        asm.call('rt.flush')
+        asm.mov_imm(RAX, SYS_WRITE)
+        asm.mov_imm(RDI, 2)
+        asm.mov_label_address(RSI, 'rt.division_message')
+        asm.mov_imm(RDX, len(DIVISION_MESSAGE))
+        asm.syscall()
+        self.emit_exit(1)
+        asm.label('rt.division_message')
+        asm.code.extend(DIVISION_MESSAGE)
+
+        self.emit_print_float()
+
+    def emit_print_float(self):
+        """
+        rt.print_float: print the double whose bits are in rax like Python's repr
+
+        The shortest digits that read back as the same double come from
+        Schubfach (integers below 2**53 are taken as they are), then are
+        laid out in fixed or exponent notation by repr's rules.
+        """
+        asm = self.asm
+        layout = self.layout
+        scratch = layout.scratch
+        digit_end = layout.digits + 23
+
+        def put(char):
+            asm.store_byte_imm(RDI, ord(char))
+            asm.step(0, RDI)
+
+        asm.label('rt.print_float')
+        asm.mov_imm(RDI, layout.float_text)
+        asm.alu(0x89, R8, RAX)
+        asm.alu(0x89, R9, RAX)  # Significand bits
+        asm.shift(4, R9, 12)
+        asm.shift(5, R9, 12)
+        asm.alu(0x89, RDX, RAX)  # Biased exponent
+        asm.shift(5, RDX, 52)
+        asm.alu_imm(4, RDX, 0x7FF)
+        asm.alu_imm(7, RDX, 0x7FF)
+        asm.jcc(CC_NE, 'rt.float_finite')
+        asm.alu(0x85, R9, R9)
+        asm.jcc(CC_NE, 'rt.float_nan')
+        asm.alu(0x85, R8, R8)
+        asm.jcc(CC_NS, 'rt.float_inf')
+        put('-')
+        asm.label('rt.float_inf')
+        for char in 'inf':
+            put(char)
+        asm.jmp('rt.float_newline')
+        asm.label('rt.float_nan')
+        for char in 'nan':
+            put(char)
+        asm.jmp('rt.float_newline')
+
+        asm.label('rt.float_finite')
+        asm.alu(0x85, R8, R8)
+        asm.jcc(CC_NS, 'rt.float_positive')
+        put('-')
+        asm.label('rt.float_positive')
+        asm.alu(0x31, R11, R11)  # dk: 0 unless the significand is scaled up
+        asm.alu(0x85, RDX, RDX)
+        asm.jcc(CC_NE, 'rt.float_normal')
+        asm.alu(0x85, R9, R9)
+        asm.jcc(CC_NE, 'rt.float_subnormal')
+        for char in '0.0':
+            put(char)
+        asm.jmp('rt.float_newline')
+
+        # Subnormal: q is the minimum; the tiniest get an extra digit of precision
+        asm.label('rt.float_subnormal')
+        asm.mov_imm(R10, Q_MIN)
+        asm.alu_imm(7, R9, C_TINY)
+        asm.jcc(CC_AE, 'rt.float_decimal')
+        asm.mov_imm(RAX, 10)
+        asm.imul(R9, RAX)
+        asm.mov_imm(R11, -1)
+        asm.jmp('rt.float_decimal')
+
+        # Normal: c = 2**52 | t, q = bq - 1075; an integer value needs no conversion
+        asm.label('rt.float_normal')
+        asm.mov_imm(RAX, C_MIN)
+        asm.alu(0x09, R9, RAX)
+        asm.mov_imm(RCX, 1075)
+        asm.alu(0x29, RCX, RDX)
+        asm.alu(0x89, R10, RCX)
+        asm.unary(3, R10)
+        asm.alu_imm(7, RCX, 0)
+        asm.jcc(CC_LE, 'rt.float_decimal')
+        asm.alu_imm(7, RCX, 53)
+        asm.jcc(CC_GE, 'rt.float_decimal')
+        asm.alu(0x89, RAX, R9)
+        asm.shift(5, RAX)
+        asm.alu(0x89, RDX, RAX)
+        asm.shift(4, RDX)
+        asm.alu(0x39, RDX, R9)
+        asm.jcc(CC_NE, 'rt.float_decimal')
+        asm.alu(0x31, RCX, RCX)
+        asm.jmp('rt.float_digits')
+
+        # r9 = c, r10 = q, r11 = dk: find k and cbl, the lower bound (closer
+        # when c is a power of two above the subnormals)
+        asm.label('rt.float_decimal')
+        asm.alu(0x89, RAX, R9)
+        asm.shift(4, RAX, 2)
+        asm.alu(0x89, RSI, RAX)
+        asm.mov_imm(RCX, 661971961083)
+        asm.imul(RCX, R10)
+        asm.mov_imm(RDX, C_MIN)
+        asm.alu(0x39, R9, RDX)
+        asm.jcc(CC_NE, 'rt.float_regular')
+        asm.alu_imm(7, R10, Q_MIN)
+        asm.jcc(CC_E, 'rt.float_regular')
+        asm.alu_imm(5, RSI, 1)
+        asm.mov_imm(RDX, 274743187321)
+        asm.alu(0x29, RCX, RDX)
+        asm.jmp('rt.float_scale')
+        asm.label('rt.float_regular')
+        asm.alu_imm(5, RSI, 2)
+        asm.label('rt.float_scale')
+        asm.shift(7, RCX, 41)
+
+        # rax = cb, rsi = cbl, rcx = k
+        asm.store(scratch['k'], RCX)
+        asm.store(scratch['dk'], R11)
+        asm.alu_imm(4, R9, 1)
+        asm.store(scratch['out'], R9)
+        asm.alu(0x89, RDX, RCX)  # h = q + flog2_pow10(-k) + 2
+        asm.unary(3, RDX)
+        asm.mov_imm(R8, 913124641741)
+        asm.imul(RDX, R8)
+        asm.shift(7, RDX, 38)
+        asm.alu(0x01, RDX, R10)
+        asm.alu_imm(0, RDX, 2)
+        asm.alu(0x89, R8, RCX)
+        asm.alu_imm(0, R8, -K_MIN)
+        asm.shift(4, R8, 4)
+        asm.mov_label_address(R9, 'rt.power_table')
+        asm.alu(0x01, R8, R9)
+        asm.load_indexed(R9, R8, 0)
+        asm.store(scratch['g1'], R9)
+        asm.load_indexed(R9, R8, 8)
+        asm.store(scratch['g0'], R9)
+        asm.alu(0x89, RCX, RDX)
+        asm.alu(0x89, R11, RAX)
+        asm.alu_imm(0, R11, 2)
+        asm.shift(4, RAX)
+        asm.shift(4, RSI)
+        asm.shift(4, R11)
+        asm.alu(0x89, R10, RSI)
+        asm.alu(0x89, RCX, RAX)
+        asm.call('rt.float_round')
+        asm.store(scratch['vb'], RAX)
+        asm.alu(0x89, RCX, R10)
+        asm.call('rt.float_round')
+        asm.alu(0x89, R10, RAX)
+        asm.alu(0x89, RCX, R11)
+        asm.call('rt.float_round')
+        asm.alu(0x89, R11, RAX)
+
+        # r9 = vb, rsi = s = vb / 4, r10 = vbl + out, r11 = vbr, r8 = out.
+        # Prefer one digit fewer (a multiple of 10) if only one of its
+        # neighbours is in the rounding interval, else s or s + 1
+        asm.load(R9, scratch['vb'])
+        asm.alu(0x89, RSI, R9)
+        asm.shift(5, RSI, 2)
+        asm.load(R8, scratch['out'])
+        asm.alu(0x01, R10, R8)
+        asm.alu_imm(7, RSI, 10)
+        asm.jcc(CC_B, 'rt.float_neighbours')
+        asm.alu(0x89, RAX, RSI)
+        asm.alu(0x31, RDX, RDX)
+        asm.mov_imm(RCX, 10)
+        asm.unary(6, RCX)
+        asm.alu(0x89, RAX, RSI)
+        asm.alu(0x29, RAX, RDX)  # sp10
+        asm.alu(0x89, RCX, RAX)
+        asm.shift(4, RCX, 2)
+        asm.alu(0x89, RDX, RAX)  # (tp10 << 2) + out
+        asm.alu_imm(0, RDX, 10)
+        asm.shift(4, RDX, 2)
+        asm.alu(0x01, RDX, R8)
+        asm.alu(0x39, R10, RCX)
+        asm.jcc(CC_A, 'rt.float_upper_ten')
+        asm.alu(0x39, RDX, R11)
+        asm.jcc(CC_BE, 'rt.float_neighbours')
+        asm.jmp('rt.float_found')
+        asm.label('rt.float_upper_ten')
+        asm.alu(0x39, RDX, R11)
+        asm.jcc(CC_A, 'rt.float_neighbours')
+        asm.alu_imm(0, RAX, 10)
+        asm.jmp('rt.float_found')
+
+        asm.label('rt.float_neighbours')
+        asm.alu(0x89, RAX, RSI)
+        asm.alu(0x89, RCX, RSI)
+        asm.shift(4, RCX, 2)
+        asm.alu(0x89, RDX, RCX)  # ((s + 1) << 2) + out
+        asm.alu_imm(0, RDX, 4)
+        asm.alu(0x01, RDX, R8)
+        asm.alu(0x39, R10, RCX)
+        asm.jcc(CC_A, 'rt.float_upper')
+        asm.alu(0x39, RDX, R11)
+        asm.jcc(CC_BE, 'rt.float_closest')
+        asm.jmp('rt.float_found')
+        asm.label('rt.float_upper')
+        asm.alu(0x39, RDX, R11)
+        asm.jcc(CC_A, 'rt.float_closest')
+        asm.step(0, RAX)
+        asm.jmp('rt.float_found')
+
+        # Both or neither are in: the closer of s and s + 1, ties to even
+        asm.label('rt.float_closest')
+        asm.alu_imm(0, RCX, 2)
+        asm.alu(0x39, R9, RCX)
+        asm.jcc(CC_B, 'rt.float_found')
+        asm.jcc(CC_A, 'rt.float_round_up')
+        asm.alu(0x89, RCX, RAX)
+        asm.alu_imm(4, RCX, 1)
+        asm.jcc(CC_E, 'rt.float_found')
+        asm.label('rt.float_round_up')
+        asm.step(0, RAX)
+
+        asm.label('rt.float_found')
+        asm.load(RCX, scratch['k'])
+        asm.load(RDX, scratch['dk'])
+        asm.alu(0x01, RCX, RDX)
+
+        # rax = digits, rcx = exponent: drop trailing zeros, then write the
+        # digits right to left ending at digit_end
+        asm.label('rt.float_digits')
+        asm.mov_imm(R8, 10)
+        asm.label('rt.float_strip')
+        asm.alu(0x89, R9, RAX)
+        asm.alu(0x31, RDX, RDX)
+        asm.unary(6, R8)
+        asm.alu(0x85, RDX, RDX)
+        asm.jcc(CC_NE, 'rt.float_stripped')
+        asm.step(0, RCX)
+        asm.jmp('rt.float_strip')
+        asm.label('rt.float_stripped')
+        asm.alu(0x89, RAX, R9)
+        asm.mov_imm(RSI, digit_end)
+        asm.label('rt.float_digit_loop')
+        asm.alu(0x31, RDX, RDX)
+        asm.unary(6, R8)
+        asm.add_byte_imm(RDX, ord('0'))
+        asm.step(1, RSI)
+        asm.store_byte(RSI, RDX)
+        asm.alu(0x85, RAX, RAX)
+        asm.jcc(CC_NE, 'rt.float_digit_loop')
+
+        # r9 = digit count, r10 = position of the decimal point
+        asm.mov_imm(R9, digit_end)
+        asm.alu(0x29, R9, RSI)
+        asm.alu(0x89, R10, R9)
+        asm.alu(0x01, R10, RCX)
+        asm.alu_imm(7, R10, -4)
+        asm.jcc(CC_LE, 'rt.float_exponent_form')
+        asm.alu_imm(7, R10, 16)
+        asm.jcc(CC_G, 'rt.float_exponent_form')
+        asm.alu_imm(7, R10, 0)
+        asm.jcc(CC_G, 'rt.float_whole')
+        put('0')
+        put('.')
+        asm.alu(0x89, RCX, R10)
+        asm.unary(3, RCX)
+        asm.mov_imm(RAX, ord('0'))
+        asm.rep_stosb()
+        asm.alu(0x89, RCX, R9)
+        asm.rep_movsb()
+        asm.jmp('rt.float_newline')
+
+        asm.label('rt.float_whole')
+        asm.alu(0x39, R10, R9)
+        asm.jcc(CC_GE, 'rt.float_integral')
+        asm.alu(0x89, RCX, R10)
+        asm.rep_movsb()
+        put('.')
+        asm.alu(0x89, RCX, R9)
+        asm.alu(0x29, RCX, R10)
+        asm.rep_movsb()
+        asm.jmp('rt.float_newline')
+        asm.label('rt.float_integral')
+        asm.alu(0x89, RCX, R9)
+        asm.rep_movsb()
+        asm.alu(0x89, RCX, R10)
+        asm.alu(0x29, RCX, R9)
+        asm.mov_imm(RAX, ord('0'))
+        asm.rep_stosb()
+        put('.')
+        put('0')
+        asm.jmp('rt.float_newline')
+
+        asm.label('rt.float_exponent_form')
+        asm.mov_imm(RCX, 1)
+        asm.rep_movsb()
+        asm.alu_imm(7, R9, 1)
+        asm.jcc(CC_E, 'rt.float_exponent')
+        put('.')
+        asm.alu(0x89, RCX, R9)
+        asm.alu_imm(5, RCX, 1)
+        asm.rep_movsb()
+        asm.label('rt.float_exponent')
+        put('e')
+        asm.alu(0x89, RAX, R10)
+        asm.alu_imm(5, RAX, 1)
+        asm.alu(0x85, RAX, RAX)
+        asm.jcc(CC_NS, 'rt.float_exponent_plus')
+        put('-')
+        asm.unary(3, RAX)
+        asm.jmp('rt.float_exponent_digits')
+        asm.label('rt.float_exponent_plus')
+        put('+')
+        asm.label('rt.float_exponent_digits')
+        asm.alu_imm(7, RAX, 100)
+        asm.jcc(CC_B, 'rt.float_exponent_two')
+        asm.alu(0x31, RDX, RDX)
+        asm.mov_imm(RCX, 100)
+        asm.unary(6, RCX)
+        asm.add_byte_imm(RAX, ord('0'))
+        asm.store_byte(RDI, RAX)
+        asm.step(0, RDI)
+        asm.alu(0x89, RAX, RDX)
+        asm.label('rt.float_exponent_two')
+        asm.alu(0x31, RDX, RDX)
+        asm.mov_imm(RCX, 10)
+        asm.unary(6, RCX)
+        asm.add_byte_imm(RAX, ord('0'))
+        asm.store_byte(RDI, RAX)
+        asm.step(0, RDI)
+        asm.add_byte_imm(RDX, ord('0'))
+        asm.store_byte(RDI, RDX)
+        asm.step(0, RDI)
+
+        asm.label('rt.float_newline')
+        put('\n')
+        asm.alu(0x89, RCX, RDI)
+        asm.mov_imm(RSI, layout.float_text)
+        asm.alu(0x29, RCX, RSI)
+        asm.jmp('rt.print_text')
+
+        # rax = the 64 bits above bit 62 of g * rcx, with bit 0 set if any
+        # below are (rcx < 2**63, g from the table entry in g1/g0)
+        asm.label('rt.float_round')
+        asm.load(RAX, scratch['g0'])
+        asm.unary(4, RCX)
+        asm.alu(0x89, R8, RDX)
+        asm.load(RAX, scratch['g1'])
+        asm.unary(4, RCX)
+        asm.shift(5, RAX, 1)
+        asm.alu(0x01, RAX, R8)
+        asm.alu(0x89, R8, RAX)
+        asm.shift(5, R8, 63)
+        asm.alu(0x01, RDX, R8)
+        asm.shift(4, RAX, 1)
+        asm.setcc_rax(CC_NE)
+        asm.alu(0x09, RAX, RDX)
+        asm.ret()
+
+        asm.label('rt.power_table')
+        asm.code.extend(power_table())
+
+
+def printed_as(text, value):
+    """
+    Whether a line an executable printed shows an interpreter output value
+
+    A float variable that is never assigned reads as the interpreter's
+    default int 0 but prints as 0.0 natively, so equal numbers also match.
+    """
+    if text == str(value):
+        return True
+    try:
+        return float(text) == value
+    except ValueError:
+        return False
+
+
+ELF_HEADER = struct.Struct('<16sHHIQQQIHHHHHH')
+PROGRAM_HEADER = struct.Struct('<IIQQQQQQ')
+ELF_HEADERS_SIZE = ELF_HEADER.size + 2 * PROGRAM_HEADER.size
+
+PT_LOAD = 1
+PF_X, PF_W, PF_R = 1, 2, 4
+
+
+def build_elf(code, data_size):
+    """
+    Wrap machine code in a static ELF executable
+
+    The text segment maps the file (headers included) at TEXT_BASE and
+    starts executing right after the headers; the data segment is
+    zero-filled memory at DATA_BASE with no bytes in the file.
+
+    Returns:
+        bytes: File contents
+    """
+    entry = TEXT_BASE + ELF_HEADERS_SIZE
+    ident = b'\x7fELF' + bytes([2, 1, 1, 0]) + bytes(8)
+    header = ELF_HEADER.pack(ident, 2, 0x3E, 1, entry, ELF_HEADER.size, 0, 0,
+                             ELF_HEADER.size, PROGRAM_HEADER.size, 2, 64, 0, 0)
+    file_size = ELF_HEADERS_SIZE + len(code)
+    text = PROGRAM_HEADER.pack(PT_LOAD, PF_R | PF_X, 0, TEXT_BASE, TEXT_BASE,
+                               file_size, file_size, PAGE_SIZE)
+    data = PROGRAM_HEADER.pack(PT_LOAD, PF_R | PF_W, 0, DATA_BASE, DATA_BASE,
+                               0, max(data_size, 8), PAGE_SIZE)
+    return header + text + data + code
+
+
+def write_executable(path, image):
+    """Write an ELF image and mark it executable"""
+    with open(path, 'wb') as file:
+        file.write(image)
+    os.chmod(path, 0o755)
@@ -0,0 +1,270 @@
+import argparse
+import bisect
+import gc
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from lexer import TokenScanner
+from workloads import generate_program
+
+
+# Comments as the lexer sees them: at a '/', a line comment wins over a block
+# comment, and an unterminated '/*' is not a comment (it lexes as '/' '*')
+COMMENT_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+
+MIN_PARALLEL_SIZE = 1 << 20  # Smaller sources are lexed in-process
+CHUNKS_PER_WORKER = 4
+
+_worker_scanner = None
+
+
+def _init_worker():
+    """Build the lexer rules once per worker (already built when the worker was forked)"""
+    global _worker_scanner
+    if _worker_scanner is None:
+        _worker_scanner = TokenScanner()
+        _worker_scanner.initialize()
+
+
+def _init_worker_ready(_):
+    return _worker_scanner is not None
+
+
+def block_comment_spans(code):
+    """
+    Find multi-line block comments
+
+    Returns:
+        tuple: (starts, ends) - sorted offsets of each comment's '/*' and just past its '*/'
+    """
+    starts, ends = [], []
+    if '/*' not in code:
+        return starts, ends
+    for match in COMMENT_PATTERN.finditer(code):
+        if match.group().startswith('/*') and '\n' in match.group():
+            starts.append(match.start())
+            ends.append(match.end())
+    return starts, ends
+
+
+def chunk_boundaries(code, count):
+    """
+    Offsets that split code into about `count` chunks that lex independently
+
+    Chunks start right after a newline. A newline inside a block comment is
+    not a token boundary, so such a cut moves to the end of the comment.
+
+    Returns:
+        list: Increasing offsets, starting with 0 and ending with len(code)
+    """
+    size = len(code)
+    starts, ends = None, None
+    bounds = [0]
+    for k in range(1, count):
+        cut = code.find('\n', max(size * k // count, bounds[-1]))
+        if cut < 0:
+            break
+        cut += 1
+        if starts is None:
+            starts, ends = block_comment_spans(code)
+        pos = bisect.bisect_left(starts, cut) - 1
+        if pos >= 0 and ends[pos] > cut:
+            cut = ends[pos]
+        if bounds[-1] < cut < size:
+            bounds.append(cut)
+    bounds.append(size)
+    return bounds
+
+
+def lex_chunk(chunk, offset, lineno):
+    """
+    Lex one chunk in a worker
+
+    Args:
+        chunk: Source text starting at a token boundary
+        offset: Position of the chunk in the whole source
+        lineno: Line number the chunk starts on
+
+    Returns:
+        tuple: (kind names, kind codes, values, lines, positions, issues) -
+               the codes are bytes and the lines and positions packed
+               int64 arrays, far cheaper to send back than dicts
+    """
+    _init_worker()
+    lexer = _worker_scanner.new_lexer(chunk)
+    lexer.lineno = lineno
+    names, codes = {}, bytearray()
+    values, lines, positions = [], array('q'), array('q')
+    tok = lexer.token()
+    while tok:
+        code = names.get(tok.type)
+        if code is None:
+            code = names[tok.type] = len(names)
+        codes.append(code)
+        values.append(tok.value)
+        lines.append(tok.lineno)
+        positions.append(tok.lexpos)
+        tok = lexer.token()
+    if offset:
+        positions = array('q', [pos + offset for pos in positions])
+    return list(names), bytes(codes), values, lines.tobytes(), positions.tobytes(), lexer.issues
+
+
+def chunk_rows(result):
+    """
+    Turn what lex_chunk returns into (kind, value, line, position) rows
+
+    Returns:
+        tuple: (rows, issues)
+    """
+    names, codes, values, lines, positions, issues = result
+    lines_array, positions_array = array('q'), array('q')
+    lines_array.frombytes(lines)
+    positions_array.frombytes(positions)
+    return list(zip(map(names.__getitem__, codes), values, lines_array, positions_array)), issues
+
+
+class ParallelTokenScanner:
+    """
+    Lexes one large source in chunks on a process pool, with the same output as TokenScanner.scan
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, workers=None, min_size=MIN_PARALLEL_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_size = min_size
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the worker pool (done on the first large scan otherwise)"""
+        with self.lock:
+            if self.pool is None:
+                _init_worker()
+                self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+                list(self.pool.map(_init_worker_ready, range(self.workers)))
+        return self
+
+    def close(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scan(self, code):
+        """
+        Scan source code and generate token stream
+
+        Args:
+            code: Source code string to tokenize
+
+        Returns:
+            tuple: (token_stream, issues) - list of tokens and list of errors
+        """
+        rows, issues = self.scan_rows(code)
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return [{'kind': kind, 'val': val, 'ln': ln, 'pos': pos} for kind, val, ln, pos in rows], issues
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def scan_rows(self, code):
+        """
+        Scan source code into (kind, value, line, position) tuples
+
+        This is what SyntaxProcessor.process reads; it makes each token's
+        dict and LexToken itself, so none is built twice.
+
+        Returns:
+            tuple: (rows, issues)
+        """
+        if len(code) < self.min_size or self.workers == 1:
+            return chunk_rows(lex_chunk(code, 0, 1))
+
+        pool = self.start().pool
+        bounds = chunk_boundaries(code, self.workers * CHUNKS_PER_WORKER)
+        futures = []
+        lineno = 1
+        for start, end in zip(bounds, bounds[1:]):
+            futures.append(pool.submit(lex_chunk, code[start:end], start, lineno))
+            lineno += code.count('\n', start, end)
+
+        rows, issues = [], []
+        for future in futures:
+            chunk, chunk_issues = chunk_rows(future.result())
+            rows += chunk
+            issues += chunk_issues
+        return rows, issues
+
+
+def generate_source(size):
+    """
+    Build a source of about `size` characters from generated programs
+
+    Block comments spanning several lines are mixed in so that chunk
+    boundaries regularly land inside them.
+    """
+    parts = []
+    total = 0
+    seed = 0
+    while total < size:
+        part = generate_program(200, seed)
+        if seed % 3 == 0:
+            lines = ['/* block', '// not a line comment', '/* not nested'][:seed // 3 % 3 + 1] + ['*/']
+            part = '\n'.join(lines) + '\n' + part
+        parts.append(part)
+        total += len(part)
+        seed += 1
+    return '\n'.join(parts)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Sequential vs parallel lexing of one large source")
+    arg_parser.add_argument('source', nargs='?', help="file to lex (default: a generated source)")
+    arg_parser.add_argument('--size-mb', type=float, default=16, help="size of the generated source")
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16])
+    args = arg_parser.parse_args(argv)
+
+    if args.source:
+        with open(args.source, 'r', encoding='utf-8') as file:
+            code = file.read()
+    else:
+        code = generate_source(int(args.size_mb * (1 << 20)))
+
+    scanner = TokenScanner()
+    scanner.initialize()
+    start = time.perf_counter()
+    expected = scanner.scan(code)
+    sequential = time.perf_counter() - start
+    print(f"{len(code) / (1 << 20):.1f} MB, {len(expected[0])} tokens, {os.cpu_count()} cores")
+    print(f"{'WORKERS':<8} {'SECONDS':>8} {'SPEEDUP':>8}  OUTPUT")
+    print(f"{'1':<8} {sequential:>8.2f} {1.0:>7.2f}x  reference")
+
+    failed = False
+    for workers in args.workers:
+        with ParallelTokenScanner(workers) as parallel:
+            start = time.perf_counter()
+            result = parallel.scan(code)
+            elapsed = time.perf_counter() - start
+        same = result == expected
+        failed = failed or not same
+        print(f"{workers:<8} {elapsed:>8.2f} {sequential / elapsed:>7.2f}x  {'identical' if same else 'DIFFERENT'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,87 +1,119 @@
+import copy
+from functools import partial
+
 import ply.yacc as yacc
+from ir import RELATIONAL_OPS, TYPED_OPS
 from lexer import TokenScanner
-from symbol_table import VariableRegistry
+from lr_parser import TableParser
+from session import CompileSession
 
 
 class SyntaxProcessor:
-    """Parser and semantic analyzer"""
+    """
+    Parser and semantic analyzer
     
-    tokens = TokenScanner.tokens
+    The grammar tables are built once by initialize() and never mutated
+    afterwards. All per-compile state lives in a CompileSession, which the
+    grammar actions reach through the per-call lexer (p.lexer.session), so
+    one processor can parse many sources concurrently.
+    """
     
-    def __init__(self):
-        self.registry = VariableRegistry()
-        self.ir_instructions = []
-        self.tmp_counter = 0
-        self.lbl_counter = 0
-        self.issues = []
-        self.ast = []
-        
-    def gen_temp(self):
-        """Generate a temporary variable name"""
-        self.tmp_counter += 1
-        return f"temp{self.tmp_counter}"
+    tokens = TokenScanner.tokens
     
-    def gen_label(self):
-        """Generate a label for control flow"""
-        self.lbl_counter += 1
-        return f"Label{self.lbl_counter}"
+    # Parse loops process() can run: PLY's own, or lr_parser.TableParser over the same tables
+    ENGINES = ('ply', 'lr')
     
-    def add_instruction(self, operation, operand1=None, operand2=None, dest=None):
-        """
-        Add an instruction to the intermediate representation
-        
-        Args:
-            operation: Operation type (assign, add, jump, etc.)
-            operand1: First operand
-            operand2: Second operand
-            dest: Destination variable
-            
-        Returns:
-            dest: The destination variable
-        """
-        instr = {'op': operation, 'src1': operand1, 'src2': operand2, 'dst': dest}
-        self.ir_instructions.append(instr)
-        return dest
+    def __init__(self):
+        self.scanner = None
+        self.processor = None
+        self.engine = 'ply'
+        self.table_parser = None
     
     # Grammar Productions
     def p_start(self, p):
         '''start : stmt_sequence'''
         p[0] = ('program', p[1])
-        self.ast.append(p[0])
+        p.lexer.session.ast.append(p[0])
     
     def p_stmt_sequence(self, p):
         '''stmt_sequence : stmt_sequence stmt
                         | stmt'''
-        p[0] = p[1] + [p[2]] if len(p) == 3 else [p[1]]
+        if len(p) == 3:
+            # Append in place; rebuilding the list per statement is quadratic
+            p[1].append(p[2])
+            p[0] = p[1]
+        else:
+            p[0] = [p[1]]
     
     def p_stmt(self, p):
         '''stmt : var_decl
+               | array_decl
+               | input_decl
                | var_assign
                | output_stmt
                | conditional
                | loop
-               | code_block'''
+               | code_block
+               | function_def
+               | return_stmt
+               | call_stmt'''
         p[0] = p[1]
     
     def p_var_decl(self, p):
         '''var_decl : data_type IDENTIFIER SEMICOLON
                    | data_type IDENTIFIER EQUALS expr SEMICOLON'''
+        session = p.lexer.session
         dtype = p[1]
         name = p[2]
         
         # Check if variable already declared in current scope
-        if self.registry.is_declared_in_current_scope(name):
-            self.issues.append(f"Redeclaration of '{name}' in current scope")
+        if session.registry.is_declared_in_current_scope(name):
+            session.report(f"Redeclaration of '{name}' in current scope", p.lineno(2))
         else:
             if len(p) == 4:
-                self.registry.add(name, dtype, None, context='declaration')
+                session.registry.add(name, dtype, None, context='declaration')
                 p[0] = ('decl', dtype, name)
             else:
-                val = p[4]
-                self.registry.add(name, dtype, val, context='declaration')
-                self.add_instruction('assign', val, None, name)
+                val = self.coerce(session, p[4], dtype, f"Float value assigned to int variable '{name}'",
+                                  p.lineno(3))
+                session.registry.add(name, dtype, val, context='declaration')
+                session.add_instruction('assign', val, None, name)
                 p[0] = ('decl_init', dtype, name, val)
     
+    def p_array_decl(self, p):
+        '''array_decl : data_type IDENTIFIER LBRACKET INTEGER RBRACKET SEMICOLON'''
+        session = p.lexer.session
+        dtype = p[1]
+        name = p[2]
+        size = p[4]
+        
+        if session.registry.is_declared_in_current_scope(name):
+            session.report(f"Redeclaration of '{name}' in current scope", p.lineno(2))
+        elif size <= 0:
+            session.report(f"Array '{name}' must have a positive size", p.lineno(2))
+        else:
+            # The symbol's value is the size, which every indexed access is checked against
+            session.registry.add(name, dtype, size, context='array')
+            session.add_instruction('array', size, dtype, name)
+        p[0] = ('array', dtype, name, size)
+    
+    def p_input_decl(self, p):
+        '''input_decl : INPUT data_type IDENTIFIER SEMICOLON'''
+        session = p.lexer.session
+        dtype = p[2]
+        name = p[3]
+        
+        # Inputs emit no IR: the optimizer already treats a variable read before
+        # any assignment as an unknown entry value, which the runner supplies
+        if session.registry.get_scope_level() != 0:
+            session.report(f"Input '{name}' must be declared at the top level", p.lineno(3))
+        elif session.registry.is_declared_in_current_scope(name):
+            session.report(f"Redeclaration of '{name}' in current scope", p.lineno(3))
+        else:
+            session.registry.add(name, dtype, None, context='input')
+            session.inputs.append((name, dtype))
+        p[0] = ('input', dtype, name)
+    
     def p_data_type(self, p):
         '''data_type : INT
                     | FLOAT'''
@@ -89,53 +121,165 @@ class SyntaxProcessor:
     
     def p_var_assign(self, p):
         '''var_assign : IDENTIFIER EQUALS expr SEMICOLON'''
+        session = p.lexer.session
         name = p[1]
-        val = p[3]
-        
-        if not self.registry.find(name):
-            self.issues.append(f"Undefined variable '{name}'")
         
-        self.add_instruction('assign', val, None, name)
+        entry = self.check_variable(session, name, p.lineno(1))
+        val = self.coerce_to_variable(session, p[3], entry, name, p.lineno(2))
+        session.add_instruction('assign', val, None, name)
         p[0] = ('assign', name, val)
     
+    def p_element_assign(self, p):
+        '''var_assign : IDENTIFIER LBRACKET expr RBRACKET EQUALS expr SEMICOLON'''
+        session = p.lexer.session
+        name = p[1]
+        index = p[3]
+        
+        entry = self.emit_check(session, name, index, p.lineno(1))
+        val = p[6]
+        if entry is not None:
+            val = self.coerce(session, val, entry['dtype'], f"Float value stored in int array '{name}'",
+                              p.lineno(5))
+        session.add_instruction('store', val, index, name)
+        p[0] = ('store', name, index, val)
+    
     def p_output_stmt(self, p):
         '''output_stmt : PRINT LPAREN expr RPAREN SEMICOLON'''
-        self.add_instruction('output', p[3], None, None)
+        session = p.lexer.session
+        session.add_instruction('output', p[3], None, None)
         p[0] = ('output', p[3])
     
     def p_conditional(self, p):
-        '''conditional : IF LPAREN comparison RPAREN code_block
-                      | IF LPAREN comparison RPAREN code_block ELSE code_block'''
-        cmp = p[3]
-        lbl_true = self.gen_label()
-        lbl_false = self.gen_label()
-        lbl_end = self.gen_label()
-        
-        self.add_instruction('jump_if_false', cmp, lbl_false, None)
-        self.add_instruction('mark', lbl_true, None, None)
+        '''conditional : IF if_test code_block
+                      | IF if_test code_block else_part code_block'''
+        session = p.lexer.session
+        cmp, lbl_true, lbl_false, lbl_end = session.label_stack.pop()
         
-        if len(p) == 6:
-            self.add_instruction('jump', lbl_end, None, None)
-            self.add_instruction('mark', lbl_false, None, None)
+        if len(p) == 4:
+            session.add_instruction('jump', lbl_end, None, None)
+            session.add_instruction('mark', lbl_false, None, None)
+            p[0] = ('if', cmp, p[3])
         else:
-            self.add_instruction('mark', lbl_false, None, None)
-            self.add_instruction('jump', lbl_end, None, None)
+            p[0] = ('if', cmp, p[3], p[5])
         
-        self.add_instruction('mark', lbl_end, None, None)
-        p[0] = ('if', cmp, p[5])
+        session.add_instruction('mark', lbl_end, None, None)
+    
+    def p_if_test(self, p):
+        '''if_test : LPAREN comparison RPAREN'''
+        # Reduced before the then-block is parsed, so the branch precedes its code
+        session = p.lexer.session
+        cmp = p[2]
+        lbl_true = session.gen_label()
+        lbl_false = session.gen_label()
+        lbl_end = session.gen_label()
+        
+        session.add_instruction('jump_if_false', cmp, lbl_false, None)
+        session.add_instruction('mark', lbl_true, None, None)
+        session.label_stack.append((cmp, lbl_true, lbl_false, lbl_end))
+        p[0] = cmp
+    
+    def p_else_part(self, p):
+        '''else_part : ELSE'''
+        # Close the then-block before the else-block is parsed
+        session = p.lexer.session
+        _, _, lbl_false, lbl_end = session.label_stack[-1]
+        session.add_instruction('jump', lbl_end, None, None)
+        session.add_instruction('mark', lbl_false, None, None)
+        p[0] = 'else'
     
     def p_loop(self, p):
-        '''loop : WHILE LPAREN comparison RPAREN code_block'''
-        lbl_start = self.gen_label()
-        lbl_end = self.gen_label()
+        '''loop : loop_start loop_test code_block'''
+        session = p.lexer.session
+        lbl_start = p[1]
+        cmp, lbl_end = p[2]
         
-        self.add_instruction('mark', lbl_start, None, None)
-        cmp = p[3]
-        self.add_instruction('jump_if_false', cmp, lbl_end, None)
-        self.add_instruction('jump', lbl_start, None, None)
-        self.add_instruction('mark', lbl_end, None, None)
+        session.add_instruction('jump', lbl_start, None, None)
+        session.add_instruction('mark', lbl_end, None, None)
         
-        p[0] = ('loop', cmp, p[5])
+        p[0] = ('loop', cmp, p[3])
+    
+    def p_for_loop(self, p):
+        '''loop : FOR for_start for_init for_control code_block'''
+        session = p.lexer.session
+        init, lbl_start = p[3]
+        cmp, lbl_end, step, step_code = p[4]
+
+        # The step was parsed before the body but runs after it
+        session.ir_instructions.extend(step_code)
+        session.add_instruction('jump', lbl_start, None, None)
+        session.add_instruction('mark', lbl_end, None, None)
+        session.registry.pop_scope()
+
+        p[0] = ('for', init, cmp, step, p[5])
+
+    def p_for_start(self, p):
+        '''for_start : LPAREN'''
+        # Variables declared in the initializer are visible only in the loop
+        session = p.lexer.session
+        session.registry.push_scope(f"for_{session.registry.current_scope_id + 1}")
+        p[0] = 'for_start'
+
+    def p_for_init(self, p):
+        '''for_init : var_decl
+                   | var_assign
+                   | SEMICOLON'''
+        # Reduced once the initializer has been emitted: the loop starts here
+        session = p.lexer.session
+        lbl_start = session.gen_label()
+        session.add_instruction('mark', lbl_start, None, None)
+        p[0] = (None if p[1] == ';' else p[1], lbl_start)
+
+    def p_for_control(self, p):
+        '''for_control : for_test for_step'''
+        session = p.lexer.session
+        cmp, lbl_end, start = p[1]
+        # Take the step's code out of the stream until the body has been emitted
+        step_code = session.ir_instructions[start:]
+        del session.ir_instructions[start:]
+        p[0] = (cmp, lbl_end, p[2], step_code)
+
+    def p_for_test(self, p):
+        '''for_test : loop_test_expr SEMICOLON'''
+        # The step's code starts where the condition's ends
+        cmp, lbl_end = p[1]
+        p[0] = (cmp, lbl_end, len(p.lexer.session.ir_instructions))
+
+    def p_loop_test_expr(self, p):
+        '''loop_test_expr : comparison'''
+        session = p.lexer.session
+        cmp = p[1]
+        lbl_end = session.gen_label()
+        session.add_instruction('jump_if_false', cmp, lbl_end, None)
+        p[0] = (cmp, lbl_end)
+
+    def p_for_step(self, p):
+        '''for_step : IDENTIFIER EQUALS expr RPAREN
+                   | RPAREN'''
+        # Both alternatives end on the closing parenthesis: the grammar has no
+        # empty rules, which PLY's error recovery can reduce forever
+        session = p.lexer.session
+        step = None
+        if len(p) == 5:
+            name = p[1]
+            entry = self.check_variable(session, name, p.lineno(1))
+            val = self.coerce_to_variable(session, p[3], entry, name, p.lineno(2))
+            session.add_instruction('assign', val, None, name)
+            step = ('assign', name, val)
+        p[0] = step
+
+    def p_loop_start(self, p):
+        '''loop_start : WHILE'''
+        # Reduced on the keyword, so the label is placed before the condition is
+        # evaluated. Not an empty rule: PLY's error recovery can loop forever
+        # reducing an empty rule in front of an error token.
+        session = p.lexer.session
+        lbl_start = session.gen_label()
+        session.add_instruction('mark', lbl_start, None, None)
+        p[0] = lbl_start
+    
+    def p_loop_test(self, p):
+        '''loop_test : LPAREN loop_test_expr RPAREN'''
+        p[0] = p[2]
     
     def p_code_block(self, p):
         '''code_block : block_start stmt_sequence block_end'''
@@ -143,22 +287,22 @@ class SyntaxProcessor:
     
     def p_block_start(self, p):
         '''block_start : LBRACE'''
+        session = p.lexer.session
         # Push new scope when entering block
-        scope_name = f"block_{self.registry.current_scope_id + 1}"
-        self.registry.push_scope(scope_name)
+        scope_name = f"block_{session.registry.current_scope_id + 1}"
+        session.registry.push_scope(scope_name)
         p[0] = 'block_start'
     
     def p_block_end(self, p):
         '''block_end : RBRACE'''
+        session = p.lexer.session
         # Pop scope when exiting block
-        self.registry.pop_scope()
+        session.registry.pop_scope()
         p[0] = 'block_end'
     
     def p_comparison(self, p):
         '''comparison : expr rel_op expr'''
-        tmp = self.gen_temp()
-        self.add_instruction(p[2], p[1], p[3], tmp)
-        p[0] = tmp
+        p[0] = self.binary(p.lexer.session, p[2], p[1], p[3])
     
     def p_rel_op(self, p):
         '''rel_op : LESS
@@ -172,9 +316,7 @@ class SyntaxProcessor:
     def p_expr_add(self, p):
         '''expr : expr PLUS term
                | expr MINUS term'''
-        tmp = self.gen_temp()
-        self.add_instruction(p[2], p[1], p[3], tmp)
-        p[0] = tmp
+        p[0] = self.binary(p.lexer.session, p[2], p[1], p[3])
     
     def p_expr_term(self, p):
         '''expr : term'''
@@ -184,9 +326,7 @@ class SyntaxProcessor:
         '''term : term MULTIPLY base
                | term DIVIDE base
                | term MOD base'''
-        tmp = self.gen_temp()
-        self.add_instruction(p[2], p[1], p[3], tmp)
-        p[0] = tmp
+        p[0] = self.binary(p.lexer.session, p[2], p[1], p[3])
     
     def p_term_base(self, p):
         '''term : base'''
@@ -199,42 +339,317 @@ class SyntaxProcessor:
     
     def p_base_id(self, p):
         '''base : IDENTIFIER'''
-        if not self.registry.find(p[1]):
-            self.issues.append(f"Undefined variable '{p[1]}'")
+        self.check_variable(p.lexer.session, p[1], p.lineno(1))
         p[0] = p[1]
     
+    def p_base_element(self, p):
+        '''base : IDENTIFIER LBRACKET expr RBRACKET'''
+        session = p.lexer.session
+        name = p[1]
+        index = p[3]
+        
+        entry = self.emit_check(session, name, index, p.lineno(1))
+        tmp = session.gen_temp(entry['dtype'] if entry is not None else 'int')
+        session.add_instruction('load', name, index, tmp)
+        p[0] = tmp
+    
     def p_base_paren(self, p):
         '''base : LPAREN expr RPAREN'''
         p[0] = p[2]
     
+    def p_base_call(self, p):
+        '''base : call'''
+        p[0] = p[1][2]
+    
+    def p_function_def(self, p):
+        '''function_def : function_header code_block'''
+        session = p.lexer.session
+        name, body = session.leave_function()
+        function = p[1]
+        if function is not None:
+            function['ir'] = body
+            p[0] = ('function', function['dtype'], name, function['params'], p[2])
+        else:
+            p[0] = ('function', None, name, [], p[2])
+    
+    def p_function_header(self, p):
+        '''function_header : data_type IDENTIFIER LPAREN param_list RPAREN
+                          | data_type IDENTIFIER LPAREN RPAREN'''
+        # Reduced before the body is parsed, so the body's IR goes to the function
+        session = p.lexer.session
+        dtype = p[1]
+        name = p[2]
+        params = p[4] if len(p) == 6 else []
+        
+        function = None
+        if session.registry.get_scope_level() != 0:
+            session.report(f"Function '{name}' must be defined at the top level", p.lineno(2))
+        elif name == 'main':
+            session.report("'main' is reserved for the top-level statements", p.lineno(2))
+        elif session.registry.is_declared_in_current_scope(name):
+            session.report(f"Redeclaration of '{name}' in current scope", p.lineno(2))
+        else:
+            # Declared before the body, so the function can call itself
+            function = session.declare_function(name, dtype, params)
+        session.enter_function(name, params, p.lineno(2))
+        p[0] = function
+    
+    def p_param_list(self, p):
+        '''param_list : param_list COMMA data_type IDENTIFIER
+                     | data_type IDENTIFIER'''
+        if len(p) == 5:
+            p[1].append((p[4], p[3]))
+            p[0] = p[1]
+        else:
+            p[0] = [(p[2], p[1])]
+    
+    def p_return_stmt(self, p):
+        '''return_stmt : RETURN expr SEMICOLON'''
+        session = p.lexer.session
+        if not session.function_stack:
+            session.report("'return' outside a function", p.lineno(1))
+        else:
+            # Every return leaves through the function's exit label, where the
+            # single 'return' instruction reads the variable named 'return'
+            # (a keyword, so it cannot clash with the program's variables)
+            name, exit_label, _ = session.function_stack[-1]
+            function = session.functions.get(name)
+            val = p[2]
+            if function is not None:
+                # A rejected header declares no function: its error is already reported
+                val = self.coerce(session, val, function['dtype'],
+                                  f"Float value returned from int function '{name}'", p.lineno(3))
+            session.add_instruction('assign', val, None, 'return')
+            session.add_instruction('jump', exit_label, None, None)
+        p[0] = ('return', p[2])
+    
+    def p_call_stmt(self, p):
+        '''call_stmt : call SEMICOLON'''
+        name, args, _ = p[1]
+        p[0] = ('call', name, args)
+    
+    def p_call(self, p):
+        '''call : IDENTIFIER LPAREN arg_list RPAREN
+               | IDENTIFIER LPAREN RPAREN'''
+        session = p.lexer.session
+        name = p[1]
+        args = p[3] if len(p) == 5 else []
+        line = p.lineno(1)
+        
+        function = session.functions.get(name)
+        if function is None:
+            if session.registry.find(name):
+                session.report(f"'{name}' is not a function", line)
+            else:
+                session.report(f"Undefined function '{name}'", line)
+        elif len(args) != len(function['params']):
+            session.report(f"Function '{name}' takes {len(function['params'])} "
+                           f"argument(s), {len(args)} given", line)
+        else:
+            # An int argument of a float parameter is converted when it is bound
+            for arg, (pname, ptype) in zip(args, function['params']):
+                if ptype == 'int' and session.type_of(arg) == 'float':
+                    session.report(f"Float argument passed to int parameter '{pname}' of '{name}'", line)
+        
+        tmp = session.gen_temp(function['dtype'] if function is not None else 'int')
+        session.add_instruction('call', name, len(args), tmp)
+        p[0] = (name, args, tmp)
+    
+    def p_arg_list(self, p):
+        '''arg_list : arg_list COMMA expr
+                   | expr'''
+        # Each argument is pushed as soon as it is evaluated; a call takes
+        # the last n pushed, so calls nested in arguments keep their own
+        session = p.lexer.session
+        if len(p) == 4:
+            session.add_instruction('param', p[3], None, None)
+            p[1].append(p[3])
+            p[0] = p[1]
+        else:
+            session.add_instruction('param', p[1], None, None)
+            p[0] = [p[1]]
+    
+    def check_variable(self, session, name, line, array=False):
+        """
+        Report a name that cannot be used as a variable (or with array, as
+        an indexed array) where it appears, on line
+        
+        Returns:
+            dict: The symbol entry, or None if an issue was reported
+        """
+        entry = session.registry.find(name)
+        if not entry:
+            session.report(f"Undefined variable '{name}'", line)
+        elif entry['ctx'] == 'function':
+            session.report(f"Function '{name}' used as a variable", line)
+        elif array and entry['ctx'] != 'array':
+            session.report(f"'{name}' is not an array", line)
+        elif not array and entry['ctx'] == 'array':
+            session.report(f"Array '{name}' used without an index", line)
+        elif session.function_stack and entry['scope_level'] == 0:
+            # Functions only see their parameters and locals, so each one can
+            # be optimized, cached and translated on its own
+            session.report(f"Global '{name}' cannot be used in function "
+                           f"'{session.function_stack[-1][0]}'", line)
+        else:
+            return entry
+        return None
+    
+    def emit_check(self, session, name, index, line):
+        """
+        Emit the bounds check before an indexed load or store
+        
+        Every access is checked; the bce pass removes the checks that range
+        analysis proves can never fail. Constant indexes are checked here.
+        
+        Returns:
+            dict: The array's symbol entry, or None if an issue was reported
+        """
+        entry = self.check_variable(session, name, line, array=True)
+        if entry is None:
+            return None
+        size = entry['val']
+        if session.type_of(index) == 'float':
+            session.report(f"Index of '{name}' must be an int", line)
+        elif isinstance(index, int) and not 0 <= index < size:
+            session.report(f"Index {index} is out of bounds for '{name}' (size {size})", line)
+        session.add_instruction('check', index, size, name)
+        return entry
+    
+    def binary(self, session, symbol, left, right):
+        """
+        Emit a binary operation on operands converted to their common type
+        
+        An int operand is widened when the other one is a float. Arithmetic
+        gets the typed op for that type (TYPED_OPS); comparisons stay untyped
+        and produce an int.
+        
+        Returns:
+            str: Temp holding the result
+        """
+        dtype = 'float' if 'float' in (session.type_of(left), session.type_of(right)) else 'int'
+        left = self.convert(session, left, dtype)
+        right = self.convert(session, right, dtype)
+        if symbol in RELATIONAL_OPS:
+            tmp = session.gen_temp('int')
+            session.add_instruction(symbol, left, right, tmp)
+        else:
+            tmp = session.gen_temp(dtype)
+            session.add_instruction(TYPED_OPS[symbol, dtype], left, right, tmp)
+        return tmp
+    
+    def convert(self, session, operand, dtype):
+        """
+        Widen an int operand used where a float is expected
+        
+        Constants are converted here, anything else by an 'itof'. Floats
+        are never narrowed; callers report them instead.
+        
+        Returns:
+            The operand to use in its place
+        """
+        if dtype != 'float' or session.type_of(operand) == 'float':
+            return operand
+        if not isinstance(operand, str):
+            return float(operand)
+        tmp = session.gen_temp('float')
+        session.add_instruction('itof', operand, None, tmp)
+        return tmp
+    
+    def coerce(self, session, value, dtype, message, line):
+        """
+        Convert a value that is stored in a place of type dtype
+        
+        A float stored in an int place is reported (with message, on line)
+        and left as it is.
+        
+        Returns:
+            The value to store
+        """
+        if dtype != 'float' and session.type_of(value) == 'float':
+            session.report(message, line)
+            return value
+        return self.convert(session, value, dtype)
+    
+    def coerce_to_variable(self, session, value, entry, name, line):
+        """Convert a value assigned to a variable (entry is None if it was reported)"""
+        if entry is None:
+            return value
+        return self.coerce(session, value, entry['dtype'], f"Float value assigned to int variable '{name}'", line)
+    
     def p_error(self, p):
-        """Handle syntax errors"""
+        """Handle syntax errors (PLY registration only; see syntax_error)"""
+        self.syntax_error(p.lexer.session if p else None, p)
+    
+    def syntax_error(self, session, p):
+        """
+        Record a syntax error in the session being parsed
+        
+        Args:
+            session: CompileSession that receives the error
+            p: Offending token, or None at end of input
+        """
+        session.syntax_errors += 1
         if p:
-            self.issues.append(f"Syntax error near '{p.value}' (line {p.lineno})")
+            session.issues.append(f"Syntax error near '{p.value}' (line {p.lineno})")
         else:
-            self.issues.append("Unexpected end of input")
+            session.issues.append("Unexpected end of input")
     
-    def initialize(self):
-        """Initialize the parser"""
+    def initialize(self, scanner=None, engine='ply'):
+        """
+        Initialize the parser
+        
+        Args:
+            scanner: Initialized TokenScanner to share (one is built if omitted)
+            engine: 'ply' for PLY's parse loop, 'lr' for the table-driven loop
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"unknown parser engine '{engine}'")
+        if scanner is None:
+            scanner = TokenScanner()
+            scanner.initialize()
+        self.scanner = scanner
         self.processor = yacc.yacc(module=self)
+        self.engine = engine
+        if engine == 'lr':
+            self.table_parser = TableParser(self.processor)
     
-    def process(self, code):
+    def process(self, code, session=None, tokens=None):
         """
         Parse source code and generate IR
         
         Args:
             code: Source code string
+            session: CompileSession to fill (a fresh one is used if omitted)
+            tokens: (kind, value, line, position) rows of code scanned
+                    beforehand (their lexical errors already in
+                    session.lex_issues); lexed while parsing if omitted
             
         Returns:
             Abstract syntax tree
         """
-        self.ir_instructions = []
-        self.tmp_counter = 0
-        self.lbl_counter = 0
-        self.issues = []
-        self.ast = []
+        if session is None:
+            session = CompileSession(code)
+        
+        # Grammar actions find the session through the lexer, so one is made either way
+        lexer = self.scanner.new_lexer(code, session.lex_issues, session)
+        if tokens is None:
+            next_token = partial(self.scanner.next_token, lexer, session.token_stream)
+        else:
+            next_token = self.scanner.token_reader(tokens, session.token_stream)
+        
+        if self.engine == 'lr':
+            # Keeps its stacks in locals, so the shared instance is reentrant
+            result = self.table_parser.parse(lexer, next_token, partial(self.syntax_error, session))
+        else:
+            # The generated LR tables are shared; the shallow copy only gives this
+            # call its own parse stacks and an error handler bound to the session
+            parser = copy.copy(self.processor)
+            parser.errorfunc = partial(self.syntax_error, session)
+            result = parser.parse(lexer=lexer, tokenfunc=next_token)
         
-        # Ensure symbol table is at global scope
-        self.registry.clear()
+        # Error recovery can stop early at end of input; keep the token list complete
+        while next_token():
+            pass
         
-        return self.processor.parse(code)
+        return result
@@ -0,0 +1,192 @@
+import time
+
+from bounds import eliminate_bounds_checks
+from cfg import CFG_ANALYSES, AnalysisCache, build_cfg
+from ir_format import format_ir
+from loops import LOOP_ANALYSES, optimize_loops
+from pgo import apply_profile, layout_blocks, profile_hints
+from ssa import (coalesce_versions, construct_ssa, destruct_ssa, eliminate_dead_code,
+                 global_value_numbering, sparse_conditional_constant_propagation)
+from simplify import simplify_cfg
+from unroll import DEFAULT_UNROLL_FACTOR, unroll_loops
+
+
+class Pass:
+    """
+    One IR transformation
+
+    run(cfg, manager) changes the CFG in place and returns how many changes
+    it made. When that is non-zero, every cached analysis except those in
+    preserves is invalidated.
+    """
+
+    def __init__(self, name, run, preserves=(), description=''):
+        self.name = name
+        self.run = run
+        self.preserves = preserves
+        self.description = description
+
+
+def _ssa(cfg, manager):
+    analyses = manager.analyses
+    return construct_ssa(cfg, analyses.get('dominators'), analyses.get('frontiers'),
+                         analyses.get('dominator-tree'))
+
+
+def _loops(cfg, manager):
+    return optimize_loops(cfg, manager.analyses, manager.reports.setdefault('loops', []))
+
+
+def _bce(cfg, manager):
+    removed = eliminate_bounds_checks(cfg, manager.analyses.get('dominators'))
+    manager.reports['checks_eliminated'] = manager.reports.get('checks_eliminated', 0) + removed
+    return removed
+
+
+def _unroll(cfg, manager):
+    return unroll_loops(cfg, manager.analyses, manager.unroll_factor, manager.reports.get('loops'))
+
+
+PASSES = {
+    'ssa': Pass('ssa', _ssa, CFG_ANALYSES, "build SSA form"),
+    'sccp': Pass('sccp', lambda cfg, manager: sparse_conditional_constant_propagation(cfg),
+                 (), "sparse conditional constant propagation"),
+    'gvn': Pass('gvn', lambda cfg, manager: global_value_numbering(cfg, manager.analyses.get('dominator-tree')),
+                CFG_ANALYSES, "global value numbering and copy propagation"),
+    'bce': Pass('bce', _bce, CFG_ANALYSES, "bounds-check elimination by range analysis"),
+    'dce': Pass('dce', lambda cfg, manager: eliminate_dead_code(cfg), CFG_ANALYSES,
+                "dead-code elimination"),
+    'out-of-ssa': Pass('out-of-ssa', lambda cfg, manager: destruct_ssa(cfg), (),
+                       "replace phis with copies"),
+    'coalesce': Pass('coalesce', lambda cfg, manager: coalesce_versions(cfg, manager.analyses.get('liveness')[1]),
+                     CFG_ANALYSES, "rename SSA versions back to their variables"),
+    'loop-opt': Pass('loop-opt', _loops, (), "loop-invariant code motion and strength reduction"),
+    'simplify-cfg': Pass('simplify-cfg', lambda cfg, manager: simplify_cfg(cfg), (),
+                         "constant branches, jump threading, block merging, unused labels"),
+    'pgo-layout': Pass('pgo-layout', lambda cfg, manager: layout_blocks(cfg) if manager.profile else 0,
+                       CFG_ANALYSES, "profile-guided block layout and branch orientation"),
+    'unroll': Pass('unroll', _unroll, (), "full and partial unrolling of counting loops"),
+}
+
+SSA_PIPELINE = ['ssa', 'sccp', 'gvn', 'bce', 'dce', 'out-of-ssa', 'coalesce']
+
+PIPELINES = {
+    0: [],
+    1: SSA_PIPELINE + ['simplify-cfg'],
+    # Unrolled copies expose constants and redundancies, so the SSA passes run again
+    2: SSA_PIPELINE + ['loop-opt', 'unroll'] + SSA_PIPELINE + ['simplify-cfg'],
+}
+
+
+def pipeline_for(opt_level, profile=False):
+    """
+    Pass names run at an optimization level (levels above the highest use the highest)
+
+    With a profile, optimizing levels end with the profile-guided layout.
+    """
+    pipeline = list(PIPELINES[min(opt_level, max(PIPELINES))])
+    if profile and pipeline:
+        pipeline.append('pgo-layout')
+    return pipeline
+
+
+def cfg_size(cfg):
+    """Instructions in a CFG, labels not counted"""
+    return sum(len(block.instrs) for block in cfg.blocks)
+
+
+class PassManager:
+    """
+    Runs a pipeline of passes over one CFG that shares cached analyses
+
+    Records per-pass timing (analyses computed on demand are included and
+    also reported separately) and instruction counts before and after.
+    """
+
+    def __init__(self, pipeline, print_after=(), unroll_factor=DEFAULT_UNROLL_FACTOR, profile=None,
+                 declared=None, return_types=None):
+        """
+        Args:
+            pipeline: Pass names in order
+            print_after: Pass names (or 'all') to dump the IR after
+            unroll_factor: Body copies per test for partially unrolled loops
+            profile: pgo.Profile recorded from the same source (IR must be as parsed)
+            declared: Variable name -> declared type (see ir.float_variables)
+            return_types: Function name -> return type of the functions the IR calls
+
+        Raises:
+            ValueError: For an unknown pass name
+        """
+        unknown = [name for name in list(pipeline) + list(print_after)
+                   if name not in PASSES and name != 'all']
+        if unknown:
+            raise ValueError(f"unknown pass '{unknown[0]}' (known: {', '.join(PASSES)})")
+        self.pipeline = [PASSES[name] for name in pipeline]
+        self.print_after = set(print_after)
+        self.unroll_factor = unroll_factor
+        self.profile = profile
+        self.declared = declared or {}
+        self.return_types = return_types or {}
+        self.analyses = None
+        self.stats = []  # One dict per pass run
+        self.dumps = []  # (pass name, IR listing)
+        # Structured results from passes, e.g. 'loops', 'checks_eliminated' and 'profile_hints'
+        self.reports = {}
+
+    def run(self, ir_code):
+        """
+        Run the pipeline
+
+        Args:
+            ir_code: List of IR instructions (not modified)
+
+        Returns:
+            list: Transformed IR instructions
+        """
+        if not self.pipeline:
+            return ir_code
+
+        cfg = build_cfg(ir_code)
+        cfg.declared = self.declared
+        cfg.return_types = self.return_types
+        if self.profile is not None:
+            apply_profile(cfg, self.profile)
+        cfg.remove_unreachable()
+        self.analyses = AnalysisCache(cfg, LOOP_ANALYSES)
+
+        for ir_pass in self.pipeline:
+            before = cfg_size(cfg)
+            analysis_before = self.analyses.seconds
+            start = time.perf_counter()
+            changes = ir_pass.run(cfg, self)
+            elapsed = time.perf_counter() - start
+            if changes:
+                self.analyses.invalidate(ir_pass.preserves)
+
+            self.stats.append({
+                'pass': ir_pass.name,
+                'ms': elapsed * 1000,
+                'analysis_ms': (self.analyses.seconds - analysis_before) * 1000,
+                'changes': changes,
+                'ir_before': before,
+                'ir_after': cfg_size(cfg),
+            })
+            if 'all' in self.print_after or ir_pass.name in self.print_after:
+                self.dumps.append((ir_pass.name, format_ir(cfg.to_ir())))
+
+        if self.profile is None:
+            return cfg.to_ir()
+        branch_positions = {}
+        ir_code = cfg.to_ir(branch_positions)
+        self.reports['profile_hints'] = profile_hints(cfg, branch_positions)
+        return ir_code
+
+
+def format_pass_stats(stats):
+    """Render pass statistics as a table"""
+    lines = [f"{'PASS':<12} {'TIME':>10} {'ANALYSES':>10} {'CHANGES':>8} {'IR':>14}", "─" * 58]
+    for row in stats:
+        delta = row['ir_after'] - row['ir_before']
+        lines.append(f"{row['pass']:<12} {row['ms']:>7.2f} ms {row['analysis_ms']:>7.2f} ms "
+                     f"{row['changes']:>8} {row['ir_after']:>7} ({delta:+d})")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,280 @@
+import hashlib
+import json
+
+from cfg import build_cfg
+from interpreter import IRInterpreter
+from ir import RELATIONAL_OPS, defined, is_var, make_instr, uses
+from loops import int_variables
+
+
+PROFILE_VERSION = 1
+
+_INVERTED = {'<': '>=', '>=': '<', '<=': '>', '>': '<=', '==': '!=', '!=': '=='}
+
+
+class ProfileError(Exception):
+    """Raised when a profile cannot be collected or read"""
+    pass
+
+
+def source_hash(code):
+    """Key that ties a profile to the exact source it was recorded from"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class Profile:
+    """Execution counts of one source's basic blocks"""
+
+    def __init__(self, source_sha256, blocks, taken):
+        self.source_sha256 = source_sha256
+        self.blocks = blocks  # Block index in build_cfg(parsed IR) -> executions
+        self.taken = taken  # Block index -> times its jump_if_false jumped
+
+    def matches(self, code):
+        """Whether the profile was recorded from this source"""
+        return self.source_sha256 == source_hash(code)
+
+    def to_dict(self):
+        return {
+            'version': PROFILE_VERSION,
+            'source_sha256': self.source_sha256,
+            'blocks': {str(index): count for index, count in sorted(self.blocks.items())},
+            'taken': {str(index): count for index, count in sorted(self.taken.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Raises:
+            ProfileError: For another format version or missing fields
+        """
+        if not isinstance(data, dict) or data.get('version') != PROFILE_VERSION:
+            raise ProfileError(f"not a version {PROFILE_VERSION} profile")
+        try:
+            return cls(data['source_sha256'],
+                       {int(index): count for index, count in data['blocks'].items()},
+                       {int(index): count for index, count in data['taken'].items()})
+        except (KeyError, AttributeError, ValueError) as e:
+            raise ProfileError(f"malformed profile: {e}")
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=1)
+            file.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a profile file
+
+        Raises:
+            ProfileError: If the file cannot be read or is not a profile
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            raise ProfileError(f"cannot read profile {path}: {e}")
+        return cls.from_dict(data)
+
+
+def instrument(ir_code):
+    """
+    Add execution counters to parsed IR
+
+    Every block starts with `count b<index>` and every taken jump_if_false
+    edge goes through `count t<index>`, where index is the block's position
+    in build_cfg(ir_code). Only the IR interpreter runs 'count'.
+
+    Returns:
+        list: Instrumented IR instructions
+    """
+    cfg = build_cfg(ir_code)
+    for block in list(cfg.blocks):
+        term = block.terminator
+        if term is not None and term['op'] == 'jump_if_false':
+            edge = cfg.split_edge(block, block.target)
+            edge.instrs.insert(0, make_instr('count', f"t{block.index}"))
+        block.instrs.insert(0, make_instr('count', f"b{block.index}"))
+    return cfg.to_ir()
+
+
+def collect_profile(code, ir_code, interpreter=None, functions=None):
+    """
+    Run a program with counters and record its profile
+
+    Only main is instrumented; functions run without counters.
+
+    Args:
+        code: Source the IR was compiled from
+        ir_code: IR as parsed (opt level 0)
+        interpreter: IRInterpreter to run with (a default one if omitted)
+        functions: CompileSession.functions of the program
+
+    Returns:
+        tuple: (Profile, ExecutionResult of the instrumented run)
+
+    Raises:
+        IRRuntimeError: If the program fails
+    """
+    result = (interpreter or IRInterpreter()).run(instrument(ir_code), functions=functions)
+    blocks, taken = {}, {}
+    for name, count in result.counts.items():
+        (blocks if name[0] == 'b' else taken)[int(name[1:])] = count
+    return Profile(source_hash(code), blocks, taken), result
+
+
+def apply_profile(cfg, profile):
+    """Attach recorded counts to the blocks of a CFG built from parsed IR"""
+    for block in cfg.blocks:
+        block.count = profile.blocks.get(block.index, 0)
+        term = block.terminator
+        if term is not None and term['op'] == 'jump_if_false':
+            block.taken = profile.taken.get(block.index, 0)
+
+
+def edge_weight(block, succ):
+    """Estimated executions of the edge block -> succ"""
+    if block.count is None:
+        return 0
+    if block.target is not None and block.fallthrough is not None and block.target is not block.fallthrough:
+        if block.taken is None:
+            return block.count // 2
+        taken = min(block.taken, block.count)
+        return taken if succ is block.target else block.count - taken
+    return block.count
+
+
+def infer_counts(cfg):
+    """Estimate counts of blocks created after the profile was applied from their predecessors"""
+    for block in cfg.reverse_postorder():
+        if block.count is None:
+            block.count = sum(edge_weight(pred, block) for pred in block.preds)
+    for block in cfg.blocks:
+        if block.count is None:
+            block.count = 0
+
+
+def _invertible(block, int_vars, use_counts):
+    """The comparison feeding block's jump_if_false, if negating it in place is safe"""
+    cond = block.terminator['src1']
+    if not is_var(cond) or use_counts.get(cond, 0) != 1:
+        return None
+    for instr in reversed(block.instrs[:-1]):
+        if defined(instr) == cond:
+            if instr['op'] not in RELATIONAL_OPS:
+                return None
+            # a < b and not (a >= b) differ for NaN, so only int comparisons are flipped
+            for operand in (instr['src1'], instr['src2']):
+                if isinstance(operand, float) or (is_var(operand) and operand not in int_vars):
+                    return None
+            return instr
+    return None
+
+
+def layout_blocks(cfg):
+    """
+    Order blocks so that hot successors follow their predecessors
+
+    Blocks are joined into chains along the heaviest edges first (an edge
+    joins two chains when it leaves the tail of one and enters the head of
+    the other); the entry's chain comes first, the rest by decreasing heat,
+    and the exit block stays last. A conditional jump whose hot side is the
+    jump target gets its comparison negated so that side falls through.
+
+    Returns:
+        int: Number of blocks moved plus branches inverted
+    """
+    infer_counts(cfg)
+    int_vars = int_variables(cfg)
+    use_counts = {}
+    for block in cfg.blocks:
+        for name in (name for instr in block.instrs for name in uses(instr)):
+            use_counts[name] = use_counts.get(name, 0) + 1
+
+    chain_of = {block: [block] for block in cfg.blocks}
+    position = {block: pos for pos, block in enumerate(cfg.blocks)}
+    edges = [(edge_weight(block, succ), block, succ) for block in cfg.blocks for succ in block.succs]
+    edges.sort(key=lambda edge: (-edge[0], position[edge[1]], position[edge[2]]))
+    for weight, block, succ in edges:
+        if weight <= 0:
+            break
+        head, tail = chain_of[block], chain_of[succ]
+        if succ is cfg.entry or succ is cfg.exit or head is tail:
+            continue
+        if head[-1] is not block or tail[0] is not succ:
+            continue
+        if succ is block.target and block.fallthrough is not None and block.fallthrough is not succ:
+            if _invertible(block, int_vars, use_counts) is None:
+                continue
+        head.extend(tail)
+        for moved in tail:
+            chain_of[moved] = head
+
+    chains = []
+    for block in cfg.blocks:
+        if chain_of[block][0] is block:
+            chains.append(chain_of[block])
+    entry_chain = chain_of[cfg.entry]
+    rest = [chain for chain in chains if chain is not entry_chain and chain[-1] is not cfg.exit]
+    rest.sort(key=lambda chain: -max(block.count for block in chain))
+    order = list(entry_chain) + [block for chain in rest for block in chain]
+    if order[-1] is not cfg.exit:
+        order += chain_of[cfg.exit]
+    changes = sum(1 for old, new in zip(cfg.blocks, order) if old is not new)
+    cfg.blocks = order
+
+    for pos, block in enumerate(order[:-1]):
+        term = block.terminator
+        if term is None or term['op'] != 'jump_if_false' or block.target is block.fallthrough:
+            continue
+        if order[pos + 1] is block.target and block.fallthrough is not order[pos + 1]:
+            cmp = _invertible(block, int_vars, use_counts)
+            if cmp is not None:
+                cmp['op'] = _INVERTED[cmp['op']]
+                block.target, block.fallthrough = block.fallthrough, block.target
+                if block.taken is not None:
+                    block.taken = block.count - min(block.taken, block.count)
+                changes += 1
+    return changes
+
+
+class ProfileHints:
+    """What the code generators learn from a profile about the final IR"""
+
+    def __init__(self, branch_bias, var_weights):
+        self.branch_bias = branch_bias  # IR position of a jump_if_false -> probability it jumps
+        self.var_weights = var_weights  # Variable -> estimated reads and writes at run time
+
+    def hot_variables(self):
+        """Variables by decreasing weight"""
+        return sorted(self.var_weights, key=lambda name: (-self.var_weights[name], name))
+
+
+def profile_hints(cfg, branch_positions):
+    """
+    Summarize block counts for the code generators
+
+    Args:
+        cfg: Profiled ControlFlowGraph after the last pass
+        branch_positions: Block -> IR position of its jump_if_false (see to_ir)
+
+    Returns:
+        ProfileHints
+    """
+    infer_counts(cfg)
+    branch_bias = {}
+    for block, pos in branch_positions.items():
+        if block.count and block.taken is not None:
+            branch_bias[pos] = min(block.taken, block.count) / block.count
+    var_weights = {}
+    for block in cfg.blocks:
+        if not block.count:
+            continue
+        for instr in block.instrs:
+            names = uses(instr)
+            if defined(instr) is not None:
+                names.append(defined(instr))
+            for name in names:
+                var_weights[name] = var_weights.get(name, 0) + block.count
+    return ProfileHints(branch_bias, var_weights)
@@ -0,0 +1,203 @@
+from symbol_table import VariableRegistry
+
+
+class CompileSession:
+    """Mutable state for compiling one source: tokens, IR, symbols and diagnostics"""
+
+    def __init__(self, code=''):
+        self.code = code
+        self.registry = VariableRegistry()
+        self.token_stream = []
+        self.lex_issues = []
+        self.ir_instructions = []
+        self.pass_stats = []  # Time and IR size per optimization pass
+        self.ir_dumps = []  # (pass name, IR listing) requested with print_after
+        self.loop_stats = []  # One dict per loop optimized at -O2
+        self.profile_hints = None  # pgo.ProfileHints when compiled with a matching profile
+        self.inputs = []  # (name, dtype) of each 'input' declaration, in order
+        # Function name -> {'name', 'dtype', 'params': [(name, dtype)], 'ir', 'asm', 'loop_stats'},
+        # in definition order
+        self.functions = {}
+        self.function_stats = []  # Time and IR size per function in the back end
+        # Bounds checks in the parsed IR, removed by the bce pass and left in the
+        # optimized IR (main and functions together)
+        self.bounds_checks = {'emitted': 0, 'eliminated': 0, 'remaining': 0}
+        # Functions whose bodies are being parsed, innermost last (see enter_function)
+        self.function_stack = []
+        self.tmp_counter = 0
+        self.temp_types = {}  # Temp -> 'int' or 'float', for the IR being emitted
+        self.lbl_counter = 0
+        # Labels of the if statements being parsed, innermost last
+        self.label_stack = []
+        self.issues = []
+        self.syntax_errors = 0  # How many of the issues are syntax errors
+        self.ast = []
+        self.asm = []
+
+    def gen_temp(self, dtype='int'):
+        """Generate a temporary variable name for values of type dtype"""
+        self.tmp_counter += 1
+        temp = f"temp{self.tmp_counter}"
+        self.temp_types[temp] = dtype
+        return temp
+
+    def type_of(self, operand):
+        """
+        Type of an operand of the IR being emitted
+
+        Args:
+            operand: Constant, temp or variable name (looked up in the
+                     scopes open right now, so a shadowing declaration wins)
+
+        Returns:
+            str: 'int' or 'float' ('int' for names that are not declared)
+        """
+        if isinstance(operand, float):
+            return 'float'
+        if not isinstance(operand, str):
+            return 'int'
+        if operand in self.temp_types:
+            return self.temp_types[operand]
+        entry = self.registry.find(operand)
+        return 'float' if entry is not None and entry['dtype'] == 'float' else 'int'
+
+    def declared_types(self):
+        """
+        Type of every declared variable, for ir.float_variables
+
+        The IR does not scope names, so a name declared both int and float
+        (in different scopes) is given 'float'.
+
+        Returns:
+            dict: Variable name -> declared type
+        """
+        types = {}
+        for entry in self.registry.all_variables:
+            if entry['ctx'] != 'function' and types.get(entry['id']) != 'float':
+                types[entry['id']] = entry['dtype']
+        return types
+
+    def gen_label(self):
+        """Generate a label for control flow"""
+        self.lbl_counter += 1
+        return f"Label{self.lbl_counter}"
+
+    def declare_function(self, name, dtype, params):
+        """
+        Register a function so calls to it can be checked
+
+        Args:
+            name: Function name
+            dtype: Return type
+            params: (name, dtype) per parameter
+
+        Returns:
+            dict: The function's record in self.functions (IR not yet set)
+        """
+        signature = f"({', '.join(f'{ptype} {pname}' for pname, ptype in params)})"
+        self.registry.add(name, dtype, signature, context='function')
+        function = {'name': name, 'dtype': dtype, 'params': list(params), 'ir': [], 'asm': [], 'loop_stats': []}
+        self.functions[name] = function
+        return function
+
+    def enter_function(self, name, params, line):
+        """
+        Start emitting a function body into its own IR list
+
+        Temps and labels are numbered from 1 in every function, so a
+        function's IR does not depend on where it is defined. A repeated
+        parameter is reported on line, the line of the function's header.
+
+        Returns:
+            str: Label that return statements jump to
+        """
+        saved = (self.ir_instructions, self.tmp_counter, self.temp_types, self.lbl_counter, self.label_stack)
+        self.ir_instructions = []
+        self.tmp_counter = 0
+        self.temp_types = {}
+        self.lbl_counter = 0
+        self.label_stack = []
+        exit_label = self.gen_label()
+        self.function_stack.append((name, exit_label, saved))
+        self.registry.push_scope(name)
+        for pname, ptype in params:
+            if self.registry.is_declared_in_current_scope(pname):
+                self.report(f"Redeclaration of '{pname}' in current scope", line)
+            else:
+                self.registry.add(pname, ptype, None, context='parameter')
+        return exit_label
+
+    def leave_function(self):
+        """
+        Finish the innermost function body and go back to the enclosing IR
+
+        Returns:
+            tuple: (name, IR of the body)
+        """
+        name, exit_label, saved = self.function_stack.pop()
+        self.add_instruction('mark', exit_label)
+        self.add_instruction('return', 'return')
+        body = self.ir_instructions
+        (self.ir_instructions, self.tmp_counter, self.temp_types, self.lbl_counter,
+         self.label_stack) = saved
+        self.registry.pop_scope()
+        return name, body
+
+    def add_instruction(self, operation, operand1=None, operand2=None, dest=None):
+        """
+        Add an instruction to the intermediate representation
+
+        Args:
+            operation: Operation type (assign, add, jump, etc.)
+            operand1: First operand
+            operand2: Second operand
+            dest: Destination variable
+
+        Returns:
+            dest: The destination variable
+        """
+        instr = {'op': operation, 'src1': operand1, 'src2': operand2, 'dst': dest}
+        self.ir_instructions.append(instr)
+        return dest
+
+    def report(self, message, line):
+        """
+        Record a semantic error with the line it is on
+
+        Args:
+            message: Error message
+            line: Line of the token the error is about (p.lineno(n) in the
+                  grammar action that found it)
+        """
+        self.issues.append(f"{message} (line {line})")
+
+    def all_issues(self):
+        """
+        Get lexical and syntax/semantic problems together
+
+        Returns:
+            list: Error messages in the order they were found per stage
+        """
+        return self.lex_issues + self.issues
+
+    def as_dict(self):
+        """
+        Get the compile results as plain data (for JSON and worker processes)
+
+        Returns:
+            dict: tokens, symbols, inputs, ir, functions, loop_stats, pass_stats,
+                  function_stats, bounds_checks, asm and issues
+        """
+        return {
+            'tokens': self.token_stream,
+            'symbols': self.registry.all_entries(),
+            'inputs': self.inputs,
+            'ir': self.ir_instructions,
+            'functions': list(self.functions.values()),
+            'loop_stats': self.loop_stats,
+            'pass_stats': self.pass_stats,
+            'function_stats': self.function_stats,
+            'bounds_checks': self.bounds_checks,
+            'asm': self.asm,
+            'issues': self.all_issues(),
+        }
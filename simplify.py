@@ -0,0 +1,220 @@
+from ir import BINARY_OPS, IREvaluationError, can_trap, defined, evaluate, is_const, is_var, uses
+
+
+def _known_condition(block):
+    """
+    Value of the block's jump_if_false condition if it is a constant
+
+    A condition computed in the same block from two constants counts too.
+
+    Returns:
+        tuple: (True, value) or (False, None)
+    """
+    cond = block.terminator['src1']
+    if is_const(cond):
+        return True, cond
+    for instr in reversed(block.instrs[:-1]):
+        if defined(instr) == cond:
+            if instr['op'] in BINARY_OPS and is_const(instr['src1']) and is_const(instr['src2']):
+                try:
+                    return True, evaluate(instr['op'], instr['src1'], instr['src2'])
+                except IREvaluationError:
+                    return False, None
+            return False, None
+    return False, None
+
+
+def _drop_branch(cfg, block, taken):
+    """
+    Replace a jump_if_false with the edge it always takes
+
+    The comparison feeding it is removed too when nothing else reads it.
+    """
+    cond = block.instrs.pop()['src1']
+    if taken:
+        block.fallthrough = block.target
+    block.target = None
+    if not is_var(cond):
+        return
+    if any(cond in uses(instr) for other in cfg.blocks for instr in other.instrs):
+        return
+    for pos in range(len(block.instrs) - 1, -1, -1):
+        if defined(block.instrs[pos]) == cond:
+            if not can_trap(block.instrs[pos]):
+                del block.instrs[pos]
+            return
+
+
+def fold_constant_branches(cfg):
+    """
+    Resolve conditional jumps whose outcome is known
+
+    Returns:
+        int: Number of branches removed
+    """
+    folded = 0
+    for block in cfg.blocks:
+        term = block.terminator
+        if term is None or term['op'] != 'jump_if_false':
+            continue
+        if block.target is block.fallthrough:
+            _drop_branch(cfg, block, False)
+            folded += 1
+            continue
+        known, value = _known_condition(block)
+        if known:
+            _drop_branch(cfg, block, not value)
+            folded += 1
+    return folded
+
+
+def _forward(block):
+    """Where control goes after block if it does nothing but continue (None otherwise)"""
+    if not block.instrs:
+        return block.fallthrough
+    if len(block.instrs) == 1 and block.instrs[0]['op'] == 'jump':
+        return block.target
+    return None
+
+
+def _thread(start, cond=None, taken=None):
+    """
+    Follow edges past blocks that only continue elsewhere
+
+    With cond, a block that only tests the same condition again is passed
+    through on the side already decided (taken means the condition was false).
+    """
+    seen = set()
+    block = start
+    while block not in seen:
+        seen.add(block)
+        nxt = _forward(block)
+        if nxt is None and cond is not None and len(block.instrs) == 1:
+            term = block.instrs[0]
+            if term['op'] == 'jump_if_false' and term['src1'] == cond:
+                nxt = block.target if taken else block.fallthrough
+        if nxt is None:
+            return block
+        block = nxt
+    return start  # A cycle of empty blocks (an empty infinite loop) stays as it is
+
+
+def thread_jumps(cfg):
+    """
+    Point every edge at the block where work actually continues
+
+    Returns:
+        int: Number of edges redirected
+    """
+    threaded = 0
+    for block in cfg.blocks:
+        term = block.terminator
+        cond = term['src1'] if term is not None and term['op'] == 'jump_if_false' else None
+        if is_const(cond):
+            cond = None
+        if block.fallthrough is not None:
+            succ = _thread(block.fallthrough, cond, False)
+            if succ is not block.fallthrough:
+                block.fallthrough = succ
+                threaded += 1
+        if block.target is not None:
+            succ = _thread(block.target, cond, True)
+            if succ is not block.target:
+                block.target = succ
+                threaded += 1
+    if threaded:
+        cfg.compute_preds()
+    return threaded
+
+
+def drop_jumps(cfg):
+    """
+    Turn unconditional jump instructions into fallthrough edges
+
+    to_ir emits a jump again only where the successor is not the next
+    block in the layout.
+
+    Returns:
+        int: Number of jump instructions dropped from adjacent successors
+    """
+    dropped = 0
+    for pos, block in enumerate(cfg.blocks):
+        term = block.terminator
+        if term is not None and term['op'] == 'jump':
+            block.instrs.pop()
+            block.fallthrough, block.target = block.target, None
+            if pos + 1 < len(cfg.blocks) and cfg.blocks[pos + 1] is block.fallthrough:
+                dropped += 1
+    return dropped
+
+
+def merge_blocks(cfg):
+    """
+    Append a block to its only predecessor when that predecessor has no other successor
+
+    Returns:
+        int: Number of blocks merged away
+    """
+    merged = 0
+    pos = 0
+    while pos < len(cfg.blocks):
+        block = cfg.blocks[pos]
+        succ = block.fallthrough
+        if (block.terminator is None and succ is not None and succ is not block
+                and succ is not cfg.exit and succ.preds == [block]):
+            block.instrs.extend(succ.instrs)
+            block.fallthrough, block.target = succ.fallthrough, succ.target
+            cfg.blocks.remove(succ)
+            for later in block.succs:
+                later.preds = [block if pred is succ else pred for pred in later.preds]
+            merged += 1
+            continue
+        pos += 1
+    return merged
+
+
+def remove_unused_labels(cfg):
+    """
+    Forget labels that no jump needs
+
+    Returns:
+        int: Number of labels removed
+    """
+    needed = set()
+    for pos, block in enumerate(cfg.blocks):
+        next_block = cfg.blocks[pos + 1] if pos + 1 < len(cfg.blocks) else None
+        if block.target is not None:
+            needed.add(block.target)
+        if block.fallthrough is not None and block.fallthrough is not next_block:
+            needed.add(block.fallthrough)
+    removed = 0
+    for block in cfg.blocks:
+        if block.label is not None and block not in needed:
+            block.label = None
+            removed += 1
+    return removed
+
+
+def simplify_cfg(cfg):
+    """
+    Fold constant branches, thread jumps, merge straight-line blocks and
+    drop unreferenced labels, until nothing changes
+
+    The CFG must be outside SSA form (merging and threading do not update phis).
+
+    Args:
+        cfg: ControlFlowGraph (modified in place)
+
+    Returns:
+        int: Number of changes made
+    """
+    changes = drop_jumps(cfg)
+    while True:
+        round_changes = fold_constant_branches(cfg) + thread_jumps(cfg)
+        if cfg.remove_unreachable():
+            round_changes += 1
+        round_changes += merge_blocks(cfg)
+        if not round_changes:
+            break
+        changes += round_changes
+    return changes + remove_unused_labels(cfg)
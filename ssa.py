@@ -0,0 +1,527 @@
+from cfg import compute_dominators, dominance_frontiers, dominator_tree, liveness
+from ir import (BINARY_OPS, COMMUTATIVE_OPS, CONVERSION_OPS, IREvaluationError, can_trap, defined,
+                evaluate, has_side_effects, is_var, make_instr, replace_uses, uses)
+
+
+# SSA versions are written name.N; name.0 is the (undefined) value on entry
+def base_name(name):
+    return name.split('.')[0]
+
+
+def construct_ssa(cfg, idom=None, frontier=None, children=None):
+    """
+    Rewrite a CFG into SSA form in place
+
+    Phis are placed on the iterated dominance frontier of each variable's
+    definitions (semi-pruned: only names live across blocks get phis), then
+    every definition gets a fresh version while walking the dominator tree.
+    A phi is {'op': 'phi', 'src1': {pred block index: value}, 'src2': name}.
+
+    Args:
+        cfg: ControlFlowGraph; unreachable blocks must already be removed
+             when analyses are passed in
+        idom, frontier, children: Precomputed dominators, dominance
+             frontiers and dominator tree (computed if omitted)
+
+    Returns:
+        int: Number of definitions renamed (phis included)
+    """
+    if idom is None:
+        cfg.remove_unreachable()
+        idom = compute_dominators(cfg)
+    if frontier is None:
+        frontier = dominance_frontiers(cfg, idom)
+
+    def_blocks = {}
+    nonlocal_names = set()
+    for block in idom:
+        killed = set()
+        for instr in block.instrs:
+            for name in uses(instr):
+                if name not in killed:
+                    nonlocal_names.add(name)
+            dst = defined(instr)
+            if dst is not None:
+                killed.add(dst)
+                def_blocks.setdefault(dst, set()).add(block)
+
+    for name in sorted(nonlocal_names & set(def_blocks)):
+        has_phi = set()
+        worklist = list(def_blocks[name])
+        while worklist:
+            block = worklist.pop()
+            for join in frontier[block]:
+                if join in has_phi:
+                    continue
+                has_phi.add(join)
+                join.instrs.insert(0, {'op': 'phi', 'src1': {}, 'src2': name, 'dst': name})
+                if join not in def_blocks[name]:
+                    def_blocks[name].add(join)
+                    worklist.append(join)
+
+    counters = {}
+    stacks = {}
+
+    def new_version(name):
+        counters[name] = counters.get(name, 0) + 1
+        version = f"{name}.{counters[name]}"
+        stacks.setdefault(name, []).append(version)
+        return version
+
+    def current(name):
+        stack = stacks.get(name)
+        return stack[-1] if stack else f"{name}.0"
+
+    if children is None:
+        children = dominator_tree(idom)
+    # Iterative dominator-tree walk; ('exit', names) pops the versions a block pushed
+    work = [('enter', cfg.entry)]
+    while work:
+        action, item = work.pop()
+        if action == 'exit':
+            for name in item:
+                stacks[name].pop()
+            continue
+
+        block = item
+        pushed = []
+        for instr in block.instrs:
+            if instr['op'] != 'phi':
+                replace_uses(instr, current)
+            dst = defined(instr)
+            if dst is not None:
+                instr['dst'] = new_version(dst)
+                pushed.append(dst)
+
+        for succ in block.succs:
+            for instr in succ.instrs:
+                if instr['op'] != 'phi':
+                    break
+                instr['src1'][block.index] = current(instr['src2'])
+
+        work.append(('exit', pushed))
+        for child in reversed(children[block]):
+            work.append(('enter', child))
+    return sum(counters.values())
+
+
+class _Lattice:
+    """Marker for the SCCP lattice's top (unknown yet) and bottom (not constant)"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+TOP = _Lattice('TOP')
+BOTTOM = _Lattice('BOTTOM')
+
+
+def _same_const(a, b):
+    return type(a) is type(b) and a == b
+
+
+def _meet(a, b):
+    if a is TOP:
+        return b
+    if b is TOP:
+        return a
+    if a is BOTTOM or b is BOTTOM or not _same_const(a, b):
+        return BOTTOM
+    return a
+
+
+def sparse_conditional_constant_propagation(cfg):
+    """
+    Wegman-Zadeck sparse conditional constant propagation on SSA form
+
+    Folds constant computations, replaces uses with constants, resolves
+    branches on constant conditions and removes blocks that can never run.
+
+    Returns:
+        int: Number of instructions removed or simplified
+    """
+    defs = {}
+    users = {}
+    for block in cfg.blocks:
+        for instr in block.instrs:
+            dst = defined(instr)
+            if dst is not None:
+                defs[dst] = instr
+            for name in uses(instr):
+                users.setdefault(name, []).append((instr, block))
+
+    values = {}
+    executable = set()
+    visited = set()
+    flow_work = [(None, cfg.entry)]
+    ssa_work = []
+
+    def value_of(operand):
+        if not is_var(operand):
+            return operand
+        if operand not in defs:
+            return BOTTOM  # Entry value of a variable read before it is assigned
+        return values.get(operand, TOP)
+
+    def evaluate_instr(instr, block):
+        op = instr['op']
+        if op == 'phi':
+            result = TOP
+            for pred_index, operand in instr['src1'].items():
+                if (pred_index, block.index) in executable:
+                    result = _meet(result, value_of(operand))
+            return result
+        if op == 'assign':
+            return value_of(instr['src1'])
+        if op in ('call', 'load'):
+            return BOTTOM  # src1 is a function or array name, not a variable
+        a = value_of(instr['src1'])
+        b = value_of(instr['src2'])
+        if a is BOTTOM or b is BOTTOM:
+            return BOTTOM
+        if a is TOP or b is TOP:
+            return TOP
+        try:
+            result = evaluate(op, a, b)
+        except IREvaluationError:
+            return BOTTOM
+        # Left to run time: the native backend wraps at 64 bits, the interpreter does not
+        if type(result) is int and not -2 ** 63 <= result < 2 ** 63:
+            return BOTTOM
+        return result
+
+    def mark_edge(pred, succ):
+        if succ is not None:
+            flow_work.append((pred, succ))
+
+    def visit(instr, block):
+        dst = defined(instr)
+        if dst is not None:
+            new = evaluate_instr(instr, block)
+            old = values.get(dst, TOP)
+            if new is not old and not (old is not TOP and old is not BOTTOM and
+                                       new is not TOP and new is not BOTTOM and _same_const(old, new)):
+                values[dst] = new
+                ssa_work.extend(users.get(dst, []))
+        elif instr['op'] == 'jump':
+            mark_edge(block, block.target)
+        elif instr['op'] == 'jump_if_false':
+            cond = value_of(instr['src1'])
+            if cond is BOTTOM:
+                mark_edge(block, block.target)
+                mark_edge(block, block.fallthrough)
+            elif cond is not TOP:
+                mark_edge(block, block.fallthrough if cond else block.target)
+
+    while flow_work or ssa_work:
+        if flow_work:
+            pred, block = flow_work.pop()
+            edge = (pred.index if pred else None, block.index)
+            if edge in executable:
+                continue
+            executable.add(edge)
+            if block in visited:
+                for instr in block.instrs:
+                    if instr['op'] != 'phi':
+                        break
+                    visit(instr, block)
+                continue
+            visited.add(block)
+            for instr in block.instrs:
+                visit(instr, block)
+            if block.terminator is None:
+                mark_edge(block, block.fallthrough)
+        else:
+            instr, block = ssa_work.pop()
+            if block in visited:
+                visit(instr, block)
+
+    changes = 0
+    for block in cfg.blocks:
+        if block not in visited:
+            continue
+        kept = []
+        for instr in block.instrs:
+            dst = defined(instr)
+            if dst is not None:
+                value = values.get(dst, TOP)
+                if value is not TOP and value is not BOTTOM:
+                    changes += 1
+                    continue
+            replace_uses(instr, lambda name: _const_or_name(values, defs, name))
+
+            if instr['op'] == 'jump_if_false' and not is_var(instr['src1']):
+                changes += 1
+                if instr['src1']:
+                    block.target = None
+                    continue
+                block.fallthrough = None
+                instr = make_instr('jump', None)
+            kept.append(instr)
+        block.instrs = kept
+
+    if cfg.remove_unreachable():
+        changes += 1
+    prune_phis(cfg)
+    return changes
+
+
+def _const_or_name(values, defs, name):
+    value = values.get(name, TOP) if name in defs else BOTTOM
+    if value is TOP or value is BOTTOM:
+        return name
+    return value
+
+
+def prune_phis(cfg):
+    """Drop phi inputs from edges that no longer exist; single-input phis become copies"""
+    for block in cfg.blocks:
+        pred_indexes = {pred.index for pred in block.preds}
+        for pos, instr in enumerate(block.instrs):
+            if instr['op'] != 'phi':
+                break
+            instr['src1'] = {pred: value for pred, value in instr['src1'].items() if pred in pred_indexes}
+            if len(instr['src1']) == 1 and block is not cfg.entry:
+                (value,) = instr['src1'].values()
+                block.instrs[pos] = make_instr('assign', value, None, instr['dst'])
+    # Copies that replaced phis must follow the remaining phis
+    for block in cfg.blocks:
+        phis = [instr for instr in block.instrs if instr['op'] == 'phi']
+        if phis and block.instrs[:len(phis)] != phis:
+            rest = [instr for instr in block.instrs if instr['op'] != 'phi']
+            block.instrs = phis + rest
+
+
+def global_value_numbering(cfg, children=None):
+    """
+    Dominator-based value numbering with copy propagation on SSA form
+
+    A computation that repeats an expression already available in a
+    dominating block is replaced by that earlier result.
+
+    Args:
+        cfg: ControlFlowGraph in SSA form
+        children: Precomputed dominator tree (computed if omitted)
+
+    Returns:
+        int: Number of instructions removed
+    """
+    if children is None:
+        children = dominator_tree(compute_dominators(cfg))
+    replacement = {}
+
+    def resolve(operand):
+        while is_var(operand) and operand in replacement:
+            operand = replacement[operand]
+        return operand
+
+    table = {}
+    removed = set()
+    work = [('enter', cfg.entry)]
+    while work:
+        action, item = work.pop()
+        if action == 'exit':
+            for key in item:
+                del table[key]
+            continue
+
+        block = item
+        added = []
+        for instr in block.instrs:
+            op = instr['op']
+            if op != 'phi':
+                replace_uses(instr, resolve)
+
+            if op == 'assign':
+                replacement[instr['dst']] = instr['src1']
+                removed.add(id(instr))
+            elif op == 'phi':
+                sources = {repr(resolve(value)) for value in instr['src1'].values()}
+                if len(sources) == 1:
+                    replacement[instr['dst']] = resolve(next(iter(instr['src1'].values())))
+                    removed.add(id(instr))
+            elif op in BINARY_OPS or op in CONVERSION_OPS:
+                a, b = instr['src1'], instr['src2']
+                if op in COMMUTATIVE_OPS and repr(a) > repr(b):
+                    a, b = b, a
+                key = (op, repr(a), repr(b))
+                if key in table:
+                    replacement[instr['dst']] = table[key]
+                    removed.add(id(instr))
+                else:
+                    table[key] = instr['dst']
+                    added.append(key)
+
+        work.append(('exit', added))
+        for child in reversed(children.get(block, [])):
+            work.append(('enter', child))
+
+    for block in cfg.blocks:
+        block.instrs = [instr for instr in block.instrs if id(instr) not in removed]
+        for instr in block.instrs:
+            replace_uses(instr, resolve)
+    return len(removed)
+
+
+def eliminate_dead_code(cfg):
+    """
+    Remove side-effect-free definitions whose results are never read
+
+    Returns:
+        int: Number of instructions removed
+    """
+    use_counts = {}
+    for block in cfg.blocks:
+        for instr in block.instrs:
+            for name in uses(instr):
+                use_counts[name] = use_counts.get(name, 0) + 1
+
+    removed = 0
+    changed = True
+    while changed:
+        changed = False
+        for block in cfg.blocks:
+            kept = []
+            for instr in block.instrs:
+                dst = defined(instr)
+                if (dst is not None and use_counts.get(dst, 0) == 0
+                        and not has_side_effects(instr) and not can_trap(instr)):
+                    for name in uses(instr):
+                        use_counts[name] -= 1
+                    removed += 1
+                    changed = True
+                    continue
+                kept.append(instr)
+            block.instrs = kept
+    return removed
+
+
+def sequentialize_copies(copies, names):
+    """
+    Order a set of parallel copies so no source is overwritten before it is read
+
+    Args:
+        copies: List of (dst, src) pairs that conceptually happen at once
+        names: NameAllocator used for a temp when copies form a cycle
+
+    Returns:
+        list: assign instructions
+    """
+    pending = [(dst, src) for dst, src in copies if dst != src]
+    result = []
+    while pending:
+        read = {src for _, src in pending if is_var(src)}
+        ready = [(dst, src) for dst, src in pending if dst not in read]
+        if ready:
+            for dst, src in ready:
+                result.append(make_instr('assign', src, None, dst))
+            pending = [copy for copy in pending if copy not in ready]
+            continue
+        # Every destination is still needed as a source: break the cycle
+        dst, _ = pending[0]
+        saved = names.temp()
+        result.append(make_instr('assign', dst, None, saved))
+        pending = [(d, saved if s == dst else s) for d, s in pending]
+    return result
+
+
+def destruct_ssa(cfg):
+    """
+    Replace phis with copies at the end of each predecessor (splitting edges as needed)
+
+    Returns:
+        int: Number of phis removed
+    """
+    removed = 0
+    for block in list(cfg.blocks):
+        phis = [instr for instr in block.instrs if instr['op'] == 'phi']
+        if not phis:
+            continue
+
+        # A copy on an edge out of a branching block must not run on its other edge
+        while True:
+            branching = [pred for pred in block.preds if len(pred.succs) > 1]
+            if not branching:
+                break
+            cfg.split_edge(branching[0], block)
+
+        for pred in block.preds:
+            copies = [(phi['dst'], phi['src1'][pred.index]) for phi in phis if pred.index in phi['src1']]
+            moves = sequentialize_copies(copies, cfg.names)
+            if pred.terminator is not None:
+                pred.instrs[-1:-1] = moves
+            else:
+                pred.instrs.extend(moves)
+        block.instrs = block.instrs[len(phis):]
+        removed += len(phis)
+    return removed
+
+
+def coalesce_versions(cfg, live_out=None):
+    """
+    Give SSA versions of a variable back their plain name where their live
+    ranges do not overlap, so optimized IR stays readable
+
+    Versions that do interfere keep a numbered name (x.1, x.2, ...).
+
+    Args:
+        cfg: ControlFlowGraph after destruct_ssa
+        live_out: Precomputed live-out sets (computed if omitted)
+
+    Returns:
+        int: Number of copies that became self-assignments and were removed
+    """
+    if live_out is None:
+        _, live_out = liveness(cfg)
+    versions = {}
+    interference = set()
+
+    for block in cfg.blocks:
+        live = set(live_out[block])
+        for instr in reversed(block.instrs):
+            dst = defined(instr)
+            if dst is not None:
+                versions.setdefault(base_name(dst), set()).add(dst)
+                copy_src = instr['src1'] if instr['op'] == 'assign' else None
+                for name in live:
+                    if name != dst and name != copy_src and base_name(name) == base_name(dst):
+                        interference.add(frozenset((dst, name)))
+                live.discard(dst)
+            for name in uses(instr):
+                versions.setdefault(base_name(name), set()).add(name)
+                live.add(name)
+
+    rename = {}
+    for base, names in versions.items():
+        colors = []
+
+        def version_key(name):
+            suffix = name[len(base) + 1:]
+            return int(suffix) if suffix.isdigit() else -1
+
+        for name in sorted(names, key=version_key):
+            for pos, members in enumerate(colors):
+                if all(frozenset((name, other)) not in interference for other in members):
+                    members.append(name)
+                    break
+            else:
+                pos = len(colors)
+                colors.append([name])
+            rename[name] = base if pos == 0 else f"{base}.{pos}"
+
+    removed = 0
+    for block in cfg.blocks:
+        kept = []
+        for instr in block.instrs:
+            replace_uses(instr, rename)
+            if defined(instr) is not None:
+                instr['dst'] = rename.get(instr['dst'], instr['dst'])
+            if instr['op'] == 'assign' and instr['src1'] == instr['dst']:
+                removed += 1
+                continue
+            kept.append(instr)
+        block.instrs = kept
+    return removed
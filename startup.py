@@ -0,0 +1,78 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(defer):
+    """
+    Start the GUI in this process and time its first frame and first compile
+
+    The clock starts before tkinter and the GUI are imported. The first frame
+    is when the editor has been exposed and its pending redraws are done;
+    the first compile is requested right after it, as a user pressing Run
+    at once would, and ends when its session is rendered.
+
+    Returns:
+        dict: first_frame_ms and first_compile_ms
+    """
+    start = time.perf_counter()
+    import tkinter as tk
+    from gui import CompilerInterface
+
+    window = tk.Tk()
+    app = CompilerInterface(window, defer=defer)
+    times = {}
+
+    def on_expose(event=None):
+        if 'first_frame_ms' in times:
+            return
+        window.update_idletasks()
+        times['first_frame_ms'] = (time.perf_counter() - start) * 1000
+        window.after_idle(app.run_compilation)
+        window.after(1, wait_for_compile)
+
+    def wait_for_compile():
+        if app.session is None:
+            window.after(1, wait_for_compile)
+            return
+        times['first_compile_ms'] = (time.perf_counter() - start) * 1000
+        window.destroy()
+
+    app.code_input.bind('<Expose>', on_expose, add='+')
+    window.mainloop()
+    return times
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="GUI time to first frame and to first compile")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="fresh processes per mode (median reported)")
+    arg_parser.add_argument('--child', choices=['eager', 'deferred'], help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child == 'deferred')))
+        return 0
+
+    print(f"{'STARTUP':<10} {'FIRST FRAME MS':>15} {'FIRST COMPILE MS':>17}")
+    for mode in ('eager', 'deferred'):
+        runs = []
+        for _ in range(args.repeat):
+            # A new interpreter each time, so imports and table loading are counted
+            child = subprocess.run([sys.executable, __file__, '--child', mode],
+                                   capture_output=True, text=True)
+            if child.returncode != 0:
+                print(child.stderr.strip().splitlines()[-1] if child.stderr.strip() else "GUI failed to start",
+                      file=sys.stderr)
+                return 2
+            runs.append(json.loads(child.stdout))
+        frame = statistics.median(run['first_frame_ms'] for run in runs)
+        compile_ms = statistics.median(run['first_compile_ms'] for run in runs)
+        print(f"{mode:<10} {frame:>15.1f} {compile_ms:>17.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -74,14 +74,9 @@ class VariableRegistry:
         # Search from current scope up to global scope
         for scope in reversed(self.scope_stack):
             if identifier in scope:
+                # Scope entries are the same dicts held in all_variables,
+                # so the display record is updated without a linear scan
                 scope[identifier]['val'] = new_value
-                
-                # Also update in all_variables for display
-                for var in self.all_variables:
-                    if var['id'] == identifier and var['scope'] == scope[identifier]['scope']:
-                        var['val'] = new_value
-                        break
-                
                 return True
         return False
     
@@ -0,0 +1,66 @@
+import pytest
+
+from artifacts import ArtifactError, ArtifactFile, ArtifactReader, encode_artifact, session_artifact, write_artifact
+from compiler import Compiler
+
+SOURCE = '''
+float scale(int x, float f) {
+    return x * f;
+}
+int twice(int n) {
+    return n + n;
+}
+int a[4];
+int i;
+float total;
+for (i = 0; i < 4; i = i + 1) {
+    a[i] = twice(i);
+    total = total + scale(a[i], 0.5);
+}
+print(total);
+'''
+
+
+def compile_source(code=SOURCE):
+    compiler = Compiler()
+    try:
+        return compiler.compile(code)
+    finally:
+        compiler.close()
+
+
+def test_session_round_trip():
+    session = compile_source()
+    reader = ArtifactReader(session_artifact(session))
+    assert reader.tokens == session.token_stream
+    assert reader.ir == session.ir_instructions
+    assert reader.symbols == session.registry.all_entries()
+    assert reader.ast() == session.ast
+
+
+def test_functions_round_trip(tmp_path):
+    session = compile_source()
+    path = tmp_path / 'prog.mca'
+    write_artifact(path, session_artifact(session))
+    with ArtifactFile(path) as art:
+        functions = art.functions()
+    assert list(functions) == list(session.functions)
+    for name, function in session.functions.items():
+        assert functions[name] == {'name': name, 'dtype': function['dtype'],
+                                   'params': [tuple(param) for param in function['params']],
+                                   'ir': function['ir']}
+
+
+def test_sections_are_optional():
+    reader = ArtifactReader(encode_artifact(ir_code=[{'op': 'assign', 'src1': 1.5, 'src2': None, 'dst': 'x'}]))
+    assert reader.ir == [{'op': 'assign', 'src1': 1.5, 'src2': None, 'dst': 'x'}]
+    assert reader.tokens is None
+    assert reader.functions() is None
+    assert reader.ast() is None
+
+
+def test_other_versions_are_rejected():
+    data = bytearray(encode_artifact(ir_code=[]))
+    data[4] = 2
+    with pytest.raises(ArtifactError, match='unsupported artifact version 2'):
+        ArtifactReader(bytes(data))
@@ -0,0 +1,39 @@
+import pytest
+
+import batch
+import cli
+
+SOURCE = '''
+input int n;
+input float x;
+int i;
+float total = 0.0;
+for (i = 0; i < n; i = i + 1) {
+    total = total + x;
+}
+print(total);
+'''
+
+
+def write_files(tmp_path, rows):
+    source = tmp_path / 'prog.c'
+    source.write_text(SOURCE)
+    inputs = tmp_path / 'inputs.csv'
+    inputs.write_text('n,x\n' + ''.join(f'{n},{x}\n' for n, x in rows))
+    return str(source), str(inputs)
+
+
+def test_missing_numpy_is_reported_without_the_csv_path(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(batch, 'numpy', None)
+    source, inputs = write_files(tmp_path, [(1, 0.5)])
+    assert cli.main(['batch', source, inputs]) == 2
+    err = capsys.readouterr().err.strip()
+    assert err == "batch execution requires NumPy (pip install numpy)"
+
+
+def test_batch_matches_one_run_per_row(tmp_path, capsys):
+    pytest.importorskip('numpy')
+    source, inputs = write_files(tmp_path, [(0, 1.5), (3, 0.5), (4, 2.0)])
+    assert cli.main(['batch', source, inputs]) == 0
+    lines = capsys.readouterr().out.split('\n')
+    assert [float(line) for line in lines[:3]] == [0.0, 1.5, 8.0]
@@ -0,0 +1,30 @@
+from artifacts import ArtifactFile
+import cli
+
+SOURCES = {
+    'first.c': 'int twice(int n) {\n    return n + n;\n}\nint a = twice(2);\nprint(a);\n',
+    'second.c': 'int b = 1;\nprint(c);\n',
+}
+
+
+def write_sources(tmp_path):
+    paths = []
+    for name, code in SOURCES.items():
+        path = tmp_path / name
+        path.write_text(code)
+        paths.append(str(path))
+    return paths
+
+
+def test_compile_many_files_to_a_directory(tmp_path, capsys):
+    paths = write_sources(tmp_path)
+    out = tmp_path / 'out'
+    artifacts = tmp_path / 'artifacts'
+    assert cli.main(['compile', *paths, '-o', str(out), '--artifacts', str(artifacts)]) == 1
+    captured = capsys.readouterr()
+    # Only the file with a problem reports one, under its own path
+    assert captured.err.count('\n') == 1 and captured.err.startswith(paths[1])
+    assert 'twice:' in (out / 'first.asm').read_text().splitlines()
+    assert (out / 'second.asm').exists()
+    with ArtifactFile(str(artifacts / 'first.mca')) as artifact:
+        assert list(artifact.functions()) == ['twice']
@@ -0,0 +1,35 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from compiler import Compiler
+from workloads import generate_program
+
+# Everything in a compile result but the timings
+RESULT_KEYS = ('tokens', 'symbols', 'inputs', 'ir', 'functions', 'bounds_checks', 'asm', 'issues')
+
+
+def result_of(session):
+    result = session.as_dict()
+    return {key: result[key] for key in RESULT_KEYS}
+
+
+@pytest.mark.parametrize('parser_engine', ['ply', 'lr'])
+def test_concurrent_compiles_match_serial_ones(parser_engine):
+    compiler = Compiler(parser_engine=parser_engine)
+    # Different programs, one with errors, at every optimization level
+    jobs = [(generate_program(30, seed), seed % 3) for seed in range(6)]
+    jobs.append(('int a = ;\nprint(b);\n', 0))
+    expected = [result_of(Compiler(parser_engine=parser_engine).compile(code, opt_level=opt_level))
+                for code, opt_level in jobs]
+    # Switch threads often so that compiles interleave inside every stage
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            for _ in range(2):
+                results = list(pool.map(lambda job: result_of(compiler.compile(job[0], opt_level=job[1])), jobs))
+                assert results == expected
+    finally:
+        sys.setswitchinterval(interval)
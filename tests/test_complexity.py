@@ -0,0 +1,26 @@
+import pytest
+
+import complexity
+
+# Small sizes fit noisy exponents; anything quadratic still lands near 2
+SMALL_SIZES = [250, 500, 1000]
+SMALL_BOUND = 1.75
+
+
+def test_stages_grow_about_linearly():
+    bounds = {stage: SMALL_BOUND for stage in complexity.DEFAULT_BOUNDS}
+    results = complexity.run_guard(SMALL_SIZES, bounds, repeats=1)
+    assert set(results) == set(bounds)
+    assert complexity.check_results(results, bounds) == []
+
+
+@pytest.mark.parametrize('bound, message', [
+    ('parse=fast', "invalid bound 'parse=fast'"),
+    ('parse', "invalid bound 'parse'"),
+    ('link=1.0', "unknown stage 'link'"),
+])
+def test_bad_bounds_are_usage_errors(capsys, bound, message):
+    with pytest.raises(SystemExit) as exit_info:
+        complexity.main(['--bound', bound, '--sizes', '10'])
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
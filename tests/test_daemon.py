@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+from compiler import Compiler
+from daemon_client import HEADER, DaemonClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Everything in a compile result but the timings
+RESULT_KEYS = ('tokens', 'symbols', 'inputs', 'ir', 'functions', 'bounds_checks', 'asm', 'issues')
+SOURCE = 'int twice(int n) {\n    return n + n;\n}\nint a = twice(4);\nprint(a * 3);\n'
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """A daemon compiling on threads, listening on a socket in tmp_path"""
+    socket_path = str(tmp_path / 'daemon.sock')
+    process = subprocess.Popen([sys.executable, 'main.py', 'serve', '--socket', socket_path, '--workers', '0'],
+                               cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        assert 'listening' in process.stdout.readline()
+        yield socket_path, process
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait(timeout=10)
+        process.stdout.close()
+
+
+def test_compile_matches_a_local_compile(daemon):
+    socket_path, _ = daemon
+    expected = json.loads(json.dumps(Compiler().compile(SOURCE).as_dict()))
+    with DaemonClient(socket_path, timeout=30) as client:
+        result = client.compile(SOURCE, path='prog.c')
+    assert result['ok'] and result['path'] == 'prog.c'
+    assert {key: result[key] for key in RESULT_KEYS} == {key: expected[key] for key in RESULT_KEYS}
+
+
+def test_malformed_requests_get_error_responses(daemon):
+    socket_path, _ = daemon
+    with DaemonClient(socket_path, timeout=30) as client:
+        response = client.request({'op': 'recompile'})
+        assert not response['ok'] and 'unknown op' in response['error']
+        # The connection still serves requests after a bad op
+        assert client.compile(SOURCE)['ok']
+    with DaemonClient(socket_path, timeout=30) as client:
+        client.sock.sendall(HEADER.pack(8) + b'not json')
+        response = client.receive()
+        assert response['id'] is None and not response['ok']
+    # A bad frame ends only its own connection
+    with DaemonClient(socket_path, timeout=30) as client:
+        assert client.request({'op': 'ping'})['ok']
+
+
+def test_stop_shuts_the_daemon_down(daemon):
+    socket_path, process = daemon
+    assert cli.main(['stop', '--socket', socket_path]) == 0
+    assert process.wait(timeout=30) == 0
+    assert not os.path.exists(socket_path)
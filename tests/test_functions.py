@@ -0,0 +1,18 @@
+from compiler import Compiler
+from interpreter import IRInterpreter
+
+SOURCE = 'int f(int n) {{ print({}); return n; }} print(f(1));'
+
+
+def run(compiler, code):
+    session = compiler.compile(code)
+    assert not session.all_issues()
+    # repr: 2 == 2.0, but they print differently
+    return repr(IRInterpreter().run(session.ir_instructions, functions=session.functions).output)
+
+
+def test_int_and_float_constants_are_cached_apart():
+    compiler = Compiler()
+    for constant in ('2.0', '2', '2.0'):
+        code = SOURCE.format(constant)
+        assert run(compiler, code) == run(Compiler(), code) == f"[{constant}, 1]"
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from compiler import Compiler
+from incremental import IncrementalCompiler, edit_number
+from workloads import generate_program
+
+ATTRS = ('token_stream', 'ir_instructions', 'functions', 'ast', 'inputs', 'lex_issues', 'issues',
+         'asm', 'bounds_checks')
+
+# Statements spliced in and out between edits: functions, arrays and
+# declarations that statements below them use
+SNIPPETS = [
+    'int twice(int n) {\n    return n + n;\n}\n',
+    'float scale;\n',
+    'int grid[6];\n',
+    'input int limit;\n',
+    'int k;\nfor (k = 0; k < 6; k = k + 1) {\n    grid[k] = twice(k) + v1;\n}\n',
+    'print(grid[2] + twice(limit));\n',
+    'scale = scale * 2.5;\n',
+    'int v1 = 7;\n',
+    '// comment only\n',
+    'int broken = ;\n',
+]
+
+
+def edit(code, rng):
+    """Change a literal, or insert or delete a snippet at a statement boundary"""
+    choice = rng.random()
+    if choice < 0.4:
+        return edit_number(code, rng)
+    lines = code.split('\n')
+    cuts = [idx for idx, line in enumerate(lines) if not line.startswith((' ', '}'))]
+    idx = rng.choice(cuts)
+    if choice < 0.8:
+        lines.insert(idx, rng.choice(SNIPPETS).rstrip('\n'))
+    else:
+        snippet = rng.choice(SNIPPETS).rstrip('\n')
+        text = '\n'.join(lines)
+        return text.replace(snippet + '\n', '', 1) if snippet in text else text
+    return '\n'.join(lines)
+
+
+def assert_same(result, expected):
+    for attr in ATTRS:
+        assert getattr(result, attr) == getattr(expected, attr), attr
+    assert result.registry.all_entries() == expected.registry.all_entries()
+
+
+@pytest.mark.parametrize('opt_level', [0, 2])
+def test_edits_match_a_full_compile(opt_level):
+    compiler = Compiler(opt_level=opt_level)
+    incremental = IncrementalCompiler(compiler)
+    rng = random.Random(opt_level)
+    code = generate_program(40)
+    assert_same(incremental.compile(code), compiler.compile(code))
+    for _ in range(30):
+        code = edit(code, rng)
+        assert_same(incremental.compile(code), compiler.compile(code))
+
+
+def test_only_changed_statements_are_parsed_and_translated():
+    compiler = Compiler(opt_level=0)
+    incremental = IncrementalCompiler(compiler)
+    code = generate_program(400)
+    incremental.compile(code)
+    translated = {id(frag): frag.asm for frag in incremental.fragments}
+    code = edit_number(code, random.Random(1))
+    assert_same(incremental.compile(code), compiler.compile(code))
+    assert incremental.stats['reparsed'] == 1
+    # Changing a literal moves no label or register: one statement is translated again
+    assert sum(translated.get(id(frag)) is not frag.asm for frag in incremental.fragments) == 1
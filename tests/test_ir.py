@@ -0,0 +1,87 @@
+import pytest
+
+from bounds import count_checks
+from compiler import Compiler
+from functions import callee_types
+from interpreter import IRInterpreter, IRRuntimeError
+from ir import float_variables, make_instr
+
+SOURCE = '''
+int twice(int n) {
+    return n + n;
+}
+float half(float p) {
+    return p;
+}
+float never_assigned;
+int total = twice(3);
+int i;
+for (i = 0; i < 4; i = i + 1) {
+    total = total + twice(i);
+}
+print(never_assigned);
+print(half(never_assigned));
+print(total);
+'''
+
+
+def test_types_come_from_ops_declarations_and_return_types():
+    session = Compiler().compile(SOURCE)
+    assert not session.all_issues()
+    floats = float_variables(session.ir_instructions, session.declared_types(),
+                             callee_types(session.ir_instructions, session.functions))
+    # An int function's result stays int; the float one's result and the
+    # never-assigned float variable (typed only by its declaration) are floats
+    assert 'never_assigned' in floats
+    assert not {'total', 'i'} & floats
+    calls = {instr['src1']: instr['dst'] for instr in session.ir_instructions if instr['op'] == 'call'}
+    assert calls['half'] in floats and calls['twice'] not in floats
+
+
+def test_copies_share_one_type():
+    ir_code = [
+        make_instr('fadd', 'x', 1.0, 'temp1'),
+        make_instr('assign', 'temp1', None, 'y.1'),
+        make_instr('phi', {0: 'y.1', 1: 'y.2'}, None, 'y.3'),
+        make_instr('assign', 'y.3', None, 'y.2'),
+        make_instr('assign', 0, None, 'k'),
+        make_instr('assign', 'k', None, 'j'),
+    ]
+    assert float_variables(ir_code) == {'temp1', 'y.1', 'y.2', 'y.3'}
+    # 'x' is only read: its declaration decides
+    assert 'x' in float_variables(ir_code, {'x': 'float'})
+
+
+def test_unknown_calls_are_float():
+    ir_code = [make_instr('call', 'f', 0, 'temp1')]
+    assert float_variables(ir_code) == {'temp1'}
+    assert float_variables(ir_code, return_types={'f': 'int'}) == set()
+
+
+@pytest.mark.parametrize('code, output', [
+    # A constant index in range
+    ('int a[10]; a[3] = 4; print(a[3] + 1);', [5]),
+    # An induction variable bounded by the array length
+    ('int a[10]; int i; int s = 0; for (i = 0; i < 10; i = i + 1) { a[i] = i; } '
+     'for (i = 0; i < 10; i = i + 1) { s = s + a[i]; } print(s);', [45]),
+])
+def test_provably_safe_checks_are_removed(code, output):
+    session = Compiler(opt_level=2).compile(code)
+    assert not session.all_issues()
+    assert session.bounds_checks['emitted'] > 0
+    assert count_checks(session.ir_instructions) == 0
+    assert IRInterpreter().run(session.ir_instructions).output == output
+
+
+@pytest.mark.parametrize('code', [
+    # Off by one: i reaches the length
+    'int a[10]; int i; for (i = 0; i <= 10; i = i + 1) { a[i] = i; } print(a[0]);',
+    # The index changes after the loop condition bounded it
+    'int a[10]; int i; for (i = 0; i < 10; i = i + 1) { i = i + 2; a[i] = i; } print(a[0]);',
+])
+def test_checks_that_can_fail_are_kept(code):
+    session = Compiler(opt_level=2).compile(code)
+    assert not session.all_issues()
+    assert count_checks(session.ir_instructions) > 0
+    with pytest.raises(IRRuntimeError, match='out of bounds'):
+        IRInterpreter().run(session.ir_instructions)
@@ -0,0 +1,33 @@
+import random
+
+from compiler import Compiler
+from workloads import generate_program
+
+from test_parser import compile_within
+
+PIECES = ('int float x y if else while for print input ( ) { } ; = + - * / % '
+          '< <= == != 1 2.5 @').split()
+
+
+def malformed_sources(count, seed=5):
+    """Random token soups and randomly damaged generated programs"""
+    rng = random.Random(seed)
+    base = generate_program(30, 2)
+    for i in range(count):
+        if i % 2:
+            yield ' '.join(rng.choice(PIECES) for _ in range(rng.randint(0, 25)))
+            continue
+        code = base
+        for _ in range(rng.randint(1, 4)):
+            at = rng.randrange(len(code))
+            code = code[:at] + rng.choice(PIECES) + code[at + rng.randint(0, 5):]
+        yield code
+
+
+def test_engines_agree_on_malformed_input():
+    ply, lr = Compiler(), Compiler(parser_engine='lr')
+    for code in malformed_sources(200):
+        expected = compile_within(ply, code)
+        actual = compile_within(lr, code)
+        for attr in ('token_stream', 'ir_instructions', 'ast', 'issues', 'lex_issues'):
+            assert getattr(actual, attr) == getattr(expected, attr), code
@@ -0,0 +1,21 @@
+import random
+
+from compiler import Compiler
+from lsp import Document, line_starts, position_at
+
+
+def test_ranged_changes_keep_line_starts():
+    rng = random.Random(0)
+    text = 'int a;\na = 1;\n\nprint(a);\n'
+    document = Document('file:///t.c', text, 0, Compiler())
+    for version in range(1, 300):
+        lo = rng.randint(0, len(text))
+        hi = rng.randint(lo, min(len(text), lo + 12))
+        inserted = rng.choice(['', '\n', 'x', 'b = 2;\n', '\n\n', 'é\n'])
+        starts = line_starts(text)
+        change = {'range': {'start': position_at(text, starts, lo), 'end': position_at(text, starts, hi)},
+                  'text': inserted}
+        document.apply([change], version)
+        text = text[:lo] + inserted + text[hi:]
+        assert document.text == text
+        assert document.starts == line_starts(text)
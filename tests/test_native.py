@@ -0,0 +1,109 @@
+import os
+import platform
+import random
+import struct
+import subprocess
+
+import pytest
+
+from compiler import Compiler
+from interpreter import IRInterpreter
+from native import NativeCodegenError, NativeTranslator, printed_as, write_executable
+from workloads import generate_program
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+BENCHMARK_FILES = sorted(os.listdir(BENCHMARKS))
+
+native_only = pytest.mark.skipif(platform.system() != 'Linux' or platform.machine() != 'x86_64',
+                                 reason="native executables are x86-64 Linux ELF")
+
+
+def build_and_run(tmp_path, ir_code, declared=None):
+    """Build an executable from IR, run it and return the completed process"""
+    path = tmp_path / 'prog'
+    write_executable(path, NativeTranslator().translate(ir_code, declared=declared))
+    return subprocess.run([str(path)], capture_output=True, text=True, timeout=60)
+
+
+def assert_matches_interpreter(tmp_path, session):
+    assert not session.all_issues()
+    run = build_and_run(tmp_path, session.ir_instructions, session.declared_types())
+    expected = IRInterpreter(int_bits=64).run(session.ir_instructions).output
+    assert run.returncode == 0, run.stderr
+    actual = run.stdout.split('\n')[:-1]
+    assert len(actual) == len(expected)
+    assert all(printed_as(text, value) for text, value in zip(actual, expected)), (actual, expected)
+
+
+@native_only
+@pytest.mark.parametrize('opt_level', [0, 2])
+@pytest.mark.parametrize('name', BENCHMARK_FILES)
+def test_benchmarks_match_interpreter(tmp_path, name, opt_level):
+    with open(os.path.join(BENCHMARKS, name), encoding='utf-8') as file:
+        assert_matches_interpreter(tmp_path, Compiler(opt_level).compile(file.read()))
+
+
+@native_only
+@pytest.mark.parametrize('opt_level', [0, 2])
+@pytest.mark.parametrize('seed', range(3))
+def test_generated_programs_match_interpreter(tmp_path, seed, opt_level):
+    assert_matches_interpreter(tmp_path, Compiler(opt_level).compile(generate_program(40, seed)))
+
+
+@native_only
+def test_wrapping_and_negative_division(tmp_path):
+    assert_matches_interpreter(tmp_path, Compiler().compile(
+        'int a; int b; int n; a = 9223372036854775807; b = a + 1; print(b); '
+        'n = 0 - 7; print(n / 2); print(n % 2); print(7 / (0 - 2));'))
+
+
+@native_only
+def test_division_by_zero_exits_with_error(tmp_path):
+    session = Compiler().compile('int a; int b; a = 0; b = 5 / a; print(b);')
+    run = build_and_run(tmp_path, session.ir_instructions)
+    assert run.returncode == 1
+    assert 'division by zero' in run.stderr
+
+
+@native_only
+@pytest.mark.parametrize('opt_level', [0, 2])
+def test_float_arithmetic_matches_interpreter(tmp_path, opt_level):
+    assert_matches_interpreter(tmp_path, Compiler(opt_level).compile(
+        'float x; float y; float unset; int i; int k; x = 0.1; y = 0.0 - 2.5; i = 7; '
+        'print(x + 0.2); print(x * y); print(y / 3.0); print(y % 0.75); print(i / 2.0); print(unset); '
+        'if (x < y) { print(1); } if (x >= y) { print(2); } if (x == 0.1) { print(3); } '
+        'x = 1.0; for (k = 0; k < 40; k = k + 1) { x = x * 7.5; print(x); } '
+        'for (k = 0; k < 40; k = k + 1) { x = x / 1000.0; y = x - 1.0; print(x); print(y); }'))
+
+
+@native_only
+def test_floats_print_like_repr(tmp_path):
+    rng = random.Random(0)
+    values = [0.0, -0.0, 0.1, 1e16, 1e-5, 1e-4, 5e-324, 1e23, 2.2250738585072014e-308, 1.7976931308638157e308,
+              9007199254740993.0, float('inf'), float('-inf'), float('nan')]
+    for _ in range(2000):
+        values.append(struct.unpack('<d', struct.pack('<Q', rng.getrandbits(64)))[0])
+        values.append(rng.random() * 10 ** rng.randint(-25, 25))
+    run = build_and_run(tmp_path, [{'op': 'output', 'src1': value, 'src2': None, 'dst': None}
+                                   for value in values])
+    assert run.stdout.split('\n')[:-1] == [str(value) for value in values]
+
+
+@native_only
+@pytest.mark.parametrize('op', ['/', '%'])
+def test_float_division_by_zero_exits_with_error(tmp_path, op):
+    session = Compiler().compile(f'float a; float b; a = 0.0 - 0.0; b = 5.0 {op} a; print(b);')
+    run = build_and_run(tmp_path, session.ir_instructions, session.declared_types())
+    assert run.returncode == 1
+    assert 'division by zero' in run.stderr
+
+
+@pytest.mark.parametrize('code, message', [
+    ('int f(int n) { return n; } print(f(1));', 'function calls'),
+    ('int a[2]; a[0] = 1; print(a[0]);', 'arrays'),
+])
+def test_unsupported_programs_are_rejected(code, message):
+    session = Compiler().compile(code)
+    assert not session.all_issues()
+    with pytest.raises(NativeCodegenError, match=message):
+        NativeTranslator().translate(session.ir_instructions)
@@ -0,0 +1,22 @@
+import pytest
+
+from compiler import Compiler
+from parallel_lex import generate_source
+
+
+@pytest.mark.parametrize('engine', ['ply', 'lr'])
+def test_compile_with_lex_workers_matches_sequential(engine):
+    # Lexical and syntax errors in the middle, a comment spanning chunk cuts
+    code = generate_source(40_000) + '\nint $x = 1;\n/* a\nb */ int 3 = ;\n' + generate_source(20_000)
+    sequential = Compiler(parser_engine=engine)
+    parallel = Compiler(parser_engine=engine, lex_workers=2)
+    parallel.parallel_scanner.min_size = 1
+    try:
+        expected = sequential.compile(code)
+        result = parallel.compile(code)
+    finally:
+        parallel.close()
+    assert result.token_stream == expected.token_stream
+    assert result.ir_instructions == expected.ir_instructions
+    assert result.all_issues() == expected.all_issues()
+    assert result.asm == expected.asm
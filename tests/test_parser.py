@@ -0,0 +1,77 @@
+import signal
+
+import pytest
+
+from compiler import Compiler
+from interpreter import IRInterpreter
+
+
+@pytest.fixture(scope='module', params=['ply', 'lr'])
+def compiler(request):
+    compiler = Compiler(parser_engine=request.param)
+    yield compiler
+    compiler.close()
+
+
+def compile_within(compiler, code, seconds=5):
+    """Compile code, failing the test instead of hanging if the parser does not stop"""
+    def timed_out(signum, frame):
+        raise AssertionError(f'parser did not terminate on {code!r}')
+
+    previous = signal.signal(signal.SIGALRM, timed_out)
+    signal.alarm(seconds)
+    try:
+        return compiler.compile(code)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+@pytest.mark.parametrize('code', [
+    'int a; while (a < 3) { a = ; }',
+    'int a; while (a < 3) { a = a + 1 }',
+    'int a; while (a < ) { a = a + 1; }',
+])
+def test_malformed_while_body_reports_errors(compiler, code):
+    session = compile_within(compiler, code)
+    assert session.all_issues()
+
+
+def test_while_loop_runs(compiler):
+    session = compile_within(compiler, 'int a; int s; a = 0; s = 0; '
+                                       'while (a < 4) { s = s + a; a = a + 1; } print(s);')
+    assert not session.all_issues()
+    assert IRInterpreter().run(session.ir_instructions).output == [6]
+
+
+@pytest.mark.parametrize('code', [
+    'int a; for (a = 0; a < 3; a = a + 1) { a = ; }',
+    'int a; for (a = 0; a < 3; a = ) { a = 1; }',
+    'int a; for (a = 0; a < 3; ) { a = a + 1 }',
+    'int a; for (a = 0; a < 3 { a = a + 1; }',
+])
+def test_malformed_for_loop_reports_errors(compiler, code):
+    session = compile_within(compiler, code)
+    assert session.all_issues()
+
+
+def test_for_step_runs_after_body(compiler):
+    session = compile_within(compiler, 'int s; s = 0; '
+                                       'for (int i = 0; i < 4; i = i + 1) { print(i); s = s + i; } '
+                                       'print(s);')
+    assert not session.all_issues()
+    assert IRInterpreter().run(session.ir_instructions).output == [0, 1, 2, 3, 6]
+
+
+def test_issues_are_reported_on_their_own_line(compiler):
+    session = compile_within(compiler, 'a = a + 2;\na = a + 2;')
+    assert [issue[-2] for issue in session.issues] == ['1', '1', '2', '2']
+
+
+@pytest.mark.parametrize('code, issue', [
+    ('{ int f(int a) { return a; } }', "Function 'f' must be defined at the top level (line 1)"),
+    ('int main() { return 1; }', "'main' is reserved for the top-level statements (line 1)"),
+    ('int x; int x(int a) { return a; }', "Redeclaration of 'x' in current scope (line 1)"),
+])
+def test_return_in_rejected_function_header(compiler, code, issue):
+    assert compile_within(compiler, code).all_issues() == [issue]
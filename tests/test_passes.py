@@ -0,0 +1,54 @@
+import pytest
+
+import cli
+from compiler import Compiler
+from passes import PASSES, Pass, PassManager, pipeline_for
+
+SOURCE = 'int i;\nint s = 0;\nfor (i = 0; i < 5; i = i + 1) {\n    s = s + i * 2;\n}\nprint(s);\n'
+
+
+def probe(changes):
+    """A pass that reads two analyses and reports the given number of changes"""
+    def run(cfg, manager):
+        manager.analyses.get('dominators')
+        manager.analyses.get('liveness')
+        return changes
+    return run
+
+
+def test_changes_invalidate_all_but_preserved_analyses(monkeypatch):
+    monkeypatch.setitem(PASSES, 'read', Pass('read', probe(0)))
+    monkeypatch.setitem(PASSES, 'change', Pass('change', probe(1), preserves=('dominators',)))
+    manager = PassManager(['read', 'read', 'change', 'read', 'change', 'read'])
+    manager.run(Compiler(0).compile(SOURCE).ir_instructions)
+    # A pass without changes keeps everything; a change keeps only what it preserves
+    assert manager.analyses.computed == {'dominators': 1, 'liveness': 3}
+    assert manager.analyses.hits == {'dominators': 5, 'liveness': 3}
+    assert [row['changes'] for row in manager.stats] == [0, 0, 1, 0, 1, 0]
+
+
+def test_unknown_passes_are_rejected():
+    with pytest.raises(ValueError, match="unknown pass 'nope'"):
+        PassManager(['ssa', 'nope'])
+
+
+def test_print_after_dumps_the_ir_after_each_run_of_a_pass():
+    session = Compiler(2).compile(SOURCE, print_after=['gvn'])
+    # gvn runs in both SSA rounds of -O2
+    assert [name for name, _ in session.ir_dumps] == ['gvn', 'gvn']
+    assert 'print 20' in session.ir_dumps[-1][1]
+    all_dumps = Compiler(2).compile(SOURCE, print_after=['all']).ir_dumps
+    assert [name for name, _ in all_dumps] == pipeline_for(2)
+
+
+def test_cli_prints_ir_and_pass_times(tmp_path, capsys):
+    path = tmp_path / 'prog.c'
+    path.write_text(SOURCE)
+    assert cli.main(['compile', str(path), '-O2', '--print-after', 'sccp', '--time-passes',
+                     '-o', str(tmp_path / 'prog.asm')]) == 0
+    captured = capsys.readouterr()
+    output = captured.out + captured.err
+    assert output.count(f';; IR after sccp ({path})') == 2
+    table = output[output.index(f'passes for {path}:'):].splitlines()
+    assert table[1].split() == ['PASS', 'TIME', 'ANALYSES', 'CHANGES', 'IR']
+    assert [line.split()[0] for line in table[3:3 + len(pipeline_for(2))]] == pipeline_for(2)
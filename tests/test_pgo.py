@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import cli
+from cfg import build_cfg
+from compiler import Compiler
+from interpreter import IRInterpreter
+from pgo import Profile, ProfileError, apply_profile, collect_profile, layout_blocks
+
+# The else side runs 97 times out of 100
+SOURCE = '''int i;
+int r = 0;
+for (i = 0; i < 100; i = i + 1) {
+    if (i < 3) {
+        r = r + 1;
+    } else {
+        r = r + 2;
+    }
+}
+print(r);
+'''
+
+
+def profiled(code):
+    session = Compiler(0).compile(code)
+    assert not session.all_issues()
+    profile, result = collect_profile(code, session.ir_instructions)
+    return session, profile, result
+
+
+def test_profile_counts_blocks_and_taken_branches(tmp_path):
+    session, profile, result = profiled(SOURCE)
+    assert result.output == [197]
+    cfg = build_cfg(session.ir_instructions)
+    branch = next(block for block in cfg.blocks if block.terminator and block.terminator['op'] == 'jump_if_false'
+                  and profile.blocks[block.index] == 100)
+    assert profile.blocks[branch.target.index] == 97
+    assert profile.blocks[branch.fallthrough.index] == 3
+    assert profile.taken[branch.index] == 97
+
+    path = tmp_path / 'prog.prof'
+    profile.save(path)
+    loaded = Profile.load(path)
+    assert (loaded.blocks, loaded.taken) == (profile.blocks, profile.taken)
+    assert loaded.matches(SOURCE)
+
+
+def test_layout_puts_the_hot_side_after_the_branch():
+    session, profile, _ = profiled(SOURCE)
+    cfg = build_cfg(session.ir_instructions)
+    apply_profile(cfg, profile)
+    branch = next(block for block in cfg.blocks if block.taken == 97)
+    hot, cold = branch.target, branch.fallthrough
+    assert layout_blocks(cfg) > 0
+    # The comparison was negated so that the hot side falls through
+    assert branch.fallthrough is hot and branch.target is cold
+    assert cfg.blocks[cfg.blocks.index(branch) + 1] is hot
+
+    plain = Compiler(2).compile(SOURCE)
+    guided = Compiler(2).compile(SOURCE, profile=profile)
+    assert guided.profile_hints is not None
+    assert guided.ir_instructions != plain.ir_instructions
+    assert IRInterpreter().run(guided.ir_instructions).output == [197]
+
+
+def test_stale_profiles_are_ignored(tmp_path, capsys):
+    _, profile, _ = profiled(SOURCE)
+    edited = SOURCE.replace('r + 2', 'r + 5')
+    stale = Compiler(2).compile(edited, profile=profile)
+    assert stale.profile_hints is None
+    assert stale.ir_instructions == Compiler(2).compile(edited).ir_instructions
+
+    path = tmp_path / 'prog.prof'
+    profile.save(path)
+    assert cli.load_profiles([str(path)], [('prog.c', edited)]) == [None]
+    assert 'ignoring stale profile' in capsys.readouterr().err
+
+
+def test_unreadable_profiles_are_rejected(tmp_path):
+    _, profile, _ = profiled(SOURCE)
+    data = profile.to_dict()
+    with pytest.raises(ProfileError, match='version'):
+        Profile.from_dict(dict(data, version=data['version'] + 1))
+    with pytest.raises(ProfileError, match='malformed'):
+        Profile.from_dict({key: value for key, value in data.items() if key != 'blocks'})
+    path = tmp_path / 'bad.prof'
+    path.write_text(json.dumps(data)[:-5])
+    with pytest.raises(ProfileError, match='cannot read'):
+        Profile.load(path)
@@ -0,0 +1,70 @@
+from cfg import build_cfg
+from interpreter import IRInterpreter
+from ir import make_instr
+from simplify import fold_constant_branches, simplify_cfg, thread_jumps
+
+
+def simplified(ir_code):
+    """Simplify IR and check that it still prints the same"""
+    cfg = build_cfg(ir_code)
+    changes = simplify_cfg(cfg)
+    result = cfg.to_ir()
+    assert IRInterpreter().run(result).output == IRInterpreter().run(ir_code).output
+    return changes, result
+
+
+def ops(ir_code):
+    return [instr['op'] for instr in ir_code]
+
+
+def test_constant_conditions_fold_to_one_side():
+    ir_code = [
+        make_instr('<', 1, 2, 'temp1'),
+        make_instr('jump_if_false', 'temp1', 'Label1'),
+        make_instr('output', 10),
+        make_instr('jump', 'Label2'),
+        make_instr('mark', 'Label1'),
+        make_instr('output', 20),
+        make_instr('mark', 'Label2'),
+        make_instr('output', 30),
+    ]
+    assert fold_constant_branches(build_cfg(ir_code)) == 1
+    changes, result = simplified(ir_code)
+    assert changes > 0
+    # The comparison, the branch and the side never taken are gone
+    assert result == [make_instr('output', 10), make_instr('output', 30)]
+
+
+def test_edges_skip_blocks_that_only_jump():
+    ir_code = [
+        make_instr('assign', 0, None, 'c'),
+        make_instr('jump_if_false', 'c', 'Label1'),
+        make_instr('output', 1),
+        make_instr('jump', 'Label2'),
+        make_instr('mark', 'Label1'),
+        make_instr('jump', 'Label2'),
+        make_instr('mark', 'Label2'),
+        make_instr('output', 2),
+    ]
+    cfg = build_cfg(ir_code)
+    branch = cfg.blocks[0]
+    empty = branch.target
+    assert thread_jumps(cfg) > 0
+    assert branch.target is empty.target
+    _, result = simplified(ir_code)
+    # The branch goes straight to the block that prints 2
+    target = result.index(make_instr('mark', result[1]['src2']))
+    assert result[target + 1] == make_instr('output', 2)
+    assert 'jump' not in ops(result)
+
+
+def test_unreachable_blocks_are_removed():
+    ir_code = [
+        make_instr('jump', 'Label2'),
+        make_instr('mark', 'Label1'),
+        make_instr('output', 99),
+        make_instr('mark', 'Label2'),
+        make_instr('output', 1),
+    ]
+    _, result = simplified(ir_code)
+    assert result == [make_instr('output', 1)]
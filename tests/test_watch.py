@@ -0,0 +1,35 @@
+import io
+
+import pytest
+
+from watch import InotifyWatcher, SourceWatcher
+
+
+@pytest.mark.parametrize('polling', [
+    pytest.param(False, marks=pytest.mark.skipif(InotifyWatcher.load() is None, reason="needs inotify")),
+    True,
+])
+def test_a_change_recompiles_only_its_file(tmp_path, polling):
+    source = tmp_path / 'src'
+    source.mkdir()
+    first, second = source / 'first.c', source / 'second.c'
+    first.write_text('int a = 1;\nint c = a * 2;\nprint(a);\nprint(c);\n')
+    second.write_text('int b = 2;\nprint(b);\n')
+    (source / 'notes.txt').write_text('not a source\n')
+    out = tmp_path / 'out'
+    watcher = SourceWatcher(str(source), output=str(out), polling=polling, interval=0.01,
+                            out=io.StringIO(), err=io.StringIO())
+    try:
+        results = watcher.compile_paths(watcher.initial_paths())
+        assert [path for path, _, problems in results if not problems] == [str(first), str(second)]
+        second_asm = (out / 'second.asm').read_text()
+
+        first.write_text('int a = 1;\nint c = a * 30;\nprint(a);\nprint(c);\n')
+        changed = watcher.next_burst(timeout=5)
+        assert changed == {str(first)}
+        assert [path for path, _, _ in watcher.compile_paths(changed)] == [str(first)]
+        assert (out / 'second.asm').read_text() == second_asm
+        # Only the edited statement was parsed again
+        assert watcher.files[str(first)].incremental.stats['reparsed'] == 1
+    finally:
+        watcher.watcher.close()
@@ -0,0 +1,273 @@
+from cfg import AnalysisCache, dominates
+from ir import defined, is_var, make_instr
+from loops import LOOP_ANALYSES, find_induction_variables, int_variables
+
+
+DEFAULT_UNROLL_FACTOR = 4
+MAX_FULL_TRIPS = 16  # Loops with at most this many iterations may be unrolled completely
+MAX_FULL_SIZE = 160  # Instructions a complete unrolling may produce
+MAX_BODY_SIZE = 40  # Larger bodies are not partially unrolled
+
+# iv REL bound keeps holding while iv moves in this direction
+_DIRECTION = {'<': 1, '<=': 1, '>': -1, '>=': -1}
+_SWAPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+class CountingLoop:
+    """Innermost loop that runs while `iv rel bound` holds and steps iv once per iteration"""
+
+    def __init__(self, loop, iv, step, rel, bound, body):
+        self.loop = loop
+        self.iv = iv
+        self.step = step
+        self.rel = rel
+        self.bound = bound  # Int constant or a variable the loop does not assign
+        self.body = body  # Loop blocks except the header, in layout order
+
+    @property
+    def header(self):
+        return self.loop.header
+
+    @property
+    def exit(self):
+        return self.loop.header.target
+
+    def size(self):
+        return sum(len(block.instrs) for block in self.body)
+
+
+def match_counting_loop(cfg, loop, loops, idom, live_in, int_vars):
+    """
+    Recognize a loop the unroller can handle
+
+    The header must hold only `c = iv rel bound` and the conditional jump
+    out of the loop, the loop must have no other exit, no inner loop and a
+    single latch, and the update of iv must run on every iteration.
+
+    Returns:
+        CountingLoop: The match, or None
+    """
+    header = loop.header
+    if len(header.instrs) != 2 or len(loop.latches) != 1 or header in loop.latches:
+        return None
+    if any(other is not loop and other.header in loop.blocks for other in loops):
+        return None
+    cmp, term = header.instrs
+    if term['op'] != 'jump_if_false' or term['src1'] != cmp['dst'] or cmp['op'] not in _DIRECTION:
+        return None
+    if header.target in loop.blocks or header.fallthrough not in loop.blocks:
+        return None
+    if loop.exits() != [(header, header.target)]:
+        return None
+    if cmp['dst'] in live_in[header.fallthrough] or cmp['dst'] in live_in[header.target]:
+        return None
+
+    ivs = find_induction_variables(loop, int_vars)
+    rel, iv, bound = cmp['op'], cmp['src1'], cmp['src2']
+    if iv not in ivs:
+        rel, iv, bound = _SWAPPED[rel], bound, iv
+    if iv not in ivs:
+        return None
+    iv_block, _, step = ivs[iv]
+    if step * _DIRECTION[rel] < 0 or not dominates(idom, iv_block, loop.latches[0]):
+        return None
+    if is_var(bound):
+        if bound not in int_vars or any(defined(instr) == bound
+                                        for block in loop.blocks for instr in block.instrs):
+            return None
+    elif type(bound) is not int:
+        return None
+
+    body = [block for block in cfg.blocks if block in loop.blocks and block is not header]
+    return CountingLoop(loop, iv, step, rel, bound, body)
+
+
+def initial_value(counting):
+    """
+    Constant iv holds on entry, if it is set by straight-line code before the loop
+
+    Returns:
+        int: The value, or None when it is not known
+    """
+    outside = [pred for pred in counting.header.preds if pred not in counting.loop.blocks]
+    if len(outside) != 1:
+        return None
+    block = outside[0]
+    seen = set()
+    while block not in seen:
+        seen.add(block)
+        for instr in reversed(block.instrs):
+            if defined(instr) == counting.iv:
+                if instr['op'] == 'assign' and type(instr['src1']) is int:
+                    return instr['src1']
+                return None
+        if len(block.preds) != 1:
+            return None
+        block = block.preds[0]
+    return None
+
+
+def trip_count(counting, limit):
+    """
+    Iterations of a loop with constant start and bound
+
+    Returns:
+        int: The count, or None if unknown or above limit
+    """
+    value = initial_value(counting)
+    if value is None or is_var(counting.bound):
+        return None
+    holds = {
+        '<': lambda v: v < counting.bound, '<=': lambda v: v <= counting.bound,
+        '>': lambda v: v > counting.bound, '>=': lambda v: v >= counting.bound,
+    }[counting.rel]
+    trips = 0
+    while holds(value):
+        trips += 1
+        if trips > limit:
+            return None
+        value += counting.step
+    return trips
+
+
+def _clone_body(cfg, counting, next_entry, times):
+    """
+    Copy the loop body; edges back to the header go to next_entry instead
+
+    Profile counts are split evenly among the `times` copies.
+
+    Returns:
+        list: The copied blocks, in the body's layout order
+    """
+    copies = {block: cfg.new_block() for block in counting.body}
+    copies[counting.header] = next_entry
+    for block in counting.body:
+        copy = copies[block]
+        copy.instrs = [dict(instr) for instr in block.instrs]
+        if block.count is not None:
+            copy.count = block.count // times
+            copy.taken = None if block.taken is None else block.taken // times
+        copy.fallthrough = copies.get(block.fallthrough, block.fallthrough)
+        copy.target = copies.get(block.target, block.target)
+        # Jumps between copies become fallthroughs, so to_ir drops them when adjacent
+        if copy.terminator is not None and copy.terminator['op'] == 'jump':
+            copy.instrs.pop()
+            copy.fallthrough, copy.target = copy.target, None
+    return [copies[block] for block in counting.body]
+
+
+def _body_copies(cfg, counting, times, last_target):
+    """Chain `times` copies of the body, the last one continuing at last_target"""
+    blocks = []
+    next_entry = last_target
+    entry_pos = counting.body.index(counting.header.fallthrough)
+    for _ in range(times):
+        copy = _clone_body(cfg, counting, next_entry, times)
+        next_entry = copy[entry_pos]
+        blocks = copy + blocks
+    return blocks, next_entry
+
+
+def _redirect_entries(counting, new_entry):
+    for pred in counting.header.preds:
+        if pred in counting.loop.blocks:
+            continue
+        if pred.fallthrough is counting.header:
+            pred.fallthrough = new_entry
+        if pred.target is counting.header:
+            pred.target = new_entry
+
+
+def unroll_fully(cfg, counting, trips):
+    """Replace the loop with `trips` straight copies of its body"""
+    blocks, entry = _body_copies(cfg, counting, trips, counting.exit)
+    _redirect_entries(counting, entry)
+    pos = cfg.blocks.index(counting.header)
+    cfg.blocks[pos:pos] = blocks
+    cfg.remove_unreachable()
+
+
+def unroll_partially(cfg, counting, factor):
+    """
+    Run `factor` copies of the body per test while that many iterations remain
+
+    A guard tests whether iv will still satisfy the condition after
+    factor - 1 more steps; if not, the original loop runs the remaining
+    iterations. Like C, this assumes iv + (factor - 1) * step does not
+    overflow.
+
+    Returns:
+        BasicBlock: The guard, the header of the unrolled loop
+    """
+    guard = cfg.new_block()
+    blocks, entry = _body_copies(cfg, counting, factor, guard)
+    ahead = cfg.names.temp()
+    test = cfg.names.temp()
+    guard.instrs = [
+        make_instr('iadd', counting.iv, (factor - 1) * counting.step, ahead),
+        make_instr(counting.rel, ahead, counting.bound, test),
+        make_instr('jump_if_false', test, None),
+    ]
+    guard.fallthrough = entry
+    guard.target = counting.header
+    _redirect_entries(counting, guard)
+    pos = cfg.blocks.index(counting.header)
+    cfg.blocks[pos:pos] = [guard] + blocks
+    cfg.compute_preds()
+    return guard
+
+
+def unroll_loops(cfg, analyses=None, factor=DEFAULT_UNROLL_FACTOR, stats=None):
+    """
+    Unroll innermost counting loops
+
+    Loops with a small constant trip count are unrolled completely; others
+    with a small body get `factor` copies of the body per test.
+
+    Args:
+        cfg: ControlFlowGraph outside SSA form (modified in place)
+        analyses: AnalysisCache for cfg with LOOP_ANALYSES (created if omitted)
+        factor: Partial unrolling factor (1: complete unrolling only, 0: no unrolling)
+        stats: Optional list of loop stat dicts (see optimize_loops); entries
+               whose header was unrolled get an 'unrolled' description
+
+    Returns:
+        int: Number of loops unrolled
+    """
+    if factor < 1:
+        return 0
+    if analyses is None:
+        analyses = AnalysisCache(cfg, LOOP_ANALYSES)
+    int_vars = int_variables(cfg)
+    by_header = {entry['header']: entry for entry in stats or []}
+
+    done = set()
+    unrolled = 0
+    while True:
+        loops = analyses.get('loops')
+        pending = [loop for loop in loops if loop.header not in done]
+        if not pending:
+            break
+        loop = pending[0]
+        done.add(loop.header)
+
+        counting = match_counting_loop(cfg, loop, loops, analyses.get('dominators'),
+                                       analyses.get('liveness')[0], int_vars)
+        if counting is None:
+            continue
+        size = counting.size()
+        trips = trip_count(counting, min(MAX_FULL_TRIPS, MAX_FULL_SIZE // max(size, 1)))
+        label = counting.header.label
+        if trips is not None:
+            unroll_fully(cfg, counting, trips)
+            description = f"fully unrolled ({trips} iterations)"
+        elif factor > 1 and size <= MAX_BODY_SIZE:
+            done.add(unroll_partially(cfg, counting, factor))
+            description = f"unrolled x{factor}"
+        else:
+            continue
+        analyses.invalidate()
+        unrolled += 1
+        if label in by_header:
+            by_header[label]['unrolled'] = description
+    return unrolled
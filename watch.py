@@ -0,0 +1,293 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from compiler import Compiler
+from incremental import IncrementalCompiler
+
+
+# inotify(7) event masks
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Reports changed paths under a directory tree from Linux inotify events"""
+
+    def __init__(self, root, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # Watch descriptor -> directory
+        for dirpath, _, _ in os.walk(root):
+            self.add_dir(dirpath)
+
+    @staticmethod
+    def load():
+        """
+        Get the C library if it has inotify
+
+        Returns:
+            CDLL: libc, or None on platforms without inotify
+        """
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        except OSError:
+            return None
+        return libc if hasattr(libc, 'inotify_init1') else None
+
+    def add_dir(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def wait(self, timeout):
+        """
+        Wait for changes
+
+        Args:
+            timeout: Seconds to wait for the first event (None: forever)
+
+        Returns:
+            set: Paths of files that changed, appeared or disappeared
+        """
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self.dirs[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files written before the watch was added are picked up by the walk
+                    for dirpath, _, filenames in os.walk(path):
+                        self.add_dir(dirpath)
+                        changed.update(os.path.join(dirpath, filename) for filename in filenames)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Reports changed paths by comparing modification times (no file is read)"""
+
+    def __init__(self, root, interval=0.5):
+        self.root = root
+        self.interval = interval
+        self.stamps = self.scan()
+
+    def scan(self):
+        stamps = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                stamps[path] = (info.st_mtime_ns, info.st_size)
+        return stamps
+
+    def wait(self, timeout):
+        """
+        Wait for changes
+
+        Args:
+            timeout: Seconds to wait (None: until something changes)
+
+        Returns:
+            set: Paths of files that changed, appeared or disappeared
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stamps = self.scan()
+            changed = {path for path in stamps.keys() | self.stamps.keys()
+                       if stamps.get(path) != self.stamps.get(path)}
+            self.stamps = stamps
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(remaining, 0))
+
+    def close(self):
+        pass
+
+
+class WatchedFile:
+    """What watch mode remembers about one source"""
+
+    def __init__(self, compiler):
+        self.stamp = None  # (mtime_ns, size) when it was last compiled
+        self.code = None
+        self.incremental = IncrementalCompiler(compiler)
+
+
+class SourceWatcher:
+    """
+    Recompiles the sources under a directory as they change
+
+    One Compiler (lexer and LALR tables) is built up front and shared by
+    every file; each file keeps its own IncrementalCompiler, so a save only
+    reparses the statements that changed. Files do not depend on each other,
+    so a change never recompiles another file.
+    """
+
+    def __init__(self, root, extensions=('.c',), opt_level=0, output=None,
+                 debounce=0.05, polling=False, interval=0.5, out=sys.stdout, err=sys.stderr):
+        """
+        Args:
+            root: Directory to watch
+            extensions: Suffixes of the files to compile
+            opt_level: Optimization level
+            output: Directory that receives <relative path>.asm per source (optional)
+            debounce: Seconds without further events before a burst is compiled
+            polling: Use modification-time polling even where inotify is available
+            interval: Seconds between polls
+        """
+        self.root = root
+        self.extensions = tuple(extensions)
+        self.opt_level = opt_level
+        self.output = output
+        self.debounce = debounce
+        self.out = out
+        self.err = err
+        self.compiler = Compiler()
+        self.files = {}  # Path -> WatchedFile
+        libc = None if polling else InotifyWatcher.load()
+        self.watcher = InotifyWatcher(root, libc) if libc else PollingWatcher(root, interval)
+
+    def is_source(self, path):
+        return path.endswith(self.extensions)
+
+    def initial_paths(self):
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            paths += [os.path.join(dirpath, name) for name in sorted(filenames) if self.is_source(name)]
+        return paths
+
+    def next_burst(self, timeout=None):
+        """
+        Wait for a change, then collect events until the tree is quiet
+
+        Returns:
+            set: Changed source paths (empty if nothing changed before timeout)
+        """
+        changed = self.watcher.wait(timeout)
+        while changed:
+            more = self.watcher.wait(self.debounce)
+            if not more:
+                break
+            changed |= more
+        return {path for path in changed if self.is_source(path)}
+
+    def compile_paths(self, paths):
+        """
+        Recompile changed sources
+
+        Returns:
+            list: (path, milliseconds, problems) per compiled file; unchanged
+                  and deleted files are not compiled
+        """
+        results = []
+        for path in sorted(paths):
+            try:
+                info = os.stat(path)
+            except OSError:
+                if self.files.pop(path, None) is not None:
+                    print(f"{path}: removed", file=self.out)
+                    if self.output and os.path.exists(self.assembly_path(path)):
+                        os.remove(self.assembly_path(path))
+                continue
+            state = self.files.get(path)
+            if state is None:
+                state = self.files[path] = WatchedFile(self.compiler)
+            stamp = (info.st_mtime_ns, info.st_size)
+            if stamp == state.stamp:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    code = file.read()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"{path}: {e}", file=self.err)
+                continue
+            state.stamp = stamp
+            if code == state.code:
+                continue
+            state.code = code
+            start = time.perf_counter()
+            session = state.incremental.compile(code, opt_level=self.opt_level)
+            elapsed = (time.perf_counter() - start) * 1000
+            issues = session.all_issues()
+            if self.output:
+                self.write_assembly(path, session.asm)
+            stats = state.incremental.stats
+            detail = "full" if stats['full'] else f"reparsed {stats['reparsed']}/{stats['statements']}"
+            status = f"{len(issues)} problem(s)" if issues else "ok"
+            print(f"{path}: {elapsed:.1f} ms ({detail}), {status}", file=self.out)
+            for issue in issues:
+                print(f"{path}: {issue}", file=self.err)
+            results.append((path, elapsed, len(issues)))
+        self.out.flush()
+        return results
+
+    def assembly_path(self, path):
+        return os.path.join(self.output, os.path.splitext(os.path.relpath(path, self.root))[0] + '.asm')
+
+    def write_assembly(self, path, asm):
+        target = self.assembly_path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(asm) + '\n')
+
+    def run(self):
+        """Compile every source, then recompile changed ones until interrupted"""
+        kind = 'inotify' if isinstance(self.watcher, InotifyWatcher) else 'polling'
+        self.compile_paths(self.initial_paths())
+        print(f"watching {self.root} ({kind}), Ctrl+C to stop", file=self.out, flush=True)
+        try:
+            while True:
+                paths = self.next_burst()
+                if paths:
+                    self.compile_paths(paths)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.watcher.close()
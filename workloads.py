@@ -0,0 +1,142 @@
+import random
+
+
+class ProgramGenerator:
+    """Generates valid Mini-C programs of a requested size for benchmarks"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.var_counter = 0
+
+    def fresh_name(self, prefix='v'):
+        """Generate a unique variable name"""
+        self.var_counter += 1
+        return f"{prefix}{self.var_counter}"
+
+    def expression(self, names, depth=0):
+        """
+        Build a random arithmetic expression over declared names
+
+        Args:
+            names: Variables that are visible at this point
+            depth: Current nesting depth (limits expression size)
+
+        Returns:
+            str: Expression source text
+        """
+        if depth > 2 or self.rng.random() < 0.3:
+            if names and self.rng.random() < 0.6:
+                return self.rng.choice(names)
+            return str(self.rng.randint(1, 100))
+
+        left = self.expression(names, depth + 1)
+        right = self.expression(names, depth + 1)
+        op = self.rng.choice(['+', '-', '*', '+', '-'])
+        if self.rng.random() < 0.2:
+            return f"({left} {op} {right})"
+        if self.rng.random() < 0.1:
+            # Divide by a non-zero constant so generated programs can run
+            return f"{left} {self.rng.choice(['/', '%'])} {self.rng.randint(1, 9)}"
+        return f"{left} {op} {right}"
+
+    def statement(self, names, indent='', depth=0):
+        """
+        Build one statement, declaring new names into `names` as needed
+
+        Returns:
+            list: Source lines for the statement
+        """
+        roll = self.rng.random()
+
+        if not names or roll < 0.3:
+            name = self.fresh_name()
+            line = f"{indent}int {name} = {self.expression(names)};"
+            names.append(name)
+            return [line]
+
+        if roll < 0.55:
+            target = self.rng.choice(names)
+            return [f"{indent}{target} = {self.expression(names)};"]
+
+        if roll < 0.7:
+            return [f"{indent}print({self.expression(names)});"]
+
+        if depth >= 2 or roll < 0.85:
+            lhs = self.rng.choice(names)
+            rel = self.rng.choice(['<', '<=', '>', '>=', '==', '!='])
+            lines = [f"{indent}if ({lhs} {rel} {self.expression(names)}) {{"]
+            lines += self.block(names, indent + '    ', depth + 1)
+            if self.rng.random() < 0.5:
+                lines.append(f"{indent}}} else {{")
+                lines += self.block(names, indent + '    ', depth + 1)
+            lines.append(f"{indent}}}")
+            return lines
+
+        # Bounded counting loop so generated programs always terminate
+        counter = self.fresh_name('c')
+        lines = [f"{indent}int {counter} = 0;",
+                 f"{indent}while ({counter} < {self.rng.randint(1, 5)}) {{"]
+        lines += self.block(names, indent + '    ', depth + 1)
+        lines.append(f"{indent}    {counter} = {counter} + 1;")
+        lines.append(f"{indent}}}")
+        return lines
+
+    def block(self, names, indent, depth):
+        """Build the statements of a nested block (names declared inside stay local)"""
+        local = list(names)
+        lines = []
+        for _ in range(self.rng.randint(1, 3)):
+            lines += self.statement(local, indent, depth)
+        return lines
+
+    def program(self, n_statements):
+        """
+        Generate a program with the given number of top-level statements
+
+        Args:
+            n_statements: Number of top-level statements
+
+        Returns:
+            str: Program source code
+        """
+        names = []
+        lines = ["/* generated program */"]
+        for idx in range(n_statements):
+            if idx % 50 == 0:
+                lines.append(f"// section {idx // 50}")
+            lines += self.statement(names)
+        return '\n'.join(lines) + '\n'
+
+    def function_program(self, n_functions, n_statements):
+        """
+        Generate a program of functions called once each from the top level
+
+        Args:
+            n_functions: Number of function definitions
+            n_statements: Statements in each function body
+
+        Returns:
+            str: Program source code
+        """
+        lines = ["/* generated program */"]
+        calls = []
+        for idx in range(n_functions):
+            name = f"f{idx}"
+            names = ['a', 'b']
+            lines.append(f"int {name}(int a, int b) {{")
+            for _ in range(n_statements):
+                lines += self.statement(names, '    ')
+            lines.append(f"    return {self.expression(names)};")
+            lines.append("}")
+            calls.append(f"print({name}({self.rng.randint(1, 100)}, {self.rng.randint(1, 100)}));")
+        return '\n'.join(lines + calls) + '\n'
+
+
+def generate_program(n_statements, seed=0):
+    """Generate a deterministic program with `n_statements` top-level statements"""
+    return ProgramGenerator(seed).program(n_statements)
+
+
+def generate_function_program(n_functions, n_statements, seed=0):
+    """Generate a deterministic program of `n_functions` functions with `n_statements` statements each"""
+    return ProgramGenerator(seed).function_program(n_functions, n_statements)